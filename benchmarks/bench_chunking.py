@@ -0,0 +1,135 @@
+"""
+Chunker nativo por tokens (helpers.chunking) contra el splitter anterior
+(RecursiveCharacterTextSplitter de LangChain con chunk_size * 4 caracteres
+sobre texto con los espacios colapsados)
+
+Reporta, con los tokens medidos por helpers.chunking.count_tokens:
+número de chunks, media y coeficiente de variación de tokens por chunk,
+chunks sobre el presupuesto, chunks que terminan a mitad de oración y
+throughput en MB/s.
+
+Uso:
+    python benchmarks/bench_chunking.py --megabytes 1 4 --chunk-size 2000 --overlap 200
+    python benchmarks/bench_chunking.py --megabytes 2 --numeric 0.4
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import textwrap
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter  # noqa: E402  (solo para comparar)
+
+from helpers.chunking import count_tokens  # noqa: E402
+from helpers.pdf_text import clean_extracted_text  # noqa: E402
+from helpers.rag_helpers import get_chunks  # noqa: E402
+from tests.stubs.pdfs import WORDS  # noqa: E402
+
+SENTENCE_END = ".?:!;"
+LONG_WORDS = ["internacionalización", "responsabilidades", "configuración", "especificaciones"]
+
+
+def synthetic_text(megabytes, numeric=0.05, seed=3):
+    """
+    Texto tipo PDF extraído: párrafos separados por línea en blanco, líneas
+    cortadas a ~90 caracteres, palabras largas y una fracción `numeric` de
+    números (tablas, montos, códigos)
+    """
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    paragraphs = []
+    size = 0
+
+    while size < target:
+        sentences = []
+        for _ in range(rng.randint(1, 10)):
+            words = [
+                rng.choice(LONG_WORDS) if rng.random() < 0.08 else
+                f"{rng.randint(1, 9999999)}" if rng.random() < numeric else
+                rng.choice(WORDS)
+                for _ in range(rng.randint(3, 45))
+            ]
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", ":"]))
+        paragraph = "\n".join(textwrap.wrap(" ".join(sentences), 90))
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+
+    return "\n\n".join(paragraphs)
+
+
+def legacy_chunks(raw_text, chunk_size, overlap):
+    # Limpieza anterior: colapsaba todos los espacios, incluidos los saltos de línea
+    text = " ".join(raw_text.split())
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size * 4,
+        chunk_overlap=overlap * 4,
+        length_function=len,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+    return text, splitter.split_text(text)
+
+
+def native_chunks(raw_text, chunk_size, overlap):
+    text = clean_extracted_text(raw_text)
+    return text, get_chunks(text, chunk_size, overlap)
+
+
+def mid_sentence_cuts(text, chunks):
+    """
+    Chunks (salvo el último) que no terminan en fin de oración. LangChain deja
+    el separador ". " al inicio del chunk siguiente, así que se mira el
+    carácter que sigue al chunk en el texto limpio.
+    """
+    cuts = 0
+    cursor = 0
+    for chunk in chunks[:-1]:
+        tail = chunk.rstrip()[-40:]
+        position = text.find(tail, cursor)
+        if position < 0:
+            cuts += tail[-1] not in SENTENCE_END
+            continue
+        cursor = position
+        following = text[position + len(tail):position + len(tail) + 1]
+        cuts += tail[-1] not in SENTENCE_END and following not in SENTENCE_END
+    return cuts
+
+
+def report(name, text, chunks, elapsed, megabytes, chunk_size):
+    tokens = [count_tokens(chunk) for chunk in chunks]
+    mean = statistics.mean(tokens)
+    cv = statistics.pstdev(tokens) / mean
+    over = sum(1 for count in tokens if count > chunk_size)
+    cuts = mid_sentence_cuts(text, chunks)
+    print(
+        f"{name:<9} {len(chunks):>7} {mean:>9.0f} {cv:>6.2f} {min(tokens):>6} {max(tokens):>6} "
+        f"{over:>6} {100 * cuts / max(1, len(chunks) - 1):>8.1f}% {megabytes / elapsed:>7.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, nargs="+", default=[1, 4])
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--overlap", type=int, default=200)
+    parser.add_argument("--numeric", type=float, default=0.05, help="Fracción de palabras numéricas")
+    args = parser.parse_args()
+
+    print(f"{'chunker':<9} {'chunks':>7} {'tokens μ':>9} {'CV':>6} {'min':>6} {'max':>6} {'>size':>6} {'corte':>9} {'MB/s':>7}")
+    for megabytes in args.megabytes:
+        raw_text = synthetic_text(megabytes, args.numeric)
+        print(f"--- {megabytes} MB")
+        for name, chunker in (("langchain", legacy_chunks), ("nativo", native_chunks)):
+            start = time.perf_counter()
+            text, chunks = chunker(raw_text, args.chunk_size, args.overlap)
+            elapsed = time.perf_counter() - start
+            report(name, text, chunks, elapsed, megabytes, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
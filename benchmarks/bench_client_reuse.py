@@ -0,0 +1,69 @@
+"""
+Micro-benchmark del costo por request de crear clientes Bedrock/OpenSearch
+frente a reutilizarlos desde el registro de helpers.clients
+
+No hace llamadas de red: mide solo la construcción de clientes (Session,
+carga de modelos de servicio, AWS4Auth y pool de conexiones).
+
+Uso:
+    python benchmarks/bench_client_reuse.py --requests 200
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import boto3
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+
+from helpers import clients  # noqa: E402
+from helpers.opensearch_helpers import create_opensearch_client  # noqa: E402
+
+
+def per_request_setup():
+    # Lo que hacía cada invocación antes del registro
+    boto3.client('bedrock-runtime', region_name='us-east-1')
+    create_opensearch_client()
+
+
+def registry_setup():
+    clients.get_bedrock_runtime_client()
+    clients.get_opensearch_client()
+
+
+def measure(fn, requests):
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "AKIABENCHMARK")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("OPENSEARCH_ENDPOINT", "https://benchmark.us-east-1.aoss.amazonaws.com")
+
+    # Calentar la carga de modelos de botocore para no medir el cold start
+    per_request_setup()
+
+    before_p50, before_p99 = measure(per_request_setup, args.requests)
+    after_p50, after_p99 = measure(registry_setup, args.requests)
+
+    print(f"{'modo':<14} {'p50 ms':>10} {'p99 ms':>10}")
+    print(f"{'por request':<14} {before_p50:>10.3f} {before_p99:>10.3f}")
+    print(f"{'registro':<14} {after_p50:>10.3f} {after_p99:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark del motor de embeddings concurrente contra un Bedrock simulado
+
+Uso:
+    python benchmarks/bench_embedding_engine.py --chunks 200 --latency 0.05 --workers 1 4 8 16
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from helpers.embedding_engine import embed_concurrently  # noqa: E402
+from helpers.rag_helpers import get_multimodal_embeddings  # noqa: E402
+from tests.stubs.bedrock import StubBedrockRuntime  # noqa: E402
+
+
+def run(chunks, latency, workers, max_concurrent):
+    bedrock = StubBedrockRuntime(latency=latency, max_concurrent=max_concurrent)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        embed_concurrently(
+            chunks,
+            lambda chunk: get_multimodal_embeddings(input_text=chunk, bedrock_runtime=bedrock),
+            max_workers=workers
+        )
+    elapsed = time.perf_counter() - start
+
+    return elapsed, bedrock.throttled
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="Segundos por invoke_model")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--max-concurrent", type=int, default=None, help="Límite de concurrencia antes de 429")
+    args = parser.parse_args()
+
+    chunks = [f"Chunk sintético {i} con texto de prueba para embeddings" for i in range(args.chunks)]
+
+    baseline = None
+    print(f"{'workers':>8} {'segundos':>10} {'chunks/s':>10} {'speedup':>8} {'429s':>6}")
+    for workers in args.workers:
+        elapsed, throttled = run(chunks, args.latency, workers, args.max_concurrent)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {elapsed:>10.3f} {len(chunks) / elapsed:>10.1f} {baseline / elapsed:>7.1f}x {throttled:>6}")
+
+
+if __name__ == "__main__":
+    main()
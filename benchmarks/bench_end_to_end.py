@@ -0,0 +1,303 @@
+"""
+Benchmark end-to-end offline: ingesta con process.lambda_handler y consultas
+con query.lambda_handler contra S3, OpenSearch y Bedrock locales (tests/stubs)
+
+Para cada tamaño de corpus (PDFs y JPGs sintéticos) sube los archivos al S3
+en memoria, los ingiere en lotes de SQS y luego lanza consultas. Reporta:
+    - ingesta: docs/s, chunks/s y el desglose por etapa de las líneas EMF
+    - consultas: p50/p95/p99 de latencia
+    - RSS pico del proceso
+y guarda los resultados en JSON; con --baseline compara contra una corrida
+anterior y falla si alguna métrica empeora más de --max-regression.
+
+Uso:
+    python benchmarks/bench_end_to_end.py --docs 10 40 --queries 100 --latency 0.02
+    python benchmarks/bench_end_to_end.py --baseline benchmarks/results/e2e_base.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import uuid
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+import process  # noqa: E402
+import query  # noqa: E402
+from helpers import clients, pdf_pipeline, rag_helpers, strategies, vector_store  # noqa: E402
+from helpers.embedding_cache import set_embedding_cache  # noqa: E402
+from helpers.idempotency import reset_idempotency_store  # noqa: E402
+from helpers.query_cache import reset_query_cache  # noqa: E402
+from tests.stubs.bedrock import StubBedrockRuntime  # noqa: E402
+from tests.stubs.opensearch import FakeOpenSearch  # noqa: E402
+from tests.stubs.pdfs import WORDS, build_pdf, synthetic_page_lines  # noqa: E402
+from tests.stubs.s3 import StubS3  # noqa: E402
+
+BUCKET = "bench"
+TENANT = "cliente_bench"
+DEFAULT_RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+# Métricas comparadas con --baseline: (ruta, True si mayor es mejor)
+COMPARED_METRICS = [
+    (("ingest", "docs_per_second"), True),
+    (("ingest", "chunks_per_second"), True),
+    (("query", "p50_ms"), False),
+    (("query", "p95_ms"), False),
+    (("query", "p99_ms"), False),
+    (("peak_rss_mb",), False)
+]
+
+
+def synthetic_jpg(seed, size_kb=64):
+    # Bytes con marcadores JPEG; el stub de Bedrock no decodifica la imagen
+    rng = random.Random(seed)
+    return b"\xff\xd8\xff\xe0\x00\x10JFIF\x00" + rng.randbytes(size_kb * 1024) + b"\xff\xd9"
+
+
+def build_corpus(doc_count, pages_per_pdf, jpg_ratio):
+    """
+    Archivos distintos entre sí (semillas por documento) para que el cache de
+    embeddings y la deduplicación no inflen el resultado
+    """
+    corpus = []
+    jpg_every = round(1 / jpg_ratio) if jpg_ratio > 0 else 0
+
+    for doc_number in range(doc_count):
+        if jpg_every and doc_number % jpg_every == jpg_every - 1:
+            corpus.append((f"imagen_{doc_number:04d}.jpg", synthetic_jpg(doc_number)))
+            continue
+
+        pages = [synthetic_page_lines(doc_number * 1000 + page) for page in range(1, pages_per_pdf + 1)]
+        corpus.append((f"documento_{doc_number:04d}.pdf", build_pdf(pages)))
+
+    return corpus
+
+
+def install_stubs(latency, throttle_every):
+    bedrock = StubBedrockRuntime(latency=latency, throttle_every=throttle_every, answer="Respuesta generada a partir del contexto.")
+    s3 = StubS3()
+    opensearch = FakeOpenSearch()
+
+    pdf_pipeline.get_bedrock_runtime_client = lambda: bedrock
+    clients.get_bedrock_runtime_client = lambda profile='default', region=None: bedrock
+    rag_helpers.get_bedrock_runtime_client = lambda profile='default', region=None: bedrock
+    strategies.get_bedrock_runtime_client = lambda profile='default', region=None: bedrock
+    vector_store.get_opensearch_client = lambda: opensearch
+    vector_store.reset_vector_stores()
+    process.get_aws_client = lambda service_name, region=None: s3
+
+    set_embedding_cache(None)
+    reset_idempotency_store()
+    reset_query_cache()
+
+    return bedrock, s3, opensearch
+
+
+def sqs_batches(s3, keys, batch_size):
+    # Misma forma que el event source de SQS: un mensaje por notificación de S3
+    for start in range(0, len(keys), batch_size):
+        yield {"Records": [
+            {
+                "messageId": str(uuid.uuid4()),
+                "eventSource": "aws:sqs",
+                "body": json.dumps({"Records": [s3.s3_event(BUCKET, key)]})
+            }
+            for key in keys[start:start + batch_size]
+        ]}
+
+
+def emf_stage_totals(output, operation):
+    # Suma los spans (campos *_ms) de las líneas EMF de la operación
+    totals = {}
+
+    for line in output.splitlines():
+        if not line.startswith('{"Operation"'):
+            continue
+        record = json.loads(line)
+        if record.get("Operation") != operation:
+            continue
+        for name, value in record.items():
+            if name.endswith("_ms") and name != "total_ms":
+                totals[name[:-3]] = totals.get(name[:-3], 0.0) + value
+
+    return {name: round(value, 1) for name, value in sorted(totals.items())}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    position = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[position]
+
+
+def peak_rss_mb():
+    # ru_maxrss: KB en Linux, bytes en macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_ingest(s3, opensearch, corpus, batch_size):
+
+    keys = []
+    for filename, body in corpus:
+        key = f"uploads/{TENANT}/general/{filename}"
+        s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+        keys.append(key)
+
+    output = io.StringIO()
+    failures = 0
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+        for event in sqs_batches(s3, keys, batch_size):
+            failures += len(process.lambda_handler(event, None)["batchItemFailures"])
+    elapsed = time.perf_counter() - start
+
+    chunks = len(opensearch.documents(f"rag-documents-{TENANT}"))
+
+    return {
+        "docs": len(corpus),
+        "failed": failures,
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(len(corpus) / elapsed, 2),
+        "chunks_per_second": round(chunks / elapsed, 2),
+        "stages_ms": emf_stage_totals(output.getvalue(), "ingest")
+    }
+
+
+def run_queries(query_count, use_cache, seed=7):
+
+    rng = random.Random(seed)
+    latencies = []
+    errors = 0
+    output = io.StringIO()
+
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+        for _ in range(query_count):
+            question = f"¿Qué dice el documento sobre {rng.choice(WORDS)} y {rng.choice(WORDS)}?"
+            body = {"tenant_id": TENANT, "question": question, "use_cache": use_cache}
+
+            start = time.perf_counter()
+            response = query.lambda_handler({"body": json.dumps(body)}, None)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            if response["statusCode"] != 200:
+                errors += 1
+
+    return {
+        "queries": query_count,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "stages_ms": emf_stage_totals(output.getvalue(), "query")
+    }
+
+
+def compare(results, baseline, max_regression):
+    """
+    Regresiones por tamaño de corpus; devuelve la lista de métricas que
+    empeoraron más que max_regression (fracción)
+    """
+    baseline_runs = {run["docs"]: run for run in baseline.get("runs", [])}
+    regressions = []
+
+    for run in results["runs"]:
+        previous = baseline_runs.get(run["docs"])
+        if previous is None:
+            continue
+
+        for path, higher_is_better in COMPARED_METRICS:
+            current, before = run, previous
+            for key in path:
+                current, before = current.get(key), before.get(key)
+            if not before or current is None:
+                continue
+
+            change = (current - before) / before
+            worse = -change if higher_is_better else change
+            marker = "❌" if worse > max_regression else "  "
+            print(f"{marker} docs={run['docs']:<5} {'.'.join(path):<26} {before:>10} -> {current:<10} ({change:+.1%})")
+
+            if worse > max_regression:
+                regressions.append((run["docs"], ".".join(path), change))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, nargs="+", default=[10, 40], help="Tamaños de corpus")
+    parser.add_argument("--pages", type=int, default=4, help="Páginas por PDF")
+    parser.add_argument("--jpg-ratio", type=float, default=0.2, help="Fracción de JPGs en el corpus")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=4, help="Mensajes por lote de SQS")
+    parser.add_argument("--latency", type=float, default=0.02, help="Latencia por llamada a Bedrock (s)")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Cada N llamadas Bedrock responde 429")
+    parser.add_argument("--use-cache", action="store_true", help="Consultas con cache de respuestas")
+    parser.add_argument("--output", help="Archivo de resultados (default benchmarks/results/e2e_<fecha>.json)")
+    parser.add_argument("--baseline", help="Resultados anteriores para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    os.environ.setdefault("PROCESS_MIN_REMAINING_MS", "0")
+    os.environ.setdefault("FANOUT_MIN_PAGES", str(10 ** 9))
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count()
+        },
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "runs": []
+    }
+
+    print(f"{'docs':>5} {'chunks':>7} {'docs/s':>8} {'chunks/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'RSS MB':>7}")
+
+    for doc_count in args.docs:
+        _, s3, opensearch = install_stubs(args.latency, args.throttle_every)
+        corpus = build_corpus(doc_count, args.pages, args.jpg_ratio)
+
+        ingest = run_ingest(s3, opensearch, corpus, args.batch_size)
+        queries = run_queries(args.queries, args.use_cache)
+
+        run = {"docs": doc_count, "ingest": ingest, "query": queries, "peak_rss_mb": peak_rss_mb()}
+        results["runs"].append(run)
+
+        print(
+            f"{doc_count:>5} {ingest['chunks']:>7} {ingest['docs_per_second']:>8} {ingest['chunks_per_second']:>9} "
+            f"{queries['p50_ms']:>8} {queries['p95_ms']:>8} {queries['p99_ms']:>8} {run['peak_rss_mb']:>7}"
+        )
+        print(f"      ingesta por etapa (ms): {ingest['stages_ms']}")
+        print(f"      consulta por etapa (ms): {queries['stages_ms']}")
+        if ingest["failed"] or queries["errors"]:
+            print(f"      ⚠️ {ingest['failed']} archivos fallidos, {queries['errors']} consultas con error")
+
+    output_path = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"e2e_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output_path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.max_regression)
+        if regressions:
+            print(f"❌ {len(regressions)} métricas empeoraron más de {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Tiempo de ingesta de un PDF grande según el número de workers de fan-out
+
+Cada worker es un proceso (backend process, fork) con su propio presupuesto
+de llamadas a Bedrock (EMBEDDING_MAX_WORKERS), como una Lambda por rango.
+Los workers devuelven los embeddings y escribe el coordinador, así el tiempo
+incluye la escritura en el FakeOpenSearch que se verifica al final.
+Con --workers 1 el PDF se procesa en una sola pasada (process_file sin fan-out).
+
+Uso:
+    python benchmarks/bench_fanout.py --pages 400 --workers 1 2 4 8 --latency 0.02
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+import process  # noqa: E402
+from helpers import clients, fanout, pdf_pipeline, vector_store  # noqa: E402
+from helpers.embedding_cache import set_embedding_cache  # noqa: E402
+from tests.stubs.bedrock import StubBedrockRuntime  # noqa: E402
+from tests.stubs.opensearch import FakeOpenSearch  # noqa: E402
+from tests.stubs.pdfs import synthetic_pdf  # noqa: E402
+from tests.stubs.s3 import StubS3  # noqa: E402
+
+BUCKET = "bench"
+
+
+def ingest(file_content, workers, latency):
+    # Stubs nuevos por corrida: los procesos hijos los heredan con fork
+    bedrock = StubBedrockRuntime(latency=latency)
+    s3 = StubS3()
+    opensearch = FakeOpenSearch()
+    pdf_pipeline.get_bedrock_runtime_client = lambda: bedrock
+    clients.get_bedrock_runtime_client = lambda profile='default': bedrock
+    vector_store.get_opensearch_client = lambda: opensearch
+    vector_store.reset_vector_stores()
+    fanout.get_aws_client = lambda service_name: s3
+
+    key = f"uploads/cliente_bench/general/manual_{workers}.pdf"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=file_content)
+
+    os.environ["FANOUT_MAX_WORKERS"] = str(workers)
+    os.environ["FANOUT_MIN_PAGES"] = "1" if workers > 1 else str(10 ** 9)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = process.process_file(s3, BUCKET, key, "cliente_bench", "general", "manual.pdf", ".pdf")
+    elapsed = time.perf_counter() - start
+
+    if not result.get("success"):
+        raise RuntimeError(result.get("message"))
+
+    persisted = len(opensearch.documents(vector_store.get_index_name("cliente_bench")))
+    if persisted != result["details"]["written_count"]:
+        raise RuntimeError(f"{result['details']['written_count']} chunks escritos pero {persisted} en el índice")
+
+    return elapsed, result["details"]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--embedding-workers", type=int, default=2)
+    args = parser.parse_args()
+
+    os.environ["FANOUT_BACKEND"] = "process"
+    os.environ["FANOUT_PAGES_PER_WORKER"] = "1"
+    os.environ["EMBEDDING_MAX_WORKERS"] = str(args.embedding_workers)
+    # Sin cache de embeddings: cada corrida paga todas las llamadas a Bedrock
+    set_embedding_cache(None)
+
+    file_content = synthetic_pdf(args.pages)
+
+    print(f"{'workers':>8} {'chunks':>7} {'total s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        elapsed, details = ingest(file_content, workers, args.latency)
+        baseline = baseline or elapsed
+        print(f"{workers:>8} {details['chunks_count']:>7} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
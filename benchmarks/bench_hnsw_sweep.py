@@ -0,0 +1,298 @@
+"""
+Barrido de parámetros HNSW: recall@size vs latencia por plantilla de índice
+(m, ef_construction de los perfiles de helpers.index_profiles) y por los
+overrides de /query (k, ef_search)
+
+Backends:
+- reference (default): HNSW mínimo en NumPy (mismo algoritmo que nmslib y
+  faiss: grafo por capas, m vecinos, ef_construction/ef_search). Las
+  latencias son de Python y solo sirven para comparar entre opciones; las
+  distancias calculadas por pregunta sí son comparables con el motor real.
+- opensearch: crea un índice temporal por plantilla en OPENSEARCH_ENDPOINT,
+  mide latencia real (round trip incluido) y lo borra al terminar. Solo
+  faiss/lucene aceptan ef_search por query.
+
+El recall se mide contra la búsqueda exacta sobre los mismos vectores.
+--csv escribe una fila por combinación para graficar recall vs p50.
+
+Uso:
+    python benchmarks/bench_hnsw_sweep.py --chunks 2000 --queries 100
+    python benchmarks/bench_hnsw_sweep.py --profiles standard precise --ef-search 16 32 64 128 256 --csv /tmp/sweep.csv
+    OPENSEARCH_ENDPOINT=https://... python benchmarks/bench_hnsw_sweep.py --backend opensearch --profiles fp16 precise
+"""
+import argparse
+import csv
+import heapq
+import math
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from helpers.index_profiles import INDEX_PROFILES, get_index_profile, supports_query_ef_search  # noqa: E402
+from tests.stubs.bedrock import fake_embedding  # noqa: E402
+from tests.stubs.pdfs import synthetic_page_lines  # noqa: E402
+
+DIMENSIONS = 256  # El embedding sintético no gana nada con 1024 y el grafo se construye 4x más rápido
+
+
+class ReferenceHnsw:
+    """
+    HNSW de referencia (Malkov y Yashunin) sobre vectores normalizados con
+    distancia 1 - coseno. Selección de vecinos simple (los m más cercanos).
+    """
+
+    def __init__(self, vectors, m, ef_construction, seed=7):
+        self.vectors = vectors
+        self.m = m
+        self.max_m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.level_mult = 1 / math.log(m)
+        self.rng = random.Random(seed)
+        self.graph = []
+        self.entry = None
+        self.entry_level = -1
+        self.distance_count = 0
+
+        for node in range(len(vectors)):
+            self._insert(node)
+
+    def _distances(self, query, nodes):
+        self.distance_count += len(nodes)
+        return 1 - self.vectors[nodes] @ query
+
+    def _search_layer(self, query, entry_points, ef, level):
+
+        visited = set(entry_points)
+        distances = self._distances(query, entry_points)
+        candidates = [(distance, node) for distance, node in zip(distances, entry_points)]
+        results = [(-distance, node) for distance, node in candidates]
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+
+        while candidates:
+            distance, node = heapq.heappop(candidates)
+            if distance > -results[0][0]:
+                break
+
+            neighbors = [neighbor for neighbor in self.graph[level].get(node, ()) if neighbor not in visited]
+            if not neighbors:
+                continue
+            visited.update(neighbors)
+
+            for neighbor_distance, neighbor in zip(self._distances(query, neighbors), neighbors):
+                if len(results) < ef or neighbor_distance < -results[0][0]:
+                    heapq.heappush(candidates, (neighbor_distance, neighbor))
+                    heapq.heappush(results, (-neighbor_distance, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return sorted((-distance, node) for distance, node in results)
+
+    def _insert(self, node):
+
+        level = int(-math.log(1 - self.rng.random()) * self.level_mult)
+        query = self.vectors[node]
+
+        while len(self.graph) <= level:
+            self.graph.append({})
+
+        if self.entry is None:
+            for layer in range(level + 1):
+                self.graph[layer][node] = []
+            self.entry, self.entry_level = node, level
+            return
+
+        entry_points = [self.entry]
+        for layer in range(self.entry_level, level, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, layer)[0][1]]
+
+        for layer in range(min(level, self.entry_level), -1, -1):
+            found = self._search_layer(query, entry_points, self.ef_construction, layer)
+            max_links = self.max_m0 if layer == 0 else self.m
+            self.graph[layer][node] = [neighbor for _, neighbor in found[:self.m]]
+
+            for neighbor in self.graph[layer][node]:
+                links = self.graph[layer][neighbor]
+                links.append(node)
+                if len(links) > max_links:
+                    order = np.argsort(self._distances(self.vectors[neighbor], links))
+                    self.graph[layer][neighbor] = [links[position] for position in order[:max_links]]
+
+            entry_points = [neighbor for _, neighbor in found]
+
+        for layer in range(self.entry_level + 1, level + 1):
+            self.graph[layer][node] = []
+
+        if level > self.entry_level:
+            self.entry, self.entry_level = node, level
+
+    def search(self, query, k, ef_search):
+        # Como OpenSearch: el ef efectivo es max(ef_search, k)
+
+        entry_points = [self.entry]
+        for layer in range(self.entry_level, 0, -1):
+            entry_points = [self._search_layer(query, entry_points, 1, layer)[0][1]]
+
+        return [node for _, node in self._search_layer(query, entry_points, max(ef_search, k), 0)[:k]]
+
+
+class ReferenceBackend:
+
+    name = "reference"
+
+    def __init__(self, corpus):
+        self.corpus = corpus
+        self.index = None
+
+    def build(self, profile):
+        start = time.perf_counter()
+        self.index = ReferenceHnsw(self.corpus, profile["m"], profile["ef_construction"])
+        return time.perf_counter() - start
+
+    def search(self, query, size, k, ef_search):
+        self.index.distance_count = 0
+        return self.index.search(query, max(k, size), ef_search)[:size], self.index.distance_count
+
+    def close(self):
+        self.index = None
+
+
+class OpenSearchBackend:
+
+    name = "opensearch"
+
+    def __init__(self, corpus):
+        from helpers.opensearch_helpers import create_opensearch_client
+        self.client = create_opensearch_client(region=os.environ.get("AWS_REGION", "us-east-1"))
+        self.corpus = corpus
+        self.index_name = None
+        self.profile = None
+
+    def build(self, profile):
+        from helpers.bulk_writer import bulk_write
+        from helpers.index_profiles import encode_vector
+        from helpers.opensearch_helpers import create_index_if_not_exists
+
+        self.profile = dict(profile, dimensions=self.corpus.shape[1])
+        self.index_name = f"bench-hnsw-{profile['name']}-{int(time.time())}"
+
+        start = time.perf_counter()
+        create_index_if_not_exists(self.client, self.index_name, profile=self.profile)
+        operations = (
+            ({"index": {"_index": self.index_name, "_id": str(position)}}, {"embedding": encode_vector(vector.tolist(), self.profile)})
+            for position, vector in enumerate(self.corpus)
+        )
+        bulk_write(self.client, operations)
+        # Serverless tarda en hacer visibles los documentos
+        while self.client.count(index=self.index_name)["count"] < len(self.corpus):
+            time.sleep(2)
+        return time.perf_counter() - start
+
+    def search(self, query, size, k, ef_search):
+        from helpers.hybrid_search import build_vector_query
+        from helpers.index_profiles import encode_vector
+
+        body = build_vector_query(
+            encode_vector(query.tolist(), self.profile), [], size, k,
+            ef_search if supports_query_ef_search(self.profile) else None
+        )
+        body["_source"] = False
+        response = self.client.search(index=self.index_name, body=body)
+        return [int(hit["_id"]) for hit in response["hits"]["hits"]], None
+
+    def close(self):
+        if self.index_name:
+            self.client.indices.delete(index=self.index_name)
+
+
+def build_corpus(chunk_count, query_count, rng):
+    chunks = [" ".join(synthetic_page_lines(number, lines_per_page=4, seed=number)) for number in range(chunk_count)]
+    questions = []
+    for _ in range(query_count):
+        words = chunks[rng.randrange(chunk_count)].replace(".", "").split()
+        questions.append(" ".join(rng.sample(words, min(8, len(words)))))
+
+    corpus = np.array([fake_embedding(chunk, DIMENSIONS) for chunk in chunks], dtype=np.float32)
+    queries = np.array([fake_embedding(question, DIMENSIONS) for question in questions], dtype=np.float32)
+    return corpus, queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["reference", "opensearch"], default="reference")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--profiles", nargs="+", default=["standard", "precise"], choices=list(INDEX_PROFILES))
+    parser.add_argument("--k", type=int, nargs="+", default=[10, 50])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    parser.add_argument("--csv", help="Archivo CSV con una fila por combinación")
+    args = parser.parse_args()
+
+    corpus, queries = build_corpus(args.chunks, args.queries, random.Random(7))
+    exact = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.size]
+
+    backend = ReferenceBackend(corpus) if args.backend == "reference" else OpenSearchBackend(corpus)
+    rows = []
+
+    print(f"backend {backend.name}, {len(corpus)} vectores de {DIMENSIONS} dimensiones, {len(queries)} preguntas, size={args.size}")
+    print(f"{'perfil':<9} {'m':>3} {'ef_c':>5} {'k':>4} {'ef_search':>9} {'recall@' + str(args.size):>10} {'p50 ms':>8} {'p95 ms':>8} {'distancias':>10}")
+
+    for name in args.profiles:
+        profile = get_index_profile(name)
+        try:
+            build_seconds = backend.build(profile)
+            print(f"# {name}: índice construido en {build_seconds:.1f} s")
+
+            for k in args.k:
+                for ef_search in args.ef_search:
+                    if ef_search < k:
+                        continue
+
+                    recalls, latencies, distance_counts = [], [], []
+                    for query, expected in zip(queries, exact):
+                        start = time.perf_counter()
+                        found, distance_count = backend.search(query, args.size, k, ef_search)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        recalls.append(len(set(found) & set(expected.tolist())) / args.size)
+                        if distance_count is not None:
+                            distance_counts.append(distance_count)
+
+                    latencies.sort()
+                    row = {
+                        "profile": name,
+                        "m": profile["m"],
+                        "ef_construction": profile["ef_construction"],
+                        "k": k,
+                        "ef_search": ef_search,
+                        "recall": round(statistics.mean(recalls), 4),
+                        "p50_ms": round(statistics.median(latencies), 3),
+                        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+                        "distances": round(statistics.mean(distance_counts)) if distance_counts else ""
+                    }
+                    rows.append(row)
+                    print(
+                        f"{name:<9} {row['m']:>3} {row['ef_construction']:>5} {k:>4} {ef_search:>9} "
+                        f"{row['recall']:>10.3f} {row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['distances']:>10}"
+                    )
+        finally:
+            backend.close()
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"📄 {len(rows)} filas en {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
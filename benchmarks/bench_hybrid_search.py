@@ -0,0 +1,140 @@
+"""
+Recall@k y latencia de los modos de búsqueda vector, lexical e hybrid
+sobre un corpus sintético con identificadores (SKUs) en FakeOpenSearch
+
+Dos tipos de pregunta:
+- identificador: "estado del pedido SKU-0042-16" (el chunk correcto es el que contiene el SKU)
+- texto: una frase del chunk con palabras omitidas y reordenadas, sin SKU
+
+La latencia suma un round trip simulado (--rtt) por request a OpenSearch:
+hybrid usa un solo _msearch, así que paga un round trip igual que los otros modos.
+
+La fusión de hybrid se elige con HYBRID_FUSION (score | rrf). Con
+--backend local se mide el índice plano NumPy de helpers.vector_store (sin rtt).
+
+Uso:
+    python benchmarks/bench_hybrid_search.py --chunks 500 --queries 100 --rtt 0.02
+    HYBRID_FUSION=rrf python benchmarks/bench_hybrid_search.py
+    python benchmarks/bench_hybrid_search.py --backend local --chunks 5000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from helpers import opensearch_indexing as indexing  # noqa: E402
+from helpers import vector_store  # noqa: E402
+from helpers.hybrid_search import SEARCH_MODES, get_hybrid_settings  # noqa: E402
+from tests.stubs.bedrock import fake_embedding  # noqa: E402
+from tests.stubs.opensearch import FakeOpenSearch  # noqa: E402
+from tests.stubs.pdfs import synthetic_page_lines  # noqa: E402
+
+TENANT = "cliente_bench"
+DIMENSIONS = 256  # Suficiente para el embedding sintético y mucho más rápido en Python puro
+
+
+class LatentOpenSearch(FakeOpenSearch):
+
+    def __init__(self, rtt):
+        super().__init__()
+        self.rtt = rtt
+
+    def search(self, index=None, body=None, **kwargs):
+        if self.rtt and not kwargs.pop("_nested", False):
+            time.sleep(self.rtt)
+        return super().search(index=index, body=body, **kwargs)
+
+    def msearch(self, body, index=None, **kwargs):
+        if self.rtt:
+            time.sleep(self.rtt)
+        rtt, self.rtt = self.rtt, 0
+        try:
+            return super().msearch(body, index=index, **kwargs)
+        finally:
+            self.rtt = rtt
+
+
+def build_corpus(chunk_count):
+    # Chunks de 4 líneas; cada chunk lleva un SKU único en su primera línea
+    return [" ".join(synthetic_page_lines(number, lines_per_page=4, seed=number)) for number in range(chunk_count)]
+
+
+def build_queries(chunks, query_count, rng):
+    queries = []
+    for _ in range(query_count):
+        target = rng.randrange(len(chunks))
+        sku = f"SKU-{target:04d}-00"
+        queries.append(("identificador", f"estado del pedido {sku}", target))
+
+        words = chunks[target].replace(".", "").split()
+        words = [word for word in words if not word.startswith("SKU")]
+        sample = rng.sample(words, min(8, len(words)))
+        queries.append(("texto", " ".join(sample), target))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rtt", type=float, default=0.02)
+    parser.add_argument("--backend", choices=["opensearch", "local"], default="opensearch")
+    args = parser.parse_args()
+
+    if args.backend == "local":
+        os.environ["VECTOR_STORE_BACKEND"] = "local"
+        os.environ["LOCAL_VECTOR_STORE_DIR"] = tempfile.mkdtemp(prefix="bench-vector-store-")
+        args.rtt = 0
+
+    rng = random.Random(7)
+    client = LatentOpenSearch(rtt=0)
+    vector_store.get_opensearch_client = lambda: client
+
+    chunks = build_corpus(args.chunks)
+    with contextlib.redirect_stdout(io.StringIO()):
+        indexing.opensearch_indexing(
+            [fake_embedding(chunk, DIMENSIONS) for chunk in chunks], chunks, TENANT, "general",
+            "uploads/cliente_bench/general/catalogo.pdf", "catalogo.pdf"
+        )
+    client.rtt = args.rtt
+
+    queries = build_queries(chunks, args.queries, rng)
+    results = {}
+
+    for mode in SEARCH_MODES:
+        for kind, question, target in queries:
+            embedding = fake_embedding(question, DIMENSIONS)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                response = indexing.opensearch_query(embedding, TENANT, question=question, search_mode=mode)
+            elapsed = time.perf_counter() - start
+
+            found = [document["chunk_index"] for document in response["documents"][:args.k]]
+            entry = results.setdefault((mode, kind), {"hits": 0, "total": 0, "latency": []})
+            entry["hits"] += target in found
+            entry["total"] += 1
+            entry["latency"].append(elapsed * 1000)
+
+    print(
+        f"backend {args.backend}, corpus: {args.chunks} chunks, {args.queries} preguntas por tipo, "
+        f"rtt simulado {args.rtt * 1000:.0f} ms, fusión {get_hybrid_settings()['fusion']}"
+    )
+    print(f"{'modo':<8} {'pregunta':<14} {'recall@' + str(args.k):>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for (mode, kind), entry in results.items():
+        latencies = sorted(entry["latency"])
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{mode:<8} {kind:<14} {entry['hits'] / entry['total']:>9.2f} {statistics.median(latencies):>8.1f} {p95:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Tiempo de import en frío de cada handler Lambda (python -X importtime en un
+proceso nuevo por corrida), la parte de INIT que paga cada cold start
+
+- antes: el handler más lo que rag_helpers cargaba al importarse (LangChain
+  text splitters, PyPDF2, opensearch-py, requests-aws4auth). verify lo pagaba
+  en el primer request al crear el cliente OpenSearch; upload nunca.
+- import: el handler tal como queda ahora (INIT)
+- 1er request: import más los módulos diferidos que el handler sí usa
+  (opensearch-py en búsqueda, además PyPDF2 en ingesta)
+
+Los tiempos dependen del entorno: aquí aiohttp está instalado y opensearch-py
+lo carga; en los layers de Lambda no está.
+
+Uso:
+    python benchmarks/bench_import_time.py --runs 5
+    python benchmarks/bench_import_time.py --handlers query --top 15
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FUNCTIONS_DIR = os.path.join(ROOT_DIR, "functions")
+
+HANDLERS = ["upload", "verify", "query", "query_stream", "query_batch", "process"]
+LEGACY_IMPORTS = ["langchain_text_splitters", "PyPDF2", "opensearchpy", "requests_aws4auth"]
+SEARCH_IMPORTS = ["opensearchpy", "requests_aws4auth"]
+
+# handler -> (imports que pagaba antes, imports diferidos que usa ahora)
+HANDLER_IMPORTS = {
+    "upload": ([], []),
+    "verify": (LEGACY_IMPORTS, SEARCH_IMPORTS),
+    "query": (LEGACY_IMPORTS, SEARCH_IMPORTS),
+    "query_stream": (LEGACY_IMPORTS, SEARCH_IMPORTS),
+    "query_batch": (LEGACY_IMPORTS, SEARCH_IMPORTS),
+    "process": (LEGACY_IMPORTS, SEARCH_IMPORTS + ["PyPDF2"]),
+}
+
+
+def import_times(statement):
+    """
+    Devuelve {módulo: µs acumulados} de un proceso que ejecuta statement
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=FUNCTIONS_DIR,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def measure(modules, runs):
+    """
+    Mediana de ms para importar modules en orden en un proceso nuevo
+    (la suma de acumulados no cuenta dos veces los módulos compartidos)
+    """
+    statement = "; ".join(f"import {module}" for module in modules)
+    samples = []
+    for _ in range(runs):
+        times = import_times(statement)
+        samples.append(sum(times.get(module, 0) for module in modules) / 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--handlers", nargs="+", default=HANDLERS)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=0, help="Módulos más pesados de cada handler")
+    args = parser.parse_args()
+
+    print(f"{'handler':<14} {'antes ms':>9} {'import ms':>10} {'1er request ms':>15}")
+    for handler in args.handlers:
+        legacy_imports, lazy_imports = HANDLER_IMPORTS.get(handler, ([], []))
+        before = measure(legacy_imports + [handler], args.runs)
+        after = measure([handler], args.runs)
+        first_request = measure([handler] + lazy_imports, args.runs)
+        print(f"{handler:<14} {before:>9.0f} {after:>10.0f} {first_request:>15.0f}")
+
+        if args.top:
+            times = import_times(f"import {handler}")
+            top_level = {module: value for module, value in times.items() if "." not in module}
+            for module, value in sorted(top_level.items(), key=lambda item: -item[1])[:args.top]:
+                print(f"    {module:<30} {value / 1000:>7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
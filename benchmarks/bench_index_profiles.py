@@ -0,0 +1,142 @@
+"""
+Recall vs memoria de los perfiles de índice (helpers.index_profiles)
+
+Para cada perfil se embeben corpus y preguntas con su dimensión, se
+codifican como los guardaría OpenSearch (encode_vector; fp16 se simula
+redondeando a float16 como el encoder sq) y se busca exacto con NumPy:
+- recall@k vs standard: fracción del top-k de standard (1024 float32) que
+  también devuelve el perfil
+- acierto@k: preguntas cuyo chunk de origen queda en el top-k
+- memoria: estimación HNSW de OpenSearch para --vectors vectores
+
+Se mide solo el efecto de dimensión y cuantización (HNSW aproxima igual en
+todos los perfiles). Con el embedding sintético (tests.stubs.bedrock) menos
+dimensiones significa más colisiones de hashing, no la pérdida real de
+Titan: para decidir el perfil de un tenant usar --embeddings con vectores
+reales de Bedrock, un .npz con corpus_<dim> y queries_<dim> (más
+targets opcional) para 1024, 384 y 256.
+
+Uso:
+    python benchmarks/bench_index_profiles.py --chunks 2000 --queries 200
+    python benchmarks/bench_index_profiles.py --embeddings titan_cliente_x.npz --vectors 5000000
+"""
+import argparse
+import os
+import random
+import sys
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from helpers.index_profiles import INDEX_PROFILES, get_index_profile, encode_vector, estimate_vector_memory  # noqa: E402
+from tests.stubs.bedrock import fake_embedding  # noqa: E402
+from tests.stubs.pdfs import synthetic_page_lines  # noqa: E402
+
+REFERENCE_PROFILE = "standard"
+
+
+def build_corpus(chunk_count):
+    return [" ".join(synthetic_page_lines(number, lines_per_page=4, seed=number)) for number in range(chunk_count)]
+
+
+def build_queries(chunks, query_count, rng):
+    # Palabras sueltas del chunk de origen, como en bench_hybrid_search
+    queries = []
+    for _ in range(query_count):
+        target = rng.randrange(len(chunks))
+        words = chunks[target].replace(".", "").split()
+        queries.append((" ".join(rng.sample(words, min(8, len(words)))), target))
+    return queries
+
+
+def synthetic_embeddings(chunks, queries):
+
+    embeddings = {}
+    for dimensions in sorted({profile["dimensions"] for profile in INDEX_PROFILES.values()}):
+        embeddings[dimensions] = (
+            np.array([fake_embedding(chunk, dimensions) for chunk in chunks], dtype=np.float32),
+            np.array([fake_embedding(question, dimensions) for question, _ in queries], dtype=np.float32)
+        )
+    return embeddings, np.array([target for _, target in queries])
+
+
+def load_embeddings(path):
+
+    data = np.load(path)
+    embeddings = {}
+    for dimensions in sorted({profile["dimensions"] for profile in INDEX_PROFILES.values()}):
+        if f"corpus_{dimensions}" in data:
+            embeddings[dimensions] = (data[f"corpus_{dimensions}"].astype(np.float32), data[f"queries_{dimensions}"].astype(np.float32))
+    return embeddings, data["targets"] if "targets" in data else None
+
+
+def encode_matrix(matrix, profile):
+    # Lo que queda almacenado en el índice para cada perfil
+
+    if profile["space_type"] != "innerproduct":
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1, norms)
+
+    encoded = np.array([encode_vector(row.tolist(), profile) for row in matrix], dtype=np.float32)
+    if profile["quantization"] == "fp16":
+        encoded = encoded.astype(np.float16).astype(np.float32)
+    return encoded
+
+
+def top_k(corpus, queries, k):
+
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, min(k, scores.shape[1] - 1), axis=1)[:, :k]
+    order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+    return np.take_along_axis(top, order, axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--vectors", type=int, default=1_000_000, help="Vectores para la estimación de memoria")
+    parser.add_argument("--embeddings", help=".npz con embeddings reales (ver docstring)")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        embeddings, targets = load_embeddings(args.embeddings)
+        source = args.embeddings
+    else:
+        chunks = build_corpus(args.chunks)
+        embeddings, targets = synthetic_embeddings(chunks, build_queries(chunks, args.queries, random.Random(7)))
+        source = "sintético"
+
+    reference_profile = get_index_profile(REFERENCE_PROFILE)
+    corpus, queries = embeddings[reference_profile["dimensions"]]
+    reference = top_k(encode_matrix(corpus, reference_profile), encode_matrix(queries, reference_profile), args.k)
+
+    print(f"corpus {source}: {corpus.shape[0]} chunks, {queries.shape[0]} preguntas, k={args.k}")
+    print(f"{'perfil':<10} {'dim':>5} {'motor':<7} {'vector':<8} {'recall@k':>9} {'acierto@k':>10} {'MB/' + format(args.vectors, ','):>16} {'ahorro':>7}")
+
+    reference_memory = estimate_vector_memory(reference_profile, args.vectors)
+
+    for name in INDEX_PROFILES:
+        profile = get_index_profile(name)
+        if profile["dimensions"] not in embeddings:
+            continue
+
+        corpus, queries = embeddings[profile["dimensions"]]
+        found = top_k(encode_matrix(corpus, profile), encode_matrix(queries, profile), args.k)
+
+        recall = np.mean([len(set(row) & set(expected)) / args.k for row, expected in zip(found, reference)])
+        accuracy = np.mean([target in row for row, target in zip(found, targets)]) if targets is not None else float("nan")
+        memory = estimate_vector_memory(profile, args.vectors)
+
+        print(
+            f"{name:<10} {profile['dimensions']:>5} {profile['engine']:<7} {profile['quantization'] or 'float32':<8} "
+            f"{recall:>9.3f} {accuracy:>10.3f} {memory / 1024 ** 2:>16,.0f} {reference_memory / memory:>6.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
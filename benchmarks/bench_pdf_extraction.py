@@ -0,0 +1,66 @@
+"""
+Páginas por segundo de la extracción de texto según backend y procesos
+
+Extrae PDFs sintéticos de distinto tamaño con cada backend instalado
+(pdfium, pypdf2) y con 1..N procesos. En Lambda las vCPUs escalan con la
+memoria configurada: medir con --workers hasta las vCPUs de la función.
+
+Uso:
+    python benchmarks/bench_pdf_extraction.py --pages 50 400 --workers 1 2 4 --repeat 3
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from helpers.pdf_text import BACKEND_MODULES, iter_pdf_pages  # noqa: E402
+from tests.stubs.pdfs import synthetic_pdf  # noqa: E402
+
+
+def installed_backends():
+    backends = [name for name, module in BACKEND_MODULES if importlib.util.find_spec(module) is not None]
+    return backends + ["pypdf2"]
+
+
+def measure(file_content, backend, workers, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = sum(1 for _ in iter_pdf_pages(file_content, backend=backend, workers=workers))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return pages, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 400])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--lines-per-page", type=int, default=45)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(f"CPUs disponibles: {cpus}")
+    print(f"{'páginas':>8} {'backend':>8} {'procesos':>9} {'segundos':>9} {'páginas/s':>10} {'vs pypdf2 x1':>13}")
+
+    for page_count in args.pages:
+        file_content = synthetic_pdf(page_count, lines_per_page=args.lines_per_page)
+        _, baseline = measure(file_content, "pypdf2", 1, args.repeat)
+
+        for backend in installed_backends():
+            for workers in args.workers:
+                pages, elapsed = measure(file_content, backend, workers, args.repeat)
+                print(
+                    f"{page_count:>8} {backend:>8} {workers:>9} {elapsed:>9.3f} "
+                    f"{pages / elapsed:>10.0f} {baseline / elapsed:>12.1f}x"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Compara el flujo por lotes (extraer todo -> chunkear todo -> embeber todo)
+contra el pipeline en streaming de helpers.pdf_pipeline
+
+Reporta tiempo total, tiempo hasta el primer embedding y pico de memoria
+Python (tracemalloc) excluyendo los bytes del PDF.
+
+Uso:
+    python benchmarks/bench_pdf_pipeline.py --pages 50 200 800 --latency 0.005
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from helpers import pdf_pipeline  # noqa: E402
+from helpers.embedding_engine import embed_concurrently  # noqa: E402
+from helpers.pdf_pipeline import iter_pdf_pipeline  # noqa: E402
+from helpers.pdf_text import extract_pdf_text  # noqa: E402
+from helpers.rag_helpers import get_chunks, get_multimodal_embeddings  # noqa: E402
+from tests.stubs.bedrock import StubBedrockRuntime  # noqa: E402
+from tests.stubs.pdfs import synthetic_pdf  # noqa: E402
+
+BATCH_SIZE = 100
+
+
+def iter_batches(items, batch_size):
+
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def batch_flow(file_content, bedrock, first_embedding):
+    text_content = extract_pdf_text(file_content)
+    chunks = get_chunks(text_content, 2000, 200)
+
+    def embed(chunk):
+        embedding = get_multimodal_embeddings(input_text=chunk, bedrock_runtime=bedrock)[0]
+        first_embedding.setdefault("at", time.perf_counter())
+        return embedding
+
+    embeddings = embed_concurrently(chunks, embed)
+    batches = [list(zip(chunks, embeddings))[i:i + BATCH_SIZE] for i in range(0, len(chunks), BATCH_SIZE)]
+    return sum(len(batch) for batch in batches)
+
+
+def streaming_flow(file_content, bedrock, first_embedding):
+    pdf_pipeline.get_bedrock_runtime_client = lambda: bedrock
+
+    def tracked(embedded_chunks):
+        for embedded_chunk in embedded_chunks:
+            first_embedding.setdefault("at", time.perf_counter())
+            yield embedded_chunk
+
+    count = 0
+    for batch in iter_batches(tracked(iter_pdf_pipeline(file_content)), BATCH_SIZE):
+        count += len(batch)
+    return count
+
+
+def measure(flow, file_content, latency):
+    first_embedding = {}
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        chunks = flow(file_content, StubBedrockRuntime(latency=latency), first_embedding)
+    elapsed = time.perf_counter() - start
+
+    # Segunda corrida solo para memoria: tracemalloc distorsiona los tiempos
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        flow(file_content, StubBedrockRuntime(latency=latency), {})
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return elapsed, first_embedding.get("at", start) - start, peak / (1024 * 1024), chunks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--latency", type=float, default=0.005)
+    args = parser.parse_args()
+
+    print(f"{'páginas':>8} {'flujo':<10} {'chunks':>7} {'total s':>9} {'1er emb s':>10} {'pico MiB':>9}")
+    for pages in args.pages:
+        file_content = synthetic_pdf(pages)
+        for name, flow in (("lotes", batch_flow), ("streaming", streaming_flow)):
+            elapsed, first, peak, chunks = measure(flow, file_content, args.latency)
+            print(f"{pages:>8} {name:<10} {chunks:>7} {elapsed:>9.2f} {first:>10.2f} {peak:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Embeddings como listas de float (antes) vs ndarray float32 (helpers.vectors)
+en cada etapa por la que pasan:
+
+- parseo: json.loads de la respuesta de Bedrock más, en el camino NumPy,
+  la conversión a float32
+- memoria: bytes retenidos (tracemalloc) por --chunks embeddings en memoria
+  como en un lote de ingesta
+- encode: encode_vector de un perfil innerproduct (normalización y, en
+  byte, cuantización a int8)
+- bulk: serialización del documento para el cuerpo NDJSON (json.dumps vs
+  dumps_document) y bytes por documento
+- dedup: chunks casi duplicados de un documento (coseno contra todos los
+  aceptados, CHUNK_DEDUP_THRESHOLD)
+- mmr: selección de --size documentos entre --candidates (MMR_LAMBDA)
+
+Las versiones con listas son las implementaciones anteriores (o su
+equivalente directo en Python puro para dedup y MMR). Los vectores son
+aleatorios normalizados; los tiempos no dependen del contenido.
+
+Uso:
+    python benchmarks/bench_vectors.py
+    python benchmarks/bench_vectors.py --chunks 500 --dimensions 1024 --candidates 100
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "functions"))
+sys.path.insert(0, ROOT_DIR)
+
+from helpers.index_profiles import BYTE_SCALE, encode_vector, get_index_profile  # noqa: E402
+from helpers.vectors import NearDuplicateFilter, dumps_document, mmr, to_vector  # noqa: E402
+
+DEDUP_THRESHOLD = 0.98
+MMR_LAMBDA = 0.5
+
+
+def list_encode(vector, profile):
+    # encode_vector anterior: Python puro sobre listas
+    norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+    normalized = [value / norm for value in vector]
+    if profile["quantization"] == "byte":
+        return [max(-128, min(127, round(value * BYTE_SCALE))) for value in normalized]
+    return normalized
+
+
+def list_cosine(a, b):
+    return sum(x * y for x, y in zip(a, b)) / (math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b)))
+
+
+def list_dedup(vectors):
+    kept = []
+    duplicates = 0
+    for vector in vectors:
+        if any(list_cosine(vector, other) >= DEDUP_THRESHOLD for other in kept):
+            duplicates += 1
+        else:
+            kept.append(vector)
+    return duplicates
+
+
+def numpy_dedup(vectors):
+    duplicate_filter = NearDuplicateFilter(DEDUP_THRESHOLD)
+    return sum(duplicate_filter.is_duplicate(vector) for vector in vectors)
+
+
+def list_mmr(query, candidates, size):
+    relevance = [list_cosine(query, candidate) for candidate in candidates]
+    selected = []
+    while len(selected) < min(size, len(candidates)):
+        best, best_score = None, -math.inf
+        for position, candidate in enumerate(candidates):
+            if position in selected:
+                continue
+            redundancy = max((list_cosine(candidate, candidates[other]) for other in selected), default=0.0)
+            score = MMR_LAMBDA * relevance[position] - (1 - MMR_LAMBDA) * max(redundancy, 0.0)
+            if score > best_score:
+                best, best_score = position, score
+        selected.append(best)
+    return selected
+
+
+def time_per_item(function, items, repeat):
+    # µs por elemento, mediana de repeat corridas
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            function(item)
+        runs.append((time.perf_counter() - start) * 1e6 / len(items))
+    return statistics.median(runs)
+
+
+def time_call(function, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        runs.append((time.perf_counter() - start) * 1e3)
+    return statistics.median(runs)
+
+
+def retained_bytes(build):
+    tracemalloc.start()
+    values = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del values
+    return current
+
+
+def synthetic_vectors(count, dimensions, rng, duplicate_every=5):
+    # Uno de cada duplicate_every repite al anterior con ruido mínimo (pies de página, cláusulas copiadas)
+    matrix = rng.standard_normal((count, dimensions))
+    for position in range(duplicate_every, count, duplicate_every):
+        matrix[position] = matrix[position - 1] + rng.normal(0, 0.01, dimensions)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def print_row(stage, before, after, unit):
+    print(f"{stage:<22} {before:>12.1f} {after:>12.1f} {unit:<10} {before / after:>6.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=300)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--candidates", type=int, default=30)
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    matrix = synthetic_vectors(args.chunks, args.dimensions, rng)
+    bodies = [json.dumps({"embedding": row.tolist(), "inputTextTokenCount": 120}) for row in matrix]
+
+    lists = [json.loads(body)["embedding"] for body in bodies]
+    arrays = [to_vector(values) for values in lists]
+    profiles = [get_index_profile(name) for name in ("fp16", "tiny")]
+    profiles = [dict(profile, dimensions=args.dimensions) for profile in profiles]
+
+    print(f"{args.chunks} embeddings de {args.dimensions} dimensiones, {args.candidates} candidatos MMR -> {args.size}")
+    print(f"{'etapa':<22} {'listas':>12} {'numpy':>12} {'unidad':<10} {'mejora':>7}")
+
+    print_row(
+        "parseo",
+        time_per_item(lambda body: json.loads(body)["embedding"], bodies, args.repeat),
+        time_per_item(lambda body: to_vector(json.loads(body)["embedding"]), bodies, args.repeat),
+        "µs/vector"
+    )
+
+    print_row(
+        "memoria",
+        retained_bytes(lambda: [json.loads(body)["embedding"] for body in bodies]) / args.chunks / 1024,
+        retained_bytes(lambda: [to_vector(json.loads(body)["embedding"]) for body in bodies]) / args.chunks / 1024,
+        "KiB/vector"
+    )
+
+    for profile in profiles:
+        print_row(
+            f"encode {profile['name']}",
+            time_per_item(lambda vector: list_encode(vector, profile), lists, args.repeat),
+            time_per_item(lambda vector: encode_vector(vector, profile), arrays, args.repeat),
+            "µs/vector"
+        )
+
+    documents = [{"content": "Cláusula de ejemplo " * 40, "document_type": "general", "chunk_index": position} for position in range(args.chunks)]
+    print_row(
+        "bulk (serializar)",
+        time_per_item(lambda position: json.dumps(dict(documents[position], embedding=lists[position]), ensure_ascii=False), range(args.chunks), args.repeat),
+        time_per_item(lambda position: dumps_document(dict(documents[position], embedding=arrays[position])), range(args.chunks), args.repeat),
+        "µs/doc"
+    )
+    print_row(
+        "bulk (tamaño)",
+        statistics.mean(len(json.dumps(dict(document, embedding=vector), ensure_ascii=False).encode("utf-8")) for document, vector in zip(documents, lists)) / 1024,
+        statistics.mean(len(dumps_document(dict(document, embedding=vector)).encode("utf-8")) for document, vector in zip(documents, arrays)) / 1024,
+        "KiB/doc"
+    )
+
+    assert list_dedup(lists) == numpy_dedup(arrays)
+    print_row("dedup", time_call(lambda: list_dedup(lists), 1), time_call(lambda: numpy_dedup(arrays), args.repeat), "ms/doc")
+
+    query = arrays[0]
+    candidates = arrays[:args.candidates]
+    print_row(
+        "mmr",
+        time_call(lambda: list_mmr(lists[0], lists[:args.candidates], args.size), args.repeat),
+        time_call(lambda: mmr(query, candidates, MMR_LAMBDA, args.size), args.repeat),
+        "ms/query"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import json
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from helpers.vectors import dumps_document
+
+
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024   # Muy por debajo del límite de request de OpenSearch Serverless
+DEFAULT_MAX_DOCS = 100
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 20.0
+
+# Estados por ítem que vale la pena reintentar
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+
+class IncompleteBulkResponse(Exception):
+    # Respuesta con menos (o más) ítems que operaciones: se reintenta como un 502
+    status_code = 502
+
+
+def get_bulk_settings() -> Dict:
+    return {
+        "max_bytes": int(os.environ.get("BULK_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        "max_docs": int(os.environ.get("BULK_BATCH_SIZE", DEFAULT_MAX_DOCS)),
+        "max_workers": int(os.environ.get("BULK_MAX_WORKERS", DEFAULT_MAX_WORKERS)),
+        "max_retries": int(os.environ.get("BULK_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    }
+
+
+def serialize_operation(action: Dict, document: Optional[Dict] = None) -> bytes:
+    # Cada operación se serializa una sola vez; los reintentos reutilizan los bytes
+    lines = json.dumps(action, ensure_ascii=False)
+    if document is not None:
+        lines += "\n" + dumps_document(document)
+    return (lines + "\n").encode("utf-8")
+
+
+def iter_bulk_batches(
+    operations: Iterable[Tuple[Dict, Optional[Dict]]],
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_docs: int = DEFAULT_MAX_DOCS
+) -> Iterator[List[Tuple[Dict, bytes]]]:
+    """
+    Agrupa operaciones bulk en lotes que no superan max_bytes ni max_docs
+
+    Args:
+        operations: Pares (acción, documento); documento es None en deletes
+        max_bytes: Tamaño máximo del cuerpo NDJSON de cada request
+        max_docs: Máximo de operaciones por request
+
+    Yields:
+        Listas de (acción, bytes serializados)
+    """
+    batch = []
+    batch_bytes = 0
+
+    for action, document in operations:
+        payload = serialize_operation(action, document)
+
+        if batch and (batch_bytes + len(payload) > max_bytes or len(batch) >= max_docs):
+            yield batch
+            batch = []
+            batch_bytes = 0
+
+        # Una operación más grande que max_bytes viaja sola
+        batch.append((action, payload))
+        batch_bytes += len(payload)
+
+    if batch:
+        yield batch
+
+
+def _operation_name(action: Dict) -> str:
+    return next(iter(action))
+
+
+def _request_error_status(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status
+    # ConnectionError / ConnectionTimeout de opensearch-py: se reintentan
+    if error.__class__.__name__ in ("ConnectionError", "ConnectionTimeout"):
+        return 503
+    return None
+
+
+def _send_batch(client, batch, max_retries, base_delay, max_delay) -> List[Dict]:
+    """
+    Envía un lote y reintenta solo los ítems rechazados con estados reintentables
+    """
+    results = [None] * len(batch)
+    pending = list(range(len(batch)))
+    attempts = [0] * len(batch)
+    attempt = 0
+
+    while pending:
+        body = b"".join(batch[position][1] for position in pending)
+        for position in pending:
+            attempts[position] += 1
+
+        try:
+            response = client.bulk(body=body)
+            response_items = response.get("items", [])
+            retry = []
+
+            if len(response_items) != len(pending):
+                # Sin un ítem por operación no se sabe cuáles se aplicaron; con _id deterministas reintentar es seguro
+                raise IncompleteBulkResponse(f"bulk devolvió {len(response_items)} ítems para {len(pending)} operaciones")
+
+            for position, item in zip(pending, response_items):
+                operation = _operation_name(batch[position][0])
+                outcome = item.get(operation, {})
+                status = outcome.get("status", 200)
+
+                if status in RETRYABLE_STATUSES and attempt < max_retries:
+                    retry.append(position)
+                    continue
+
+                # Borrar algo que ya no existe deja el índice en el estado buscado
+                failed = "error" in outcome and not (operation == "delete" and status == 404)
+                results[position] = {
+                    "operation": operation,
+                    "_id": outcome.get("_id", batch[position][0][operation].get("_id")),
+                    "status": status,
+                    "attempts": attempts[position],
+                    "error": outcome.get("error") if failed else None
+                }
+
+        except Exception as e:
+            status = _request_error_status(e)
+
+            if status == 413 and len(pending) > 1:
+                # Request demasiado grande: se parte en dos mitades
+                middle = len(pending) // 2
+                halves = [[batch[position] for position in pending[:middle]], [batch[position] for position in pending[middle:]]]
+                for half_positions, half in zip((pending[:middle], pending[middle:]), halves):
+                    for position, result in zip(half_positions, _send_batch(client, half, max_retries, base_delay, max_delay)):
+                        result["attempts"] += attempts[position]
+                        results[position] = result
+                return results
+
+            if status not in RETRYABLE_STATUSES or attempt >= max_retries:
+                for position in pending:
+                    operation = _operation_name(batch[position][0])
+                    results[position] = {
+                        "operation": operation,
+                        "_id": batch[position][0][operation].get("_id"),
+                        "status": status or 500,
+                        "attempts": attempts[position],
+                        "error": {"type": e.__class__.__name__, "reason": str(e)}
+                    }
+                return results
+
+            retry = pending
+
+        if not retry:
+            break
+
+        delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+        attempt += 1
+        print(f"⏳ {len(retry)} ítems rechazados en bulk, reintento {attempt}/{max_retries} en {delay:.2f}s")
+        time.sleep(delay)
+        pending = retry
+
+    return results
+
+
+def bulk_write(
+    client,
+    operations: Iterable[Tuple[Dict, Optional[Dict]]],
+    max_bytes: Optional[int] = None,
+    max_docs: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    max_retries: Optional[int] = None,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY
+) -> Dict:
+    """
+    Escribe operaciones bulk en lotes acotados por bytes y cantidad, con
+    varios lotes en paralelo y reintento solo de los ítems rechazados
+
+    Args:
+        client: Cliente OpenSearch
+        operations: Iterable (puede ser un generador) de pares (acción, documento)
+        max_bytes: Tamaño máximo de cada request (BULK_MAX_BYTES)
+        max_docs: Operaciones máximas por request (BULK_BATCH_SIZE)
+        max_workers: Requests bulk simultáneos (BULK_MAX_WORKERS)
+        max_retries: Reintentos ante 429/5xx (BULK_MAX_RETRIES)
+
+    Returns:
+        Reporte con totales y el resultado de cada ítem en orden de entrada
+    """
+    settings = get_bulk_settings()
+    max_bytes = max_bytes or settings["max_bytes"]
+    max_docs = max_docs or settings["max_docs"]
+    max_workers = max(1, max_workers or settings["max_workers"])
+    max_retries = settings["max_retries"] if max_retries is None else max_retries
+
+    items = []
+    batches = 0
+    in_flight = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch in iter_bulk_batches(operations, max_bytes, max_docs):
+            batches += 1
+            in_flight.append(executor.submit(_send_batch, client, batch, max_retries, base_delay, max_delay))
+
+            # No acumular más lotes serializados que los que se pueden enviar
+            while len(in_flight) >= max_workers * 2:
+                items.extend(in_flight.popleft().result())
+
+        while in_flight:
+            items.extend(in_flight.popleft().result())
+
+    failed = [item for item in items if item["error"]]
+
+    return {
+        "success": not failed,
+        "total": len(items),
+        "succeeded": len(items) - len(failed),
+        "failed": len(failed),
+        "retried": len([item for item in items if item["attempts"] > 1]),
+        "batches": batches,
+        "items": items
+    }
+
+
+def summarize_bulk_report(report: Dict, max_errors: int = 10) -> Dict:
+    # Versión compacta para logs y respuestas: sin el detalle de ítems exitosos
+    summary = {key: value for key, value in report.items() if key != "items"}
+    summary["errors"] = [item for item in report.get("items", []) if item["error"]][:max_errors]
+    return summary
@@ -0,0 +1,162 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+from typing import Dict, Tuple
+
+
+# Clientes reutilizados entre invocaciones "warm" de la misma Lambda
+_clients: Dict[Tuple, object] = {}
+_session = None
+_credentials_fingerprint = None
+_lock = threading.Lock()
+
+DEFAULT_REGION = 'us-east-1'
+
+
+def get_pool_size() -> int:
+    # El pool HTTP debe cubrir los hilos del motor de embeddings
+    return max(10, int(os.environ.get('EMBEDDING_MAX_WORKERS', 8)) * 2)
+
+
+def get_bedrock_config(profile: str) -> Config:
+
+    if profile == 'generation':
+        return Config(
+            connect_timeout=3600,  # 60 minutos
+            read_timeout=3600,     # 60 minutos
+            retries={'max_attempts': 1},
+            max_pool_connections=get_pool_size(),
+            tcp_keepalive=True
+        )
+
+    if profile == 'rerank':
+        # Sin reintentos: el rerank tiene su propio presupuesto de latencia
+        return Config(
+            connect_timeout=2,
+            read_timeout=5,
+            retries={'max_attempts': 1},
+            max_pool_connections=get_pool_size(),
+            tcp_keepalive=True
+        )
+
+    # Embeddings: sin reintentos de botocore, call_with_backoff es la única
+    # capa de reintentos ante throttling
+    return Config(
+        retries={'max_attempts': 1},
+        max_pool_connections=get_pool_size(),
+        tcp_keepalive=True
+    )
+
+
+def current_credentials_fingerprint() -> Tuple:
+    """
+    Identifica las credenciales estáticas del entorno. Si cambian (rotación
+    en variables de entorno) el registro descarta los clientes cacheados.
+    Las credenciales de rol se refrescan solas dentro de boto3 y AWS4Auth.
+    """
+    return (
+        os.environ.get('AWS_ACCESS_KEY_ID'),
+        os.environ.get('AWS_SESSION_TOKEN'),
+        os.environ.get('AWS_PROFILE')
+    )
+
+
+def get_session() -> boto3.Session:
+
+    global _session, _credentials_fingerprint
+
+    fingerprint = current_credentials_fingerprint()
+
+    if _session is not None and fingerprint == _credentials_fingerprint:
+        return _session
+
+    with _lock:
+        if _session is None or fingerprint != _credentials_fingerprint:
+            if _session is not None:
+                print("🔑 Credenciales rotadas, recreando clientes AWS")
+            _clients.clear()
+            _session = boto3.Session()
+            _credentials_fingerprint = fingerprint
+
+    return _session
+
+
+def get_cached_client(key: Tuple, factory):
+
+    session = get_session()
+
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory(session)
+            _clients[key] = client
+
+    return client
+
+
+def get_bedrock_runtime_client(profile: str = 'default', region: str = DEFAULT_REGION):
+    """
+    Devuelve el cliente bedrock-runtime compartido para el perfil indicado
+
+    Args:
+        profile: 'default' para embeddings, 'generation' para modelos con timeouts largos,
+            'rerank' para el modelo de rerank (timeouts cortos)
+        region: Región de Bedrock
+
+    Returns:
+        Cliente boto3 bedrock-runtime (thread-safe)
+    """
+    return get_cached_client(
+        ('bedrock-runtime', profile, region),
+        lambda session: session.client('bedrock-runtime', region_name=region, config=get_bedrock_config(profile))
+    )
+
+
+def get_aws_client(service_name: str, region: str = None):
+    return get_cached_client(
+        (service_name, 'default', region),
+        lambda session: session.client(service_name, region_name=region)
+    )
+
+
+def get_lambda_client(region: str = None):
+    """
+    Cliente Lambda para invocaciones síncronas largas (workers de fan-out):
+    sin reintentos automáticos, un worker fallido lo maneja el coordinador
+    """
+    return get_cached_client(
+        ('lambda', 'invoke', region),
+        lambda session: session.client('lambda', region_name=region, config=Config(
+            read_timeout=900,  # Timeout máximo de una Lambda
+            retries={'max_attempts': 0},
+            max_pool_connections=get_pool_size(),
+            tcp_keepalive=True
+        ))
+    )
+
+
+def get_opensearch_client(region: str = DEFAULT_REGION):
+    """
+    Devuelve el cliente OpenSearch compartido (firma SigV4 + pool de conexiones TLS)
+    """
+    endpoint = os.environ.get('OPENSEARCH_ENDPOINT')
+
+    def factory(session):
+        from helpers.opensearch_helpers import create_opensearch_client
+        return create_opensearch_client(region, session=session, pool_maxsize=get_pool_size())
+
+    return get_cached_client(('opensearch', endpoint, region), factory)
+
+
+def reset_clients():
+    global _session, _credentials_fingerprint
+
+    with _lock:
+        _clients.clear()
+        _session = None
+        _credentials_fingerprint = None
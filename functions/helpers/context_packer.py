@@ -0,0 +1,199 @@
+import os
+from typing import Dict, List, Optional, Set, Tuple
+
+from helpers.chunking import count_tokens
+from helpers.vector_store import tokenize
+
+
+# Tokens de contexto (count_tokens) que se envían a Nova Pro
+DEFAULT_CONTEXT_TOKEN_BUDGET = 6000
+# Similitud Jaccard de shingles a partir de la cual un chunk se considera repetido
+DEFAULT_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+# Caracteres del inicio del chunk siguiente que se buscan al final del anterior
+OVERLAP_PROBE_CHARS = 32
+# Un chunk que no entra completo se recorta solo si queda al menos esto de presupuesto
+MIN_TRUNCATED_TOKENS = 100
+
+
+def get_context_settings() -> Dict:
+
+    return {
+        "token_budget": max(1, int(os.environ.get("CONTEXT_TOKEN_BUDGET", DEFAULT_CONTEXT_TOKEN_BUDGET))),
+        "duplicate_threshold": float(os.environ.get("CONTEXT_DUPLICATE_THRESHOLD", DEFAULT_DUPLICATE_THRESHOLD))
+    }
+
+
+def shingles(text: str) -> Set[Tuple[str, ...]]:
+
+    words = tokenize(text)
+    if len(words) <= SHINGLE_SIZE:
+        return {tuple(words)}
+
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(first: Set, second: Set) -> float:
+
+    if not first or not second:
+        return 0.0
+
+    return len(first & second) / len(first | second)
+
+
+def overlap_length(previous: str, following: str) -> int:
+    """
+    Largo del sufijo de previous que es prefijo de following (el overlap que
+    iter_chunks copia al inicio del chunk siguiente)
+    """
+    probe = following[:OVERLAP_PROBE_CHARS]
+    if not probe:
+        return 0
+
+    position = previous.find(probe, max(0, len(previous) - len(following)))
+
+    # La primera coincidencia válida es el overlap más largo
+    while position != -1:
+        if following.startswith(previous[position:]):
+            return len(previous) - position
+        position = previous.find(probe, position + 1)
+
+    return 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+
+    words = []
+    tokens = 0
+
+    for word in text.split():
+        word_tokens = count_tokens(word)
+        if tokens + word_tokens > max_tokens:
+            break
+        words.append(word)
+        tokens += word_tokens
+
+    return " ".join(words)
+
+
+def marginal_tokens(document: Dict, selected: Dict[Tuple[str, int], Dict]) -> int:
+    # Tokens que agrega el chunk descontando el overlap con vecinos ya elegidos
+    content = document["content"]
+    key = document.get("source_file", "")
+    chunk_index = document.get("chunk_index", 0)
+    tokens = count_tokens(content)
+
+    previous = selected.get((key, chunk_index - 1))
+    if previous:
+        tokens -= count_tokens(content[:overlap_length(previous["content"], content)])
+
+    following = selected.get((key, chunk_index + 1))
+    if following:
+        tokens -= count_tokens(content[len(content) - overlap_length(content, following["content"]):])
+
+    return max(0, tokens)
+
+
+def merge_block(documents: List[Dict]) -> str:
+    # Chunks consecutivos del mismo archivo, en orden de chunk_index
+
+    text = documents[0]["content"]
+
+    for document in documents[1:]:
+        overlap = overlap_length(text, document["content"])
+        text += document["content"][overlap:] if overlap else "\n\n" + document["content"]
+
+    return text
+
+
+def pack_context(documents: List[Dict], settings: Optional[Dict] = None) -> Tuple[str, List[Dict]]:
+    """
+    Arma el contexto del prompt dentro de un presupuesto de tokens:
+    1. Recorre los chunks por relevancia y descarta casi-duplicados
+    2. Agrega cada chunk si su costo (sin el overlap con vecinos ya elegidos)
+       entra en el presupuesto
+    3. Une los chunks consecutivos del mismo archivo quitando el overlap
+
+    Args:
+        documents: Chunks ordenados por relevancia (salida de la búsqueda/rerank)
+        settings: Resultado de get_context_settings()
+
+    Returns:
+        (contexto, fuentes) con una fuente por bloque de chunks consecutivos
+    """
+    settings = settings or get_context_settings()
+    budget = settings["token_budget"]
+
+    selected: Dict[Tuple[str, int], Dict] = {}
+    selected_shingles = []
+    used_tokens = 0
+    raw_tokens = 0
+    duplicates = 0
+
+    for rank, document in enumerate(documents):
+        content = (document.get("content") or "").strip()
+        if not content:
+            continue
+
+        key = (document.get("source_file", ""), document.get("chunk_index", 0))
+        if key in selected:
+            continue
+
+        document_shingles = shingles(content)
+        if any(jaccard(document_shingles, other) >= settings["duplicate_threshold"] for other in selected_shingles):
+            duplicates += 1
+            continue
+
+        candidate = dict(document, content=content, rank=rank)
+        cost = marginal_tokens(candidate, selected)
+
+        if used_tokens + cost > budget:
+            remaining = budget - used_tokens
+            if selected or remaining < MIN_TRUNCATED_TOKENS:
+                continue
+            # El chunk más relevante no entra solo: se recorta en vez de dejar el contexto vacío
+            candidate["content"] = truncate_to_tokens(content, remaining)
+            cost = count_tokens(candidate["content"])
+
+        selected[key] = candidate
+        selected_shingles.append(document_shingles)
+        used_tokens += cost
+        raw_tokens += count_tokens(candidate["content"])
+
+    blocks = []
+    for document in sorted(selected.values(), key=lambda document: (document.get("source_file", ""), document.get("chunk_index", 0))):
+        previous_block = blocks[-1] if blocks else None
+        if (
+            previous_block
+            and previous_block[-1].get("source_file", "") == document.get("source_file", "")
+            and previous_block[-1].get("chunk_index", 0) + 1 == document.get("chunk_index", 0)
+        ):
+            previous_block.append(document)
+        else:
+            blocks.append([document])
+
+    # Los bloques van en el orden de su chunk más relevante
+    blocks.sort(key=lambda block: min(document["rank"] for document in block))
+
+    context_chunks = []
+    sources = []
+
+    for i, block in enumerate(blocks):
+        content = merge_block(block)
+        source_file = block[0].get("source_file") or "Archivo desconocido"
+        score = max(document.get("rerank_score", document.get("score", 0)) for document in block)
+
+        context_chunks.append(f"[Documento {i+1}] ({source_file.split('/')[-1]}): {content}")
+        sources.append({
+            "source_file": source_file,
+            "chunk_indexes": [document.get("chunk_index", 0) for document in block],
+            "content_snippet": content[:200] + "..." if len(content) > 200 else content,
+            "relevance_score": round(score, 3)
+        })
+
+    print(
+        f"🧱 Contexto: {len(selected)} chunks en {len(blocks)} bloques, "
+        f"{used_tokens}/{budget} tokens ({raw_tokens - used_tokens} de overlap quitados, {duplicates} duplicados)"
+    )
+
+    return "\n\n".join(context_chunks), sources
@@ -0,0 +1,254 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from helpers.clients import get_aws_client
+from helpers.vectors import VECTOR_DTYPE, to_vector
+
+
+DEFAULT_MEMORY_ENTRIES = 5000
+DEFAULT_TTL_DAYS = 90
+
+
+def normalize_cache_text(text: Optional[str]) -> str:
+    # Mismo texto con distinto espaciado o forma Unicode debe dar la misma clave
+    if not text:
+        return ""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def embedding_cache_key(model_id: str, dimensions: int, text: Optional[str] = None, image: Optional[str] = None) -> str:
+    """
+    Genera la clave content-addressed de un embedding
+
+    Args:
+        model_id: Modelo de Bedrock que genera el embedding
+        dimensions: Dimensiones solicitadas
+        text: Texto de entrada (se normaliza antes de hashear)
+        image: Imagen en base64, si la hay
+
+    Returns:
+        Hash SHA-256 como string hexadecimal
+    """
+    image_digest = hashlib.sha256(image.encode("utf-8")).hexdigest() if image else ""
+    unique_string = f"{model_id}|{dimensions}|{normalize_cache_text(text)}|{image_digest}"
+
+    return hashlib.sha256(unique_string.encode("utf-8")).hexdigest()
+
+
+def pack_embedding(embedding) -> bytes:
+    # float32 empaquetado: 4 bytes por dimensión en vez de ~20 en JSON
+    return to_vector(embedding).tobytes()
+
+
+def unpack_embedding(data: bytes) -> np.ndarray:
+    # Copia: frombuffer sobre bytes devuelve un array de solo lectura
+    return np.frombuffer(bytes(data), dtype=VECTOR_DTYPE).copy()
+
+
+class MemoryLRUBackend:
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+            return embedding
+
+    def set(self, key: str, embedding: np.ndarray):
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteBackend:
+    """
+    Backend persistente local (tests, benchmarks y ejecución offline)
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (cache_key TEXT PRIMARY KEY, embedding BLOB NOT NULL)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT embedding FROM embeddings WHERE cache_key = ?", (key,)
+            ).fetchone()
+        return unpack_embedding(row[0]) if row else None
+
+    def set(self, key: str, embedding: np.ndarray):
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO embeddings (cache_key, embedding) VALUES (?, ?)",
+                (key, pack_embedding(embedding))
+            )
+            self._connection.commit()
+
+
+class DynamoDBBackend:
+    """
+    Backend persistente compartido entre Lambdas. Tabla con partition key
+    'cache_key' (S) y TTL sobre 'expires_at'.
+    """
+
+    name = "dynamodb"
+
+    def __init__(self, table_name: str, ttl_days: int = DEFAULT_TTL_DAYS, client=None):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_days * 24 * 3600
+        self.client = client or get_aws_client("dynamodb")
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        response = self.client.get_item(
+            TableName=self.table_name,
+            Key={"cache_key": {"S": key}},
+            ProjectionExpression="embedding"
+        )
+        item = response.get("Item")
+        return unpack_embedding(item["embedding"]["B"]) if item else None
+
+    def set(self, key: str, embedding: np.ndarray):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "cache_key": {"S": key},
+                "embedding": {"B": pack_embedding(embedding)},
+                "expires_at": {"N": str(int(time.time()) + self.ttl_seconds)}
+            }
+        )
+
+
+class EmbeddingCache:
+    """
+    Cache por niveles: el primer backend es el más rápido (LRU en memoria);
+    un acierto en un nivel inferior se promueve a los superiores.
+    """
+
+    def __init__(self, backends: List):
+        self.backends = backends
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.hits_by_backend: Dict[str, int] = {backend.name: 0 for backend in backends}
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+
+        for level, backend in enumerate(self.backends):
+            try:
+                embedding = backend.get(key)
+            except Exception as e:
+                print(f"⚠️ Error leyendo cache de embeddings ({backend.name}): {str(e)}")
+                continue
+
+            if embedding is not None:
+                for upper in self.backends[:level]:
+                    upper.set(key, embedding)
+                with self._lock:
+                    self.hits += 1
+                    self.hits_by_backend[backend.name] += 1
+                return embedding
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key: str, embedding: np.ndarray):
+
+        for backend in self.backends:
+            try:
+                backend.set(key, embedding)
+            except Exception as e:
+                print(f"⚠️ Error escribiendo cache de embeddings ({backend.name}): {str(e)}")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "hits_by_backend": dict(self.hits_by_backend)
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.hits_by_backend = {backend.name: 0 for backend in self.backends}
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+
+def create_embedding_cache_from_env() -> Optional[EmbeddingCache]:
+    """
+    EMBEDDING_CACHE_BACKEND: none | memory (default) | sqlite | dynamodb
+    """
+    backend_name = os.environ.get("EMBEDDING_CACHE_BACKEND", "memory").lower()
+
+    if backend_name == "none":
+        return None
+
+    backends = [MemoryLRUBackend(int(os.environ.get("EMBEDDING_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)))]
+
+    if backend_name == "sqlite":
+        backends.append(SQLiteBackend(os.environ.get("EMBEDDING_CACHE_PATH", "/tmp/embedding_cache.sqlite3")))
+
+    elif backend_name == "dynamodb":
+        table_name = os.environ.get("EMBEDDING_CACHE_TABLE")
+        if not table_name:
+            raise ValueError("Variable EMBEDDING_CACHE_TABLE no configurada")
+        backends.append(DynamoDBBackend(table_name, int(os.environ.get("EMBEDDING_CACHE_TTL_DAYS", DEFAULT_TTL_DAYS))))
+
+    elif backend_name != "memory":
+        raise ValueError(f"EMBEDDING_CACHE_BACKEND no soportado: {backend_name}")
+
+    return EmbeddingCache(backends)
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+
+    global _embedding_cache
+
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                _embedding_cache = create_embedding_cache_from_env() or False
+
+    return _embedding_cache or None
+
+
+def set_embedding_cache(cache: Optional[EmbeddingCache]):
+    global _embedding_cache
+    _embedding_cache = cache if cache is not None else False
+
+
+def reset_embedding_cache():
+    # Vuelve a leer la configuración del entorno en el próximo uso
+    global _embedding_cache
+    _embedding_cache = None
@@ -0,0 +1,168 @@
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from helpers.metrics import bind_metrics, count
+
+
+# Concurrencia por defecto; configurable por Lambda con EMBEDDING_MAX_WORKERS
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 20.0
+
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+def get_max_workers(max_workers: Optional[int] = None) -> int:
+
+    if max_workers is None:
+        max_workers = int(os.environ.get("EMBEDDING_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+
+    return max(1, max_workers)
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """
+    Indica si un error (o su causa) corresponde a throttling de Bedrock
+
+    Args:
+        error: Excepción capturada, posiblemente envuelta en un ValueError
+
+    Returns:
+        True si el error se puede reintentar con backoff
+    """
+    while error is not None:
+        response = getattr(error, "response", None)
+        if isinstance(response, dict):
+            code = response.get("Error", {}).get("Code", "")
+            status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            if code in THROTTLING_ERROR_CODES or status == 429:
+                return True
+        error = error.__cause__
+
+    return False
+
+
+def call_with_backoff(
+    fn: Callable[..., Any],
+    *args,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    base_delay: float = DEFAULT_BASE_DELAY,
+    max_delay: float = DEFAULT_MAX_DELAY,
+    **kwargs
+) -> Any:
+
+    attempt = 0
+    while True:
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt >= max_retries or not is_throttling_error(e):
+                raise
+
+            # Backoff exponencial con jitter completo
+            delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            attempt += 1
+            count("bedrock_retries")
+            print(f"⏳ Throttling en Bedrock, reintento {attempt}/{max_retries} en {delay:.2f}s")
+            time.sleep(delay)
+
+
+def embed_concurrently(
+    items: Sequence[Any],
+    embed_fn: Callable[[Any], Any],
+    max_workers: Optional[int] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES,
+    return_exceptions: bool = False
+) -> List[Any]:
+    """
+    Ejecuta embed_fn sobre cada elemento con un pool de hilos acotado
+
+    Args:
+        items: Elementos a embeber (chunks de texto, payloads, etc.)
+        embed_fn: Función que genera el embedding de un elemento
+        max_workers: Máximo de llamadas simultáneas a Bedrock
+        max_retries: Reintentos por elemento ante throttling
+        return_exceptions: Si es True, los fallos se devuelven en su posición
+            en lugar de propagarse
+
+    Returns:
+        Resultados en el mismo orden que items
+    """
+    if not items:
+        return []
+
+    workers = min(get_max_workers(max_workers), len(items))
+
+    def run(item):
+        try:
+            return call_with_backoff(embed_fn, item, max_retries=max_retries)
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
+
+    if workers == 1:
+        return [run(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map conserva el orden de entrada y propaga la primera excepción
+        return list(executor.map(bind_metrics(run), items))
+
+
+def embed_stream(
+    items: Iterable[Any],
+    embed_fn: Callable[[Any], Any],
+    should_embed: Optional[Callable[[Any], bool]] = None,
+    max_workers: Optional[int] = None,
+    max_pending: Optional[int] = None,
+    max_retries: int = DEFAULT_MAX_RETRIES
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Versión en streaming de embed_concurrently: consume items de forma
+    perezosa y produce (item, embedding) en orden de entrada
+
+    Args:
+        items: Iterable (p. ej. generador de chunks) que se consume a demanda
+        embed_fn: Función que genera el embedding de un elemento
+        should_embed: Si devuelve False, el elemento se emite con embedding None
+        max_workers: Máximo de llamadas simultáneas a Bedrock
+        max_pending: Máximo de elementos en vuelo; acota la memoria del stage
+        max_retries: Reintentos por elemento ante throttling
+
+    Yields:
+        Tuplas (item, embedding)
+    """
+    workers = get_max_workers(max_workers)
+    max_pending = max_pending or workers * 2
+    pending = deque()
+
+    def drain_one():
+        item, result = pending.popleft()
+        return item, result.result() if isinstance(result, Future) else result
+
+    # Los hilos registran en las métricas de la operación que los lanzó
+    embed_call = bind_metrics(call_with_backoff)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for item in items:
+            if should_embed is None or should_embed(item):
+                pending.append((item, executor.submit(embed_call, embed_fn, item, max_retries=max_retries)))
+            else:
+                pending.append((item, None))
+
+            # Backpressure: no leer más entrada mientras el buffer esté lleno
+            while len(pending) >= max_pending:
+                yield drain_one()
+
+        while pending:
+            yield drain_one()
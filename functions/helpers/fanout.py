@@ -0,0 +1,354 @@
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from helpers.clients import get_aws_client, get_lambda_client
+from helpers.rag_helpers import chunk_document_hash
+from helpers.pdf_text import get_pdf_page_count, iter_pdf_pages
+from helpers.pdf_pipeline import iter_clean_pages, iter_embedded_chunks, iter_text_chunks
+from helpers.opensearch_indexing import (
+    get_existing_chunk_hashes, get_existing_duplicate_hashes, make_needs_embedding, get_embedding_dimensions, opensearch_indexing_stream
+)
+from helpers.query_cache import bump_index_version
+from helpers.vector_store import get_vector_store, get_index_name
+from helpers.tenancy import maybe_promote_tenant
+
+
+# PDFs con menos páginas se procesan en una sola invocación
+DEFAULT_FANOUT_MIN_PAGES = 200
+DEFAULT_PAGES_PER_WORKER = 50
+DEFAULT_FANOUT_MAX_WORKERS = 8
+FANOUT_BACKENDS = ["lambda", "process", "thread"]
+
+# Mismos parámetros que iter_pdf_chunks
+CHUNK_SIZE = 2000
+CHUNK_OVERLAP = 200
+
+
+def get_fanout_settings() -> Dict:
+    """
+    Configuración del fan-out. Dentro de Lambda el backend por defecto invoca
+    la misma función (FANOUT_FUNCTION_NAME) por cada rango; fuera de Lambda
+    usa un pool de procesos.
+    """
+    in_lambda = bool(os.environ.get("AWS_LAMBDA_FUNCTION_NAME"))
+    backend = os.environ.get("FANOUT_BACKEND", "lambda" if in_lambda else "process").lower()
+
+    if backend not in FANOUT_BACKENDS:
+        raise ValueError(f"FANOUT_BACKEND inválido: {backend}. Opciones: {', '.join(FANOUT_BACKENDS)}")
+
+    return {
+        "backend": backend,
+        "min_pages": int(os.environ.get("FANOUT_MIN_PAGES", DEFAULT_FANOUT_MIN_PAGES)),
+        "pages_per_worker": max(1, int(os.environ.get("FANOUT_PAGES_PER_WORKER", DEFAULT_PAGES_PER_WORKER))),
+        "max_workers": max(1, int(os.environ.get("FANOUT_MAX_WORKERS", DEFAULT_FANOUT_MAX_WORKERS))),
+        "function_name": os.environ.get("FANOUT_FUNCTION_NAME") or os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+    }
+
+
+def plan_page_ranges(page_count: int, pages_per_worker: int, max_workers: int) -> List[Tuple[int, int]]:
+    """
+    Divide el documento en rangos contiguos [inicio, fin) de al menos
+    pages_per_worker páginas y como mucho max_workers rangos (una sola ola)
+    """
+    if page_count <= 0:
+        return []
+
+    range_size = max(pages_per_worker, math.ceil(page_count / max_workers))
+
+    return [
+        (first_page, min(first_page + range_size, page_count))
+        for first_page in range(0, page_count, range_size)
+    ]
+
+
+def split_evenly(items: List, parts: int) -> List[List]:
+
+    parts = max(1, min(parts, len(items)))
+    size = math.ceil(len(items) / parts) if items else 0
+
+    return [items[start:start + size] for start in range(0, len(items), size)] if items else []
+
+
+def extract_pages_task(payload: Dict) -> Dict:
+    """
+    Worker: texto limpio de un rango de páginas del PDF en S3
+    """
+    try:
+        response = get_aws_client('s3').get_object(Bucket=payload["bucket"], Key=payload["object_key"])
+        file_content = response['Body'].read()
+
+        pages = list(iter_clean_pages(iter_pdf_pages(file_content, payload["first_page"], payload["last_page"])))
+
+        return {"success": True, "pages": pages}
+
+    except Exception as e:
+        print(f"❌ Error extrayendo páginas {payload.get('first_page')}-{payload.get('last_page')}: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+
+def embed_chunks_task(payload: Dict) -> Dict:
+    """
+    Worker: embebe un rango de chunks con sus índices globales y, con
+    payload["write"], los indexa; si no, devuelve los embeddings para que
+    los escriba el coordinador. No borra obsoletos: solo el coordinador ve
+    el documento completo.
+    """
+    try:
+        chunks = [(chunk_index, chunk) for chunk_index, chunk in payload["chunks"]]
+        embedded_chunks = iter_embedded_chunks(chunks, dimensions=get_embedding_dimensions(payload["tenant_id"]))
+
+        if not payload.get("write", True):
+            return {"success": True, "embedded_chunks": list(embedded_chunks)}
+
+        return opensearch_indexing_stream(
+            embedded_chunks,
+            payload["tenant_id"],
+            payload["document_type"],
+            payload["object_key"],
+            payload["filename"],
+            indexed_hashes={},
+            delete_stale=False
+        )
+
+    except Exception as e:
+        print(f"❌ Error embebiendo chunks de {payload.get('object_key')}: {str(e)}")
+        return {"success": False, "message": str(e)}
+
+
+FANOUT_TASKS = {
+    "extract_pages": extract_pages_task,
+    "embed_chunks": embed_chunks_task
+}
+
+
+def run_fanout_task(event: Dict) -> Dict:
+    # Punto de entrada de los workers (evento {"fanout_task", "payload"})
+    task = FANOUT_TASKS.get(event.get("fanout_task"))
+
+    if task is None:
+        return {"success": False, "message": f"Tarea de fan-out desconocida: {event.get('fanout_task')}"}
+
+    return task(event.get("payload", {}))
+
+
+def invoke_lambda_task(function_name: str, event: Dict) -> Dict:
+
+    response = get_lambda_client().invoke(
+        FunctionName=function_name,
+        InvocationType='RequestResponse',
+        Payload=json.dumps(event).encode("utf-8")
+    )
+    result = json.loads(response['Payload'].read() or b"{}")
+
+    if response.get('FunctionError'):
+        return {"success": False, "message": result.get('errorMessage', 'Error en worker Lambda')}
+
+    return result
+
+
+def run_fanout_tasks(task_name: str, payloads: List[Dict], settings: Dict) -> List[Dict]:
+    """
+    Ejecuta una tarea por payload en paralelo y devuelve los resultados en orden
+
+    Args:
+        task_name: Clave de FANOUT_TASKS
+        payloads: Payloads JSON-serializables (viajan a otra Lambda o proceso)
+        settings: Resultado de get_fanout_settings()
+    """
+    if not payloads:
+        return []
+
+    events = [{"fanout_task": task_name, "payload": payload} for payload in payloads]
+    workers = min(settings["max_workers"], len(events))
+    backend = settings["backend"]
+
+    if backend == "lambda":
+        if not settings["function_name"]:
+            raise ValueError("FANOUT_FUNCTION_NAME no configurado para el backend lambda")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda event: invoke_lambda_task(settings["function_name"], event), events))
+
+    executor_class = ProcessPoolExecutor if backend == "process" else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        return list(executor.map(run_fanout_task, events))
+
+
+def should_fan_out(file_content: bytes, settings: Optional[Dict] = None) -> bool:
+
+    settings = settings or get_fanout_settings()
+
+    return get_pdf_page_count(file_content) >= settings["min_pages"]
+
+
+def fanout_pdf_ingestion(file_content, bucket_name, object_key, tenant_id, document_type, filename, settings=None):
+    """
+    Coordinador de ingesta de PDFs grandes:
+    1. Los workers extraen el texto de rangos de páginas en paralelo
+    2. El coordinador chunkea el texto completo en orden (barato), así los
+       índices y el overlap en los bordes de rango son los del documento entero
+    3. Los workers embeben rangos de chunks en paralelo; los indexa el
+       coordinador (o cada worker Lambda, con OpenSearch)
+    4. El coordinador borra los chunks obsoletos del archivo
+
+    Returns:
+        Mismo formato que opensearch_indexing_stream
+    """
+    try:
+        settings = settings or get_fanout_settings()
+
+        page_count = get_pdf_page_count(file_content)
+        page_ranges = plan_page_ranges(page_count, settings["pages_per_worker"], settings["max_workers"])
+
+        print(f"🪭 Fan-out de {object_key}: {page_count} páginas en {len(page_ranges)} rangos ({settings['backend']})")
+
+        extracted = run_fanout_tasks("extract_pages", [
+            {"bucket": bucket_name, "object_key": object_key, "first_page": first_page, "last_page": last_page}
+            for first_page, last_page in page_ranges
+        ], settings)
+
+        failed = [result for result in extracted if not result.get("success", False)]
+        if failed:
+            return {
+                "success": False,
+                "message": f"Error extrayendo texto en {len(failed)} rangos: {failed[0].get('message')}"
+            }
+
+        pages = [page for result in extracted for page in result["pages"]]
+        chunks = list(iter_text_chunks(iter(pages), CHUNK_SIZE, CHUNK_OVERLAP))
+
+        if not chunks:
+            # Nunca borrar lo indexado por un archivo del que no se extrajo nada
+            return {
+                "success": False,
+                "message": "No se pudo extraer texto"
+            }
+
+        indexed_hashes = get_existing_chunk_hashes(tenant_id, object_key)
+        duplicate_hashes = get_existing_duplicate_hashes(tenant_id, object_key) if indexed_hashes else {}
+        needs_embedding = make_needs_embedding(tenant_id, object_key, indexed_hashes, duplicate_hashes)
+
+        current_hashes = set()
+        pending_chunks = []
+        for chunk_index, chunk in chunks:
+            current_hashes.add(chunk_document_hash(tenant_id, object_key, chunk_index, chunk))
+            if needs_embedding(chunk_index, chunk):
+                pending_chunks.append([chunk_index, chunk])
+
+        print(f"🧩 {len(pending_chunks)}/{len(chunks)} chunks requieren embedding")
+
+        vector_store = get_vector_store()
+        index_name = get_index_name(tenant_id)
+
+        # Se crea antes de lanzar workers para que no compitan creando el índice
+        if pending_chunks and not vector_store.ensure_index(tenant_id):
+            return {
+                "success": False,
+                "message": f"Error creando índice {index_name}"
+            }
+
+        # Solo los workers Lambda escriben (la respuesta de una invocación no
+        # admite los embeddings de un rango); con procesos o hilos escribe el
+        # coordinador, así un store local no se reescribe desde cada proceso
+        workers_write = settings["backend"] == "lambda"
+        if workers_write and vector_store.name != "opensearch":
+            raise ValueError(f"El backend lambda de fan-out requiere OpenSearch, no el vector store {vector_store.name}")
+
+        embedded = run_fanout_tasks("embed_chunks", [
+            {
+                "tenant_id": tenant_id,
+                "document_type": document_type,
+                "object_key": object_key,
+                "filename": filename,
+                "chunks": chunk_range,
+                "write": workers_write
+            }
+            for chunk_range in split_evenly(pending_chunks, settings["max_workers"])
+        ], settings)
+
+        failed = [result for result in embedded if not result.get("success", False)]
+        if failed:
+            return {
+                "success": False,
+                "message": f"Error embebiendo {len(failed)} rangos de chunks: {failed[0].get('message')}"
+            }
+
+        indexed = embedded
+        if not workers_write and embedded:
+            # El documento entero en orden: el filtro de casi duplicados ve también los chunks sin cambios
+            embeddings = {
+                chunk_index: embedding
+                for result in embedded for chunk_index, _, embedding in result["embedded_chunks"]
+            }
+            indexed = [opensearch_indexing_stream(
+                ((chunk_index, chunk, embeddings.get(chunk_index)) for chunk_index, chunk in chunks),
+                tenant_id,
+                document_type,
+                object_key,
+                filename,
+                indexed_hashes=indexed_hashes,
+                delete_stale=False,
+                duplicate_hashes=duplicate_hashes
+            )]
+
+        failed = [result for result in indexed if not result.get("success", False)]
+        written_count = sum(result.get("details", {}).get("written_count", 0) for result in indexed)
+        deduplicated_count = sum(result.get("details", {}).get("deduplicated_count", 0) for result in indexed)
+        invalid_count = sum(result.get("details", {}).get("invalid_count", 0) for result in indexed)
+
+        if failed:
+            return {
+                "success": False,
+                "message": f"Error indexando chunks: {failed[0].get('message')}"
+            }
+
+        # Los obsoletos se borran solo cuando todos los rangos quedaron escritos
+        stale_ids = [
+            document_id for document_hash, document_id in indexed_hashes.items()
+            if document_hash not in current_hashes
+        ]
+
+        deleted = vector_store.delete_documents(tenant_id, stale_ids)
+
+        if stale_ids:
+            bump_index_version(tenant_id)
+
+        if not deleted:
+            return {
+                "success": False,
+                "message": "Error eliminando chunks obsoletos en OpenSearch"
+            }
+
+        if written_count and vector_store.name == "opensearch":
+            maybe_promote_tenant(tenant_id)
+
+        print(f"🎉 Documento indexado con fan-out: {written_count} nuevos/modificados, {len(stale_ids)} obsoletos")
+        return {
+            "success": True,
+            "message": f"Documento procesado e indexado: {len(chunks)} elementos",
+            "details": {
+                "tenant_id": tenant_id,
+                "index_name": index_name,
+                "chunks_count": len(chunks),
+                "embeddings_count": len(pending_chunks),
+                "written_count": written_count,
+                "unchanged_count": len(chunks) - written_count - deduplicated_count - invalid_count,
+                "deduplicated_count": deduplicated_count,
+                "invalid_count": invalid_count,
+                "deleted_count": len(stale_ids),
+                "page_count": page_count,
+                "page_ranges": len(page_ranges),
+                "chunk_ranges": len(embedded),
+                "document_type": document_type,
+                "filename": filename
+            }
+        }
+
+    except Exception as e:
+        print(f"❌ Error en fan-out de {object_key}: {str(e)}")
+        return {
+            "success": False,
+            "message": f"Error en fan-out: {str(e)}"
+        }
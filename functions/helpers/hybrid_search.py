@@ -0,0 +1,203 @@
+import os
+from typing import Dict, List, Optional, Sequence
+
+from helpers.vectors import vector_to_list
+
+
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+FUSION_METHODS = ("rrf", "score")
+DEFAULT_SEARCH_MODE = "vector"
+DEFAULT_FUSION = "score"
+
+# Constante de RRF: atenúa la diferencia entre las primeras posiciones de cada lista
+DEFAULT_RRF_K = 60
+# Candidatos que aporta cada rama antes de fusionar
+DEFAULT_HYBRID_CANDIDATES = 20
+
+# Límites de los overrides por request (size, k, ef_search) de /query
+SEARCH_OPTION_LIMITS = {
+    "size": 100,
+    "k": 1000,
+    "ef_search": 2048
+}
+
+LEXICAL_FIELDS = ["content", "description"]
+
+SOURCE_FIELDS = [
+    "content",
+    "source_file",
+    "document_type",
+    "chunk_index",
+    "created_at",
+    "document_hash"
+]
+
+
+def get_search_mode(search_mode: Optional[str] = None) -> str:
+    """
+    Modo de búsqueda del request o, si no viene, SEARCH_MODE (default vector)
+    """
+    search_mode = (search_mode or os.environ.get("SEARCH_MODE", DEFAULT_SEARCH_MODE)).lower()
+
+    if search_mode not in SEARCH_MODES:
+        raise ValueError(f"search_mode inválido: {search_mode}. Valores permitidos: {', '.join(SEARCH_MODES)}")
+
+    return search_mode
+
+
+def get_hybrid_settings() -> Dict:
+    # score por defecto: en identificadores RRF deja ganar a chunks mediocres en ambas ramas
+    fusion = os.environ.get("HYBRID_FUSION", DEFAULT_FUSION).lower()
+    if fusion not in FUSION_METHODS:
+        raise ValueError(f"HYBRID_FUSION inválido: {fusion}. Valores permitidos: {', '.join(FUSION_METHODS)}")
+
+    return {
+        "fusion": fusion,
+        "rrf_k": int(os.environ.get("HYBRID_RRF_K", DEFAULT_RRF_K)),
+        "candidates": int(os.environ.get("HYBRID_CANDIDATES", DEFAULT_HYBRID_CANDIDATES)),
+        "vector_weight": float(os.environ.get("HYBRID_VECTOR_WEIGHT", 1.0)),
+        "lexical_weight": float(os.environ.get("HYBRID_LEXICAL_WEIGHT", 1.0))
+    }
+
+
+def build_vector_query(
+    question_embedding: List[float],
+    filters: List[Dict],
+    size: int,
+    k: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    knn_filter: bool = False
+) -> Dict:
+    """
+    kNN con filtros. k (vecinos que busca HNSW, default size) puede ser
+    mayor que size para mejorar el recall con filtros restrictivos;
+    ef_search sobrescribe el del índice (solo faiss y lucene). Con
+    knn_filter los filtros van también dentro del kNN (índices compartidos:
+    HNSW solo devuelve vecinos del tenant)
+    """
+    knn = {
+        "vector": vector_to_list(question_embedding),
+        "k": max(k or size, size)
+    }
+
+    if ef_search:
+        knn["method_parameters"] = {"ef_search": ef_search}
+
+    if knn_filter and filters:
+        knn["filter"] = {"bool": {"filter": list(filters)}}
+
+    return {
+        "size": size,
+        "query": {
+            "bool": {
+                "must": {
+                    "knn": {
+                        "embedding": knn
+                    }
+                },
+                "filter": list(filters)
+            }
+        },
+        "_source": SOURCE_FIELDS
+    }
+
+
+def build_lexical_query(question: str, filters: List[Dict], size: int) -> Dict:
+    # BM25 sobre los campos text del mapping; identificadores (facturas, SKUs) matchean literal
+
+    return {
+        "size": size,
+        "query": {
+            "bool": {
+                "must": {
+                    "multi_match": {
+                        "query": question,
+                        "fields": LEXICAL_FIELDS
+                    }
+                },
+                "filter": list(filters)
+            }
+        },
+        "_source": SOURCE_FIELDS
+    }
+
+
+def reciprocal_rank_fusion(
+    ranked_hits: Sequence[List[Dict]],
+    weights: Optional[Sequence[float]] = None,
+    rrf_k: int = DEFAULT_RRF_K,
+    size: int = 10
+) -> List[Dict]:
+    """
+    Fusiona listas de hits de OpenSearch con Reciprocal Rank Fusion:
+    score(d) = sum(peso_i / (rrf_k + posición_i(d)))
+
+    El score se normaliza contra el máximo posible (primera posición en
+    todas las listas) para quedar en [0, 1] como el score de kNN.
+
+    Args:
+        ranked_hits: Una lista de hits (con _id) por rama, en orden de relevancia
+        weights: Peso de cada rama; default 1.0
+        rrf_k: Constante de RRF
+        size: Resultados a devolver
+
+    Returns:
+        Hits fusionados con _score reemplazado por el score RRF y
+        _ranks con la posición (1-based) en cada rama o None
+    """
+    weights = list(weights) if weights is not None else [1.0] * len(ranked_hits)
+    max_score = sum(weight / (rrf_k + 1) for weight in weights) or 1.0
+
+    fused = {}
+    for branch, (hits, weight) in enumerate(zip(ranked_hits, weights)):
+        for position, hit in enumerate(hits, 1):
+            entry = fused.get(hit["_id"])
+            if entry is None:
+                entry = fused[hit["_id"]] = {"hit": hit, "score": 0.0, "ranks": [None] * len(ranked_hits)}
+            entry["score"] += weight / (rrf_k + position)
+            entry["ranks"][branch] = position
+
+    ordered = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:size]
+
+    return [
+        dict(entry["hit"], _score=entry["score"] / max_score, _ranks=entry["ranks"])
+        for entry in ordered
+    ]
+
+
+def weighted_score_fusion(
+    ranked_hits: Sequence[List[Dict]],
+    weights: Optional[Sequence[float]] = None,
+    size: int = 10
+) -> List[Dict]:
+    """
+    Alternativa a RRF: combina los scores de cada rama normalizados min-max
+    a [0, 1]. Conserva la magnitud de BM25, así un match de un término raro
+    (un número de factura) pesa más que varios matches de palabras comunes.
+
+    Returns:
+        Hits fusionados con _score en [0, 1] y _ranks como en reciprocal_rank_fusion
+    """
+    weights = list(weights) if weights is not None else [1.0] * len(ranked_hits)
+    total_weight = sum(weights) or 1.0
+
+    fused = {}
+    for branch, (hits, weight) in enumerate(zip(ranked_hits, weights)):
+        if not hits:
+            continue
+        scores = [hit.get("_score") or 0.0 for hit in hits]
+        low, high = min(scores), max(scores)
+        for position, (hit, score) in enumerate(zip(hits, scores), 1):
+            normalized = (score - low) / (high - low) if high > low else 1.0
+            entry = fused.get(hit["_id"])
+            if entry is None:
+                entry = fused[hit["_id"]] = {"hit": hit, "score": 0.0, "ranks": [None] * len(ranked_hits)}
+            entry["score"] += weight * normalized
+            entry["ranks"][branch] = position
+
+    ordered = sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)[:size]
+
+    return [
+        dict(entry["hit"], _score=entry["score"] / total_weight, _ranks=entry["ranks"])
+        for entry in ordered
+    ]
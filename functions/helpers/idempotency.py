@@ -0,0 +1,126 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from helpers.clients import get_aws_client
+
+
+# Tiempo que un archivo queda "en proceso" antes de que otra entrega pueda tomarlo
+DEFAULT_LOCK_SECONDS = 20 * 60
+DEFAULT_COMPLETED_TTL_DAYS = 7
+
+
+def ingestion_idempotency_key(bucket_name: str, object_key: str, version: Optional[str]) -> str:
+    # version = versionId o eTag del evento: una nueva subida del archivo es otro trabajo
+    return f"ingestion#{bucket_name}/{object_key}#{version or 'latest'}"
+
+
+class InMemoryIdempotencyStore:
+
+    def __init__(self, lock_seconds: float = DEFAULT_LOCK_SECONDS):
+        self.lock_seconds = lock_seconds
+        self._records: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> bool:
+        with self._lock:
+            record = self._records.get(key)
+            if record and (record["status"] == "COMPLETED" or record["locked_until"] > time.time()):
+                return False
+            self._records[key] = {"status": "IN_PROGRESS", "locked_until": time.time() + self.lock_seconds}
+            return True
+
+    def complete(self, key: str):
+        with self._lock:
+            self._records[key] = {"status": "COMPLETED", "locked_until": 0}
+
+    def release(self, key: str):
+        with self._lock:
+            self._records.pop(key, None)
+
+
+class DynamoDBIdempotencyStore:
+    """
+    Registro de ingestas en DynamoDB (misma tabla del cache, partition key
+    'cache_key'). acquire es un put condicional: solo una entrega del mismo
+    archivo lo procesa; si esa ejecución muere, el lock vence y otra lo toma.
+    """
+
+    def __init__(
+        self,
+        table_name: str,
+        lock_seconds: float = DEFAULT_LOCK_SECONDS,
+        completed_ttl_days: int = DEFAULT_COMPLETED_TTL_DAYS,
+        client=None
+    ):
+        self.table_name = table_name
+        self.lock_seconds = lock_seconds
+        self.completed_ttl_seconds = completed_ttl_days * 24 * 3600
+        self.client = client or get_aws_client("dynamodb")
+
+    def acquire(self, key: str) -> bool:
+        now = int(time.time())
+        try:
+            self.client.put_item(
+                TableName=self.table_name,
+                Item={
+                    "cache_key": {"S": key},
+                    "status": {"S": "IN_PROGRESS"},
+                    "locked_until": {"N": str(now + int(self.lock_seconds))},
+                    "expires_at": {"N": str(now + self.completed_ttl_seconds)}
+                },
+                ConditionExpression="attribute_not_exists(cache_key) OR (#status = :in_progress AND locked_until < :now)",
+                ExpressionAttributeNames={"#status": "status"},
+                ExpressionAttributeValues={":in_progress": {"S": "IN_PROGRESS"}, ":now": {"N": str(now)}}
+            )
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def complete(self, key: str):
+        self.client.put_item(
+            TableName=self.table_name,
+            Item={
+                "cache_key": {"S": key},
+                "status": {"S": "COMPLETED"},
+                "expires_at": {"N": str(int(time.time()) + self.completed_ttl_seconds)}
+            }
+        )
+
+    def release(self, key: str):
+        self.client.delete_item(TableName=self.table_name, Key={"cache_key": {"S": key}})
+
+
+_idempotency_store = None
+_lock = threading.Lock()
+
+
+def get_idempotency_store():
+    """
+    IDEMPOTENCY_TABLE configurada -> DynamoDB; si no, registro en memoria
+    (solo deduplica dentro de la misma instancia)
+    """
+    global _idempotency_store
+
+    if _idempotency_store is None:
+        with _lock:
+            if _idempotency_store is None:
+                table_name = os.environ.get("IDEMPOTENCY_TABLE")
+                lock_seconds = float(os.environ.get("IDEMPOTENCY_LOCK_SECONDS", DEFAULT_LOCK_SECONDS))
+                if table_name:
+                    _idempotency_store = DynamoDBIdempotencyStore(table_name, lock_seconds)
+                else:
+                    _idempotency_store = InMemoryIdempotencyStore(lock_seconds)
+
+    return _idempotency_store
+
+
+def reset_idempotency_store():
+    global _idempotency_store
+    with _lock:
+        _idempotency_store = None
@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from helpers.index_profiles import profile_from_mapping
+
+
+# Los índices existentes solo cambian al borrarse (migraciones): TTL largo e invalidación por 404
+DEFAULT_INDEX_METADATA_TTL_SECONDS = 300
+# Un índice que no existe puede crearlo la Lambda de ingesta en cualquier momento
+DEFAULT_MISSING_INDEX_TTL_SECONDS = 10
+
+# Versión del mapping que escribe create_index_if_not_exists en _meta (0 = índice sin versión)
+# 2: document_hash como keyword (antes quedaba text + .keyword por mapping dinámico)
+MAPPING_VERSION = 2
+
+
+def is_not_found_error(error: Exception) -> bool:
+    # Sin importar opensearchpy: su carga es lenta y las excepciones llevan status_code
+    return getattr(error, "status_code", None) == 404
+
+
+def read_index_metadata(client, index_name: str) -> Dict:
+    """
+    Un solo GET _mapping: existencia (404 = no existe), perfil (dimensión,
+    motor, cuantización) y versión del mapping
+    """
+    try:
+        mappings = client.indices.get_mapping(index=index_name)[index_name]["mappings"]
+    except Exception as e:
+        if is_not_found_error(e):
+            return {"exists": False, "profile": None, "mapping_version": None}
+        raise
+
+    return {
+        "exists": True,
+        "profile": profile_from_mapping(mappings),
+        "mapping_version": (mappings.get("_meta") or {}).get("mapping_version", 0)
+    }
+
+
+class IndexMetadataCache:
+    """
+    Metadatos de índices de OpenSearch en la Lambda warm, para no pagar un
+    indices.exists por request. Los índices inexistentes se cachean menos
+    tiempo; un 404 en una búsqueda o escritura invalida la entrada.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_INDEX_METADATA_TTL_SECONDS, missing_ttl_seconds: float = DEFAULT_MISSING_INDEX_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.missing_ttl_seconds = missing_ttl_seconds
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, client, index_name: str) -> Dict:
+
+        with self._lock:
+            entry = self._entries.get(index_name)
+            if entry and time.monotonic() < entry["expires_at"]:
+                self.hits += 1
+                return entry["metadata"]
+            self.misses += 1
+
+        metadata = read_index_metadata(client, index_name)
+        ttl = self.ttl_seconds if metadata["exists"] else self.missing_ttl_seconds
+
+        with self._lock:
+            self._entries[index_name] = {"metadata": metadata, "expires_at": time.monotonic() + ttl}
+        return metadata
+
+    def invalidate(self, index_name: str):
+        with self._lock:
+            self._entries.pop(index_name, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+_index_metadata_cache = None
+_lock = threading.Lock()
+
+
+def get_index_metadata_cache() -> IndexMetadataCache:
+    """
+    INDEX_METADATA_TTL (default 300 s) e INDEX_METADATA_MISSING_TTL
+    (default 10 s); 0 desactiva el cache
+    """
+    global _index_metadata_cache
+
+    if _index_metadata_cache is None:
+        with _lock:
+            if _index_metadata_cache is None:
+                _index_metadata_cache = IndexMetadataCache(
+                    ttl_seconds=float(os.environ.get("INDEX_METADATA_TTL", DEFAULT_INDEX_METADATA_TTL_SECONDS)),
+                    missing_ttl_seconds=float(os.environ.get("INDEX_METADATA_MISSING_TTL", DEFAULT_MISSING_INDEX_TTL_SECONDS))
+                )
+
+    return _index_metadata_cache
+
+
+def get_index_metadata(client, index_name: str) -> Dict:
+    return get_index_metadata_cache().get(client, index_name)
+
+
+def invalidate_index_metadata(index_name: Optional[str]):
+    if index_name:
+        get_index_metadata_cache().invalidate(index_name)
+
+
+def reset_index_metadata_cache():
+    global _index_metadata_cache
+    with _lock:
+        _index_metadata_cache = None
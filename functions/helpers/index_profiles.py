@@ -0,0 +1,130 @@
+import json
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+from helpers.vectors import normalize_rows, to_vector
+
+
+# Perfil de índice (plantilla de creación): dimensión de Titan Multimodal
+# (1024 | 384 | 256), motor k-NN, cuantización de los vectores guardados y
+# parámetros de HNSW. m y ef_construction solo aplican al crear el índice;
+# ef_search es el default del índice y se puede subir por request.
+INDEX_PROFILES = {
+    # Mapping histórico: float32 con nmslib
+    "standard": {"dimensions": 1024, "engine": "nmslib", "space_type": "cosinesimil", "quantization": None, "m": 16, "ef_construction": 100, "ef_search": 100},
+    # faiss con scalar quantization fp16 en el servidor: mitad de memoria, mismos embeddings
+    "fp16": {"dimensions": 1024, "engine": "faiss", "space_type": "innerproduct", "quantization": "fp16", "m": 16, "ef_construction": 100, "ef_search": 100},
+    "compact": {"dimensions": 384, "engine": "faiss", "space_type": "innerproduct", "quantization": "fp16", "m": 16, "ef_construction": 100, "ef_search": 100},
+    # Vectores byte cuantizados en el cliente: 1/16 de la memoria de standard
+    "tiny": {"dimensions": 256, "engine": "faiss", "space_type": "innerproduct", "quantization": "byte", "m": 16, "ef_construction": 100, "ef_search": 100},
+    # Más recall a cambio de memoria y latencia (tenants de documentos legales)
+    "precise": {"dimensions": 1024, "engine": "faiss", "space_type": "innerproduct", "quantization": None, "m": 32, "ef_construction": 256, "ef_search": 256}
+}
+DEFAULT_INDEX_PROFILE = "standard"
+
+# Índices creados antes de los perfiles no tienen _meta: son standard
+LEGACY_INDEX_PROFILE = "standard"
+
+BYTES_PER_VALUE = {None: 4, "fp16": 2, "byte": 1}
+BYTE_SCALE = 127
+# nmslib no acepta ef_search por query: usa el del índice
+QUERY_EF_SEARCH_ENGINES = ("faiss", "lucene")
+# Filtrado eficiente (filter dentro de knn): nmslib solo post-filtra el top-k
+KNN_FILTER_ENGINES = ("faiss", "lucene")
+
+
+def get_index_profile(name: str) -> Dict:
+
+    if name not in INDEX_PROFILES:
+        raise ValueError(f"Perfil de índice inválido: {name}. Valores permitidos: {', '.join(INDEX_PROFILES)}")
+
+    return dict(INDEX_PROFILES[name], name=name)
+
+
+def get_configured_index_profile(tenant_id: str) -> Dict:
+    """
+    Perfil para índices nuevos: INDEX_PROFILE para todos los tenants y
+    TENANT_INDEX_PROFILES (JSON {"cliente_x": "compact"}) para excepciones.
+    Un índice existente conserva el perfil con el que se creó.
+    """
+    overrides = json.loads(os.environ.get("TENANT_INDEX_PROFILES") or "{}")
+
+    return get_index_profile(overrides.get(tenant_id) or os.environ.get("INDEX_PROFILE", DEFAULT_INDEX_PROFILE))
+
+
+def profile_from_mapping(mapping: Dict) -> Dict:
+    # Perfil guardado en el _meta del mapping al crear el índice
+
+    name = (mapping.get("_meta") or {}).get("index_profile", LEGACY_INDEX_PROFILE)
+    return get_index_profile(name)
+
+
+def build_embedding_field(profile: Dict) -> Dict:
+
+    method = {
+        "name": "hnsw",
+        "space_type": profile["space_type"],
+        "engine": profile["engine"],
+        "parameters": {
+            "m": profile["m"],
+            "ef_construction": profile["ef_construction"]
+        }
+    }
+
+    if profile["quantization"] == "fp16":
+        method["parameters"]["encoder"] = {"name": "sq", "parameters": {"type": "fp16"}}
+
+    field = {
+        "type": "knn_vector",
+        "dimension": profile["dimensions"],
+        "method": method
+    }
+
+    if profile["quantization"] == "byte":
+        field["data_type"] = "byte"
+
+    return field
+
+
+def encode_vector(vector, profile: Dict):
+    """
+    Embedding de Titan -> valor del campo embedding según el perfil. Con
+    innerproduct se normaliza (producto interno = coseno) y con byte se
+    escala a enteros en [-128, 127]; documentos y preguntas pasan por aquí.
+    Devuelve el mismo tipo que recibe: ndarray (float32 o int8) o lista.
+    """
+    if profile["space_type"] != "innerproduct":
+        return vector
+
+    if len(vector) != profile["dimensions"]:
+        raise ValueError(f"Dimensión {len(vector)} distinta a la del perfil {profile['name']} ({profile['dimensions']})")
+
+    encoded = normalize_rows(vector)
+
+    if profile["quantization"] == "byte":
+        encoded = np.clip(np.rint(encoded * BYTE_SCALE), -128, 127).astype(np.int8)
+
+    return encoded if isinstance(vector, np.ndarray) else encoded.tolist()
+
+
+def decode_vector(vector, profile: Dict) -> np.ndarray:
+    # Inversa aproximada de encode_vector: el embedding guardado como float32 (byte -> [-1, 1])
+    vector = to_vector(vector)
+    return vector / BYTE_SCALE if profile["quantization"] == "byte" else vector
+
+
+def supports_query_ef_search(profile: Dict) -> bool:
+    return profile["engine"] in QUERY_EF_SEARCH_ENGINES
+
+
+def supports_knn_filter(profile: Dict) -> bool:
+    return profile["engine"] in KNN_FILTER_ENGINES
+
+
+def estimate_vector_memory(profile: Dict, vectors: int, m: Optional[int] = None) -> int:
+    # Fórmula de la guía de OpenSearch para HNSW: 1.1 * (bytes_por_vector + 8 * m) * vectores
+    m = m or profile["m"]
+
+    return int(1.1 * (BYTES_PER_VALUE[profile["quantization"]] * profile["dimensions"] + 8 * m) * vectors)
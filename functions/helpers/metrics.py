@@ -0,0 +1,187 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, Optional
+
+
+DEFAULT_METRICS_NAMESPACE = "NuevoRag"
+
+_current_metrics: contextvars.ContextVar = contextvars.ContextVar("current_metrics", default=None)
+
+
+class Metrics:
+    """
+    Tiempos por etapa y contadores de una operación (un archivo ingerido o
+    una consulta). Los spans son exclusivos por hilo: si un span abre otro
+    (p. ej. chunk tira de extract), el tiempo del interno no cuenta en el
+    externo. Los spans de hilos en paralelo se suman, así que una etapa
+    concurrente puede acumular más que el tiempo total.
+    """
+
+    def __init__(self, operation: str, namespace: Optional[str] = None, **properties):
+        self.operation = operation
+        self.namespace = namespace or os.environ.get("METRICS_NAMESPACE", DEFAULT_METRICS_NAMESPACE)
+        self.properties = properties
+        self.timings: Dict[str, float] = defaultdict(float)
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.units: Dict[str, str] = {}
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, name: str):
+        stack = self._local.__dict__.setdefault("stack", [])
+        now = time.perf_counter()
+
+        if stack:
+            # Se pausa el span padre mientras corre el hijo
+            parent_name, parent_start = stack[-1]
+            self.add_time(parent_name, (now - parent_start) * 1000)
+
+        stack.append((name, now))
+        try:
+            yield
+        finally:
+            _, start = stack.pop()
+            now = time.perf_counter()
+            self.add_time(name, (now - start) * 1000)
+            if stack:
+                stack[-1] = (stack[-1][0], now)
+
+    def add_time(self, name: str, milliseconds: float):
+        with self._lock:
+            self.timings[name] += milliseconds
+
+    def count(self, name: str, value: float = 1, unit: str = "Count"):
+        with self._lock:
+            self.counters[name] += value
+            self.units[name] = unit
+
+    def snapshot(self) -> Dict:
+        # Formato del campo timings de /query
+        with self._lock:
+            return {
+                "total_ms": round((time.perf_counter() - self.start_time) * 1000, 1),
+                "stages_ms": {name: round(value, 1) for name, value in self.timings.items()},
+                "counters": {name: value for name, value in self.counters.items()}
+            }
+
+    def to_emf(self) -> Dict:
+        """
+        Embedded Metric Format: CloudWatch extrae las métricas de la línea de
+        log sin llamadas a PutMetricData. Dimensión: Operation; el resto de
+        properties (tenant, archivo) quedan como campos consultables en Logs Insights.
+        """
+        snapshot = self.snapshot()
+
+        record = {
+            "Operation": self.operation,
+            **self.properties,
+            "total_ms": snapshot["total_ms"]
+        }
+        definitions = [{"Name": "total_ms", "Unit": "Milliseconds"}]
+
+        for name, value in snapshot["stages_ms"].items():
+            record[f"{name}_ms"] = value
+            definitions.append({"Name": f"{name}_ms", "Unit": "Milliseconds"})
+
+        for name, value in snapshot["counters"].items():
+            record[name] = value
+            definitions.append({"Name": name, "Unit": self.units.get(name, "Count")})
+
+        record["_aws"] = {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": self.namespace,
+                "Dimensions": [["Operation"]],
+                "Metrics": definitions
+            }]
+        }
+        return record
+
+    def emit(self):
+        print(json.dumps(self.to_emf(), ensure_ascii=False, default=str), flush=True)
+
+
+def get_metrics() -> Optional[Metrics]:
+    return _current_metrics.get()
+
+
+@contextmanager
+def metrics_scope(operation: str, **properties) -> Iterator[Metrics]:
+    """
+    Abre las métricas de una operación en el contexto actual y al cerrar
+    imprime la línea EMF (METRICS_ENABLED=false la desactiva)
+    """
+    metrics = Metrics(operation, **properties)
+    token = _current_metrics.set(metrics)
+
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+        if os.environ.get("METRICS_ENABLED", "true").lower() != "false":
+            metrics.emit()
+
+
+@contextmanager
+def span(name: str):
+    # No-op fuera de un metrics_scope
+    metrics = get_metrics()
+
+    if metrics is None:
+        yield
+        return
+
+    with metrics.span(name):
+        yield
+
+
+def count(name: str, value: float = 1, unit: str = "Count"):
+
+    metrics = get_metrics()
+    if metrics is not None and value:
+        metrics.count(name, value, unit)
+
+
+def timed_iter(iterable: Iterable, name: str, counter: Optional[str] = None) -> Iterator:
+    """
+    Mide el tiempo de producir cada elemento de un generador (no el del
+    consumidor) y opcionalmente cuenta los elementos
+    """
+    iterator = iter(iterable)
+
+    while True:
+        with span(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        if counter:
+            count(counter)
+        yield item
+
+
+def bind_metrics(fn: Callable) -> Callable:
+    """
+    Envuelve fn para que, al correr en otro hilo (ThreadPoolExecutor), siga
+    registrando en las métricas de quien la envolvió
+    """
+    metrics = get_metrics()
+
+    if metrics is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current_metrics.set(metrics)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_metrics.reset(token)
+
+    return run
@@ -0,0 +1,386 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from helpers.bulk_writer import bulk_write
+from helpers.rag_helpers import chunk_document_hash
+from helpers.index_profiles import get_index_profile, build_embedding_field, DEFAULT_INDEX_PROFILE
+from helpers.index_metadata import MAPPING_VERSION, get_index_metadata
+
+if TYPE_CHECKING:
+    import boto3
+    from opensearchpy import OpenSearch
+
+
+# Chunks por página al leer los ya indexados de un archivo (index.max_result_window es 10000)
+INDEXED_HASHES_PAGE_SIZE = 5000
+# Con embedding cada hit pesa ~10 KB: páginas más chicas
+INDEXED_VECTORS_PAGE_SIZE = 500
+
+
+def create_opensearch_client(region: str = 'us-east-1', session: "boto3.Session" = None, pool_maxsize: int = None) -> "OpenSearch":
+
+    # Imports diferidos: opensearch-py tarda cientos de ms en cargar
+    import boto3
+    from opensearchpy import OpenSearch, RequestsHttpConnection
+    from requests_aws4auth import AWS4Auth
+
+    try:
+
+        session = session or boto3.Session()
+        credentials = session.get_credentials()
+        
+        # refreshable_credentials firma cada request con credenciales vigentes,
+        # así el cliente puede reutilizarse entre invocaciones
+        awsauth = AWS4Auth(
+            region=region,
+            service='aoss',
+            refreshable_credentials=credentials
+        )
+        
+        opensearch_endpoint = os.environ.get('OPENSEARCH_ENDPOINT')
+        if not opensearch_endpoint:
+            raise ValueError("Variable OPENSEARCH_ENDPOINT no configurada")
+        
+        host = opensearch_endpoint
+        
+        client = OpenSearch(
+            hosts=[{'host': host.replace('https://', ''), 'port': 443}],
+            http_auth=awsauth,
+            use_ssl=True,
+            verify_certs=True,
+            connection_class=RequestsHttpConnection,
+            pool_maxsize=pool_maxsize,
+            timeout=60
+        )
+        
+        return client
+        
+    except Exception as e:
+        print(f"Error creando cliente OpenSearch: {str(e)}")
+        raise ValueError(f"Error en cliente OpenSearch: {str(e)}")
+
+
+def create_index_if_not_exists(
+    client: "OpenSearch", 
+    index_name: str, 
+    profile: Dict = None
+) -> bool:
+
+    try:
+
+        if client.indices.exists(index=index_name):
+            print(f"📋 Índice '{index_name}' ya existe")
+            return True
+        
+        profile = profile or get_index_profile(DEFAULT_INDEX_PROFILE)
+        
+        print(f"🆕 Creando índice '{index_name}' con perfil {profile['name']} "
+              f"({profile['dimensions']} dimensiones, {profile['engine']}, {profile['quantization'] or 'float32'})")
+        
+        index_mapping = {
+            "settings": {
+                "index": {
+                    "knn": True,  # Habilitar k-NN search
+                    "knn.algo_param.ef_search": profile["ef_search"]
+                }
+            },
+            "mappings": {
+                # Ingesta y consulta leen el perfil del índice, no la configuración actual
+                "_meta": {
+                    "index_profile": profile["name"],
+                    "mapping_version": MAPPING_VERSION
+                },
+                "properties": {
+                    "tenant_id": {
+                        "type": "keyword"  # Para filtrado exacto
+                    },
+                    "content": {
+                        "type": "text",
+                        "analyzer": "standard"
+                    },
+                    "embedding": build_embedding_field(profile),
+                    "document_type": {
+                        "type": "keyword"
+                    },
+                    "file_format": {
+                        "type": "keyword"
+                    },
+                    "source_file": {
+                        "type": "keyword"
+                    },
+                    "chunk_index": {
+                        "type": "integer"
+                    },
+                    "document_hash": {
+                        "type": "keyword"  # Orden de la paginación con search_after
+                    },
+                    "duplicate_of": {
+                        "type": "keyword"  # Tombstones de chunks casi duplicados
+                    },
+                    "created_at": {
+                        "type": "date",
+                        "format": "strict_date_optional_time"
+                    },
+                    "content_type": {
+                        "type": "keyword"  # "text" o "image"
+                    },
+                    "description": {
+                        "type": "text",
+                        "analyzer": "standard"  # Para imágenes principalmente
+                    }
+                }
+            }
+        }
+        
+        # Crear índice
+        try:
+            client.indices.create(
+                index=index_name,
+                body=index_mapping
+            )
+        except Exception as e:
+            # Varias Lambdas de ingesta del mismo tenant nuevo: gana la primera, el resto lo usa
+            if not is_already_exists_error(e):
+                raise
+            print(f"📋 Índice '{index_name}' creado por otra ejecución")
+            return True
+        
+        print(f"✅ Índice '{index_name}' creado exitosamente")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Error creando índice '{index_name}': {str(e)}")
+        return False
+
+
+def is_already_exists_error(error: Exception) -> bool:
+    return "resource_already_exists_exception" in str(getattr(error, "error", "") or error)
+
+
+def build_index_operations(
+    index_name: str,
+    documents: Iterable[Dict],
+    tenant_id: str
+) -> Iterator[Tuple[Dict, Dict]]:
+
+    timestamp = datetime.utcnow().isoformat()
+    
+    for i, doc in enumerate(documents):
+        chunk_index = doc.get('chunk_index', i)
+
+        content_hash = chunk_document_hash(
+            tenant_id, 
+            doc.get('source_file', 'unknown'), 
+            chunk_index,
+            doc['content']
+        )
+
+        # _id determinista: re-indexar el mismo chunk sobrescribe en vez de duplicar
+        action = {
+            "index": {
+                "_index": index_name,
+                "_id": content_hash
+            }
+        }
+        
+        # Documento completo
+        document = {
+            "tenant_id": tenant_id,
+            "content": doc['content'],
+            "embedding": doc['embedding'],
+            "document_type": doc.get('document_type', 'unknown'),
+            "file_format": doc.get('file_format', 'unknown'),
+            "source_file": doc.get('source_file', 'unknown'),
+            "chunk_index": chunk_index,
+            "document_hash": content_hash,  # Hash único para identificación
+            "created_at": timestamp
+        }
+
+        if doc.get('duplicate_of'):
+            # Tombstone de un chunk casi duplicado: sin contenido ni embedding no aparece
+            # en búsquedas, solo recuerda su hash para no volver a embeberlo
+            del document['content'], document['embedding']
+            document['duplicate_of'] = doc['duplicate_of']
+
+        yield action, document
+
+
+def get_document_hash_sort_field(client: "OpenSearch", index_name: str) -> str:
+    # Índices anteriores a mapping_version 2: document_hash es text y solo su subcampo .keyword se puede ordenar
+    mapping_version = get_index_metadata(client, index_name)["mapping_version"] or 0
+    return "document_hash" if mapping_version >= 2 else "document_hash.keyword"
+
+
+def iter_sorted_hits(
+    client: "OpenSearch",
+    index_name: str,
+    query: Dict,
+    page_size: int,
+    source: Optional[List[str]] = None
+) -> Iterator[Dict]:
+    """
+    Todos los hits de query en páginas de page_size, con search_after sobre
+    document_hash (único por chunk): Serverless no tiene scroll ni reindex
+    """
+    sort_field = get_document_hash_sort_field(client, index_name)
+    search_after = None
+
+    while True:
+        body = {"size": page_size, "query": query, "sort": [{sort_field: "asc"}]}
+        if source is not None:
+            body["_source"] = source
+        if search_after:
+            body["search_after"] = search_after
+
+        hits = client.search(index=index_name, body=body).get("hits", {}).get("hits", [])
+        yield from hits
+
+        if len(hits) < page_size:
+            return
+        search_after = hits[-1]["sort"]
+
+
+def log_bulk_report(report: Dict, description: str = "documentos") -> None:
+
+    for item in report['items']:
+        if item['error']:
+            print(f"❌ Error en bulk ({item['operation']}) ID: {item['_id']}, Error: {item['error']}")
+    
+    if report['failed']:
+        print(f"⚠️ {report['failed']} {description} fallaron en bulk")
+    
+    print(f"✅ Bulk completado: {report['succeeded']}/{report['total']} {description} "
+          f"en {report['batches']} lotes ({report['retried']} reintentados)")
+
+
+def index_document_bulk(
+    client: "OpenSearch",
+    index_name: str,
+    documents: List[Dict],
+    tenant_id: str
+) -> bool:
+
+    try:
+        if not documents:
+            print("No hay documentos para indexar")
+            return True
+        
+        print(f"Preparando bulk indexing de {len(documents)} documentos para tenant '{tenant_id}'")
+        
+        # Lotes acotados por bytes/cantidad; solo se reintentan los ítems rechazados
+        print(f"🚀 Ejecutando bulk indexing...")
+        report = bulk_write(client, build_index_operations(index_name, documents, tenant_id))
+        
+        log_bulk_report(report, "documentos indexados")
+        
+        return report['success']
+        
+    except Exception as e:
+        print(f"❌ Error en bulk indexing: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def source_file_query(tenant_id: str, source_file: str) -> Dict:
+
+    return {
+        "bool": {
+            "filter": [
+                {"term": {"tenant_id": tenant_id}},
+                {"term": {"source_file": source_file}}
+            ]
+        }
+    }
+
+
+def get_indexed_document_hashes(
+    client: "OpenSearch",
+    index_name: str,
+    tenant_id: str,
+    source_file: str
+) -> Dict[str, str]:
+    """
+    Obtiene los chunks ya indexados de un archivo fuente
+
+    Args:
+        client: Cliente OpenSearch
+        index_name: Índice del tenant
+        tenant_id: ID del tenant
+        source_file: Ruta del archivo fuente (object key de S3)
+
+    Returns:
+        Diccionario document_hash -> _id de OpenSearch
+    """
+    # Paginado: un archivo puede tener más chunks que una sola búsqueda
+    indexed_hashes = {}
+    for hit in iter_sorted_hits(client, index_name, source_file_query(tenant_id, source_file), INDEXED_HASHES_PAGE_SIZE, source=["document_hash"]):
+        document_hash = hit.get('_source', {}).get('document_hash')
+        if document_hash:
+            indexed_hashes[document_hash] = hit['_id']
+
+    return indexed_hashes
+
+
+def get_indexed_duplicate_hashes(
+    client: "OpenSearch",
+    index_name: str,
+    tenant_id: str,
+    source_file: str
+) -> Dict[str, str]:
+    """
+    Tombstones de chunks casi duplicados de un archivo fuente
+
+    Returns:
+        Diccionario document_hash -> document_hash del chunk conservado
+    """
+    query = source_file_query(tenant_id, source_file)
+    query["bool"]["filter"].append({"exists": {"field": "duplicate_of"}})
+
+    return {
+        hit['_source']['document_hash']: hit['_source']['duplicate_of']
+        for hit in iter_sorted_hits(client, index_name, query, INDEXED_HASHES_PAGE_SIZE, source=["document_hash", "duplicate_of"])
+    }
+
+
+def get_indexed_document_vectors(
+    client: "OpenSearch",
+    index_name: str,
+    tenant_id: str,
+    source_file: str
+) -> Dict[str, List]:
+    """
+    Embeddings ya indexados de un archivo fuente (tal como se guardaron,
+    cuantizados según el perfil del índice)
+
+    Returns:
+        Diccionario _id de OpenSearch -> embedding
+    """
+    return {
+        hit['_id']: hit['_source']['embedding']
+        for hit in iter_sorted_hits(client, index_name, source_file_query(tenant_id, source_file), INDEXED_VECTORS_PAGE_SIZE, source=["embedding"])
+        if hit.get('_source', {}).get('embedding') is not None
+    }
+
+
+def delete_documents_bulk(client: "OpenSearch", index_name: str, document_ids: List[str]) -> bool:
+
+    try:
+        if not document_ids:
+            return True
+
+        print(f"🧹 Eliminando {len(document_ids)} chunks obsoletos de '{index_name}'")
+        report = bulk_write(
+            client,
+            (({"delete": {"_index": index_name, "_id": document_id}}, None) for document_id in document_ids)
+        )
+
+        if not report['success']:
+            log_bulk_report(report, "chunks obsoletos eliminados")
+
+        return report['success']
+
+    except Exception as e:
+        print(f"❌ Error eliminando chunks obsoletos: {str(e)}")
+        return False
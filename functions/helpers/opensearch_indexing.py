@@ -1,17 +1,116 @@
-from helpers.rag_helpers import create_opensearch_client, create_index_if_not_exists, index_document_bulk
+from helpers.rag_helpers import chunk_document_hash
+from helpers.opensearch_helpers import log_bulk_report
+from helpers.bulk_writer import summarize_bulk_report
+from helpers.query_cache import bump_index_version
+from helpers.hybrid_search import get_search_mode
+from helpers.vector_store import get_vector_store, get_index_name
+from helpers.tenancy import maybe_promote_tenant
+from helpers.vectors import NearDuplicateFilter, get_chunk_dedup_threshold, is_valid_embedding, to_vector
+from helpers.metrics import count, span
 
-def opensearch_indexing(embeddings, chunks, tenant_id, document_type, object_key, filename):
 
+# Top 10 documentos más relevantes
+DEFAULT_SEARCH_SIZE = 10
+
+
+def get_embedding_dimensions(tenant_id):
+    # Dimensión de los embeddings según el perfil del índice del tenant (ingesta y consulta)
+    return get_vector_store().get_index_profile(tenant_id)["dimensions"]
+
+
+def get_existing_chunk_hashes(tenant_id, object_key):
+
+    try:
+        indexed_hashes = get_vector_store().get_document_hashes(tenant_id, object_key)
+        print(f"📋 {len(indexed_hashes)} chunks ya indexados para {object_key}")
+
+        return indexed_hashes
+
+    except Exception as e:
+        # Sin información previa se re-indexa todo el archivo
+        print(f"⚠️ No se pudieron leer chunks indexados de {object_key}: {str(e)}")
+        return {}
+
+
+def get_existing_duplicate_hashes(tenant_id, object_key):
+
+    try:
+        return get_vector_store().get_duplicate_hashes(tenant_id, object_key)
+
+    except Exception as e:
+        # Sin tombstones los casi duplicados se vuelven a embeber y deduplicar
+        print(f"⚠️ No se pudieron leer chunks deduplicados de {object_key}: {str(e)}")
+        return {}
+
+
+def is_unchanged_chunk(document_hash, indexed_hashes, duplicate_hashes, seen_hashes, dedup_enabled):
+    """
+    Chunk que no hay que embeber ni escribir: ya indexado o, si es el tombstone
+    de un casi duplicado, mientras se siga deduplicando y su chunk conservado
+    (anterior en el documento, está en seen_hashes) no haya cambiado
+    """
+    if document_hash not in indexed_hashes:
+        return False
+
+    kept_hash = duplicate_hashes.get(document_hash)
+    return kept_hash is None or (dedup_enabled and kept_hash in seen_hashes)
+
+
+def make_needs_embedding(tenant_id, object_key, indexed_hashes, duplicate_hashes):
+    # needs_embedding de iter_embedded_chunks: se llama en orden de chunk, como el indexado
+    dedup_enabled = get_chunk_dedup_threshold() is not None
+    seen_hashes = set()
+
+    def needs_embedding(i, chunk):
+        document_hash = chunk_document_hash(tenant_id, object_key, i, chunk)
+        unchanged = is_unchanged_chunk(document_hash, indexed_hashes, duplicate_hashes, seen_hashes, dedup_enabled)
+        seen_hashes.add(document_hash)
+        return not unchanged
+
+    return needs_embedding
+
+
+def opensearch_indexing(embeddings, chunks, tenant_id, document_type, object_key, filename, indexed_hashes=None):
+
+    embedded_chunks = (
+        (i, chunk, embedding) for i, (chunk, embedding) in enumerate(zip(chunks, embeddings))
+    )
+
+    return opensearch_indexing_stream(
+        embedded_chunks, tenant_id, document_type, object_key, filename,
+        indexed_hashes=indexed_hashes,
+        is_image=bool(chunks) and chunks[0] == "[IMAGE_CONTENT]"
+    )
+
+
+def opensearch_indexing_stream(
+    embedded_chunks,
+    tenant_id,
+    document_type,
+    object_key,
+    filename,
+    indexed_hashes=None,
+    is_image=False,
+    batch_size=None,
+    delete_stale=True,
+    duplicate_hashes=None
+):
+    """
+    Indexa (chunk_index, chunk, embedding) a medida que llegan, en lotes bulk
+    acotados por bytes y por batch_size documentos, sin materializar el
+    documento completo. Con delete_stale=False (workers de fan-out, que solo
+    ven un rango del documento) los obsoletos los borra el coordinador.
+
+    Los chunks casi duplicados (CHUNK_DEDUP_THRESHOLD) se escriben como
+    tombstones sin contenido ni embedding; duplicate_hashes son los ya
+    indexados (get_existing_duplicate_hashes).
+    """
     try:
-        opensearch_client = create_opensearch_client()
+        vector_store = get_vector_store()
         
-        index_name = f"rag-documents-{tenant_id}"
+        index_name = get_index_name(tenant_id)
         
-        index_created = create_index_if_not_exists(
-            opensearch_client, 
-            index_name,     
-            dimensions=1024
-        )
+        index_created = vector_store.ensure_index(tenant_id)
         
         if not index_created:
             print(f"No se pudo crear/verificar índice {index_name}")
@@ -20,54 +119,175 @@ def opensearch_indexing(embeddings, chunks, tenant_id, document_type, object_key
                 "message": f"Error creando índice {index_name}"
             }
         
+        if indexed_hashes is None:
+            indexed_hashes = get_existing_chunk_hashes(tenant_id, object_key)
+            duplicate_hashes = get_existing_duplicate_hashes(tenant_id, object_key) if indexed_hashes else {}
+        
+        duplicate_hashes = duplicate_hashes or {}
+        
         file_extension = '.' + filename.split('.')[-1].lower() if '.' in filename else ''
-        is_image = chunks and len(chunks) > 0 and chunks[0] == "[IMAGE_CONTENT]"
-        
-        documents = []
-        for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-            doc = {
-                'content': chunk,
-                'embedding': embedding,
-                'document_type': document_type,
-                'file_format': file_extension,
-                'source_file': object_key
-            }
-            
-            if is_image:
-                doc['content_type'] = 'image'
-                doc['description'] = f'Imagen {file_extension} del documento {filename}'
-            else:
-                doc['content_type'] = 'text'
+        
+        current_hashes = set()
+        counters = {"chunks": 0, "embeddings": 0, "invalid": 0, "deduplicated": 0, "sent": 0}
+        
+        # Casi duplicados dentro del documento (CHUNK_DEDUP_THRESHOLD); en fan-out con workers Lambda, dentro del rango del worker
+        dedup_threshold = get_chunk_dedup_threshold()
+        duplicate_filter = NearDuplicateFilter(dedup_threshold) if dedup_threshold else None
+        # También ve los chunks sin cambios (su vector indexado se lee al llegar el primer
+        # chunk a comparar): si no, el duplicado descartado se escribiría al re-subir el archivo
+        dedup_state = {"indexed_vectors": None, "unchanged_ids": []}
+        
+        def seed_unchanged_chunk(document_hash):
+            # Tombstones no tienen vector: quedan fuera del filtro
+            document_id = indexed_hashes[document_hash]
+            if dedup_state["indexed_vectors"] is None:
+                dedup_state["unchanged_ids"].append(document_hash)
+            elif document_id in dedup_state["indexed_vectors"]:
+                duplicate_filter.add(dedup_state["indexed_vectors"][document_id], key=document_hash)
+        
+        def load_indexed_vectors():
+            dedup_state["indexed_vectors"] = vector_store.get_document_vectors(tenant_id, object_key) if indexed_hashes else {}
+            for document_hash in dedup_state["unchanged_ids"]:
+                seed_unchanged_chunk(document_hash)
+        
+        def iter_changed_documents():
+            for i, chunk, embedding in embedded_chunks:
+                counters["chunks"] += 1
+                document_hash = chunk_document_hash(tenant_id, object_key, i, chunk)
+                unchanged = is_unchanged_chunk(document_hash, indexed_hashes, duplicate_hashes, current_hashes, bool(duplicate_filter))
+                current_hashes.add(document_hash)
+
+                if unchanged:
+                    if duplicate_filter:
+                        seed_unchanged_chunk(document_hash)
+                    continue
+
+                # Sin embedding porque ya estaba indexado
+                if embedding is None:
+                    continue
+
+                counters["embeddings"] += 1
+                embedding = to_vector(embedding)
                 
-            documents.append(doc)
-        
-        indexing_success = index_document_bulk(
-            opensearch_client,
-            index_name,
-            documents,
-            tenant_id
-        )
-        
-        if indexing_success:
-            content_description = "imagen" if is_image else "documento"
-            print(f"🎉 {content_description.title()} indexado exitosamente en OpenSearch")
-            return {
-                "success": True,
-                "message": f"{content_description.title()} procesado e indexado: {len(chunks)} elementos",
-                "details": {
-                    "tenant_id": tenant_id,
-                    "index_name": index_name,
-                    "chunks_count": len(chunks),
-                    "embeddings_count": len(embeddings),
-                    "document_type": document_type,
-                    "filename": filename
+                if not is_valid_embedding(embedding):
+                    counters["invalid"] += 1
+                    print(f"⚠️ Embedding inválido (NaN o norma 0) en chunk {i}, no se indexa")
+                    continue
+                
+                if duplicate_filter and dedup_state["indexed_vectors"] is None:
+                    load_indexed_vectors()
+                
+                kept_hash = duplicate_filter.match(embedding, key=document_hash) if duplicate_filter else None
+                
+                doc = {
+                    'content': chunk,
+                    'embedding': embedding,
+                    'document_type': document_type,
+                    'file_format': file_extension,
+                    'source_file': object_key,
+                    'chunk_index': i
                 }
+                
+                if is_image:
+                    doc['content_type'] = 'image'
+                    doc['description'] = f'Imagen {file_extension} del documento {filename}'
+                else:
+                    doc['content_type'] = 'text'
+                
+                if kept_hash is not None:
+                    # Tombstone: el hash queda indexado y al re-subir el archivo no se embebe
+                    counters["deduplicated"] += 1
+                    yield dict(doc, embedding=None, duplicate_of=kept_hash)
+                    continue
+                
+                counters["sent"] += 1
+                yield doc
+        
+        # index excluye el tiempo de las etapas que alimentan el generador
+        try:
+            with span("index"):
+                report = vector_store.write_documents(tenant_id, iter_changed_documents(), batch_size=batch_size)
+        except Exception:
+            # Si el stream falla a mitad de archivo los lotes ya enviados quedan indexados
+            if counters["sent"]:
+                bump_index_version(tenant_id)
+            raise
+        log_bulk_report(report, "documentos indexados")
+        # Los tombstones no cuentan como chunks escritos
+        written_count = max(0, report["succeeded"] - counters["deduplicated"])
+        count("documents_indexed", written_count)
+        count("bulk_retries", report["retried"])
+        count("chunks_deduplicated", counters["deduplicated"])
+        count("invalid_embeddings", counters["invalid"])
+        
+        if written_count:
+            # Las respuestas cacheadas del tenant dejan de ser válidas
+            bump_index_version(tenant_id)
+        
+        if not report["success"]:
+            return {
+                "success": False,
+                "message": "Error en indexado bulk de OpenSearch",
+                "bulk_report": summarize_bulk_report(report)
+            }
+        
+        chunks_count = counters["chunks"]
+        embeddings_count = counters["embeddings"]
+        skipped_count = counters["invalid"] + counters["deduplicated"]
+        
+        if chunks_count == 0:
+            # Nunca borrar lo indexado por un archivo del que no se extrajo nada
+            return {
+                "success": False,
+                "message": "No se pudo extraer texto"
             }
-        else:
+        
+        stale_ids = [
+            document_id for document_hash, document_id in indexed_hashes.items()
+            if document_hash not in current_hashes
+        ] if delete_stale else []
+        unchanged_count = chunks_count - written_count - skipped_count
+        
+        print(f"🔁 Incremental: {written_count} nuevos/modificados, {unchanged_count} sin cambios, {len(stale_ids)} obsoletos")
+        if skipped_count:
+            print(f"🧬 {counters['deduplicated']} chunks casi duplicados y {counters['invalid']} embeddings inválidos no se indexaron")
+        
+        # Los obsoletos se borran solo cuando todo el archivo quedó escrito
+        deleted = vector_store.delete_documents(tenant_id, stale_ids)
+        
+        if stale_ids:
+            bump_index_version(tenant_id)
+        
+        if not deleted:
             return {
                 "success": False,
-                "message": "Error en indexado bulk de OpenSearch"
+                "message": "Error eliminando chunks obsoletos en OpenSearch"
             }
+        
+        if delete_stale and written_count and vector_store.name == "opensearch":
+            # Tenants del pool que crecieron pasan a índice propio
+            maybe_promote_tenant(tenant_id)
+        
+        content_description = "imagen" if is_image else "documento"
+        print(f"🎉 {content_description.title()} indexado exitosamente en OpenSearch")
+        return {
+            "success": True,
+            "message": f"{content_description.title()} procesado e indexado: {chunks_count} elementos",
+            "details": {
+                "tenant_id": tenant_id,
+                "index_name": index_name,
+                "chunks_count": chunks_count,
+                "embeddings_count": embeddings_count,
+                "written_count": written_count,
+                "unchanged_count": unchanged_count,
+                "deduplicated_count": counters["deduplicated"],
+                "invalid_count": counters["invalid"],
+                "deleted_count": len(stale_ids),
+                "bulk_report": summarize_bulk_report(report),
+                "document_type": document_type,
+                "filename": filename
+            }
+        }
                 
     except Exception as opensearch_error:
         print(f"Error en OpenSearch: {str(opensearch_error)}")
@@ -77,15 +297,74 @@ def opensearch_indexing(embeddings, chunks, tenant_id, document_type, object_key
         }
 
 
-def opensearch_query(question_embedding, tenant_id, document_type=None):
+def build_search_filters(tenant_id, document_type=None):
+
+    filters = [{"term": {"tenant_id": tenant_id}}]
+    
+    if document_type:
+        filters.append({"term": {"document_type": document_type}})
+        print(f"📂 Filtrando por document_type: {document_type}")
+    
+    return filters
 
+
+def hits_to_documents(hits):
+
+    documents = []
+    
+    for hit in hits:
+        source = hit.get('_source', {})
+        score = hit.get('_score', 0)
+        
+        document = {
+            'content': source.get('content', ''),
+            'source_file': source.get('source_file', ''),
+            'document_type': source.get('document_type', ''),
+            'chunk_index': source.get('chunk_index', 0),
+            'created_at': source.get('created_at', ''),
+            'document_hash': source.get('document_hash', ''),
+            'score': score
+        }
+        
+        # Solo en búsquedas con with_embeddings (MMR); se quita antes de responder
+        if 'embedding' in source:
+            document['embedding'] = source['embedding']
+        
+        documents.append(document)
+    
+    return documents
+
+
+def opensearch_query(question_embedding, tenant_id, document_type=None, question=None, search_mode=None, size=DEFAULT_SEARCH_SIZE, k=None, ef_search=None, with_embeddings=False):
+    """
+    Búsqueda de chunks relevantes del tenant
+
+    Args:
+        question_embedding: Embedding de la pregunta (modos vector e hybrid)
+        tenant_id: ID del tenant
+        document_type: Filtro opcional
+        question: Texto de la pregunta (modos lexical e hybrid)
+        search_mode: vector (kNN), lexical (BM25) o hybrid (ambas fusionadas)
+        size: Documentos a devolver (más candidatos cuando hay rerank)
+        k: Vecinos que busca HNSW (default size)
+        ef_search: Override del ef_search del índice para este request
+        with_embeddings: Incluir el embedding de cada documento (MMR)
+    """
     try:
         
-        opensearch_client = create_opensearch_client()
+        search_mode = get_search_mode(search_mode)
+        
+        vector_store = get_vector_store()
         
-        index_name = f"rag-documents-{tenant_id}"
+        index_name = get_index_name(tenant_id)
         
-        if not opensearch_client.indices.exists(index=index_name):
+        filters = build_search_filters(tenant_id, document_type)
+        
+        print(f"🔎 Ejecutando búsqueda {search_mode} en índice: {index_name} ({vector_store.name})")
+        
+        search_result = vector_store.search(tenant_id, question_embedding, question, filters, search_mode, size, k=k, ef_search=ef_search, with_embeddings=with_embeddings)
+        
+        if search_result is None:
             return {
                 "success": True,
                 "documents": [],
@@ -93,69 +372,12 @@ def opensearch_query(question_embedding, tenant_id, document_type=None):
                 "message": f"No hay documentos indexados para el tenant {tenant_id}"
             }
         
-        search_query = {
-            "size": 10,  # Top 10 documentos más relevantes
-            "query": {
-                "bool": {
-                    "must": {
-                        "knn": {
-                            "embedding": {
-                                "vector": question_embedding,
-                                "k": 10
-                            }
-                        }
-                    },
-                    "filter": [
-                        {"term": {"tenant_id": tenant_id}}
-                    ]
-                }
-            },
-            "_source": [
-                "content", 
-                "source_file", 
-                "document_type", 
-                "chunk_index", 
-                "created_at",
-                "document_hash"
-            ]
-        }
-        
-        if document_type:
-            search_query["query"]["bool"]["filter"].append(
-                {"term": {"document_type": document_type}}
-            )
-            print(f"📂 Filtrando por document_type: {document_type}")
-        
-        print(f"🔎 Ejecutando búsqueda en índice: {index_name}")
-        
-        response = opensearch_client.search(
-            index=index_name,
-            body=search_query
-        )
-        
-        hits = response.get('hits', {})
-        total_found = hits.get('total', {}).get('value', 0)
-        documents = []
-        
-        for hit in hits.get('hits', []):
-            source = hit.get('_source', {})
-            score = hit.get('_score', 0)
-            
-            documents.append({
-                'content': source.get('content', ''),
-                'source_file': source.get('source_file', ''),
-                'document_type': source.get('document_type', ''),
-                'chunk_index': source.get('chunk_index', 0),
-                'created_at': source.get('created_at', ''),
-                'document_hash': source.get('document_hash', ''),
-                'score': score
-            })
-        
         return {
             "success": True,
-            "documents": documents,
-            "total_found": total_found,
-            "index_searched": index_name
+            "documents": hits_to_documents(search_result["hits"]),
+            "total_found": search_result["total"],
+            "index_searched": index_name,
+            "search_mode": search_mode
         }
         
     except Exception as e:
@@ -166,4 +388,78 @@ def opensearch_query(question_embedding, tenant_id, document_type=None):
             "success": False,
             "message": f"Error en búsqueda OpenSearch: {str(e)}",
             "documents": []
-        }
\ No newline at end of file
+        }
+
+
+def opensearch_query_batch(question_embeddings, tenant_id, document_type=None, questions=None, search_mode=None, size=DEFAULT_SEARCH_SIZE, k=None, ef_search=None, with_embeddings=False):
+    """
+    Versión por lotes de opensearch_query: todas las búsquedas del tenant en
+    un solo _msearch
+
+    Args:
+        question_embeddings: Un embedding por pregunta (modos vector e hybrid)
+        questions: Textos de las preguntas, alineados con question_embeddings
+
+    Returns:
+        Lista alineada con las preguntas, cada una con el formato de opensearch_query
+    """
+    questions = questions or [None] * len(question_embeddings)
+    
+    try:
+        
+        search_mode = get_search_mode(search_mode)
+        
+        vector_store = get_vector_store()
+        
+        index_name = get_index_name(tenant_id)
+        
+        filters = build_search_filters(tenant_id, document_type)
+        
+        print(f"🔎 Ejecutando {len(questions)} búsquedas {search_mode} en índice: {index_name} ({vector_store.name})")
+        
+        search_results = vector_store.search_many(tenant_id, [
+            {
+                "question_embedding": question_embedding,
+                "question": question,
+                "filters": filters,
+                "search_mode": search_mode,
+                "size": size,
+                "k": k,
+                "ef_search": ef_search,
+                "with_embeddings": with_embeddings
+            }
+            for question_embedding, question in zip(question_embeddings, questions)
+        ])
+        
+        if search_results is None:
+            return [{
+                "success": True,
+                "documents": [],
+                "total_found": 0,
+                "message": f"No hay documentos indexados para el tenant {tenant_id}"
+            } for _ in questions]
+        
+        return [
+            {
+                "success": False,
+                "message": f"Error en búsqueda OpenSearch: {search_result['error']}",
+                "documents": []
+            } if 'error' in search_result else {
+                "success": True,
+                "documents": hits_to_documents(search_result["hits"]),
+                "total_found": search_result["total"],
+                "index_searched": index_name,
+                "search_mode": search_mode
+            }
+            for search_result in search_results
+        ]
+        
+    except Exception as e:
+        print(f"❌ Error en opensearch_query_batch: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return [{
+            "success": False,
+            "message": f"Error en búsqueda OpenSearch: {str(e)}",
+            "documents": []
+        } for _ in questions]
@@ -0,0 +1,85 @@
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from helpers.pdf_text import iter_pdf_pages, clean_extracted_text
+from helpers.rag_helpers import get_multimodal_embeddings
+from helpers.chunking import iter_chunks
+from helpers.embedding_engine import embed_stream
+from helpers.clients import get_bedrock_runtime_client
+from helpers.metrics import timed_iter
+
+
+def iter_clean_pages(pages: Iterable[str]) -> Iterator[str]:
+
+    for page_text in pages:
+        page_text = clean_extracted_text(page_text)
+        if page_text:
+            yield page_text
+
+
+def iter_text_chunks(texts: Iterable[str], chunk_size: int, chunk_overlap: int) -> Iterator[Tuple[int, str]]:
+    """
+    Chunking incremental: emite cada chunk apenas se completa, sin acumular
+    el documento. Cada texto de entrada (página) empieza un párrafo nuevo,
+    igual que get_chunks sobre las páginas unidas por "\n\n".
+
+    Args:
+        texts: Fragmentos de texto en orden (p. ej. páginas limpias)
+        chunk_size: Tamaño de chunk en tokens
+        chunk_overlap: Overlap en tokens
+
+    Yields:
+        Tuplas (chunk_index, chunk)
+    """
+    return enumerate(iter_chunks(texts, chunk_size, chunk_overlap))
+
+
+def iter_pdf_chunks(file_content: bytes, chunk_size: int = 2000, chunk_overlap: int = 200) -> Iterator[Tuple[int, str]]:
+    # Spans exclusivos: el tiempo de extract no se cuenta dentro de chunk
+    pages = timed_iter(iter_clean_pages(iter_pdf_pages(file_content)), "extract", "pages")
+    return timed_iter(iter_text_chunks(pages, chunk_size, chunk_overlap), "chunk", "chunks")
+
+
+def iter_embedded_chunks(
+    chunks: Iterable[Tuple[int, str]],
+    needs_embedding: Optional[Callable[[int, str], bool]] = None,
+    dimensions: int = 1024,
+    max_workers: Optional[int] = None
+) -> Iterator[Tuple[int, str, Optional[List[float]]]]:
+    """
+    Stage de embeddings: mientras Bedrock responde, el generador de entrada
+    sigue parseando páginas. Los chunks descartados por needs_embedding
+    se emiten con embedding None.
+
+    Yields:
+        Tuplas (chunk_index, chunk, embedding)
+    """
+    bedrock_runtime = get_bedrock_runtime_client()
+
+    def embed(indexed_chunk):
+        return get_multimodal_embeddings(
+            base64_image=None,
+            input_text=indexed_chunk[1],
+            dimensions=dimensions,
+            bedrock_runtime=bedrock_runtime
+        )[0]
+
+    should_embed = None
+    if needs_embedding is not None:
+        should_embed = lambda indexed_chunk: needs_embedding(*indexed_chunk)
+
+    # embed = espera del pipeline por Bedrock (sin el tiempo de las etapas anteriores)
+    for (chunk_index, chunk), embedding in timed_iter(embed_stream(chunks, embed, should_embed, max_workers=max_workers), "embed"):
+        yield chunk_index, chunk, embedding
+
+
+def iter_pdf_pipeline(
+    file_content: bytes,
+    needs_embedding: Optional[Callable[[int, str], bool]] = None,
+    chunk_size: int = 2000,
+    chunk_overlap: int = 200,
+    dimensions: int = 1024
+) -> Iterator[Tuple[int, str, Optional[List[float]]]]:
+    """
+    Pipeline completo páginas -> texto limpio -> chunks -> embeddings
+    """
+    return iter_embedded_chunks(iter_pdf_chunks(file_content, chunk_size, chunk_overlap), needs_embedding, dimensions)
@@ -0,0 +1,298 @@
+import importlib.util
+import io
+import multiprocessing
+import os
+import re
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+
+# Por debajo de este número de páginas se extrae en el mismo proceso
+DEFAULT_PARALLEL_MIN_PAGES = 16
+WORKER_FAILED = "worker_failed"
+
+# PDFium no es thread-safe ni con documentos distintos: toda llamada en el
+# proceso (abrir, contar páginas, extraer, cerrar) y cada fork pasan por aquí
+_pdfium_lock = threading.RLock()
+
+
+def _reset_pdfium_lock():
+    # El hijo de un fork hereda el lock tomado por el hilo que hizo fork
+    global _pdfium_lock
+    _pdfium_lock = threading.RLock()
+
+
+os.register_at_fork(after_in_child=_reset_pdfium_lock)
+
+
+class PyPDF2Document:
+    """
+    Backend de respaldo en Python puro (siempre disponible en el layer)
+    """
+
+    name = "pypdf2"
+
+    def __init__(self, file_content: bytes):
+        # Import diferido: solo la ingesta de PDFs paga la carga de PyPDF2
+        import PyPDF2
+
+        self.reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+        self.page_count = len(self.reader.pages)
+
+    def extract_page(self, page_index: int) -> str:
+        return self.reader.pages[page_index].extract_text() or ""
+
+    def close(self):
+        pass
+
+
+class PdfiumDocument:
+    """
+    Backend nativo (PDFium vía pypdfium2), varias veces más rápido que PyPDF2.
+    PDFium no es thread-safe: cada llamada toma _pdfium_lock (hilos de la
+    cola de ingesta, fan-out thread) y el paralelismo real es por procesos.
+    """
+
+    name = "pdfium"
+
+    def __init__(self, file_content: bytes):
+        import pypdfium2
+
+        with _pdfium_lock:
+            self.document = pypdfium2.PdfDocument(file_content)
+            self.page_count = len(self.document)
+
+    def extract_page(self, page_index: int) -> str:
+        with _pdfium_lock:
+            page = self.document[page_index]
+            try:
+                text_page = page.get_textpage()
+                try:
+                    return text_page.get_text_range() or ""
+                finally:
+                    text_page.close()
+            finally:
+                page.close()
+
+    def close(self):
+        with _pdfium_lock:
+            self.document.close()
+
+
+PDF_BACKENDS = {
+    "pdfium": PdfiumDocument,
+    "pypdf2": PyPDF2Document
+}
+# Orden de preferencia para PDF_EXTRACTOR=auto
+BACKEND_MODULES = [("pdfium", "pypdfium2")]
+
+
+def get_pdf_backend(backend: Optional[str] = None) -> str:
+    """
+    Backend de extracción: PDF_EXTRACTOR = auto | pdfium | pypdf2.
+    auto usa el más rápido instalado y cae a PyPDF2.
+    """
+    backend = (backend or os.environ.get("PDF_EXTRACTOR", "auto")).lower()
+
+    if backend == "auto":
+        for name, module in BACKEND_MODULES:
+            if importlib.util.find_spec(module) is not None:
+                return name
+        return "pypdf2"
+
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"PDF_EXTRACTOR inválido: {backend}. Opciones: auto, {', '.join(PDF_BACKENDS)}")
+
+    return backend
+
+
+def open_pdf(file_content: bytes, backend: Optional[str] = None):
+
+    backend = get_pdf_backend(backend)
+
+    try:
+        return PDF_BACKENDS[backend](file_content)
+
+    except Exception as e:
+        if backend != "pypdf2":
+            # PDFs que el backend nativo rechaza pueden abrir con PyPDF2
+            print(f"⚠️ {backend} no pudo abrir el PDF ({str(e)}), usando pypdf2")
+            return open_pdf(file_content, "pypdf2")
+
+        print(f"❌ Error extrayendo texto del PDF: {str(e)}")
+        raise ValueError(f"No se pudo extraer texto del PDF: {str(e)}")
+
+
+def get_pdf_page_count(file_content: bytes) -> int:
+    # Solo lee el árbol de páginas, no extrae texto
+    document = open_pdf(file_content)
+    try:
+        return document.page_count
+    finally:
+        document.close()
+
+
+def get_extract_workers(page_count: int) -> int:
+    """
+    Procesos de extracción: PDF_EXTRACT_WORKERS o las vCPUs disponibles
+    (en Lambda escalan con la memoria: 2048 MB -> 2 vCPUs). Los PDFs cortos
+    no compensan el costo de arrancar procesos.
+    """
+    if page_count < int(os.environ.get("PDF_PARALLEL_MIN_PAGES", DEFAULT_PARALLEL_MIN_PAGES)):
+        return 1
+
+    workers = os.environ.get("PDF_EXTRACT_WORKERS")
+    if workers:
+        workers = int(workers)
+    else:
+        workers = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+
+    return max(1, min(workers, page_count))
+
+
+def extract_page_text(document, page_index: int) -> Tuple[Optional[str], Optional[str]]:
+    # (texto, error): una página ilegible no aborta el documento
+    try:
+        return document.extract_page(page_index), None
+    except Exception as e:
+        return None, str(e)
+
+
+def extract_pages_worker(connection, file_content: bytes, backend: str, page_indexes: List[int]):
+    """
+    Proceso hijo: envía por el pipe un mensaje (texto, error) por página, en
+    orden. Sin prints: el padre reporta los errores.
+    """
+    try:
+        document = open_pdf(file_content, backend)
+        try:
+            for page_index in page_indexes:
+                connection.send(extract_page_text(document, page_index))
+        finally:
+            document.close()
+    except Exception as e:
+        connection.send((None, f"{WORKER_FAILED}: {str(e)}"))
+    finally:
+        connection.close()
+
+
+def iter_pages_parallel(file_content: bytes, backend: str, page_indexes: List[int], workers: int) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+    """
+    Reparte las páginas entre procesos en round-robin (página i -> proceso
+    i % workers) y las devuelve en orden. Cada proceso se adelanta como mucho
+    lo que cabe en su pipe, así la extracción sigue siendo en streaming.
+
+    Usa Process + Pipe en vez de multiprocessing.Pool: Lambda no tiene
+    /dev/shm y Pool/Queue fallan al crear semáforos.
+    """
+    context = multiprocessing.get_context("fork")
+    processes = []
+    connections = []
+
+    try:
+        for worker in range(workers):
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=extract_pages_worker,
+                args=(sender, file_content, backend, page_indexes[worker::workers]),
+                daemon=True
+            )
+            # Sin fork mientras otro hilo está dentro de PDFium (el hijo heredaría su estado a medias)
+            with _pdfium_lock:
+                process.start()
+            sender.close()
+            processes.append(process)
+            connections.append(receiver)
+
+        for position, page_index in enumerate(page_indexes):
+            try:
+                text, error = connections[position % workers].recv()
+            except EOFError:
+                raise ValueError(f"No se pudo extraer texto del PDF: el proceso de la página {page_index + 1} terminó inesperadamente")
+
+            if error and error.startswith(WORKER_FAILED):
+                raise ValueError(f"No se pudo extraer texto del PDF: {error}")
+
+            yield page_index, text, error
+
+    finally:
+        for connection in connections:
+            connection.close()
+        for process in processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
+
+
+def iter_pdf_pages(
+    file_content: bytes,
+    first_page: int = 0,
+    last_page: Optional[int] = None,
+    backend: Optional[str] = None,
+    workers: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Extrae el texto del PDF página por página, sin acumular el documento
+
+    Args:
+        file_content: Bytes del PDF
+        first_page: Primera página (base 0) del rango a extraer
+        last_page: Página final (exclusiva); None hasta el final
+        backend: pdfium | pypdf2 (None = PDF_EXTRACTOR / auto)
+        workers: Procesos de extracción (None = según vCPUs y tamaño)
+
+    Yields:
+        Texto crudo de cada página (las páginas con error se omiten)
+    """
+    document = open_pdf(file_content, backend)
+
+    last_page = document.page_count if last_page is None else min(last_page, document.page_count)
+    page_indexes = list(range(first_page, last_page))
+    workers = get_extract_workers(len(page_indexes)) if workers is None else max(1, min(workers, len(page_indexes) or 1))
+
+    if workers > 1:
+        backend = document.name
+        document.close()
+        document = None
+        pages = iter_pages_parallel(file_content, backend, page_indexes, workers)
+    else:
+        pages = ((page_index, *extract_page_text(document, page_index)) for page_index in page_indexes)
+
+    try:
+        for page_index, text, error in pages:
+            if error:
+                print(f"Error en página {page_index + 1}: {error}")
+                continue
+            yield text
+    finally:
+        pages.close()
+        if document is not None:
+            document.close()
+
+
+def extract_pdf_text(file_content: bytes) -> str:
+    
+    try:
+        # join sobre la lista de páginas en vez de concatenar con +=
+        text_content = "\n\n".join(iter_pdf_pages(file_content))
+        
+        text_content = clean_extracted_text(text_content)
+        
+        return text_content
+        
+    except Exception as e:
+        print(f"❌ Error extrayendo texto del PDF: {str(e)}")
+        raise ValueError(f"No se pudo extraer texto del PDF: {str(e)}")
+
+
+def clean_extracted_text(text: str) -> str:
+    
+    text = text.replace('\x00', '')
+    
+    # Normaliza espacios dentro de cada línea pero conserva los saltos de línea:
+    # el chunker corta por párrafos y oraciones
+    text = '\n'.join(' '.join(line.split()) for line in text.splitlines())
+    
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    
+    return text.strip()
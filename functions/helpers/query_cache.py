@@ -0,0 +1,315 @@
+import copy
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from helpers.clients import get_aws_client
+from helpers.vectors import to_vector, vector_norm
+
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_VERSION_TTL_SECONDS = 5
+
+
+def normalize_question(question: str) -> str:
+    # "¿Cuál es el horario?" y "cual es el horario" no deben ser entradas distintas
+    text = unicodedata.normalize("NFKD", question or "")
+    text = "".join(character for character in text if not unicodedata.combining(character))
+    text = " ".join(text.lower().split())
+    return text.strip(" ?¿!¡.")
+
+
+def cosine_similarity(a: np.ndarray, a_norm: float, b: np.ndarray, b_norm: float) -> float:
+    # Un embedding de otra dimensión (cambio de perfil del índice) nunca es un hit
+    if not a_norm or not b_norm or a.shape != b.shape:
+        return 0.0
+    return float(np.dot(a, b)) / (a_norm * b_norm)
+
+
+class InMemoryIndexVersionStore:
+    """
+    Versión del índice de cada tenant. Cambia cada vez que se indexa o borra
+    algo, lo que invalida las respuestas cacheadas del tenant.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get_version(self, tenant_id: str) -> int:
+        return self._versions.get(tenant_id, 0)
+
+    def bump_version(self, tenant_id: str) -> int:
+        with self._lock:
+            self._versions[tenant_id] = self._versions.get(tenant_id, 0) + 1
+            return self._versions[tenant_id]
+
+
+class DynamoDBIndexVersionStore:
+    """
+    Versión compartida entre la Lambda de procesamiento (que la incrementa) y
+    la de consultas (que la lee). Se cachea localmente version_ttl segundos
+    para no pagar un GetItem por consulta.
+    """
+
+    def __init__(self, table_name: str, version_ttl: float = DEFAULT_VERSION_TTL_SECONDS, client=None):
+        self.table_name = table_name
+        self.version_ttl = version_ttl
+        self.client = client or get_aws_client("dynamodb")
+        self._cached: Dict[str, Tuple[int, float]] = {}
+
+    @staticmethod
+    def _key(tenant_id: str) -> Dict:
+        return {"cache_key": {"S": f"index_version#{tenant_id}"}}
+
+    def get_version(self, tenant_id: str) -> int:
+        cached = self._cached.get(tenant_id)
+        if cached and time.monotonic() - cached[1] < self.version_ttl:
+            return cached[0]
+
+        response = self.client.get_item(TableName=self.table_name, Key=self._key(tenant_id), ConsistentRead=True)
+        version = int(response.get("Item", {}).get("version", {}).get("N", 0))
+        self._cached[tenant_id] = (version, time.monotonic())
+        return version
+
+    def bump_version(self, tenant_id: str) -> int:
+        response = self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(tenant_id),
+            UpdateExpression="ADD version :one",
+            ExpressionAttributeValues={":one": {"N": "1"}},
+            ReturnValues="UPDATED_NEW"
+        )
+        version = int(response["Attributes"]["version"]["N"])
+        self._cached[tenant_id] = (version, time.monotonic())
+        return version
+
+
+class QueryCache:
+    """
+    Cache de respuestas RAG en dos niveles:
+    - exacto por (tenant, scope, pregunta normalizada), sin embedding
+    - semántico opcional: reutiliza la respuesta de una pregunta cuyo
+      embedding está a similitud coseno >= semantic_threshold
+
+    Las entradas expiran por TTL, se desalojan por LRU y se invalidan cuando
+    cambia la versión del índice del tenant. scope agrupa los parámetros del
+    request que cambian la respuesta (document_type, modo de búsqueda).
+    """
+
+    def __init__(
+        self,
+        version_store,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        semantic_threshold: Optional[float] = None
+    ):
+        self.version_store = version_store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.latency_saved_ms = 0.0
+
+    def get_index_version(self, tenant_id: str) -> Optional[int]:
+        # Falla abierto como bump_index_version: sin versión la consulta no usa el cache
+        try:
+            return self.version_store.get_version(tenant_id)
+        except Exception as e:
+            print(f"⚠️ No se pudo leer la versión de índice de {tenant_id}: {str(e)}")
+            return None
+
+    def _is_fresh(self, entry: Dict, index_version: int) -> bool:
+        if time.monotonic() - entry["stored_at"] > self.ttl_seconds:
+            return False
+        return entry["index_version"] == index_version
+
+    def _hit(self, key, entry: Dict, level: str) -> Dict:
+        self._entries.move_to_end(key)
+        if level == "exact":
+            self.exact_hits += 1
+        else:
+            self.semantic_hits += 1
+        # En un hit semántico el embedding de la pregunta ya se pagó
+        saved_ms = entry["latency_ms"] if level == "exact" else entry["latency_ms"] - entry["embedding_ms"]
+        self.latency_saved_ms += max(0.0, saved_ms)
+        return {"result": copy.deepcopy(entry["result"]), "level": level, "question": entry["question"]}
+
+    def get_exact(self, tenant_id: str, scope, question: str, index_version: Optional[int] = None) -> Optional[Dict]:
+
+        key = (tenant_id, scope, normalize_question(question))
+        # La versión se lee fuera del lock: con DynamoDB es una llamada de red
+        if index_version is None:
+            index_version = self.get_index_version(tenant_id)
+        if index_version is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_fresh(entry, index_version):
+                    return self._hit(key, entry, "exact")
+                del self._entries[key]
+
+        return None
+
+    def get_semantic(self, tenant_id: str, scope, embedding, index_version: Optional[int] = None) -> Optional[Dict]:
+
+        if index_version is None and self.semantic_threshold:
+            index_version = self.get_index_version(tenant_id)
+
+        if not self.semantic_threshold or index_version is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        embedding = to_vector(embedding)
+        norm = vector_norm(embedding)
+
+        with self._lock:
+            best_key, best_similarity = None, self.semantic_threshold
+            for key, entry in list(self._entries.items()):
+                if key[0] != tenant_id or key[1] != scope:
+                    continue
+                if not self._is_fresh(entry, index_version):
+                    del self._entries[key]
+                    continue
+                similarity = cosine_similarity(embedding, norm, entry["embedding"], entry["embedding_norm"])
+                if similarity >= best_similarity:
+                    best_key, best_similarity = key, similarity
+
+            if best_key is not None:
+                return self._hit(best_key, self._entries[best_key], "semantic")
+
+            self.misses += 1
+
+        return None
+
+    def put(
+        self,
+        tenant_id: str,
+        scope,
+        question: str,
+        embedding,
+        result: Dict,
+        latency_ms: float,
+        embedding_ms: float = 0.0,
+        index_version: Optional[int] = None
+    ):
+        """
+        index_version: versión leída antes de buscar (la respuesta se armó
+        con ese índice); None la lee ahora
+        """
+        if index_version is None:
+            index_version = self.get_index_version(tenant_id)
+        if index_version is None:
+            return
+
+        key = (tenant_id, scope, normalize_question(question))
+        entry = {
+            "question": question,
+            "result": copy.deepcopy(result),
+            "embedding": to_vector(embedding) if embedding is not None else None,
+            "embedding_norm": vector_norm(embedding) if embedding is not None else 0.0,
+            "latency_ms": latency_ms,
+            "embedding_ms": embedding_ms,
+            "stored_at": time.monotonic(),
+            "index_version": index_version
+        }
+
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self.exact_hits + self.semantic_hits
+            total = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": round(hits / total, 3) if total else 0.0,
+                "latency_saved_ms": round(self.latency_saved_ms, 1)
+            }
+
+
+_query_cache = None
+_version_store = None
+_lock = threading.Lock()
+
+
+def get_index_version_store():
+    """
+    INDEX_VERSION_TABLE configurada -> DynamoDB (compartido entre Lambdas);
+    si no, versión en memoria (tests y ejecución local)
+    """
+    global _version_store
+
+    if _version_store is None:
+        with _lock:
+            if _version_store is None:
+                table_name = os.environ.get("INDEX_VERSION_TABLE")
+                if table_name:
+                    _version_store = DynamoDBIndexVersionStore(
+                        table_name,
+                        float(os.environ.get("QUERY_CACHE_VERSION_TTL", DEFAULT_VERSION_TTL_SECONDS))
+                    )
+                else:
+                    _version_store = InMemoryIndexVersionStore()
+
+    return _version_store
+
+
+def bump_index_version(tenant_id: str):
+    # Nunca debe romper la ingesta: en el peor caso las respuestas viven hasta su TTL
+    try:
+        version = get_index_version_store().bump_version(tenant_id)
+        print(f"🔄 Versión de índice de {tenant_id}: {version}")
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar la versión de índice de {tenant_id}: {str(e)}")
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    """
+    QUERY_CACHE_ENABLED (default true), QUERY_CACHE_MAX_ENTRIES, QUERY_CACHE_TTL
+    y QUERY_CACHE_SEMANTIC_THRESHOLD (vacío = sin nivel semántico)
+    """
+    global _query_cache
+
+    if os.environ.get("QUERY_CACHE_ENABLED", "true").lower() != "true":
+        return None
+
+    if _query_cache is None:
+        threshold = os.environ.get("QUERY_CACHE_SEMANTIC_THRESHOLD")
+        cache = QueryCache(
+            get_index_version_store(),
+            max_entries=int(os.environ.get("QUERY_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+            ttl_seconds=float(os.environ.get("QUERY_CACHE_TTL", DEFAULT_TTL_SECONDS)),
+            semantic_threshold=float(threshold) if threshold else None
+        )
+        with _lock:
+            if _query_cache is None:
+                _query_cache = cache
+
+    return _query_cache
+
+
+def reset_query_cache():
+    global _query_cache, _version_store
+    with _lock:
+        _query_cache = None
+        _version_store = None
@@ -0,0 +1,175 @@
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional, Tuple
+
+from helpers.clients import get_bedrock_runtime_client
+from helpers.vector_store import tokenize
+
+
+RERANK_MODES = ("none", "local", "bedrock")
+DEFAULT_RERANK_MODE = "none"
+# Candidatos que se piden a la búsqueda cuando hay rerank
+DEFAULT_RERANK_CANDIDATES = 50
+# Chunks que pasan al prompt
+DEFAULT_RERANK_TOP_N = 5
+# Presupuesto de latencia del rerank; si se pasa se usa el orden vectorial
+DEFAULT_RERANK_TIMEOUT_MS = 800
+
+DEFAULT_RERANK_MODEL_ID = "cohere.rerank-v3-5:0"
+# Los modelos de rerank de Bedrock no están en todas las regiones
+DEFAULT_RERANK_REGION = "us-west-2"
+
+# Peso del orden original en el scorer local (el resto es cobertura de términos)
+LOCAL_VECTOR_WEIGHT = 0.3
+
+
+def get_rerank_settings(rerank_mode: Optional[str] = None) -> Dict:
+    """
+    Configuración del rerank: RERANK_MODE = none | local | bedrock
+    """
+    mode = (rerank_mode or os.environ.get("RERANK_MODE", DEFAULT_RERANK_MODE)).lower()
+
+    if mode not in RERANK_MODES:
+        raise ValueError(f"RERANK_MODE inválido: {mode}. Valores permitidos: {', '.join(RERANK_MODES)}")
+
+    return {
+        "mode": mode,
+        "candidates": max(1, int(os.environ.get("RERANK_CANDIDATES", DEFAULT_RERANK_CANDIDATES))),
+        "top_n": max(1, int(os.environ.get("RERANK_TOP_N", DEFAULT_RERANK_TOP_N))),
+        "timeout_ms": float(os.environ.get("RERANK_TIMEOUT_MS", DEFAULT_RERANK_TIMEOUT_MS)),
+        "model_id": os.environ.get("RERANK_MODEL_ID", DEFAULT_RERANK_MODEL_ID),
+        "region": os.environ.get("RERANK_REGION", DEFAULT_RERANK_REGION)
+    }
+
+
+def local_rerank_scores(question: str, documents: List[Dict]) -> List[float]:
+    """
+    Scorer determinista para tests y entornos sin modelo de rerank: cobertura
+    de los términos de la pregunta ponderada por IDF dentro de los candidatos,
+    combinada con la posición en el orden vectorial
+    """
+    terms = set(tokenize(question))
+    documents_terms = [set(tokenize(document.get("content"))) for document in documents]
+    total = len(documents)
+
+    idf = {}
+    for term in terms:
+        frequency = sum(1 for document_terms in documents_terms if term in document_terms)
+        idf[term] = math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+
+    max_idf = sum(idf.values()) or 1.0
+
+    scores = []
+    for position, document_terms in enumerate(documents_terms):
+        coverage = sum(weight for term, weight in idf.items() if term in document_terms) / max_idf
+        rank_score = 1.0 - position / total
+        scores.append((1 - LOCAL_VECTOR_WEIGHT) * coverage + LOCAL_VECTOR_WEIGHT * rank_score)
+
+    return scores
+
+
+def bedrock_rerank_scores(question: str, documents: List[Dict], settings: Dict) -> List[float]:
+    """
+    Scores de un modelo de rerank de Bedrock (Cohere Rerank o Amazon Rerank)
+    vía invoke_model
+    """
+    bedrock_runtime = get_bedrock_runtime_client('rerank', settings["region"])
+
+    payload = {
+        "query": question,
+        "documents": [document.get("content", "") for document in documents],
+        "top_n": len(documents)
+    }
+    if settings["model_id"].startswith("cohere."):
+        payload["api_version"] = 2
+
+    response = bedrock_runtime.invoke_model(
+        modelId=settings["model_id"],
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(payload)
+    )
+    response_body = json.loads(response['body'].read())
+
+    scores = [0.0] * len(documents)
+    for result in response_body.get("results", []):
+        scores[result["index"]] = float(result["relevance_score"])
+
+    return scores
+
+
+RERANK_SCORERS = {
+    "local": lambda question, documents, settings: local_rerank_scores(question, documents),
+    "bedrock": bedrock_rerank_scores
+}
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_rerank_executor() -> ThreadPoolExecutor:
+    # Hilos compartidos entre requests: un rerank vencido sigue en su hilo sin bloquear la respuesta
+    global _executor
+
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="rerank")
+
+    return _executor
+
+
+def rerank_documents(question: str, documents: List[Dict], settings: Dict) -> Tuple[List[Dict], Dict]:
+    """
+    Reordena los candidatos de la búsqueda y devuelve los top_n. Si el scorer
+    falla o no responde dentro de timeout_ms, devuelve los top_n en el orden
+    de la búsqueda.
+
+    Args:
+        question: Pregunta del usuario
+        documents: Candidatos en el orden de opensearch_query
+        settings: Resultado de get_rerank_settings()
+
+    Returns:
+        (documentos, info) con info = {"mode", "candidates", "fallback", "latency_ms"}
+    """
+    info = {"mode": settings["mode"], "candidates": len(documents), "fallback": None, "latency_ms": 0.0}
+
+    if settings["mode"] == "none":
+        return documents, info
+
+    if len(documents) <= 1:
+        return documents[:settings["top_n"]], info
+
+    start_time = time.perf_counter()
+    scorer = RERANK_SCORERS[settings["mode"]]
+    future = get_rerank_executor().submit(scorer, question, documents, settings)
+
+    try:
+        scores = future.result(timeout=settings["timeout_ms"] / 1000)
+    except FutureTimeoutError:
+        info["fallback"] = "timeout"
+    except Exception as e:
+        print(f"⚠️ Error en rerank {settings['mode']}: {str(e)}")
+        info["fallback"] = "error"
+
+    info["latency_ms"] = round((time.perf_counter() - start_time) * 1000, 1)
+
+    if info["fallback"]:
+        print(f"⏱️ Rerank sin resultado ({info['fallback']}, {info['latency_ms']} ms), se usa el orden vectorial")
+        return documents[:settings["top_n"]], info
+
+    # Orden estable: ante empate gana la posición original
+    order = sorted(range(len(documents)), key=lambda position: -scores[position])
+
+    reranked = [
+        dict(documents[position], rerank_score=scores[position])
+        for position in order[:settings["top_n"]]
+    ]
+
+    print(f"🏅 Rerank {settings['mode']}: {len(documents)} candidatos -> {len(reranked)} en {info['latency_ms']} ms")
+    return reranked, info
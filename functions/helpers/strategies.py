@@ -1,34 +1,46 @@
-from helpers.rag_helpers import extract_pdf_text, get_chunks, get_embeddings, get_multimodal_embeddings, analyze_image_with_claude
-from helpers.opensearch_indexing import opensearch_query
+from helpers.rag_helpers import get_multimodal_embeddings, analyze_image_with_claude
+from helpers.pdf_pipeline import iter_pdf_pipeline
+from helpers.opensearch_indexing import opensearch_query, opensearch_query_batch, get_embedding_dimensions, DEFAULT_SEARCH_SIZE
 from payloads.payloads import get_payload_for_rag_response
 from prompting.prompts import get_rag_response_prompt
-import boto3
+from helpers.clients import get_bedrock_runtime_client
+from helpers.query_cache import get_query_cache
+from helpers.hybrid_search import get_search_mode
+from helpers.reranking import get_rerank_settings, rerank_documents
+from helpers.context_packer import get_context_settings, pack_context
+from helpers.vectors import get_mmr_settings, mmr
+from helpers.metrics import count, span, timed_iter, bind_metrics
+from helpers.embedding_engine import embed_concurrently, call_with_backoff
+from concurrent.futures import ThreadPoolExecutor
 import json
-from botocore.config import Config
 import base64
+import os
+import time
 
-def pdf_strategy(text):
+RAG_RESPONSE_MODEL_ID = "amazon.nova-pro-v1:0"
+# Llamadas simultáneas a Nova Pro en /query/batch
+DEFAULT_BATCH_GENERATION_CONCURRENCY = 5
+NO_RESULTS_ANSWER = "No encontré información relevante en tus documentos para responder esa pregunta."
+
+def pdf_strategy(text, needs_embedding=None):
 
     try:
 
-        text_content = extract_pdf_text(text)
+        chunks = []
+        embeddings = []
+        for _, chunk, embedding in iter_pdf_pipeline(text, needs_embedding):
+            chunks.append(chunk)
+            embeddings.append(embedding)
 
-        if not text_content.strip():
+        if not chunks:
             return {
                 "success": False,
                 "message": "No se pudo extraer texto"
         }
 
-        chunks = get_chunks(text_content, 2000, 200)
-
-        embeddings = []
-        for chunk in chunks:
-            chunk_embedding = get_multimodal_embeddings(
-                base64_image=None,
-                input_text=chunk,
-                dimensions=1024
-            )
-            embeddings.extend(chunk_embedding)
+        # embeddings alineado con chunks; None en los chunks que no se embebieron
+        pending_count = len([embedding for embedding in embeddings if embedding is not None])
+        print(f"🧩 {pending_count}/{len(chunks)} chunks requieren embedding")
 
         return (chunks, embeddings)
     
@@ -39,7 +51,13 @@ def pdf_strategy(text):
         }
 
 
-def jpg_strategy(file_content, filename="imagen.jpg"):
+def pdf_stream_strategy(file_content, needs_embedding=None, dimensions=1024):
+    # Generador (chunk_index, chunk, embedding): el indexado empieza mientras
+    # las páginas siguientes aún se están parseando
+    return iter_pdf_pipeline(file_content, needs_embedding, dimensions=dimensions)
+
+
+def jpg_strategy(file_content, filename="imagen.jpg", dimensions=1024):
 
     try:
 
@@ -47,10 +65,11 @@ def jpg_strategy(file_content, filename="imagen.jpg"):
           
         base64_image = base64.b64encode(file_content).decode('utf-8')
         
-        embeddings = get_multimodal_embeddings(
+        embeddings = call_with_backoff(
+            get_multimodal_embeddings,
             base64_image=base64_image,
             input_text=description,
-            dimensions=1024
+            dimensions=dimensions
         )
         
         chunks = [description]
@@ -67,110 +86,472 @@ def jpg_strategy(file_content, filename="imagen.jpg"):
         }
 
 
-def query_strategy(question, tenant_id, document_type=None):
+def query_strategy(question, tenant_id, document_type=None, use_cache=True, search_mode=None, search_options=None):
 
     try:
 
-        question_embeddings = get_multimodal_embeddings(
-            base64_image=None,
-            input_text=question,
-            dimensions=1024
-        )
+        start_time = time.perf_counter()
+        query_cache = get_query_cache() if use_cache else None
         
-        if not question_embeddings or len(question_embeddings) == 0:
-            return {
-                "success": False,
-                "message": "No se pudo generar embedding de la pregunta"
-            }
+        prepared = prepare_rag_query(question, tenant_id, document_type, search_mode, query_cache, start_time, search_options)
         
-        question_embedding = question_embeddings[0]
+        if not prepared.get('success', False) or prepared.get('cached'):
+            return prepared.get('cached') or prepared
         
-        search_result = opensearch_query(
-            question_embedding, 
-            tenant_id, 
-            document_type
-        )
+        return answer_from_prepared(question, tenant_id, prepared, query_cache, start_time)
         
-        if not search_result.get('success', False):
-            return {
-                "success": False,
-                "message": f"Error en búsqueda OpenSearch: {search_result.get('message', 'Error desconocido')}"
+    except Exception as e:
+        print(f"❌ Error en query_strategy: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            "success": False,
+            "message": f"Error en estrategia RAG: {str(e)}"
+        }
+
+
+def answer_from_prepared(question, tenant_id, prepared, query_cache, start_time):
+    # Contexto + Nova Pro sobre los documentos de prepare_rag_query (o su equivalente por lotes)
+    
+    relevant_docs = prepared['relevant_docs']
+    
+    if len(relevant_docs) == 0:
+        result = {
+            "success": True,
+            "answer": NO_RESULTS_ANSWER,
+            "sources": [],
+            "total_documents_searched": 0
+        }
+        return remember_result(query_cache, tenant_id, question, prepared, result, start_time)
+    
+    context, sources = build_rag_context(relevant_docs)
+    
+    answer = generate_llm_response(question, context)
+    
+    if not answer:
+        return {
+            "success": False,
+            "message": "Error generando respuesta con LLM"
+        }
+    
+    result = {
+        "success": True,
+        "answer": answer,
+        "sources": sources,
+        "total_documents_searched": prepared['rerank']['candidates']
+    }
+    
+    return remember_result(query_cache, tenant_id, question, prepared, result, start_time)
+
+
+def get_batch_generation_concurrency():
+    return max(1, int(os.environ.get('BATCH_GENERATION_CONCURRENCY', DEFAULT_BATCH_GENERATION_CONCURRENCY)))
+
+
+def batch_query_strategy(questions, tenant_id, document_type=None, use_cache=True, search_mode=None, search_options=None):
+    """
+    Responde varias preguntas del mismo tenant en una invocación:
+    cache exacto -> embeddings en paralelo -> cache semántico -> un solo
+    _msearch con todas las búsquedas -> rerank + generación con a lo sumo
+    BATCH_GENERATION_CONCURRENCY llamadas a Nova Pro a la vez
+
+    Returns:
+        {"success": True, "results": [...]} con un resultado por pregunta en el
+        mismo orden (formato de query_strategy más "question"); el fallo de una
+        pregunta no afecta a las demás
+    """
+    try:
+
+        start_time = time.perf_counter()
+        query_cache = get_query_cache() if use_cache else None
+        
+        search_mode = get_search_mode(search_mode)
+        rerank_settings = get_rerank_settings()
+        mmr_settings = get_mmr_settings()
+        search_options = search_options or {}
+        search_size = get_search_size(rerank_settings, search_options)
+        cache_scope = get_cache_scope(document_type, search_mode, rerank_settings, search_options, mmr_settings)
+        # Antes de buscar: las respuestas se guardan con la versión del índice que leyeron
+        index_version = query_cache.get_index_version(tenant_id) if query_cache else None
+        
+        results = [None] * len(questions)
+        pending = []
+        dimensions = get_embedding_dimensions(tenant_id)
+        
+        for position, question in enumerate(questions):
+            cached = query_cache.get_exact(tenant_id, cache_scope, question, index_version) if index_version is not None else None
+            if cached:
+                count("query_cache_hits")
+                results[position] = with_cache_info(cached["result"], query_cache, cached)
+            else:
+                pending.append(position)
+        
+        with span("embed"):
+            embeddings = embed_concurrently(
+                [questions[position] for position in pending],
+                lambda question: get_multimodal_embeddings(base64_image=None, input_text=question, dimensions=dimensions),
+                return_exceptions=True
+            )
+        
+        embedding_ms = (time.perf_counter() - start_time) * 1000
+        prepared = {}
+        
+        for position, question_embeddings in zip(pending, embeddings):
+            if isinstance(question_embeddings, Exception) or not question_embeddings:
+                results[position] = {
+                    "success": False,
+                    "message": "No se pudo generar embedding de la pregunta"
+                }
+                continue
+            
+            question_embedding = question_embeddings[0]
+            
+            cached = query_cache.get_semantic(tenant_id, cache_scope, question_embedding, index_version) if index_version is not None else None
+            if cached:
+                count("query_cache_hits")
+                results[position] = with_cache_info(cached["result"], query_cache, cached)
+                continue
+            
+            prepared[position] = {
+                "success": True,
+                "cache_scope": cache_scope,
+                "index_version": index_version,
+                "question_embedding": question_embedding,
+                "embedding_ms": embedding_ms
             }
         
-        relevant_docs = search_result.get('documents', [])
+        positions = list(prepared)
+        
+        if positions:
+            with span("search"):
+                search_results = opensearch_query_batch(
+                    [prepared[position]["question_embedding"] for position in positions],
+                    tenant_id,
+                    document_type,
+                    questions=[questions[position] for position in positions],
+                    search_mode=search_mode,
+                    size=get_candidate_size(search_size, mmr_settings),
+                    k=search_options.get("k"),
+                    ef_search=search_options.get("ef_search"),
+                    with_embeddings=bool(mmr_settings["lambda"])
+                )
+            
+            def answer(position, search_result):
+                question = questions[position]
+                
+                if not search_result.get('success', False):
+                    return {
+                        "success": False,
+                        "message": search_result.get('message', 'Error en búsqueda OpenSearch')
+                    }
+                
+                count("documents_retrieved", len(search_result.get('documents', [])))
+                
+                documents = diversify_documents(prepared[position]["question_embedding"], search_result.get('documents', []), mmr_settings, search_size)
+                
+                with span("rerank"):
+                    relevant_docs, rerank_info = rerank_documents(question, documents, rerank_settings)
+                
+                return answer_from_prepared(
+                    question, tenant_id,
+                    dict(prepared[position], relevant_docs=relevant_docs, rerank=rerank_info),
+                    query_cache, start_time
+                )
+            
+            def safe_answer(job):
+                try:
+                    return answer(*job)
+                except Exception as e:
+                    print(f"❌ Error respondiendo pregunta {job[0] + 1}: {str(e)}")
+                    return {"success": False, "message": f"Error en estrategia RAG: {str(e)}"}
+            
+            workers = min(get_batch_generation_concurrency(), len(positions))
+            
+            # Sin acotar, un lote grande dispara el throttling de Nova Pro para todo el tenant
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                answers = list(executor.map(bind_metrics(safe_answer), zip(positions, search_results)))
+            
+            for position, result in zip(positions, answers):
+                results[position] = result
+        
+        answered = sum(1 for result in results if result.get('success'))
+        print(f"📦 Lote de {len(questions)} preguntas: {answered} respondidas en {(time.perf_counter() - start_time) * 1000:.0f} ms")
+        
+        return {
+            "success": True,
+            "results": [dict(result, question=question) for question, result in zip(questions, results)]
+        }
+        
+    except Exception as e:
+        print(f"❌ Error en batch_query_strategy: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            "success": False,
+            "message": f"Error en estrategia RAG por lotes: {str(e)}"
+        }
+
+
+def stream_query_strategy(question, tenant_id, document_type=None, use_cache=True, search_mode=None, search_options=None):
+    """
+    Versión en streaming de query_strategy. Produce eventos en orden:
+    sources -> token (uno por fragmento de Nova Pro) -> done, o un evento
+    error en cualquier punto (incluso a mitad de la respuesta)
+
+    Yields:
+        Diccionarios {"type": "sources" | "token" | "done" | "error", ...}
+    """
+    try:
+
+        start_time = time.perf_counter()
+        query_cache = get_query_cache() if use_cache else None
+        
+        prepared = prepare_rag_query(question, tenant_id, document_type, search_mode, query_cache, start_time, search_options)
+        
+        if not prepared.get('success', False):
+            yield {"type": "error", "message": prepared.get('message')}
+            return
+        
+        if prepared.get('cached'):
+            yield from result_events(prepared['cached'])
+            return
+        
+        relevant_docs = prepared['relevant_docs']
         
         if len(relevant_docs) == 0:
-            return {
+            result = {
                 "success": True,
-                "answer": "No encontré información relevante en tus documentos para responder esa pregunta.",
+                "answer": NO_RESULTS_ANSWER,
                 "sources": [],
                 "total_documents_searched": 0
             }
+            yield from result_events(remember_result(query_cache, tenant_id, question, prepared, result, start_time))
+            return
         
-        context_chunks = []
-        sources = []
+        context, sources = build_rag_context(relevant_docs)
         
-        for i, doc in enumerate(relevant_docs[:5]):  # Top 5 documentos más relevantes
-            content = doc.get('content', '')
-            source_file = doc.get('source_file', 'Archivo desconocido')
-            score = doc.get('score', 0)
-            
-            context_chunks.append(f"[Documento {i+1}]: {content}")
-            sources.append({
-                "source_file": source_file,
-                "content_snippet": content[:200] + "..." if len(content) > 200 else content,
-                "relevance_score": round(score, 3)
-            })
+        # Las fuentes salen antes de invocar al LLM
+        yield {"type": "sources", "sources": sources, "total_documents_searched": prepared['rerank']['candidates']}
         
-        context = "\n\n".join(context_chunks)
+        answer_parts = []
+        for text in timed_iter(generate_llm_response_stream(question, context), "generate"):
+            answer_parts.append(text)
+            yield {"type": "token", "text": text}
         
-        answer = generate_llm_response(question, context)
+        answer = "".join(answer_parts).strip()
         
         if not answer:
-            return {
-                "success": False,
-                "message": "Error generando respuesta con LLM"
-            }
+            yield {"type": "error", "message": "Error generando respuesta con LLM"}
+            return
         
-        return {
+        result = {
             "success": True,
             "answer": answer,
             "sources": sources,
-            "total_documents_searched": len(relevant_docs)
+            "total_documents_searched": prepared['rerank']['candidates']
         }
         
+        final = remember_result(query_cache, tenant_id, question, prepared, result, start_time)
+        yield {"type": "done", "answer": answer, "cache": final.get('cache')}
+        
     except Exception as e:
-        print(f"❌ Error en query_strategy: {str(e)}")
+        print(f"❌ Error en stream_query_strategy: {str(e)}")
         import traceback
         traceback.print_exc()
+        yield {"type": "error", "message": f"Error en estrategia RAG: {str(e)}"}
+
+
+def prepare_rag_query(question, tenant_id, document_type, search_mode, query_cache, start_time, search_options=None):
+    """
+    Pasos compartidos por la respuesta JSON y la respuesta en streaming:
+    cache exacto -> embedding de la pregunta -> cache semántico -> búsqueda
+    (kNN, BM25 o híbrida según search_mode) -> MMR opcional (MMR_LAMBDA) ->
+    rerank opcional (RERANK_MODE)
+
+    Returns:
+        {"success": False, "message"} si falla, {"success": True, "cached"} con
+        la respuesta cacheada, o {"success": True, "relevant_docs", ...}
+    """
+    search_mode = get_search_mode(search_mode)
+    rerank_settings = get_rerank_settings()
+    mmr_settings = get_mmr_settings()
+    search_options = search_options or {}
+    search_size = get_search_size(rerank_settings, search_options)
+    cache_scope = get_cache_scope(document_type, search_mode, rerank_settings, search_options, mmr_settings)
+    # Antes de buscar: si un re-index cambia la versión durante la generación, la respuesta no queda como vigente
+    index_version = query_cache.get_index_version(tenant_id) if query_cache else None
+    
+    if index_version is not None:
+        cached = query_cache.get_exact(tenant_id, cache_scope, question, index_version)
+        if cached:
+            count("query_cache_hits")
+            print("⚡ Respuesta desde cache (exacta)")
+            return {"success": True, "cached": with_cache_info(cached["result"], query_cache, cached)}
+    
+    with span("embed"):
+        question_embeddings = call_with_backoff(
+            get_multimodal_embeddings,
+            base64_image=None,
+            input_text=question,
+            dimensions=get_embedding_dimensions(tenant_id)
+        )
+    
+    if not question_embeddings or len(question_embeddings) == 0:
         return {
             "success": False,
-            "message": f"Error en estrategia RAG: {str(e)}"
+            "message": "No se pudo generar embedding de la pregunta"
+        }
+    
+    question_embedding = question_embeddings[0]
+    embedding_ms = (time.perf_counter() - start_time) * 1000
+    
+    if index_version is not None:
+        cached = query_cache.get_semantic(tenant_id, cache_scope, question_embedding, index_version)
+        if cached:
+            count("query_cache_hits")
+            print(f"⚡ Respuesta desde cache (semántica): {cached['question'][:80]}")
+            return {"success": True, "cached": with_cache_info(cached["result"], query_cache, cached)}
+    
+    with span("search"):
+        search_result = opensearch_query(
+            question_embedding, 
+            tenant_id, 
+            document_type,
+            question=question,
+            search_mode=search_mode,
+            size=get_candidate_size(search_size, mmr_settings),
+            k=search_options.get("k"),
+            ef_search=search_options.get("ef_search"),
+            with_embeddings=bool(mmr_settings["lambda"])
+        )
+    
+    if not search_result.get('success', False):
+        return {
+            "success": False,
+            "message": f"Error en búsqueda OpenSearch: {search_result.get('message', 'Error desconocido')}"
         }
+    
+    count("documents_retrieved", len(search_result.get('documents', [])))
+    
+    documents = diversify_documents(question_embedding, search_result.get('documents', []), mmr_settings, search_size)
+    
+    with span("rerank"):
+        relevant_docs, rerank_info = rerank_documents(question, documents, rerank_settings)
+    
+    return {
+        "success": True,
+        "cache_scope": cache_scope,
+        "index_version": index_version,
+        "question_embedding": question_embedding,
+        "embedding_ms": embedding_ms,
+        "relevant_docs": relevant_docs,
+        "rerank": rerank_info
+    }
+
+
+def get_cache_scope(document_type, search_mode, rerank_settings, search_options, mmr_settings=None):
+    # Todo lo que cambia los documentos recuperados separa entradas del cache
+    mmr_lambda = (mmr_settings or {}).get("lambda")
+    return (document_type, search_mode, rerank_settings["mode"], tuple(sorted(search_options.items())), mmr_lambda)
+
+
+def get_search_size(rerank_settings, search_options):
+    # Con rerank se sobre-piden candidatos y el reranker elige los top_n
+
+    if search_options.get("size"):
+        return search_options["size"]
+
+    return rerank_settings["candidates"] if rerank_settings["mode"] != "none" else DEFAULT_SEARCH_SIZE
+
+
+def get_candidate_size(search_size, mmr_settings):
+    # Con MMR se piden más candidatos para tener de dónde diversificar
+    return max(search_size, mmr_settings["candidates"]) if mmr_settings["lambda"] else search_size
+
+
+def diversify_documents(question_embedding, documents, mmr_settings, size):
+    """
+    MMR sobre los candidatos (MMR_LAMBDA): elige size documentos relevantes
+    y distintos entre sí antes del rerank, y quita los embeddings que la
+    búsqueda trajo solo para esto
+    """
+    if not mmr_settings["lambda"]:
+        return documents
+
+    if len(documents) > 1 and all(document.get('embedding') is not None for document in documents):
+        with span("mmr"):
+            selected = mmr(question_embedding, [document['embedding'] for document in documents], mmr_settings["lambda"], size)
+        documents = [documents[position] for position in selected]
+
+    return [
+        {key: value for key, value in document.items() if key != 'embedding'}
+        for document in documents[:size]
+    ]
+
+
+def build_rag_context(relevant_docs):
+    # Chunks vecinos unidos sin overlap, sin duplicados y dentro de CONTEXT_TOKEN_BUDGET
+    with span("pack"):
+        return pack_context(relevant_docs, get_context_settings())
+
+
+def result_events(result):
+    # Una respuesta ya completa (cache o sin documentos) con la misma forma que el stream
+
+    yield {"type": "sources", "sources": result.get('sources', []), "total_documents_searched": result.get('total_documents_searched', 0)}
+    yield {"type": "token", "text": result.get('answer', '')}
+    yield {"type": "done", "answer": result.get('answer', ''), "cache": result.get('cache')}
+
+
+def remember_result(query_cache, tenant_id, question, prepared, result, start_time):
+    # Solo se cachean respuestas exitosas; los errores se reintentan completos
+
+    if not query_cache:
+        return result
+
+    # Sin versión leída antes de buscar (DynamoDB falló) no se cachea
+    if prepared.get('index_version') is not None:
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        query_cache.put(tenant_id, prepared['cache_scope'], question, prepared['question_embedding'], result, latency_ms, prepared['embedding_ms'], prepared['index_version'])
+    return with_cache_info(result, query_cache, None)
+
+
+def with_cache_info(result, query_cache, cached):
+
+    response = dict(result)
+    response["cache"] = {
+        "hit": cached["level"] if cached else None,
+        **query_cache.stats()
+    }
+    return response
+
+
+def count_llm_usage(usage):
+    # usage de Nova: {"inputTokens", "outputTokens"}
+    count("llm_input_tokens", usage.get('inputTokens', 0))
+    count("llm_output_tokens", usage.get('outputTokens', 0))
 
 
 def generate_llm_response(question, context):
 
     try:
-        config = Config(
-            connect_timeout=3600,  # 60 minutos
-            read_timeout=3600,     # 60 minutos
-            retries={'max_attempts': 1}
-        )
-        bedrock_runtime = boto3.client('bedrock-runtime', region_name='us-east-1', config=config)
+        bedrock_runtime = get_bedrock_runtime_client('generation')
         
         system_prompt, user_prompt = get_rag_response_prompt(question, context)
 
         payload = get_payload_for_rag_response(system_prompt, user_prompt)
         
-        response = bedrock_runtime.invoke_model(
-            modelId="amazon.nova-pro-v1:0",
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps(payload)
-        )
+        with span("generate"):
+            response = bedrock_runtime.invoke_model(
+                modelId=RAG_RESPONSE_MODEL_ID,
+                contentType="application/json",
+                accept="application/json",
+                body=json.dumps(payload)
+            )
+            
+            response_body = json.loads(response['body'].read())
         
-        response_body = json.loads(response['body'].read())
+        count_llm_usage(response_body.get('usage', {}))
         
         output = response_body.get('output', {})
         message = output.get('message', {})
@@ -192,3 +573,42 @@ def generate_llm_response(question, context):
         traceback.print_exc()
         return None
 
+
+def generate_llm_response_stream(question, context):
+    """
+    Igual que generate_llm_response pero con invoke_model_with_response_stream:
+    produce el texto a medida que Nova Pro lo genera. Los errores a mitad del
+    stream se propagan como excepción.
+
+    Yields:
+        Fragmentos de texto de la respuesta
+    """
+    bedrock_runtime = get_bedrock_runtime_client('generation')
+    
+    system_prompt, user_prompt = get_rag_response_prompt(question, context)
+
+    payload = get_payload_for_rag_response(system_prompt, user_prompt)
+    
+    response = bedrock_runtime.invoke_model_with_response_stream(
+        modelId=RAG_RESPONSE_MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps(payload)
+    )
+    
+    for event in response['body']:
+        chunk = event.get('chunk')
+        
+        if chunk is None:
+            # Excepciones modeladas del stream (modelStreamErrorException, throttlingException, ...)
+            error_name = next(iter(event), 'unknown')
+            raise ValueError(f"Error en stream de Nova Pro: {error_name} {event.get(error_name)}")
+        
+        data = json.loads(chunk['bytes'])
+        text = data.get('contentBlockDelta', {}).get('delta', {}).get('text')
+        
+        if 'metadata' in data:
+            count_llm_usage(data['metadata'].get('usage', {}))
+        
+        if text:
+            yield text
@@ -0,0 +1,482 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from botocore.exceptions import ClientError
+
+from helpers.clients import get_aws_client, get_opensearch_client, get_lambda_client
+from helpers.bulk_writer import bulk_write
+from helpers.opensearch_helpers import create_index_if_not_exists, delete_documents_bulk, iter_sorted_hits
+from helpers.index_profiles import get_index_profile, get_configured_index_profile, supports_knn_filter
+from helpers.index_metadata import get_index_metadata, read_index_metadata, invalidate_index_metadata
+from helpers.query_cache import bump_index_version
+
+
+TENANCY_MODES = ("dedicated", "pooled")
+DEFAULT_TENANCY_MODE = "dedicated"
+DEFAULT_POOLED_INDEX_COUNT = 4
+# Faiss: el filtro por tenant_id va dentro del kNN (nmslib post-filtraría el top-k de todo el pool)
+DEFAULT_POOLED_INDEX_PROFILE = "fp16"
+# Chunks en el pool a partir de los cuales el tenant pasa a índice propio (0 = nunca)
+DEFAULT_PROMOTION_CHUNKS = 50000
+DEFAULT_PLACEMENT_TTL_SECONDS = 60
+DEFAULT_MIGRATION_LOCK_SECONDS = 15 * 60
+MIGRATION_PAGE_SIZE = 500
+
+INDEX_PREFIX = "rag-documents-"
+POOL_INDEX_PREFIX = f"{INDEX_PREFIX}pool-"
+
+
+def get_tenancy_settings() -> Dict:
+    """
+    TENANCY_MODE: dedicated (default, un índice por tenant) o pooled (los
+    tenants comparten POOLED_INDEX_COUNT índices y se separan por el filtro
+    tenant_id). En pooled, los tenants con excepción en TENANT_INDEX_PROFILES
+    y los que superan TENANT_PROMOTION_CHUNKS usan índice propio.
+    """
+    mode = os.environ.get("TENANCY_MODE", DEFAULT_TENANCY_MODE).lower()
+
+    if mode not in TENANCY_MODES:
+        raise ValueError(f"TENANCY_MODE inválido: {mode}. Valores permitidos: {', '.join(TENANCY_MODES)}")
+
+    pool_profile = get_index_profile(os.environ.get("POOLED_INDEX_PROFILE", DEFAULT_POOLED_INDEX_PROFILE))
+    if not supports_knn_filter(pool_profile):
+        raise ValueError(f"POOLED_INDEX_PROFILE {pool_profile['name']} usa {pool_profile['engine']}, que no filtra dentro del kNN")
+
+    return {
+        "mode": mode,
+        "pool_count": max(1, int(os.environ.get("POOLED_INDEX_COUNT", DEFAULT_POOLED_INDEX_COUNT))),
+        "pool_profile": pool_profile,
+        "promotion_chunks": int(os.environ.get("TENANT_PROMOTION_CHUNKS", DEFAULT_PROMOTION_CHUNKS)),
+        "placement_ttl": float(os.environ.get("TENANCY_CACHE_TTL", DEFAULT_PLACEMENT_TTL_SECONDS))
+    }
+
+
+def dedicated_index_name(tenant_id: str) -> str:
+    return f"{INDEX_PREFIX}{tenant_id}"
+
+
+def pool_index_name(tenant_id: str, pool_count: int) -> str:
+    # Hash estable (no hash() de Python, que cambia entre procesos)
+    bucket = int(hashlib.sha256(tenant_id.encode("utf-8")).hexdigest(), 16) % pool_count
+    return f"{POOL_INDEX_PREFIX}{bucket:02d}"
+
+
+def is_pool_index(index_name: str) -> bool:
+    return index_name.startswith(POOL_INDEX_PREFIX)
+
+
+class InMemoryTenancyRegistry:
+    """
+    Ubicación de cada tenant: {"placement": dedicated | pooled, "index_name"}.
+    Se registra en la primera ingesta y solo la cambia una migración.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, Dict] = {}
+        self._migrations: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, tenant_id: str) -> Optional[Dict]:
+        with self._lock:
+            record = self._records.get(tenant_id)
+            return dict(record) if record else None
+
+    def put(self, tenant_id: str, record: Dict, only_if_absent: bool = False) -> bool:
+        with self._lock:
+            if only_if_absent and tenant_id in self._records:
+                return False
+            self._records[tenant_id] = dict(record)
+            return True
+
+    def begin_migration(self, tenant_id: str, target: str, lock_seconds: float) -> bool:
+        with self._lock:
+            if self._migrations.get(tenant_id, 0) > time.time():
+                return False
+            self._migrations[tenant_id] = time.time() + lock_seconds
+            return True
+
+    def end_migration(self, tenant_id: str):
+        with self._lock:
+            self._migrations.pop(tenant_id, None)
+
+
+class DynamoDBTenancyRegistry:
+    """
+    Registro compartido entre Lambdas en la tabla del cache (cache_key =
+    tenancy#<tenant>, sin expires_at). El lock de migración es un update
+    condicional: una sola migración por tenant a la vez.
+    """
+
+    def __init__(self, table_name: str, client=None):
+        self.table_name = table_name
+        self.client = client or get_aws_client("dynamodb")
+
+    @staticmethod
+    def _key(tenant_id: str) -> Dict:
+        return {"cache_key": {"S": f"tenancy#{tenant_id}"}}
+
+    def get(self, tenant_id: str) -> Optional[Dict]:
+        item = self.client.get_item(TableName=self.table_name, Key=self._key(tenant_id), ConsistentRead=True).get("Item")
+
+        # Un item con solo el lock de migración no es una ubicación
+        if not item or "placement" not in item:
+            return None
+
+        return {"placement": item["placement"]["S"], "index_name": item["index_name"]["S"]}
+
+    def put(self, tenant_id: str, record: Dict, only_if_absent: bool = False) -> bool:
+        request = {
+            "TableName": self.table_name,
+            "Key": self._key(tenant_id),
+            "UpdateExpression": "SET placement = :placement, index_name = :index_name",
+            "ExpressionAttributeValues": {":placement": {"S": record["placement"]}, ":index_name": {"S": record["index_name"]}}
+        }
+        if only_if_absent:
+            request["ConditionExpression"] = "attribute_not_exists(placement)"
+
+        try:
+            self.client.update_item(**request)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def begin_migration(self, tenant_id: str, target: str, lock_seconds: float) -> bool:
+        now = int(time.time())
+        try:
+            self.client.update_item(
+                TableName=self.table_name,
+                Key=self._key(tenant_id),
+                UpdateExpression="SET migrating_until = :until, migration_target = :target",
+                ConditionExpression="attribute_not_exists(migrating_until) OR migrating_until < :now",
+                ExpressionAttributeValues={
+                    ":until": {"N": str(now + int(lock_seconds))},
+                    ":target": {"S": target},
+                    ":now": {"N": str(now)}
+                }
+            )
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+                return False
+            raise
+
+    def end_migration(self, tenant_id: str):
+        self.client.update_item(
+            TableName=self.table_name,
+            Key=self._key(tenant_id),
+            UpdateExpression="REMOVE migrating_until, migration_target"
+        )
+
+
+_registry = None
+_placements: Dict[str, Dict] = {}
+_lock = threading.Lock()
+
+
+def get_tenancy_registry():
+    """
+    TENANCY_TABLE configurada -> DynamoDB (compartido entre Lambdas); si no,
+    registro en memoria (solo para tests y desarrollo local)
+    """
+    global _registry
+
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                table_name = os.environ.get("TENANCY_TABLE")
+                _registry = DynamoDBTenancyRegistry(table_name) if table_name else InMemoryTenancyRegistry()
+
+    return _registry
+
+
+def reset_tenancy():
+    global _registry
+    with _lock:
+        _registry = None
+        _placements.clear()
+
+
+def default_placement(tenant_id: str, settings: Dict) -> Dict:
+    """
+    Ubicación de un tenant sin registro. En modo pooled, un tenant con índice
+    propio anterior al modo (o con perfil propio) sigue en su índice.
+    """
+    dedicated = {"placement": "dedicated", "index_name": dedicated_index_name(tenant_id)}
+
+    if settings["mode"] == "dedicated":
+        return dedicated
+
+    if json.loads(os.environ.get("TENANT_INDEX_PROFILES") or "{}").get(tenant_id):
+        return dedicated
+
+    if get_index_metadata(get_opensearch_client(), dedicated["index_name"])["exists"]:
+        return dedicated
+
+    return {"placement": "pooled", "index_name": pool_index_name(tenant_id, settings["pool_count"])}
+
+
+def forget_tenant_placement(tenant_id: str):
+    with _lock:
+        _placements.pop(tenant_id, None)
+
+
+def _cache_placement(tenant_id: str, placement: Dict) -> Dict:
+    with _lock:
+        _placements[tenant_id] = dict(placement, cached_at=time.monotonic())
+    return placement
+
+
+def resolve_tenant_index(tenant_id: str) -> Dict:
+    """
+    {"placement", "index_name", "registered"} del tenant. Se cachea
+    TENANCY_CACHE_TTL segundos: una migración se ve en todas las Lambdas
+    a lo sumo ese tiempo después.
+    """
+    settings = get_tenancy_settings()
+
+    with _lock:
+        cached = _placements.get(tenant_id)
+    if cached and time.monotonic() - cached["cached_at"] < settings["placement_ttl"]:
+        return cached
+
+    record = get_tenancy_registry().get(tenant_id)
+    if record:
+        return _cache_placement(tenant_id, dict(record, registered=True))
+
+    return _cache_placement(tenant_id, dict(default_placement(tenant_id, settings), registered=False))
+
+
+def get_tenant_index_name(tenant_id: str) -> str:
+    return resolve_tenant_index(tenant_id)["index_name"]
+
+
+def register_tenant_index(tenant_id: str) -> str:
+    """
+    Ruta de escritura: fija la ubicación del tenant en su primera ingesta,
+    así cambiar TENANCY_MODE o POOLED_INDEX_COUNT no mueve tenants existentes
+    """
+    placement = resolve_tenant_index(tenant_id)
+    if placement["registered"]:
+        return placement["index_name"]
+
+    record = {"placement": placement["placement"], "index_name": placement["index_name"]}
+    if not get_tenancy_registry().put(tenant_id, record, only_if_absent=True):
+        # Otra Lambda lo registró primero: vale su registro
+        record = get_tenancy_registry().get(tenant_id) or record
+
+    print(f"🏷️ Tenant {tenant_id} registrado en '{record['index_name']}' ({record['placement']})")
+    return _cache_placement(tenant_id, dict(record, registered=True))["index_name"]
+
+
+def get_placement_profile(tenant_id: str) -> Dict:
+    # Perfil con el que se crearía el índice del tenant: el del pool o el configurado
+    if resolve_tenant_index(tenant_id)["placement"] == "pooled":
+        return get_tenancy_settings()["pool_profile"]
+    return get_configured_index_profile(tenant_id)
+
+
+# --------------------------------------------------------------- migración
+
+
+def iter_tenant_documents(client, index_name: str, tenant_id: str, page_size: Optional[int] = None):
+    query = {"bool": {"filter": [{"term": {"tenant_id": tenant_id}}]}}
+    return iter_sorted_hits(client, index_name, query, page_size or MIGRATION_PAGE_SIZE)
+
+
+def copy_tenant_documents(client, source_index: str, target_index: str, tenant_id: str, skip_ids: Optional[Set[str]] = None) -> Set[str]:
+    """
+    Copia los chunks del tenant tal como están guardados (mismo perfil en
+    ambos índices) y devuelve los _id que hay en el origen, copiados o no.
+    Idempotente: _id deterministas. skip_ids no se vuelven a copiar.
+    """
+    copied = set()
+    skip_ids = skip_ids or set()
+
+    def operations():
+        for hit in iter_tenant_documents(client, source_index, tenant_id):
+            copied.add(hit["_id"])
+            if hit["_id"] not in skip_ids:
+                yield {"index": {"_index": target_index, "_id": hit["_id"]}}, hit["_source"]
+
+    report = bulk_write(client, operations())
+    if not report["success"]:
+        raise ValueError(f"{report['failed']} chunks no se pudieron copiar a '{target_index}'")
+
+    return copied
+
+
+def get_existing_profile(client, index_name: str) -> Optional[Dict]:
+    # Sin cache: la migración decide con el estado actual de OpenSearch
+    return read_index_metadata(client, index_name)["profile"]
+
+
+def migrate_tenant(tenant_id: str, target: str) -> Dict:
+    """
+    Mueve los chunks de un tenant entre su índice propio y el pool:
+    1. Copia al índice destino (mismo perfil de vectores)
+    2. Cambia el registro: las Lambdas leen y escriben en el destino a lo
+       sumo TENANCY_CACHE_TTL segundos después
+    3. Pasado ese tiempo vuelve a copiar (escrituras tardías al origen) y
+       quita del destino los chunks que el origen borró mientras tanto
+    4. Borra del origen: el índice entero si era propio, por _id si es el pool
+    """
+    if target not in TENANCY_MODES:
+        raise ValueError(f"Ubicación inválida: {target}. Valores permitidos: {', '.join(TENANCY_MODES)}")
+
+    settings = get_tenancy_settings()
+    registry = get_tenancy_registry()
+    client = get_opensearch_client()
+
+    forget_tenant_placement(tenant_id)
+    current = resolve_tenant_index(tenant_id)
+
+    if current["placement"] == target:
+        return {"success": True, "message": f"Tenant {tenant_id} ya está en '{current['index_name']}' ({target})"}
+
+    lock_seconds = float(os.environ.get("TENANCY_MIGRATION_LOCK_SECONDS", DEFAULT_MIGRATION_LOCK_SECONDS))
+    if not registry.begin_migration(tenant_id, target, lock_seconds):
+        return {"success": False, "message": f"Ya hay una migración en curso para {tenant_id}"}
+
+    source_index = current["index_name"]
+    target_index = dedicated_index_name(tenant_id) if target == "dedicated" else pool_index_name(tenant_id, settings["pool_count"])
+
+    try:
+        print(f"🚚 Migrando {tenant_id}: '{source_index}' -> '{target_index}'")
+
+        source_profile = get_existing_profile(client, source_index)
+        copied = set()
+
+        if source_profile:
+            target_profile = get_existing_profile(client, target_index) or (settings["pool_profile"] if target == "pooled" else source_profile)
+            if target_profile["name"] != source_profile["name"]:
+                raise ValueError(
+                    f"El perfil de '{target_index}' ({target_profile['name']}) no coincide con el de '{source_index}' ({source_profile['name']})"
+                )
+
+            if not create_index_if_not_exists(client, target_index, profile=target_profile):
+                raise ValueError(f"No se pudo crear el índice '{target_index}'")
+            invalidate_index_metadata(target_index)
+
+            copied = copy_tenant_documents(client, source_index, target_index, tenant_id)
+
+        record = {"placement": target, "index_name": target_index}
+        registry.put(tenant_id, record)
+        _cache_placement(tenant_id, dict(record, registered=True))
+        bump_index_version(tenant_id)
+
+        if source_profile:
+            # Lambdas con la ubicación vieja en cache pueden seguir escribiendo al origen
+            time.sleep(settings["placement_ttl"])
+
+            # Solo las escrituras tardías: un chunk ya copiado que el destino borró (re-index
+            # con la ubicación nueva) no debe volver
+            recopied = copy_tenant_documents(client, source_index, target_index, tenant_id, skip_ids=copied)
+            removed = sorted(copied - recopied)
+            if removed and not delete_documents_bulk(client, target_index, removed):
+                raise ValueError(f"No se pudieron quitar {len(removed)} chunks borrados de '{target_index}'")
+
+            if is_pool_index(source_index):
+                if not delete_documents_bulk(client, source_index, sorted(recopied)):
+                    raise ValueError(f"No se pudieron borrar los chunks de {tenant_id} en '{source_index}'")
+            else:
+                client.indices.delete(index=source_index)
+                invalidate_index_metadata(source_index)
+
+            bump_index_version(tenant_id)
+            copied = recopied
+
+        print(f"✅ Tenant {tenant_id} migrado a '{target_index}': {len(copied)} chunks")
+        return {
+            "success": True,
+            "message": f"Tenant {tenant_id} migrado a {target}",
+            "details": {
+                "tenant_id": tenant_id,
+                "source_index": source_index,
+                "target_index": target_index,
+                "placement": target,
+                "documents": len(copied)
+            }
+        }
+
+    except Exception as e:
+        # Si falla antes del cambio de registro el tenant sigue entero en el origen;
+        # después, re-ejecutar la migración completa el paso 3 y 4
+        print(f"❌ Error migrando {tenant_id}: {str(e)}")
+        return {"success": False, "message": f"Error migrando {tenant_id}: {str(e)}"}
+
+    finally:
+        registry.end_migration(tenant_id)
+
+
+def request_tenant_migration(tenant_id: str, target: str) -> Dict:
+    """
+    Dentro de Lambda la migración corre en otra invocación asíncrona de la
+    misma función (no alarga la ingesta que la dispara); fuera, en línea
+    """
+    function_name = os.environ.get("AWS_LAMBDA_FUNCTION_NAME")
+
+    if not function_name:
+        return migrate_tenant(tenant_id, target)
+
+    get_lambda_client().invoke(
+        FunctionName=function_name,
+        InvocationType='Event',
+        Payload=json.dumps({"tenancy_migration": {"tenant_id": tenant_id, "target": target}}).encode("utf-8")
+    )
+    return {"success": True, "message": f"Migración de {tenant_id} a {target} solicitada"}
+
+
+def maybe_promote_tenant(tenant_id: str) -> Optional[Dict]:
+    # Después de cada ingesta: un tenant del pool que creó demasiado pasa a índice propio
+
+    try:
+        settings = get_tenancy_settings()
+        placement = resolve_tenant_index(tenant_id)
+
+        if placement["placement"] != "pooled" or settings["promotion_chunks"] <= 0:
+            return None
+
+        chunks = get_opensearch_client().count(
+            index=placement["index_name"],
+            body={"query": {"term": {"tenant_id": tenant_id}}}
+        )["count"]
+
+        if chunks < settings["promotion_chunks"]:
+            return None
+
+        print(f"📈 {tenant_id} tiene {chunks} chunks en '{placement['index_name']}' (límite {settings['promotion_chunks']}): pasa a índice propio")
+        return request_tenant_migration(tenant_id, "dedicated")
+
+    except Exception as e:
+        # Nunca debe romper la ingesta: se reintenta en la próxima
+        print(f"⚠️ No se pudo evaluar la promoción de {tenant_id}: {str(e)}")
+        return None
+
+
+def run_tenancy_migration(event: Dict) -> Dict:
+    """
+    Handler del evento {"tenancy_migration": {"tenant_id" o "tenant_ids", "target"}}
+    de la Lambda de procesamiento. También es la herramienta del operador:
+
+        aws lambda invoke --function-name <process> \\
+            --payload '{"tenancy_migration": {"tenant_ids": ["cliente_a"], "target": "pooled"}}' out.json
+    """
+    request = event.get("tenancy_migration") or {}
+    tenant_ids: List[str] = request.get("tenant_ids") or ([request["tenant_id"]] if request.get("tenant_id") else [])
+    target = request.get("target")
+
+    if not tenant_ids or target not in TENANCY_MODES:
+        return {"success": False, "message": f"tenancy_migration requiere tenant_id(s) y target ({', '.join(TENANCY_MODES)})"}
+
+    results = [migrate_tenant(tenant_id, target) for tenant_id in tenant_ids]
+
+    return {
+        "success": all(result["success"] for result in results),
+        "results": results
+    }
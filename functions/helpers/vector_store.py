@@ -0,0 +1,793 @@
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from helpers.clients import get_opensearch_client
+from helpers.bulk_writer import bulk_write
+from helpers.opensearch_helpers import (
+    create_index_if_not_exists,
+    build_index_operations,
+    get_indexed_document_hashes,
+    get_indexed_document_vectors,
+    get_indexed_duplicate_hashes,
+    delete_documents_bulk
+)
+from helpers.index_profiles import get_configured_index_profile, encode_vector, decode_vector, supports_query_ef_search
+from helpers.index_metadata import get_index_metadata, invalidate_index_metadata, is_not_found_error
+from helpers.tenancy import get_tenant_index_name, register_tenant_index, get_placement_profile, dedicated_index_name, is_pool_index, forget_tenant_placement
+from helpers.hybrid_search import (
+    get_hybrid_settings,
+    build_vector_query,
+    build_lexical_query,
+    reciprocal_rank_fusion,
+    weighted_score_fusion,
+    LEXICAL_FIELDS,
+    SOURCE_FIELDS
+)
+
+
+VECTOR_STORE_BACKENDS = ("opensearch", "local")
+DEFAULT_LOCAL_STORE_DIR = "/tmp/rag-vector-store"
+
+
+def get_index_name(tenant_id: str) -> str:
+    # Índice propio o del pool según la ubicación del tenant (helpers.tenancy)
+    return get_tenant_index_name(tenant_id)
+
+
+def fuse_hits(ranked_hits: List[List[Dict]], weights: List[float], size: int) -> List[Dict]:
+
+    settings = get_hybrid_settings()
+    if settings["fusion"] == "rrf":
+        return reciprocal_rank_fusion(ranked_hits, weights, settings["rrf_k"], size)
+    return weighted_score_fusion(ranked_hits, weights, size)
+
+
+class OpenSearchVectorStore:
+    """
+    Backend por defecto: OpenSearch Serverless, con un índice por tenant o
+    índices compartidos entre tenants (TENANCY_MODE)
+    """
+
+    name = "opensearch"
+
+    @staticmethod
+    def _index_metadata(index_name: str) -> Dict:
+        # Existencia y perfil desde el cache de la Lambda warm (helpers.index_metadata)
+        return get_index_metadata(get_opensearch_client(), index_name)
+
+    @staticmethod
+    def _index_missing(tenant_id: str, index_name: str):
+        # 404: el índice se borró (p. ej. migración de tenancy) después de cachearlo
+        print(f"⚠️ Índice '{index_name}' no encontrado, se invalida su metadata")
+        invalidate_index_metadata(index_name)
+        forget_tenant_placement(tenant_id)
+
+    def get_index_profile(self, tenant_id: str) -> Dict:
+        """
+        Perfil del índice del tenant (index_profiles): el guardado en el
+        mapping si el índice existe, o el configurado para crearlo (el del
+        pool si el tenant es pooled)
+        """
+        metadata = self._index_metadata(get_index_name(tenant_id))
+        return metadata["profile"] if metadata["exists"] else get_placement_profile(tenant_id)
+
+    def ensure_index(self, tenant_id: str) -> bool:
+        # La primera ingesta fija la ubicación del tenant
+        index_name = register_tenant_index(tenant_id)
+
+        if self._index_metadata(index_name)["exists"]:
+            return True
+
+        created = create_index_if_not_exists(get_opensearch_client(), index_name, profile=get_placement_profile(tenant_id))
+        # El perfil real puede ser el de otra Lambda que lo creó primero: se relee
+        invalidate_index_metadata(index_name)
+        return created
+
+    def get_document_hashes(self, tenant_id: str, source_file: str) -> Dict[str, str]:
+
+        index_name = get_index_name(tenant_id)
+
+        if not self._index_metadata(index_name)["exists"]:
+            return {}
+
+        try:
+            return get_indexed_document_hashes(get_opensearch_client(), index_name, tenant_id, source_file)
+        except Exception as e:
+            if not is_not_found_error(e):
+                raise
+            self._index_missing(tenant_id, index_name)
+            return {}
+
+    def get_duplicate_hashes(self, tenant_id: str, source_file: str) -> Dict[str, str]:
+
+        index_name = get_index_name(tenant_id)
+
+        if not self._index_metadata(index_name)["exists"]:
+            return {}
+
+        try:
+            return get_indexed_duplicate_hashes(get_opensearch_client(), index_name, tenant_id, source_file)
+        except Exception as e:
+            if not is_not_found_error(e):
+                raise
+            self._index_missing(tenant_id, index_name)
+            return {}
+
+    def get_document_vectors(self, tenant_id: str, source_file: str) -> Dict:
+
+        index_name = get_index_name(tenant_id)
+
+        if not self._index_metadata(index_name)["exists"]:
+            return {}
+
+        try:
+            vectors = get_indexed_document_vectors(get_opensearch_client(), index_name, tenant_id, source_file)
+        except Exception as e:
+            if not is_not_found_error(e):
+                raise
+            self._index_missing(tenant_id, index_name)
+            return {}
+
+        # Guardados según el perfil (byte = enteros): se comparan como los embeddings nuevos
+        profile = self.get_index_profile(tenant_id)
+        return {document_id: decode_vector(vector, profile) for document_id, vector in vectors.items()}
+
+    def write_documents(self, tenant_id: str, documents: Iterable[Dict], batch_size: Optional[int] = None) -> Dict:
+        # El bulk writer arma lotes por bytes/cantidad a medida que llegan los chunks
+        index_name = get_index_name(tenant_id)
+        profile = self.get_index_profile(tenant_id)
+        encoded_documents = (
+            dict(document, embedding=encode_vector(document['embedding'], profile)) if document['embedding'] is not None else document
+            for document in documents
+        )
+
+        report = bulk_write(
+            get_opensearch_client(),
+            build_index_operations(index_name, encoded_documents, tenant_id),
+            max_docs=batch_size
+        )
+
+        # El reintento del archivo (SQS) vuelve a crear o resolver el índice
+        if any(item["error"] and item["status"] == 404 for item in report["items"]):
+            self._index_missing(tenant_id, index_name)
+
+        return report
+
+    def delete_documents(self, tenant_id: str, document_ids: List[str]) -> bool:
+        return delete_documents_bulk(get_opensearch_client(), get_index_name(tenant_id), document_ids)
+
+    def search(
+        self,
+        tenant_id: str,
+        question_embedding: Optional[List[float]],
+        question: Optional[str],
+        filters: List[Dict],
+        search_mode: str,
+        size: int,
+        k: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        with_embeddings: bool = False
+    ) -> Optional[Dict]:
+        """
+        Returns:
+            {"hits", "total"} con hits en formato OpenSearch (con el embedding
+            en _source si with_embeddings), o None si el tenant no tiene índice
+        """
+        client = get_opensearch_client()
+        index_name = get_index_name(tenant_id)
+
+        if not self._index_metadata(index_name)["exists"]:
+            return None
+
+        request = self._prepare_request(tenant_id, index_name, {
+            "question_embedding": question_embedding,
+            "question": question,
+            "filters": filters,
+            "search_mode": search_mode,
+            "size": size,
+            "k": k,
+            "ef_search": ef_search,
+            "with_embeddings": with_embeddings
+        })
+
+        if search_mode == "hybrid":
+            return self._hybrid_search(client, tenant_id, index_name, request)
+
+        [search_query] = self._build_branch_queries(request)
+        try:
+            response = client.search(index=index_name, body=search_query)
+        except Exception as e:
+            if not is_not_found_error(e):
+                raise
+            self._index_missing(tenant_id, index_name)
+            return None
+
+        return {
+            "hits": response.get('hits', {}).get('hits', []),
+            "total": response.get('hits', {}).get('total', {}).get('value', 0)
+        }
+
+    def search_many(self, tenant_id: str, requests: List[Dict]) -> Optional[List[Dict]]:
+        """
+        Varias búsquedas del mismo tenant en un solo _msearch (una sub-búsqueda
+        por request, dos en modo hybrid). Un error en un request no afecta al resto.
+
+        Args:
+            requests: Dicts con question_embedding, question, filters, search_mode,
+                size y opcionalmente k, ef_search y with_embeddings
+
+        Returns:
+            Lista alineada con requests de {"hits", "total"} o {"error"}, o None
+            si el tenant no tiene índice
+        """
+        client = get_opensearch_client()
+        index_name = get_index_name(tenant_id)
+
+        if not self._index_metadata(index_name)["exists"]:
+            return None
+
+        body = []
+        branch_counts = []
+        for request in requests:
+            queries = self._build_branch_queries(self._prepare_request(tenant_id, index_name, request))
+            branch_counts.append(len(queries))
+            for search_query in queries:
+                body.extend([{}, search_query])
+
+        responses = client.msearch(index=index_name, body=body).get('responses', [])
+
+        if self._responses_index_missing(responses):
+            self._index_missing(tenant_id, index_name)
+            return None
+
+        results = []
+        position = 0
+        for request, branch_count in zip(requests, branch_counts):
+            branch_responses = responses[position:position + branch_count]
+            position += branch_count
+            try:
+                results.append(self._merge_branch_responses(request["search_mode"], branch_responses, request["size"]))
+            except ValueError as e:
+                results.append({"error": str(e)})
+
+        return results
+
+    def _prepare_request(self, tenant_id: str, index_name: str, request: Dict) -> Dict:
+        # La pregunta se cuantiza igual que los documentos del índice
+
+        profile = self.get_index_profile(tenant_id)
+        prepared = dict(request, knn_filter=is_pool_index(index_name))
+
+        if request.get("question_embedding") is not None:
+            prepared["question_embedding"] = encode_vector(request["question_embedding"], profile)
+
+        if request.get("ef_search") and not supports_query_ef_search(profile):
+            print(f"⚠️ ef_search por request no soportado por {profile['engine']} (perfil {profile['name']}), se usa el del índice")
+            prepared["ef_search"] = None
+
+        return prepared
+
+    @staticmethod
+    def _build_branch_queries(request: Dict) -> List[Dict]:
+
+        search_mode = request["search_mode"]
+        size = request["size"]
+
+        if search_mode == "lexical":
+            queries = [build_lexical_query(request["question"], request["filters"], size)]
+
+        elif search_mode == "vector":
+            queries = [build_vector_query(
+                request["question_embedding"], request["filters"], size,
+                request.get("k"), request.get("ef_search"), request.get("knn_filter", False)
+            )]
+
+        else:
+            candidates = max(size, get_hybrid_settings()["candidates"])
+            queries = [
+                build_vector_query(
+                    request["question_embedding"], request["filters"], candidates,
+                    request.get("k"), request.get("ef_search"), request.get("knn_filter", False)
+                ),
+                build_lexical_query(request["question"], request["filters"], candidates)
+            ]
+
+        if request.get("with_embeddings"):
+            # Solo para MMR: el embedding es la mayor parte del _source
+            for search_query in queries:
+                search_query["_source"] = SOURCE_FIELDS + ["embedding"]
+
+        return queries
+
+    @staticmethod
+    def _merge_branch_responses(search_mode: str, responses: List[Dict], size: int) -> Dict:
+
+        if search_mode != "hybrid":
+            [result] = responses or [{"error": "Sin respuesta de _msearch"}]
+            if 'error' in result:
+                raise ValueError(f"Error en búsqueda {search_mode}: {result['error']}")
+            return {
+                "hits": result.get('hits', {}).get('hits', []),
+                "total": result.get('hits', {}).get('total', {}).get('value', 0)
+            }
+
+        settings = get_hybrid_settings()
+        ranked_hits = []
+        weights = []
+        for branch, weight, result in zip(("vector", "lexical"), (settings["vector_weight"], settings["lexical_weight"]), responses):
+            if 'error' in result:
+                print(f"⚠️ Rama {branch} de la búsqueda híbrida falló: {result['error']}")
+                continue
+            ranked_hits.append(result.get('hits', {}).get('hits', []))
+            weights.append(weight)
+
+        if not ranked_hits:
+            raise ValueError("Fallaron ambas ramas de la búsqueda híbrida")
+
+        return {
+            "hits": fuse_hits(ranked_hits, weights, size),
+            "total": len({hit['_id'] for branch_hits in ranked_hits for hit in branch_hits})
+        }
+
+    @staticmethod
+    def _responses_index_missing(responses: List[Dict]) -> bool:
+        return any(response.get('status') == 404 for response in responses)
+
+    @classmethod
+    def _hybrid_search(cls, client, tenant_id, index_name, request):
+        """
+        kNN + BM25 en un solo _msearch (OpenSearch ejecuta ambas en paralelo) y
+        fusión con RRF o por scores normalizados (HYBRID_FUSION). Si una rama
+        falla se usa solo la otra.
+        """
+        responses = client.msearch(
+            index=index_name,
+            body=[part for search_query in cls._build_branch_queries(request) for part in ({}, search_query)]
+        ).get('responses', [])
+
+        if cls._responses_index_missing(responses):
+            cls._index_missing(tenant_id, index_name)
+            return None
+
+        return cls._merge_branch_responses("hybrid", responses, request["size"])
+
+
+class LocalTenantIndex:
+    """
+    Índice plano (búsqueda exacta) de un tenant en disco:
+    - vectors.f32: matriz float32 (capacidad x dimensiones) memory-mapped,
+      con los vectores normalizados para que coseno = producto punto
+    - documents.json: metadatos por fila (None en filas borradas)
+    """
+
+    def __init__(self, path: str):
+        import numpy as np
+
+        self.np = np
+        self.path = path
+        self.vectors_path = os.path.join(path, "vectors.f32")
+        self.documents_path = os.path.join(path, "documents.json")
+        self.lock = threading.RLock()
+        self.dimensions = None
+        self.rows: List[Optional[Dict]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.vectors = None
+        self._lexical_stats = None
+
+        if os.path.exists(self.documents_path):
+            self._load()
+
+    # ------------------------------------------------------- persistencia
+
+    def _load(self):
+        with open(self.documents_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+
+        self.dimensions = state["dimensions"]
+        self.rows = state["rows"]
+        self.id_to_row = {row["_id"]: position for position, row in enumerate(self.rows) if row}
+        capacity = os.path.getsize(self.vectors_path) // (4 * self.dimensions)
+        self.vectors = self.np.memmap(self.vectors_path, dtype=self.np.float32, mode="r+", shape=(capacity, self.dimensions))
+
+    def _ensure_capacity(self, rows_needed: int):
+        capacity = 0 if self.vectors is None else self.vectors.shape[0]
+        if rows_needed <= capacity:
+            return
+
+        new_capacity = max(64, capacity * 2, rows_needed)
+        if self.vectors is not None:
+            self.vectors.flush()
+            self.vectors = None
+
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(new_capacity * self.dimensions * 4)
+
+        self.vectors = self.np.memmap(self.vectors_path, dtype=self.np.float32, mode="r+", shape=(new_capacity, self.dimensions))
+
+    def _persist(self):
+        if self.vectors is not None:
+            self.vectors.flush()
+
+        # Escritura atómica de los metadatos
+        temporary_path = self.documents_path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"dimensions": self.dimensions, "rows": self.rows}, f, ensure_ascii=False)
+        os.replace(temporary_path, self.documents_path)
+
+    # ---------------------------------------------------------- escritura
+
+    def upsert(self, document_id: str, document: Dict):
+
+        embedding = document.get("embedding")
+        embedding = self.np.asarray(embedding, dtype=self.np.float32) if embedding is not None else None
+
+        with self.lock:
+            if embedding is None:
+                # Tombstone (chunk casi duplicado): fila sin vector que las búsquedas ignoran
+                if self.dimensions is None:
+                    raise ValueError("Un tombstone no puede ser la primera fila del índice")
+                embedding = self.np.zeros(self.dimensions, dtype=self.np.float32)
+
+            if self.dimensions is None:
+                os.makedirs(self.path, exist_ok=True)
+                self.dimensions = len(embedding)
+
+            if len(embedding) != self.dimensions:
+                raise ValueError(f"Dimensión {len(embedding)} distinta a la del índice ({self.dimensions})")
+
+            position = self.id_to_row.get(document_id)
+            if position is None:
+                position = len(self.rows)
+                self._ensure_capacity(position + 1)
+                self.rows.append(None)
+                self.id_to_row[document_id] = position
+
+            norm = float(self.np.linalg.norm(embedding))
+            self.vectors[position] = embedding / norm if norm else embedding
+            self.rows[position] = dict({key: value for key, value in document.items() if key != "embedding"}, _id=document_id)
+            self._lexical_stats = None
+
+    def delete(self, document_ids: List[str]):
+
+        with self.lock:
+            for document_id in document_ids:
+                position = self.id_to_row.pop(document_id, None)
+                if position is not None:
+                    self.rows[position] = None
+            self._lexical_stats = None
+
+            if len(self.id_to_row) < len(self.rows) // 2:
+                self._compact()
+
+    def _compact(self):
+        live = [position for position, row in enumerate(self.rows) if row]
+        vectors = self.np.array(self.vectors[live]) if live else None
+
+        self.rows = [self.rows[position] for position in live]
+        self.id_to_row = {row["_id"]: position for position, row in enumerate(self.rows)}
+
+        self.vectors = None
+        with open(self.vectors_path, "wb") as f:
+            f.truncate(max(64, len(self.rows)) * self.dimensions * 4)
+        self.vectors = self.np.memmap(self.vectors_path, dtype=self.np.float32, mode="r+", shape=(max(64, len(self.rows)), self.dimensions))
+        if vectors is not None:
+            self.vectors[:len(self.rows)] = vectors
+
+    def flush(self):
+        with self.lock:
+            if self.dimensions is not None:
+                self._persist()
+
+    # ------------------------------------------------------------ lectura
+
+    def _matching_rows(self, filters: List[Dict]) -> List[int]:
+        # Los filtros son los mismos term de OpenSearch (tenant_id, document_type, source_file)
+        terms = [next(iter(clause["term"].items())) for clause in filters]
+        return [
+            position for position, row in enumerate(self.rows)
+            if row and "duplicate_of" not in row
+            and all(row.get(field) == (value.get("value") if isinstance(value, dict) else value) for field, value in terms)
+        ]
+
+    def hits(self, positions: List[int], scores: List[float]) -> List[Dict]:
+        return [
+            {
+                "_id": self.rows[position]["_id"],
+                "_score": float(score),
+                "_source": {field: self.rows[position].get(field) for field in SOURCE_FIELDS if field in self.rows[position]}
+            }
+            for position, score in zip(positions, scores)
+        ]
+
+    def add_embeddings(self, hits: List[Dict]):
+        # Vectores normalizados de la matriz, como los devuelve un índice innerproduct
+        with self.lock:
+            for hit in hits:
+                position = self.id_to_row.get(hit["_id"])
+                if position is not None:
+                    hit["_source"]["embedding"] = self.vectors[position].copy()
+
+    def vector_search(self, question_embedding: List[float], filters: List[Dict], size: int) -> List[Dict]:
+
+        np = self.np
+        with self.lock:
+            positions = self._matching_rows(filters)
+            if not positions or question_embedding is None:
+                return []
+
+            query = np.asarray(question_embedding, dtype=np.float32)
+            norm = float(np.linalg.norm(query))
+            if norm:
+                query = query / norm
+
+            similarities = self.vectors[positions] @ query
+            top = min(size, len(positions))
+            best = np.argpartition(-similarities, top - 1)[:top]
+            best = best[np.argsort(-similarities[best])]
+
+            # Misma escala que cosinesimil en OpenSearch: (1 + coseno) / 2
+            return self.hits([positions[i] for i in best], [(1 + similarities[i]) / 2 for i in best])
+
+    def lexical_search(self, question: str, filters: List[Dict], size: int, k1: float = 1.2, b: float = 0.75) -> List[Dict]:
+
+        query_terms = set(tokenize(question))
+
+        with self.lock:
+            positions = self._matching_rows(filters)
+            if not positions or not query_terms:
+                return []
+
+            stats = self._get_lexical_stats()
+            document_count = len(stats["lengths"])
+            average_length = sum(stats["lengths"].values()) / max(1, document_count)
+
+            scores = []
+            for position in positions:
+                frequencies = stats["frequencies"].get(position)
+                if not frequencies or not query_terms.intersection(frequencies):
+                    continue
+
+                length = stats["lengths"][position]
+                score = 0.0
+                for term in query_terms.intersection(frequencies):
+                    document_frequency = stats["document_frequencies"][term]
+                    idf = math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                    frequency = frequencies[term]
+                    score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * length / average_length))
+                scores.append((score, position))
+
+            scores.sort(reverse=True)
+            scores = scores[:size]
+            return self.hits([position for _, position in scores], [score for score, _ in scores])
+
+    def _get_lexical_stats(self) -> Dict:
+        # Estadísticas BM25 cacheadas hasta la próxima escritura
+        if self._lexical_stats is None:
+            frequencies = {}
+            lengths = {}
+            document_frequencies = Counter()
+            for position, row in enumerate(self.rows):
+                if not row or "duplicate_of" in row:
+                    continue
+                terms = [token for field in LEXICAL_FIELDS for token in tokenize(row.get(field))]
+                frequencies[position] = Counter(terms)
+                lengths[position] = len(terms)
+                document_frequencies.update(set(terms))
+            self._lexical_stats = {"frequencies": frequencies, "lengths": lengths, "document_frequencies": document_frequencies}
+        return self._lexical_stats
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    # Aproximación del analyzer standard: minúsculas y separación por no-alfanuméricos
+    return re.findall(r"\w+", (text or "").lower())
+
+
+class LocalVectorStore:
+    """
+    Backend en proceso para tests, benchmarks y tenants pequeños: un
+    LocalTenantIndex por tenant bajo base_dir (LOCAL_VECTOR_STORE_DIR),
+    siempre dedicado (TENANCY_MODE no aplica).
+    Requiere numpy.
+    """
+
+    name = "local"
+
+    def __init__(self, base_dir: str = DEFAULT_LOCAL_STORE_DIR):
+        self.base_dir = base_dir
+        self._indexes: Dict[str, LocalTenantIndex] = {}
+        self._lock = threading.Lock()
+
+    def _index(self, tenant_id: str, create: bool = False) -> Optional[LocalTenantIndex]:
+
+        path = os.path.join(self.base_dir, dedicated_index_name(tenant_id))
+
+        with self._lock:
+            index = self._indexes.get(tenant_id)
+            if index is None and (create or os.path.exists(os.path.join(path, "documents.json"))):
+                index = self._indexes[tenant_id] = LocalTenantIndex(path)
+            return index
+
+    def get_index_profile(self, tenant_id: str) -> Dict:
+        # Solo se respeta la dimensión: el índice local guarda float32 y busca exacto
+        return get_configured_index_profile(tenant_id)
+
+    def ensure_index(self, tenant_id: str) -> bool:
+        self._index(tenant_id, create=True)
+        return True
+
+    def get_document_hashes(self, tenant_id: str, source_file: str) -> Dict[str, str]:
+
+        index = self._index(tenant_id)
+        if index is None:
+            return {}
+
+        with index.lock:
+            return {
+                row["document_hash"]: row["_id"]
+                for row in index.rows
+                if row and row.get("tenant_id") == tenant_id and row.get("source_file") == source_file
+            }
+
+    def get_duplicate_hashes(self, tenant_id: str, source_file: str) -> Dict[str, str]:
+
+        index = self._index(tenant_id)
+        if index is None:
+            return {}
+
+        with index.lock:
+            return {
+                row["document_hash"]: row["duplicate_of"]
+                for row in index.rows
+                if row and "duplicate_of" in row and row.get("tenant_id") == tenant_id and row.get("source_file") == source_file
+            }
+
+    def get_document_vectors(self, tenant_id: str, source_file: str) -> Dict:
+
+        index = self._index(tenant_id)
+        if index is None:
+            return {}
+
+        with index.lock:
+            return {
+                row["_id"]: index.vectors[position].copy()
+                for position, row in enumerate(index.rows)
+                if row and "duplicate_of" not in row and row.get("tenant_id") == tenant_id and row.get("source_file") == source_file
+            }
+
+    def write_documents(self, tenant_id: str, documents: Iterable[Dict], batch_size: Optional[int] = None) -> Dict:
+
+        index = self._index(tenant_id, create=True)
+        items = []
+
+        for action, document in build_index_operations(dedicated_index_name(tenant_id), documents, tenant_id):
+            document_id = action["index"]["_id"]
+            try:
+                index.upsert(document_id, document)
+                items.append({"operation": "index", "_id": document_id, "status": 201, "attempts": 1, "error": None})
+            except Exception as e:
+                items.append({"operation": "index", "_id": document_id, "status": 400, "attempts": 1, "error": {"type": e.__class__.__name__, "reason": str(e)}})
+
+        index.flush()
+        failed = [item for item in items if item["error"]]
+
+        # Mismo formato de reporte que bulk_write
+        return {
+            "success": not failed,
+            "total": len(items),
+            "succeeded": len(items) - len(failed),
+            "failed": len(failed),
+            "retried": 0,
+            "batches": 1 if items else 0,
+            "items": items
+        }
+
+    def delete_documents(self, tenant_id: str, document_ids: List[str]) -> bool:
+
+        if not document_ids:
+            return True
+
+        index = self._index(tenant_id)
+        if index is None:
+            return True
+
+        print(f"🧹 Eliminando {len(document_ids)} chunks obsoletos de '{dedicated_index_name(tenant_id)}' (local)")
+        index.delete(document_ids)
+        index.flush()
+        return True
+
+    def search(
+        self,
+        tenant_id: str,
+        question_embedding: Optional[List[float]],
+        question: Optional[str],
+        filters: List[Dict],
+        search_mode: str,
+        size: int,
+        k: Optional[int] = None,
+        ef_search: Optional[int] = None,
+        with_embeddings: bool = False
+    ) -> Optional[Dict]:
+        # Búsqueda exacta: k y ef_search no aplican
+
+        index = self._index(tenant_id)
+        if index is None:
+            return None
+
+        if search_mode == "vector":
+            hits = index.vector_search(question_embedding, filters, size)
+            result = {"hits": hits, "total": len(hits)}
+
+        elif search_mode == "lexical":
+            hits = index.lexical_search(question, filters, size)
+            result = {"hits": hits, "total": len(hits)}
+
+        else:
+            settings = get_hybrid_settings()
+            candidates = max(size, settings["candidates"])
+            ranked_hits = [
+                index.vector_search(question_embedding, filters, candidates),
+                index.lexical_search(question, filters, candidates)
+            ]
+            result = {
+                "hits": fuse_hits(ranked_hits, [settings["vector_weight"], settings["lexical_weight"]], size),
+                "total": len({hit["_id"] for branch_hits in ranked_hits for hit in branch_hits})
+            }
+
+        if with_embeddings:
+            index.add_embeddings(result["hits"])
+
+        return result
+
+    def search_many(self, tenant_id: str, requests: List[Dict]) -> Optional[List[Dict]]:
+        # En proceso no hay round-trips que ahorrar: una búsqueda por request
+
+        if self._index(tenant_id) is None:
+            return None
+
+        results = []
+        for request in requests:
+            try:
+                results.append(self.search(
+                    tenant_id, request["question_embedding"], request["question"],
+                    request["filters"], request["search_mode"], request["size"],
+                    with_embeddings=request.get("with_embeddings", False)
+                ))
+            except Exception as e:
+                results.append({"error": str(e)})
+
+        return results
+
+
+_vector_stores = {}
+_lock = threading.Lock()
+
+
+def get_vector_store():
+    """
+    Backend según VECTOR_STORE_BACKEND: opensearch (default) o local
+    (LOCAL_VECTOR_STORE_DIR, default /tmp/rag-vector-store)
+    """
+    backend = os.environ.get("VECTOR_STORE_BACKEND", "opensearch").lower()
+
+    if backend not in VECTOR_STORE_BACKENDS:
+        raise ValueError(f"VECTOR_STORE_BACKEND inválido: {backend}. Valores permitidos: {', '.join(VECTOR_STORE_BACKENDS)}")
+
+    key = (backend, os.environ.get("LOCAL_VECTOR_STORE_DIR", DEFAULT_LOCAL_STORE_DIR))
+
+    with _lock:
+        if key not in _vector_stores:
+            if backend == "local":
+                _vector_stores[key] = LocalVectorStore(key[1])
+            else:
+                _vector_stores[key] = OpenSearchVectorStore()
+        return _vector_stores[key]
+
+
+def reset_vector_stores():
+    with _lock:
+        _vector_stores.clear()
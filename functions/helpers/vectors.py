@@ -0,0 +1,201 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# Los embeddings viajan como float32: 4 bytes por dimensión y operaciones vectorizadas
+VECTOR_DTYPE = np.float32
+
+# Candidatos que se piden a la búsqueda para diversificar con MMR
+DEFAULT_MMR_CANDIDATES = 30
+
+
+def to_vector(values) -> np.ndarray:
+    # Lista de Bedrock / bytes del cache / vector ya convertido -> ndarray float32 (sin copiar si ya lo es)
+    return np.asarray(values, dtype=VECTOR_DTYPE)
+
+
+def vector_to_list(vector) -> List:
+    # Para cuerpos que serializa opensearch-py o respuestas JSON
+    return vector.tolist() if isinstance(vector, np.ndarray) else list(vector)
+
+
+def vector_norm(vector) -> float:
+    return float(np.linalg.norm(vector))
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    # Filas de norma 1 (las de norma 0 quedan en 0): coseno = producto punto
+    matrix = np.asarray(matrix, dtype=VECTOR_DTYPE)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def is_valid_embedding(vector) -> bool:
+    # OpenSearch rechaza NaN/inf y cosinesimil no admite vectores de norma 0
+    vector = to_vector(vector)
+    return vector.size > 0 and bool(np.isfinite(vector).all()) and vector_norm(vector) > 0
+
+
+@lru_cache(maxsize=16)
+def _vector_format(dimensions: int, integer: bool) -> str:
+    # %.9g reproduce exactamente cada float32 con la mitad de caracteres que json.dumps de float64
+    return ",".join(["%d" if integer else "%.9g"] * dimensions)
+
+
+def format_vector_json(vector) -> str:
+    """
+    Array JSON de un vector con una sola operación de formato por vector
+    (json.dumps formatea cada float por separado). Los enteros (perfil byte)
+    se escriben como %d.
+    """
+    vector = np.asarray(vector)
+
+    if vector.ndim != 1:
+        raise ValueError(f"Se esperaba un vector, no un array de forma {vector.shape}")
+
+    integer = np.issubdtype(vector.dtype, np.integer)
+    if not integer and not np.isfinite(vector).all():
+        raise ValueError("El vector tiene valores NaN o infinitos")
+
+    return "[" + _vector_format(len(vector), integer) % tuple(vector.tolist()) + "]"
+
+
+def dumps_document(document: Dict) -> str:
+    """
+    json.dumps de un documento bulk: los campos ndarray (embedding) se
+    escriben con format_vector_json y el resto con json.dumps
+    """
+    vectors = {field: value for field, value in document.items() if isinstance(value, np.ndarray)}
+
+    if not vectors:
+        return json.dumps(document, ensure_ascii=False)
+
+    fields = json.dumps({field: value for field, value in document.items() if field not in vectors}, ensure_ascii=False)
+    vector_fields = ", ".join(f"{json.dumps(field)}: {format_vector_json(value)}" for field, value in vectors.items())
+
+    return fields[:-1] + (", " if fields != "{}" else "") + vector_fields + "}"
+
+
+class NearDuplicateFilter:
+    """
+    Detecta chunks casi duplicados (encabezados y pies de página repetidos,
+    cláusulas copiadas) dentro de un documento: cada vector se compara con
+    todos los ya aceptados en un solo producto matriz-vector
+    """
+
+    def __init__(self, threshold: float, capacity: int = 64):
+        self.threshold = threshold
+        self._matrix = None
+        self._keys = []
+        self._capacity = capacity
+
+    def match(self, vector, key=None):
+        """
+        Clave del vector aceptado más parecido si está a similitud coseno
+        >= threshold; si no hay ninguno, acepta vector con key (default su
+        posición) y devuelve None
+        """
+        normalized = normalize_rows(vector)
+        size = len(self._keys)
+
+        if size:
+            similarities = self._matrix[:size] @ normalized
+            best = int(np.argmax(similarities))
+            if float(similarities[best]) >= self.threshold:
+                return self._keys[best]
+
+        self._append(normalized, key)
+        return None
+
+    def is_duplicate(self, vector) -> bool:
+        """
+        True si vector está a similitud coseno >= threshold de uno ya
+        aceptado; si no, lo acepta
+        """
+        return self.match(vector) is not None
+
+    def add(self, vector, key=None):
+        # Acepta sin comparar (chunks ya indexados que siguen en el documento)
+        self._append(normalize_rows(vector), key)
+
+    def _append(self, normalized: np.ndarray, key):
+
+        size = len(self._keys)
+
+        if self._matrix is None:
+            self._matrix = np.empty((self._capacity, len(normalized)), dtype=VECTOR_DTYPE)
+        elif size == len(self._matrix):
+            # Crece al doble: append amortizado O(1) sin re-apilar la matriz
+            self._matrix = np.concatenate([self._matrix, np.empty_like(self._matrix)])
+
+        self._matrix[size] = normalized
+        self._keys.append(size if key is None else key)
+
+
+def get_chunk_dedup_threshold() -> Optional[float]:
+    """
+    CHUNK_DEDUP_THRESHOLD: similitud coseno desde la que un chunk se
+    considera duplicado de otro del mismo documento (vacío = no se deduplica)
+    """
+    threshold = os.environ.get("CHUNK_DEDUP_THRESHOLD")
+    if not threshold:
+        return None
+
+    threshold = float(threshold)
+    if not 0 < threshold <= 1:
+        raise ValueError(f"CHUNK_DEDUP_THRESHOLD inválido: {threshold}. Debe estar en (0, 1]")
+    return threshold
+
+
+def get_mmr_settings() -> Dict:
+    """
+    MMR_LAMBDA: peso de la relevancia frente a la diversidad en (0, 1]
+    (vacío = sin MMR); MMR_CANDIDATES: candidatos que se diversifican
+    """
+    mmr_lambda = os.environ.get("MMR_LAMBDA")
+    mmr_lambda = float(mmr_lambda) if mmr_lambda else None
+
+    if mmr_lambda is not None and not 0 < mmr_lambda <= 1:
+        raise ValueError(f"MMR_LAMBDA inválido: {mmr_lambda}. Debe estar en (0, 1]")
+
+    return {
+        "lambda": mmr_lambda,
+        "candidates": max(1, int(os.environ.get("MMR_CANDIDATES", DEFAULT_MMR_CANDIDATES)))
+    }
+
+
+def mmr(query_vector, candidate_vectors: Sequence, mmr_lambda: float, size: int) -> List[int]:
+    """
+    Maximal Marginal Relevance: elige size candidatos maximizando
+    lambda * sim(pregunta, d) - (1 - lambda) * max sim(d, elegidos)
+
+    Las similitudes entre candidatos se calculan una vez (matriz n x n) y
+    cada paso actualiza el máximo contra los elegidos con una fila.
+
+    Returns:
+        Posiciones de los candidatos elegidos, en orden de selección
+    """
+    if not len(candidate_vectors) or size <= 0:
+        return []
+
+    candidates = normalize_rows(np.asarray(candidate_vectors))
+    relevance = candidates @ normalize_rows(query_vector)
+    similarities = candidates @ candidates.T
+
+    selected = []
+    available = np.ones(len(candidates), dtype=bool)
+    redundancy = np.zeros(len(candidates), dtype=VECTOR_DTYPE)
+
+    for _ in range(min(size, len(candidates))):
+        scores = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarities[best])
+
+    return selected
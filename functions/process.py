@@ -1,102 +1,248 @@
 import json
 import urllib.parse
-import boto3
 import os
-from helpers.rag_helpers import (
-    extract_pdf_text, 
-    get_chunks, 
-    get_embeddings,
-    create_opensearch_client,
-    create_index_if_not_exists,
-    index_document_bulk
+from helpers.strategies import pdf_stream_strategy, jpg_strategy
+from helpers.opensearch_indexing import (
+    opensearch_indexing, opensearch_indexing_stream, get_existing_chunk_hashes, get_existing_duplicate_hashes,
+    make_needs_embedding, get_embedding_dimensions
 )
-from helpers.strategies import pdf_strategy, jpg_strategy
-from helpers.opensearch_indexing import opensearch_indexing
+from helpers.clients import get_aws_client
+from helpers.embedding_cache import get_embedding_cache
+from helpers.idempotency import get_idempotency_store, ingestion_idempotency_key
+from helpers.fanout import should_fan_out, fanout_pdf_ingestion, run_fanout_task
+from helpers.tenancy import run_tenancy_migration
+from helpers.metrics import metrics_scope, span, count, get_metrics
+from concurrent.futures import ThreadPoolExecutor
+
+# Archivos procesados en paralelo dentro de una invocación
+DEFAULT_MAX_CONCURRENCY = 2
+# No empezar un archivo si queda menos que esto del timeout; vuelve a la cola
+DEFAULT_MIN_REMAINING_MS = 120000
+
 
 def lambda_handler(event, context):
     
-    s3_client = boto3.client('s3')
+    # Invocación de worker desde el coordinador de fan-out
+    if 'fanout_task' in event:
+        return run_fanout_task(event)
     
-    for record in event.get('Records', []):
-        try:
-            event_name = record.get('eventName', '')
-            bucket_name = record['s3']['bucket']['name']
-            object_key = urllib.parse.unquote_plus(
-                record['s3']['object']['key'], 
-                encoding='utf-8'
-            )
-            object_size = record['s3']['object']['size']
-            
-            path_parts = object_key.split('/')
-            if len(path_parts) < 3:
-                print(f"❌ Path inválido: {object_key}")
-                continue
-                
-            tenant_id = path_parts[1] if path_parts[0] == 'uploads' else 'unknown'
-            document_type = path_parts[2] if len(path_parts) >= 3 else 'general'
-            filename = path_parts[-1]
-            
-            extension = '.' + filename.split('.')[-1].lower() if '.' in filename else ''
-            
-            print(f"Tenant ID: {tenant_id}")
-            print(f"Tipo documento: {document_type}")
-            print(f"Nombre archivo: {filename}")
-            print(f"Extensión: {extension}")
-            
-            result = process_file(
-                s3_client, bucket_name, object_key, 
-                tenant_id, document_type, filename, extension
-            )
-              
-        except Exception as e:
-            print(f"❌ Error procesando archivo {object_key}: {str(e)}")
-            continue
-        
-        print("=== FIN PROCESAMIENTO ===")
+    # Migración de tenant entre índice propio y pool (promoción automática u operador)
+    if 'tenancy_migration' in event:
+        return run_tenancy_migration(event)
+    
+    records = event.get('Records', [])
+    
+    if records and records[0].get('eventSource') == 'aws:sqs':
+        return handle_sqs_batch(records, context)
+    
+    # Invocación directa desde la notificación de S3 (despliegues sin cola)
+    results = run_ingestion_jobs([(None, record) for record in records], context)
+    failed = [result for result in results if result['status'] == 'failed']
+    
+    if failed:
+        # Que la invocación asíncrona reintente en vez de perder los archivos
+        raise RuntimeError(f"Fallaron {len(failed)} de {len(results)} archivos: {[result['object_key'] for result in failed]}")
     
     return {
         'statusCode': 200,
         'body': json.dumps({
-            'message': f'Procesados {len(event.get("Records", []))} archivos exitosamente'
+            'message': f'Procesados {len(records)} archivos exitosamente'
         })
     }
 
 
+def handle_sqs_batch(messages, context):
+    """
+    Procesa un lote de SQS donde cada mensaje es una notificación de S3.
+    Devuelve batchItemFailures: solo los mensajes fallidos vuelven a la cola
+    (y tras maxReceiveCount intentos, a la DLQ).
+    """
+    jobs = []
+    failed_message_ids = []
+    
+    for message in messages:
+        try:
+            notification = json.loads(message['body'])
+        except (json.JSONDecodeError, KeyError, TypeError):
+            print(f"❌ Mensaje {message.get('messageId')} no es una notificación de S3 válida")
+            failed_message_ids.append(message.get('messageId'))
+            continue
+        
+        # s3:TestEvent y similares no traen Records
+        for record in notification.get('Records', []):
+            jobs.append((message['messageId'], record))
+    
+    for result in run_ingestion_jobs(jobs, context):
+        if result['status'] == 'failed' and result['message_id'] not in failed_message_ids:
+            failed_message_ids.append(result['message_id'])
+    
+    print(f"📬 Lote SQS: {len(messages)} mensajes, {len(jobs)} archivos, {len(failed_message_ids)} mensajes a reintentar")
+    
+    return {
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_message_ids]
+    }
+
+
+def get_process_concurrency():
+    return max(1, int(os.environ.get('PROCESS_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)))
+
+
+def run_ingestion_jobs(jobs, context):
+    
+    if not jobs:
+        return []
+    
+    s3_client = get_aws_client('s3')
+    workers = min(get_process_concurrency(), len(jobs))
+    
+    # Un PDF lento ya no bloquea al resto del lote
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda job: run_ingestion_job(s3_client, job[0], job[1], context), jobs))
+
+
+def run_ingestion_job(s3_client, message_id, record, context):
+    
+    object_key = None
+    
+    try:
+        bucket_name = record['s3']['bucket']['name']
+        object_key = urllib.parse.unquote_plus(
+            record['s3']['object']['key'], 
+            encoding='utf-8'
+        )
+        object_version = record['s3']['object'].get('versionId') or record['s3']['object'].get('eTag')
+        
+        job = {"message_id": message_id, "object_key": object_key}
+        
+        path_parts = object_key.split('/')
+        if len(path_parts) < 3:
+            print(f"❌ Path inválido: {object_key}")
+            return dict(job, status="skipped")
+            
+        tenant_id = path_parts[1] if path_parts[0] == 'uploads' else 'unknown'
+        document_type = path_parts[2] if len(path_parts) >= 3 else 'general'
+        filename = path_parts[-1]
+        
+        extension = '.' + filename.split('.')[-1].lower() if '.' in filename else ''
+        
+        min_remaining_ms = int(os.environ.get('PROCESS_MIN_REMAINING_MS', DEFAULT_MIN_REMAINING_MS))
+        if context is not None and context.get_remaining_time_in_millis() < min_remaining_ms:
+            print(f"⏱️ Sin tiempo suficiente para {object_key}, vuelve a la cola")
+            return dict(job, status="failed")
+        
+        idempotency_store = get_idempotency_store()
+        idempotency_key = ingestion_idempotency_key(bucket_name, object_key, object_version)
+        
+        if not idempotency_store.acquire(idempotency_key):
+            print(f"♻️ {object_key} ya fue procesado o está en proceso, se omite")
+            return dict(job, status="duplicate")
+        
+        print(f"Tenant ID: {tenant_id}")
+        print(f"Tipo documento: {document_type}")
+        print(f"Nombre archivo: {filename}")
+        print(f"Extensión: {extension}")
+        
+        # Una línea EMF por archivo con los tiempos de cada etapa
+        with metrics_scope("ingest", tenant_id=tenant_id, object_key=object_key, file_type=extension) as metrics:
+            try:
+                result = process_file(
+                    s3_client, bucket_name, object_key, 
+                    tenant_id, document_type, filename, extension
+                )
+            except Exception as e:
+                result = {"success": False, "message": str(e)}
+            
+            metrics.count("files_failed" if not (result.get('success') or result.get('skipped')) else "files_processed")
+        
+        if result.get('success', False) or result.get('skipped', False):
+            idempotency_store.complete(idempotency_key)
+            print("=== FIN PROCESAMIENTO ===")
+            return dict(job, status="skipped" if result.get('skipped') else "processed")
+        
+        # Se libera el lock para que el reintento de SQS pueda procesarlo
+        idempotency_store.release(idempotency_key)
+        print(f"❌ Error procesando archivo {object_key}: {result.get('message')}")
+        return dict(job, status="failed")
+          
+    except Exception as e:
+        print(f"❌ Error procesando archivo {object_key}: {str(e)}")
+        return {"message_id": message_id, "object_key": object_key, "status": "failed"}
+
+
 def process_file(s3_client, bucket_name, object_key, tenant_id, document_type, filename, extension):
     
     try:
         
-        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
-        file_content = response['Body'].read()
+        with span("download"):
+            response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+            file_content = response['Body'].read()
+        count("bytes_downloaded", len(file_content), "Bytes")
 
-        embeddings = None
-        chunks = None
+        if extension == '.pdf' and should_fan_out(file_content):
+            # PDFs grandes: rangos de páginas en paralelo para no pasar los 15 min
+            indexing_result = fanout_pdf_ingestion(
+                file_content, bucket_name, object_key, tenant_id, document_type, filename
+            )
+        
+        elif extension == '.pdf':
+            indexed_hashes = get_existing_chunk_hashes(tenant_id, object_key)
+            duplicate_hashes = get_existing_duplicate_hashes(tenant_id, object_key) if indexed_hashes else {}
+            embedded_chunks = pdf_stream_strategy(
+                file_content,
+                make_needs_embedding(tenant_id, object_key, indexed_hashes, duplicate_hashes),
+                dimensions=get_embedding_dimensions(tenant_id)
+            )
 
-        if extension == '.pdf':
-            chunks, embeddings = pdf_strategy(file_content)
+            # Parseo, embeddings e indexado avanzan en paralelo por lotes
+            indexing_result = opensearch_indexing_stream(
+                embedded_chunks, tenant_id, document_type, object_key, filename,
+                indexed_hashes=indexed_hashes,
+                duplicate_hashes=duplicate_hashes
+            )
         
         elif extension == '.jpg':
-            chunks, embeddings = jpg_strategy(file_content, filename)
+            chunks, embeddings = jpg_strategy(file_content, filename, dimensions=get_embedding_dimensions(tenant_id))
+
+            if not embeddings or not chunks:
+                return {
+                    "success": False,
+                    "message": "No se pudieron generar embeddings o chunks"
+                }
+
+            indexing_result = opensearch_indexing(embeddings, chunks, tenant_id, document_type, object_key, filename)
         
         else:
             return {
+                "skipped": True,
                 "message": "Proximamente mas extensiones"
             }
 
-        
-        if not embeddings or not chunks:
-            return {
-                "success": False,
-                "message": "No se pudieron generar embeddings o chunks"
-            }
-        
-        opensearch_indexing(embeddings, chunks, tenant_id, document_type, object_key, filename)
+        if not indexing_result.get("success", False):
+            return indexing_result
 
-        return {
+        result = {
             "success": True,
-            "message": "Archivo procesado correctamente"
+            "message": "Archivo procesado correctamente",
+            "details": indexing_result.get("details", {})
         }
 
+        # Solo este archivo: stats() de la cache acumula todo el contenedor
+        # y mezclaría los archivos procesados en paralelo
+        embedding_cache = get_embedding_cache()
+        metrics = get_metrics()
+        if embedding_cache and metrics is not None:
+            counters = metrics.snapshot()["counters"]
+            hits = counters.get("embedding_cache_hits", 0)
+            misses = counters.get("embedding_requests", 0)
+            result["embedding_cache"] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0
+            }
+            print(f"🧮 Cache de embeddings: {result['embedding_cache']}")
+
+        return result
+
         
     except Exception as e:
         print(f"❌ Error procesando PDF: {str(e)}")
@@ -1,5 +1,7 @@
 import json
 from helpers.strategies import query_strategy
+from helpers.hybrid_search import SEARCH_MODES, SEARCH_OPTION_LIMITS
+from helpers.metrics import metrics_scope
 
 def lambda_handler(event, context):
     
@@ -16,15 +18,20 @@ def lambda_handler(event, context):
         tenant_id = body.get('tenant_id', '').strip()
         question = body.get('question', '').strip()
         document_type = body.get('document_type', None)  # Opcional
+        use_cache = body.get('use_cache', True) is not False  # Opcional, para forzar una respuesta fresca
+        search_mode = body.get('search_mode', None)  # Opcional: vector | lexical | hybrid
+        include_timings = body.get('include_timings', False) is True  # Opcional: tiempos por etapa en la respuesta
+        search_options = get_search_options(body)  # Opcional: size, k y ef_search de la búsqueda kNN
         
-        validation_error = validate_query_request(tenant_id, question)
+        validation_error = validate_query_request(tenant_id, question, search_mode, search_options)
         if validation_error:
             return create_error_response(400, validation_error)
         
         if document_type:
             print(f"📂 Filtro document_type: {document_type}")
         
-        rag_result = query_strategy(question, tenant_id, document_type)
+        with metrics_scope("query", tenant_id=tenant_id, search_mode=search_mode) as metrics:
+            rag_result = query_strategy(question, tenant_id, document_type, use_cache, search_mode, search_options)
         
         if not rag_result.get('success', False):
             return create_error_response(500, rag_result.get('message', 'Error en consulta RAG'))
@@ -38,6 +45,12 @@ def lambda_handler(event, context):
             'question': question
         }
         
+        if 'cache' in rag_result:
+            response_body['cache'] = rag_result['cache']
+        
+        if include_timings:
+            response_body['timings'] = metrics.snapshot()
+        
         return create_success_response(response_body)
         
     except json.JSONDecodeError:
@@ -49,11 +62,53 @@ def lambda_handler(event, context):
         return create_error_response(500, "Error interno en consulta")
 
 
-def validate_query_request(tenant_id, question):
+def get_search_options(body):
+    return {name: body[name] for name in SEARCH_OPTION_LIMITS if body.get(name) is not None}
+
+
+def validate_query_request(tenant_id, question, search_mode=None, search_options=None):
+
+    return validate_tenant_request(tenant_id, search_mode, search_options) or validate_question(question)
+
+
+def validate_tenant_request(tenant_id, search_mode=None, search_options=None):
 
     if not tenant_id:
         return "tenant_id es requerido"
     
+    import re
+    if not re.match(r'^cliente_[a-z0-9]+$', tenant_id):
+        return "tenant_id debe tener formato: cliente_[a-z0-9]+"
+    
+    if search_mode is not None and search_mode not in SEARCH_MODES:
+        return f"search_mode debe ser uno de: {', '.join(SEARCH_MODES)}"
+    
+    return validate_search_options(search_options or {})
+
+
+def validate_search_options(search_options):
+
+    for name, value in search_options.items():
+        limit = SEARCH_OPTION_LIMITS[name]
+        if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= limit:
+            return f"{name} debe ser un entero entre 1 y {limit}"
+    
+    size = search_options.get('size')
+    k = search_options.get('k')
+    ef_search = search_options.get('ef_search')
+    
+    # HNSW necesita ef_search >= k, y k < size dejaría hits sin llenar
+    if k and size and k < size:
+        return "k debe ser mayor o igual que size"
+    
+    if ef_search and k and ef_search < k:
+        return "ef_search debe ser mayor o igual que k"
+    
+    return None
+
+
+def validate_question(question):
+
     if not question:
         return "question es requerida"
     
@@ -63,10 +118,6 @@ def validate_query_request(tenant_id, question):
     if len(question) > 2000:
         return "question demasiado larga (máximo 2000 caracteres)"
     
-    import re
-    if not re.match(r'^cliente_[a-z0-9]+$', tenant_id):
-        return "tenant_id debe tener formato: cliente_[a-z0-9]+"
-    
     return None
 
 
@@ -0,0 +1,105 @@
+import json
+import os
+from helpers.strategies import batch_query_strategy
+from helpers.metrics import metrics_scope
+from query import validate_tenant_request, validate_question, get_search_options, create_success_response, create_error_response
+
+# API Gateway corta a los 29 s: con 5 generaciones a la vez y ~3-4 s por
+# respuesta de Nova Pro, 20 preguntas quedan dentro del límite
+DEFAULT_MAX_BATCH_QUESTIONS = 20
+
+
+def lambda_handler(event, context):
+
+    try:
+        body = json.loads(event.get('body', '{}'))
+
+        tenant_id = body.get('tenant_id', '').strip()
+        questions = body.get('questions', None)
+        document_type = body.get('document_type', None)  # Opcional
+        use_cache = body.get('use_cache', True) is not False  # Opcional, para forzar respuestas frescas
+        search_mode = body.get('search_mode', None)  # Opcional: vector | lexical | hybrid
+        include_timings = body.get('include_timings', False) is True  # Opcional: tiempos por etapa del lote
+        search_options = get_search_options(body)  # Opcional: size, k y ef_search, iguales para todo el lote
+
+        validation_error = validate_tenant_request(tenant_id, search_mode, search_options) or validate_questions(questions)
+        if validation_error:
+            return create_error_response(400, validation_error)
+
+        questions = [question.strip() if isinstance(question, str) else '' for question in questions]
+
+        # Las preguntas inválidas reciben su error sin frenar al resto del lote
+        question_errors = {i: validate_question(question) for i, question in enumerate(questions)}
+        valid_questions = [question for i, question in enumerate(questions) if not question_errors[i]]
+
+        with metrics_scope("query_batch", tenant_id=tenant_id, search_mode=search_mode, questions=len(questions)) as metrics:
+            if valid_questions:
+                rag_result = batch_query_strategy(valid_questions, tenant_id, document_type, use_cache, search_mode, search_options)
+            else:
+                rag_result = {"success": True, "results": []}
+
+        if not rag_result.get('success', False):
+            return create_error_response(500, rag_result.get('message', 'Error en consulta RAG por lotes'))
+
+        answers = iter(rag_result['results'])
+        results = []
+
+        for i, question in enumerate(questions):
+            if question_errors[i]:
+                results.append({'question': question, 'success': False, 'error': question_errors[i]})
+                continue
+
+            rag_answer = next(answers)
+
+            if not rag_answer.get('success', False):
+                results.append({'question': question, 'success': False, 'error': rag_answer.get('message', 'Error en consulta RAG')})
+                continue
+
+            result = {
+                'question': question,
+                'success': True,
+                'answer': rag_answer.get('answer'),
+                'sources': rag_answer.get('sources', []),
+                'total_documents_searched': rag_answer.get('total_documents_searched', 0)
+            }
+
+            if 'cache' in rag_answer:
+                result['cache'] = rag_answer['cache']
+
+            results.append(result)
+
+        response_body = {
+            'success': True,
+            'tenant_id': tenant_id,
+            'results': results,
+            'answered': sum(1 for result in results if result['success'])
+        }
+
+        if include_timings:
+            response_body['timings'] = metrics.snapshot()
+
+        return create_success_response(response_body)
+
+    except json.JSONDecodeError:
+        return create_error_response(400, "Invalid JSON in request body")
+    except Exception as e:
+        print(f"Error en query RAG por lotes: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return create_error_response(500, "Error interno en consulta por lotes")
+
+
+def get_max_batch_questions():
+    return max(1, int(os.environ.get('MAX_BATCH_QUESTIONS', DEFAULT_MAX_BATCH_QUESTIONS)))
+
+
+def validate_questions(questions):
+
+    if not isinstance(questions, list) or not questions:
+        return "questions debe ser una lista no vacía"
+
+    max_questions = get_max_batch_questions()
+    if len(questions) > max_questions:
+        return f"Demasiadas preguntas en el lote (máximo {max_questions})"
+
+    return None
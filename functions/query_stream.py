@@ -0,0 +1,171 @@
+"""
+Consulta RAG en streaming (NDJSON): un evento JSON por línea, con las
+fuentes primero y luego los tokens de Nova Pro a medida que se generan.
+
+El runtime administrado de Python no soporta response streaming, así que la
+Lambda corre este módulo como servidor HTTP detrás de Lambda Web Adapter
+(run.sh) con una function URL en modo RESPONSE_STREAM. lambda_handler queda
+como fallback bufferizado con el mismo formato; /query sigue devolviendo JSON.
+"""
+import json
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from helpers.strategies import stream_query_strategy
+from helpers.metrics import metrics_scope
+from query import validate_query_request, get_search_options
+
+
+def parse_stream_request(raw_body):
+
+    try:
+        body = json.loads(raw_body or '{}')
+    except json.JSONDecodeError:
+        return None, "Invalid JSON in request body"
+
+    if not isinstance(body, dict):
+        return None, "El cuerpo debe ser un objeto JSON"
+
+    for field in ('tenant_id', 'question', 'document_type', 'search_mode'):
+        if body.get(field) is not None and not isinstance(body[field], str):
+            return None, f"{field} debe ser un string"
+
+    tenant_id = (body.get('tenant_id') or '').strip()
+    question = (body.get('question') or '').strip()
+
+    search_mode = body.get('search_mode', None)
+    search_options = get_search_options(body)
+
+    validation_error = validate_query_request(tenant_id, question, search_mode, search_options)
+    if validation_error:
+        return None, validation_error
+
+    return {
+        'tenant_id': tenant_id,
+        'question': question,
+        'document_type': body.get('document_type', None),
+        'use_cache': body.get('use_cache', True) is not False,
+        'search_mode': search_mode,
+        'search_options': search_options
+    }, None
+
+
+def iter_query_events(params):
+
+    with metrics_scope("query_stream", tenant_id=params['tenant_id'], search_mode=params['search_mode']):
+        for event in stream_query_strategy(
+            params['question'],
+            params['tenant_id'],
+            params['document_type'],
+            params['use_cache'],
+            params['search_mode'],
+            params['search_options']
+        ):
+            yield (json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+class QueryStreamHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        # Readiness check de Lambda Web Adapter
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        headers_sent = False
+
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            params, error = parse_stream_request(self.rfile.read(length).decode('utf-8'))
+
+            if error:
+                self.send_json(400, {'success': False, 'error': error})
+                return
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            headers_sent = True
+
+            for line in iter_query_events(params):
+                self.write_chunk(line)
+            self.write_chunk(b"")
+
+        except Exception as e:
+            print(f"❌ Error en consulta streaming: {str(e)}")
+            try:
+                if not headers_sent:
+                    self.send_json(500, {'success': False, 'error': f"Internal server error: {str(e)}"})
+                    return
+                # Con el 200 ya enviado el error viaja como último evento y se cierra el stream
+                event = {"type": "error", "message": f"Internal server error: {str(e)}"}
+                self.write_chunk((json.dumps(event, ensure_ascii=False) + "\n").encode('utf-8'))
+                self.write_chunk(b"")
+            except OSError:
+                # El cliente ya cerró la conexión
+                pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def write_chunk(self, data):
+        # Cada evento viaja en su propio chunk HTTP para que el cliente lo vea de inmediato
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+
+def lambda_handler(event, context):
+    # Fallback sin streaming: mismo NDJSON, entregado al final
+
+    params, error = parse_stream_request(event.get('body', '{}'))
+
+    headers = {
+        'Content-Type': 'application/x-ndjson' if not error else 'application/json',
+        'Access-Control-Allow-Origin': '*',
+        'Access-Control-Allow-Methods': 'POST, OPTIONS',
+        'Access-Control-Allow-Headers': 'Content-Type, X-Amz-Date, Authorization, X-Api-Key, X-Amz-Security-Token'
+    }
+
+    if error:
+        return {
+            'statusCode': 400,
+            'headers': headers,
+            'body': json.dumps({'success': False, 'error': error}, ensure_ascii=False)
+        }
+
+    try:
+        body = b"".join(iter_query_events(params)).decode('utf-8')
+
+    except Exception as e:
+        print(f"❌ Error en consulta streaming: {str(e)}")
+        return {
+            'statusCode': 500,
+            'headers': dict(headers, **{'Content-Type': 'application/json'}),
+            'body': json.dumps({'success': False, 'error': f"Internal server error: {str(e)}"}, ensure_ascii=False)
+        }
+
+    return {
+        'statusCode': 200,
+        'headers': headers,
+        'body': body
+    }
+
+
+def main():
+    port = int(os.environ.get('PORT', 8080))
+    print(f"🚀 Servidor de consultas en streaming escuchando en :{port}")
+    ThreadingHTTPServer(('0.0.0.0', port), QueryStreamHandler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+#!/bin/sh
+# Entrada de la Lambda de streaming bajo Lambda Web Adapter (ver query_stream.py)
+PYTHONPATH=$PYTHONPATH:/opt/python:$LAMBDA_RUNTIME_DIR exec python query_stream.py
@@ -54,7 +54,7 @@ def lambda_handler(event, context):
         response_body = {
             "ok": True,
             "chunks": chunks[:3],
-            "embeddings": embeddings[:3]
+            "embeddings": [embedding.tolist() for embedding in embeddings[:3]]
         }
         
         return {
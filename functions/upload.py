@@ -1,9 +1,9 @@
 import json
-import boto3
 import uuid
 import re
 import os
 from datetime import datetime
+from helpers.clients import get_aws_client
 
 headers = {
     'Content-Type': 'application/json',
@@ -16,7 +16,7 @@ allowed_types = ['general']
 
 def lambda_handler(event, context):
 
-    s3_client = boto3.client('s3')
+    s3_client = get_aws_client('s3')
     
     try:
     
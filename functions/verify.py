@@ -1,6 +1,8 @@
 import json
 import os
-from helpers.rag_helpers import create_opensearch_client
+from helpers.clients import get_opensearch_client
+from helpers.tenancy import resolve_tenant_index
+from helpers.index_metadata import get_index_metadata
 
 
 def lambda_handler(event, context):
@@ -24,7 +26,7 @@ def lambda_handler(event, context):
         
         print(f"🔍 Verificando documentos para tenant: {tenant_id}")
         
-        opensearch_client = create_opensearch_client()
+        opensearch_client = get_opensearch_client()
         
         verification_result = verify_tenant_documents(tenant_id, opensearch_client)
         
@@ -61,15 +63,24 @@ def verify_tenant_documents(tenant_id: str, opensearch_client):
             "size": 10,  # Máximo 10 documentos para el sample
             "sort": [
                 {"created_at": {"order": "desc"}}  # Más recientes primero
-            ]
+            ],
+            # El embedding es casi todo el _source; su dimensión sale del perfil del índice
+            "_source": {"excludes": ["embedding"]}
         }
         
-        index_pattern = "rag-documents-*"
+        # Solo el índice del tenant (propio o del pool), no rag-documents-* entero
+        placement = resolve_tenant_index(tenant_id)
+        index_pattern = placement["index_name"]
         
-        response = opensearch_client.search(
-            index=index_pattern,
-            body=search_query
-        )
+        index_metadata = get_index_metadata(opensearch_client, index_pattern)
+        
+        if not index_metadata["exists"]:
+            response = {}
+        else:
+            response = opensearch_client.search(
+                index=index_pattern,
+                body=search_query
+            )
         
         hits = response.get('hits', {})
         total_hits = hits.get('total', {}).get('value', 0)
@@ -78,6 +89,7 @@ def verify_tenant_documents(tenant_id: str, opensearch_client):
         
         unique_indexes = set()
         document_samples = []
+        embedding_dimensions = index_metadata["profile"]["dimensions"] if index_metadata["exists"] else 0
         
         for doc in documents:
             unique_indexes.add(doc['_index'])
@@ -91,7 +103,7 @@ def verify_tenant_documents(tenant_id: str, opensearch_client):
                 "file_format": source.get('file_format', 'N/A'),
                 "chunk_index": source.get('chunk_index', 0),
                 "content_preview": source.get('content', '')[:150] + '...' if len(source.get('content', '')) > 150 else source.get('content', ''),
-                "embedding_dimensions": len(source.get('embedding', [])),
+                "embedding_dimensions": embedding_dimensions,
                 "created_at": source.get('created_at', 'N/A')
             })
         
@@ -99,11 +111,14 @@ def verify_tenant_documents(tenant_id: str, opensearch_client):
             "tenant_id": tenant_id,
             "total_documents": total_hits,
             "indexes": list(unique_indexes),
+            "placement": placement["placement"],
             "sample_documents": document_samples,
             "statistics": {
                 "unique_indexes_count": len(unique_indexes),
                 "documents_shown": len(document_samples),
-                "search_pattern": index_pattern
+                "search_pattern": index_pattern,
+                "index_profile": index_metadata["profile"]["name"] if index_metadata["exists"] else None,
+                "mapping_version": index_metadata["mapping_version"]
             },
             "status": "success" if total_hits > 0 else "no_documents_found"
         }
@@ -13,16 +13,20 @@ from aws_cdk import (
 from aws_cdk.aws_lambda_python_alpha import PythonFunction, PythonLayerVersion
 from constructs import Construct
 import json 
-from nuevorag.resources.create_lambdas import create_test_lambda, create_process_lambda, create_upload_lambda, create_verify_lambda, create_query_lambda
+from nuevorag.resources.create_lambdas import create_test_lambda, create_process_lambda, create_upload_lambda, create_verify_lambda, create_query_lambda, create_query_stream_lambda, create_query_batch_lambda
 from nuevorag.resources.create_opensearch import create_opensearch
-from nuevorag.resources.layers import create_langchain_layer
+from nuevorag.resources.layers import create_ingestion_layer, create_search_layer
+from nuevorag.resources.create_dynamodb import create_embedding_cache_table
+from nuevorag.resources.create_queues import create_ingestion_queue
 
 class NuevoragStack(Stack):
 
     def __init__(self, scope: Construct, construct_id: str, stack_variables: dict, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
-        langchain_layer = create_langchain_layer(self, stack_variables['prefix'])
+        # Cada Lambda carga solo las dependencias que usa
+        ingestion_layer = create_ingestion_layer(self, stack_variables['prefix'])
+        search_layer = create_search_layer(self, stack_variables['prefix'])
 
         bucket = s3.Bucket(self, f"{stack_variables['prefix']}-Bucket",
             removal_policy=RemovalPolicy.DESTROY,
@@ -30,28 +34,49 @@ class NuevoragStack(Stack):
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
         )
 
-        test_lambda = create_test_lambda(self, stack_variables['prefix'], langchain_layer)
+        test_lambda = create_test_lambda(self, stack_variables['prefix'])
         
-        process_lambda = create_process_lambda(self, stack_variables['prefix'], langchain_layer, None)
+        process_lambda = create_process_lambda(self, stack_variables['prefix'], ingestion_layer, None)
         
-        verify_lambda = create_verify_lambda(self, stack_variables['prefix'], langchain_layer)
+        verify_lambda = create_verify_lambda(self, stack_variables['prefix'], search_layer)
         
-        query_lambda = create_query_lambda(self, stack_variables['prefix'], langchain_layer)
+        query_lambda = create_query_lambda(self, stack_variables['prefix'], search_layer)
         
-        vector_collection = create_opensearch(self, stack_variables['prefix'], process_lambda.role, verify_lambda.role, query_lambda.role)
+        query_stream_lambda, query_stream_url = create_query_stream_lambda(self, stack_variables['prefix'], search_layer)
+        
+        query_batch_lambda = create_query_batch_lambda(self, stack_variables['prefix'], search_layer)
+        
+        vector_collection = create_opensearch(self, stack_variables['prefix'], process_lambda.role, verify_lambda.role, query_lambda.role, query_stream_lambda.role, query_batch_lambda.role)
         
         process_lambda.add_environment("OPENSEARCH_ENDPOINT", f"https://{vector_collection.attr_collection_endpoint}")
         
-        upload_lambda = create_upload_lambda(self, stack_variables['prefix'], langchain_layer, bucket)
+        upload_lambda = create_upload_lambda(self, stack_variables['prefix'], bucket)
         
         verify_lambda.add_environment("OPENSEARCH_ENDPOINT", f"https://{vector_collection.attr_collection_endpoint}")
         
         query_lambda.add_environment("OPENSEARCH_ENDPOINT", f"https://{vector_collection.attr_collection_endpoint}")
         
+        query_stream_lambda.add_environment("OPENSEARCH_ENDPOINT", f"https://{vector_collection.attr_collection_endpoint}")
+        
+        query_batch_lambda.add_environment("OPENSEARCH_ENDPOINT", f"https://{vector_collection.attr_collection_endpoint}")
+        
+        embedding_cache_table = create_embedding_cache_table(self, stack_variables['prefix'], [process_lambda, query_lambda, query_stream_lambda, query_batch_lambda, test_lambda])
+        
+        # Registro de idempotencia de ingestas en la misma tabla (cache_key = ingestion#...)
+        process_lambda.add_environment("IDEMPOTENCY_TABLE", embedding_cache_table.table_name)
+        
+        # Ubicación de cada tenant (índice propio o pool compartido) en la misma tabla (cache_key = tenancy#...)
+        embedding_cache_table.grant_read_data(verify_lambda)
+        for function in [process_lambda, verify_lambda, query_lambda, query_stream_lambda, query_batch_lambda]:
+            function.add_environment("TENANCY_TABLE", embedding_cache_table.table_name)
+            function.add_environment("TENANCY_MODE", stack_variables.get('tenancy_mode', 'dedicated'))
+        
+        ingestion_queue, ingestion_dlq = create_ingestion_queue(self, stack_variables['prefix'], process_lambda)
 
+        # S3 -> SQS -> Lambda: los picos de subidas se encolan y los fallos se reintentan por archivo
         bucket.add_event_notification(
             s3.EventType.OBJECT_CREATED,
-            s3n.LambdaDestination(process_lambda),
+            s3n.SqsDestination(ingestion_queue),
             s3.NotificationKeyFilter(prefix="uploads/") 
         )
 
@@ -71,8 +96,12 @@ class NuevoragStack(Stack):
         query_resource = api.root.add_resource("query")
         query_resource.add_method("POST", apigateway.LambdaIntegration(query_lambda))
         
+        # Endpoint /query/batch
+        query_batch_resource = query_resource.add_resource("batch")
+        query_batch_resource.add_method("POST", apigateway.LambdaIntegration(query_batch_lambda))
+        
         # Método OPTIONS para CORS en todos los endpoints
-        for resource in [test_resource, upload_resource, tenant_resource, query_resource]:
+        for resource in [test_resource, upload_resource, tenant_resource, query_resource, query_batch_resource]:
             resource.add_method("OPTIONS", apigateway.MockIntegration(
                 integration_responses=[{
                     'statusCode': '200',
@@ -118,6 +147,16 @@ class NuevoragStack(Stack):
             description="URL del endpoint /query para consultas RAG"
         )
         
+        CfnOutput(self, "QueryBatchEndpoint",
+            value=f"{api.url}query/batch",
+            description="URL del endpoint /query/batch para varias preguntas en una consulta"
+        )
+        
+        CfnOutput(self, "QueryStreamEndpoint",
+            value=query_stream_url.url,
+            description="Function URL de consultas RAG en streaming (NDJSON)"
+        )
+        
         CfnOutput(self, "ProcessLambdaName",
             value=process_lambda.function_name,
             description="Nombre de la función Lambda que procesa archivos S3"
@@ -136,4 +175,13 @@ class NuevoragStack(Stack):
         CfnOutput(self, "OpenSearchCollectionId",
             value=vector_collection.attr_id,
             description="ID de la colección OpenSearch Serverless"
-        )
\ No newline at end of file
+        )        
+        CfnOutput(self, "IngestionQueueUrl",
+            value=ingestion_queue.queue_url,
+            description="Cola SQS que recibe las notificaciones de S3 de uploads/"
+        )
+        
+        CfnOutput(self, "IngestionDeadLetterQueueUrl",
+            value=ingestion_dlq.queue_url,
+            description="DLQ con los archivos que fallaron tras 3 intentos"
+        )
@@ -0,0 +1,29 @@
+from aws_cdk import (
+    RemovalPolicy,
+    aws_dynamodb as dynamodb,
+)
+
+
+def create_embedding_cache_table(app, prefix, lambdas):
+
+    # Cache content-addressed de embeddings: cache_key = hash(modelo, dimensiones, texto)
+    # También guarda la versión de índice de cada tenant (cache_key = index_version#<tenant>),
+    # sin expires_at, que invalida el cache de respuestas de /query
+    embedding_cache_table = dynamodb.Table(
+        app, f"{prefix}-EmbeddingCacheTable",
+        partition_key=dynamodb.Attribute(
+            name="cache_key",
+            type=dynamodb.AttributeType.STRING
+        ),
+        billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+        time_to_live_attribute="expires_at",
+        removal_policy=RemovalPolicy.DESTROY
+    )
+
+    for function in lambdas:
+        embedding_cache_table.grant_read_write_data(function)
+        function.add_environment("EMBEDDING_CACHE_BACKEND", "dynamodb")
+        function.add_environment("EMBEDDING_CACHE_TABLE", embedding_cache_table.table_name)
+        function.add_environment("INDEX_VERSION_TABLE", embedding_cache_table.table_name)
+
+    return embedding_cache_table
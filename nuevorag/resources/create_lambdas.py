@@ -1,5 +1,6 @@
 from aws_cdk import (
     Duration,  
+    Stack,
     aws_lambda as lambda_,
     aws_iam as iam,
 )
@@ -7,14 +8,14 @@ from aws_cdk import (
 from aws_cdk.aws_lambda_python_alpha import PythonFunction
 
 
-def create_test_lambda(app, prefix, layer):
+def create_test_lambda(app, prefix):
 
+    # Sin layer: solo usa boto3 (incluido en el runtime)
     test_lambda = PythonFunction(app, f"{prefix}-TestLambda",
         runtime=lambda_.Runtime.PYTHON_3_12,
         entry="functions",  
         handler="lambda_handler",    
         index="test.py",           
-        layers=[layer],    
         timeout=Duration.minutes(5), 
         memory_size=1024,         
     )
@@ -40,7 +41,9 @@ def create_process_lambda(app, prefix, layer, opensearch_collection):
     """
     
     # Environment variables - se agregará OPENSEARCH_ENDPOINT después si es necesario
-    env_vars = {}
+    env_vars = {
+        "EMBEDDING_MAX_WORKERS": "8"  # Llamadas concurrentes a Bedrock por archivo
+    }
     if opensearch_collection:
         env_vars["OPENSEARCH_ENDPOINT"] = f"https://{opensearch_collection.attr_collection_endpoint}"
     
@@ -125,17 +128,32 @@ def create_process_lambda(app, prefix, layer, opensearch_collection):
             )
         )
 
+    # Fan-out de PDFs grandes: la Lambda se invoca a sí misma por cada rango.
+    # Policy aparte (no la default del rol) para no crear una dependencia circular
+    iam.Policy(app, f"{prefix}-ProcessFanoutPolicy",
+        roles=[process_lambda.role],
+        statements=[
+            iam.PolicyStatement(
+                effect=iam.Effect.ALLOW,
+                actions=["lambda:InvokeFunction"],
+                resources=[process_lambda.function_arn]
+            )
+        ]
+    )
+    process_lambda.add_environment("FANOUT_MIN_PAGES", "200")
+    process_lambda.add_environment("FANOUT_MAX_WORKERS", "8")
+
     return process_lambda
 
 
-def create_upload_lambda(app, prefix, layer, bucket):
+def create_upload_lambda(app, prefix, bucket):
     
+    # Sin layer: solo genera URLs prefirmadas con boto3
     upload_lambda = PythonFunction(app, f"{prefix}-UploadLambda",
         runtime=lambda_.Runtime.PYTHON_3_12,
         entry="functions",  
         handler="lambda_handler",    
         index="upload.py",           
-        layers=[layer],    
         timeout=Duration.minutes(1),   
         memory_size=512,              
         environment={
@@ -232,4 +250,111 @@ def create_query_lambda(app, prefix, layer):
         )
     )
 
-    return query_lambda
\ No newline at end of file
+    return query_lambda
+
+
+def create_query_batch_lambda(app, prefix, layer):
+    """
+    Lambda de /query/batch: varias preguntas de un tenant en una invocación.
+    Mismo timeout que /query; API Gateway igual corta a los 29 s, de ahí el
+    tope de preguntas por lote (MAX_BATCH_QUESTIONS)
+    """
+    query_batch_lambda = PythonFunction(app, f"{prefix}-QueryBatchLambda",
+        runtime=lambda_.Runtime.PYTHON_3_12,
+        entry="functions",
+        handler="lambda_handler",
+        index="query_batch.py",
+        layers=[layer],
+        timeout=Duration.minutes(2),
+        memory_size=1024,
+        environment={
+            # Se agregará OPENSEARCH_ENDPOINT en el stack principal
+            "BATCH_GENERATION_CONCURRENCY": "5",
+            "MAX_BATCH_QUESTIONS": "20"
+        }
+    )
+
+    query_batch_lambda.add_to_role_policy(
+        iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=[
+                "aoss:*"
+            ],
+            resources=["*"]
+        )
+    )
+    
+    query_batch_lambda.add_to_role_policy(
+        iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=[
+                "bedrock:InvokeModel",
+                "bedrock:ListFoundationModels",
+                "bedrock:GetFoundationModel"
+            ],
+            resources=["*"]
+        )
+    )
+
+    return query_batch_lambda
+
+
+def create_query_stream_lambda(app, prefix, layer):
+    """
+    Lambda de /query en streaming: corre query_stream.py como servidor HTTP
+    detrás de Lambda Web Adapter y responde por una function URL en modo
+    RESPONSE_STREAM (el runtime de Python no hace streaming por sí solo)
+    """
+
+    web_adapter_layer = lambda_.LayerVersion.from_layer_version_arn(
+        app, f"{prefix}-WebAdapterLayer",
+        f"arn:aws:lambda:{Stack.of(app).region}:753240598075:layer:LambdaAdapterLayerX86:24"
+    )
+
+    query_stream_lambda = lambda_.Function(app, f"{prefix}-QueryStreamLambda",
+        runtime=lambda_.Runtime.PYTHON_3_12,
+        code=lambda_.Code.from_asset("functions"),  # Dependencias en el layer de búsqueda
+        handler="run.sh",
+        layers=[layer, web_adapter_layer],
+        timeout=Duration.minutes(5),
+        memory_size=1024,
+        environment={
+            "AWS_LAMBDA_EXEC_WRAPPER": "/opt/bootstrap",
+            "AWS_LWA_INVOKE_MODE": "response_stream",
+            "PORT": "8080"
+            # Se agregará OPENSEARCH_ENDPOINT en el stack principal
+        }
+    )
+
+    query_stream_lambda.add_to_role_policy(
+        iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=[
+                "aoss:*"
+            ],
+            resources=["*"]
+        )
+    )
+
+    query_stream_lambda.add_to_role_policy(
+        iam.PolicyStatement(
+            effect=iam.Effect.ALLOW,
+            actions=[
+                "bedrock:InvokeModel",
+                "bedrock:InvokeModelWithResponseStream"
+            ],
+            resources=["*"]
+        )
+    )
+
+    query_stream_url = query_stream_lambda.add_function_url(
+        auth_type=lambda_.FunctionUrlAuthType.NONE,
+        invoke_mode=lambda_.InvokeMode.RESPONSE_STREAM,
+        cors=lambda_.FunctionUrlCorsOptions(
+            allowed_origins=["*"],
+            allowed_methods=[lambda_.HttpMethod.POST],
+            allowed_headers=["Content-Type", "X-Amz-Date", "Authorization", "X-Api-Key", "X-Amz-Security-Token"]
+        )
+    )
+
+    return query_stream_lambda, query_stream_url
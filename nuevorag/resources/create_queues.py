@@ -0,0 +1,42 @@
+from aws_cdk import (
+    Duration,
+    RemovalPolicy,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
+)
+
+
+def create_ingestion_queue(app, prefix, process_lambda, max_instances=4, files_per_instance=2):
+
+    # Mensajes que fallaron maxReceiveCount veces quedan aquí para inspección/redrive
+    dead_letter_queue = sqs.Queue(
+        app, f"{prefix}-IngestionDLQ",
+        retention_period=Duration.days(14),
+        removal_policy=RemovalPolicy.DESTROY
+    )
+
+    # Visibilidad = 6x el timeout de la Lambda (recomendación de AWS para event sources SQS)
+    ingestion_queue = sqs.Queue(
+        app, f"{prefix}-IngestionQueue",
+        visibility_timeout=Duration.minutes(90),
+        retention_period=Duration.days(4),
+        dead_letter_queue=sqs.DeadLetterQueue(
+            max_receive_count=3,
+            queue=dead_letter_queue
+        ),
+        removal_policy=RemovalPolicy.DESTROY
+    )
+
+    # Lotes pequeños: cada mensaje es un archivo que puede tardar minutos.
+    # max_concurrency acota las instancias (mínimo 2) para no saturar Bedrock/OpenSearch
+    process_lambda.add_event_source(lambda_event_sources.SqsEventSource(
+        ingestion_queue,
+        batch_size=4,
+        max_batching_window=Duration.seconds(10),
+        report_batch_item_failures=True,
+        max_concurrency=max_instances
+    ))
+
+    process_lambda.add_environment("PROCESS_MAX_CONCURRENCY", str(files_per_instance))
+
+    return ingestion_queue, dead_letter_queue
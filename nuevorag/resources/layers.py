@@ -1,20 +1,35 @@
 from aws_cdk import (
-    Duration,  
     aws_lambda as lambda_,
-    aws_iam as iam,
 )
 
-from aws_cdk.aws_lambda_python_alpha import PythonFunction, PythonLayerVersion
+from aws_cdk.aws_lambda_python_alpha import PythonLayerVersion
 
-def create_langchain_layer(app, prefix):
+# boto3 no va en los layers: lo trae el runtime de Lambda
 
-    langchain_layer = PythonLayerVersion(
+
+def create_ingestion_layer(app, prefix):
+
+    # PyPDF2 + opensearch-py: solo la Lambda de procesamiento
+    ingestion_layer = PythonLayerVersion(
         app,
-        f"{prefix}-LangChainAWSLayer",
-        entry="layers/langchain_layer",
+        f"{prefix}-IngestionLayer",
+        entry="layers/ingestion_layer",
         compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
-        description="Layer con LangChain-AWS y dependencias relacionadas"
+        description="Layer de ingesta: PyPDF2, opensearch-py"
     )
 
-    return langchain_layer
+    return ingestion_layer
+
+
+def create_search_layer(app, prefix):
+
+    # Solo el cliente de OpenSearch: /query, /query/stream y /verify no cargan PyPDF2
+    search_layer = PythonLayerVersion(
+        app,
+        f"{prefix}-SearchLayer",
+        entry="layers/search_layer",
+        compatible_runtimes=[lambda_.Runtime.PYTHON_3_12],
+        description="Layer de búsqueda: opensearch-py"
+    )
 
+    return search_layer
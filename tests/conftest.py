@@ -0,0 +1,60 @@
+import os
+import sys
+
+# Las Lambdas importan sus módulos relativos a functions/ (entry del bundle)
+FUNCTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "functions")
+
+if FUNCTIONS_DIR not in sys.path:
+    sys.path.insert(0, FUNCTIONS_DIR)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def disable_embedding_cache():
+    # Cada test parte sin cache de embeddings; los tests de cache instalan el suyo
+    from helpers.embedding_cache import set_embedding_cache, reset_embedding_cache
+
+    set_embedding_cache(None)
+    yield
+    reset_embedding_cache()
+
+
+@pytest.fixture(autouse=True)
+def reset_query_cache():
+    from helpers.query_cache import reset_query_cache
+
+    yield
+    reset_query_cache()
+
+
+@pytest.fixture(autouse=True)
+def reset_vector_stores():
+    from helpers.vector_store import reset_vector_stores
+
+    yield
+    reset_vector_stores()
+
+
+@pytest.fixture(autouse=True)
+def reset_idempotency_store():
+    from helpers.idempotency import reset_idempotency_store
+
+    yield
+    reset_idempotency_store()
+
+
+@pytest.fixture(autouse=True)
+def reset_tenancy():
+    from helpers.tenancy import reset_tenancy
+
+    yield
+    reset_tenancy()
+
+
+@pytest.fixture(autouse=True)
+def reset_index_metadata_cache():
+    from helpers.index_metadata import reset_index_metadata_cache
+
+    yield
+    reset_index_metadata_cache()
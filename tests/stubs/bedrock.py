@@ -0,0 +1,156 @@
+import hashlib
+import io
+import json
+import math
+import re
+import threading
+import time
+
+from botocore.exceptions import ClientError, EventStreamError
+
+
+def fake_embedding(text, dimensions=1024):
+    """
+    Embedding determinista tipo "hashing trick": textos con palabras en común
+    quedan cerca en similitud coseno, suficiente para probar recuperación
+    """
+    vector = [0.0] * dimensions
+
+    for token in re.findall(r"\w+", (text or "").lower()):
+        digest = hashlib.md5(token.encode("utf-8")).digest()
+        position = int.from_bytes(digest[:4], "little") % dimensions
+        vector[position] += 1.0 if digest[4] % 2 == 0 else -1.0
+
+    norm = math.sqrt(sum(value * value for value in vector))
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+
+    return [value / norm for value in vector]
+
+
+def throttling_error(operation="InvokeModel"):
+    return ClientError(
+        {
+            "Error": {"Code": "ThrottlingException", "Message": "Too many requests, please wait before trying again."},
+            "ResponseMetadata": {"HTTPStatusCode": 429}
+        },
+        operation
+    )
+
+
+class StubBedrockRuntime:
+    """
+    Cliente bedrock-runtime local con latencia y throttling configurables
+
+    Args:
+        latency: Segundos que tarda cada invoke_model
+        max_concurrent: Llamadas simultáneas permitidas antes de responder 429
+        throttle_every: Si > 0, cada N-ésima llamada responde 429
+        answer: Texto que devuelven los modelos generativos
+        stream_error_after: Si se indica, el stream falla tras ese número de fragmentos
+    """
+
+    def __init__(self, latency=0.0, max_concurrent=None, throttle_every=0, answer="Respuesta de prueba.", stream_error_after=None):
+        self.latency = latency
+        self.stream_error_after = stream_error_after
+        self.max_concurrent = max_concurrent
+        self.throttle_every = throttle_every
+        self.answer = answer
+        self.calls = []
+        self.throttled = 0
+        self.peak_concurrency = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            call_number = len(self.calls) + self.throttled + 1
+
+            if self.throttle_every and call_number % self.throttle_every == 0:
+                self.throttled += 1
+                raise throttling_error()
+
+            if self.max_concurrent is not None and self._in_flight >= self.max_concurrent:
+                self.throttled += 1
+                raise throttling_error()
+
+            self._in_flight += 1
+            self.peak_concurrency = max(self.peak_concurrency, self._in_flight)
+
+    def _exit(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def invoke_model(self, modelId, body, contentType=None, accept=None):
+        self._enter()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+
+            payload = json.loads(body)
+            with self._lock:
+                self.calls.append({"modelId": modelId, "payload": payload})
+
+            return {"body": io.BytesIO(json.dumps(self._response_for(modelId, payload)).encode("utf-8"))}
+        finally:
+            self._exit()
+
+    def invoke_model_with_response_stream(self, modelId, body, contentType=None, accept=None):
+        self._enter()
+        self._exit()
+
+        payload = json.loads(body)
+        with self._lock:
+            self.calls.append({"modelId": modelId, "payload": payload, "stream": True})
+
+        return {"body": self._stream_events()}
+
+    def _stream_events(self):
+        # Mismo formato de eventos que Nova en invoke_model_with_response_stream: un fragmento por palabra
+        def event(data):
+            return {"chunk": {"bytes": json.dumps(data).encode("utf-8")}}
+
+        yield event({"messageStart": {"role": "assistant"}})
+
+        for position, word in enumerate(re.findall(r"\S+\s*", self.answer)):
+            if self.stream_error_after is not None and position >= self.stream_error_after:
+                raise EventStreamError(
+                    {"Error": {"Code": "modelStreamErrorException", "Message": "Stream interrumpido"}},
+                    "InvokeModelWithResponseStream"
+                )
+            if self.latency:
+                time.sleep(self.latency)
+            yield event({"contentBlockDelta": {"delta": {"text": word}, "contentBlockIndex": 0}})
+
+        yield event({"contentBlockStop": {"contentBlockIndex": 0}})
+        yield event({"messageStop": {"stopReason": "end_turn"}})
+        yield event({"metadata": {"usage": {"inputTokens": 100, "outputTokens": len(self.answer.split())}}})
+
+    def _response_for(self, model_id, payload):
+
+        if model_id.startswith("amazon.titan-embed-image"):
+            dimensions = payload.get("embeddingConfig", {}).get("outputEmbeddingLength", 1024)
+            text = payload.get("inputText", "") or payload.get("inputImage", "")[:64]
+            return {"embedding": fake_embedding(text, dimensions), "inputTextTokenCount": len(payload.get("inputText", "").split())}
+
+        if model_id.startswith("amazon.titan-embed-text"):
+            return {"embedding": fake_embedding(payload.get("inputText", ""), payload.get("dimensions", 1024)), "inputTextTokenCount": len(payload.get("inputText", "").split())}
+
+        if ".rerank" in model_id:
+            # Rerank: fracción de palabras de la consulta presentes en cada documento
+            query_words = set(re.findall(r"\w+", payload["query"].lower())) or {""}
+            scores = [
+                len(query_words & set(re.findall(r"\w+", document.lower()))) / len(query_words)
+                for document in payload["documents"]
+            ]
+            ranked = sorted(range(len(scores)), key=lambda index: -scores[index])[:payload.get("top_n", len(scores))]
+            return {"results": [{"index": index, "relevance_score": scores[index]} for index in ranked]}
+
+        if model_id.startswith("anthropic."):
+            return {"content": [{"type": "text", "text": self.answer}]}
+
+        return {
+            "output": {"message": {"content": [{"text": self.answer}]}},
+            "usage": {"inputTokens": len(json.dumps(payload).split()), "outputTokens": len(self.answer.split())}
+        }
@@ -0,0 +1,413 @@
+import copy
+import fnmatch
+import json
+import math
+import re
+import threading
+import uuid
+from collections import Counter, OrderedDict
+
+from opensearchpy.exceptions import NotFoundError, RequestError
+
+
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}")
+
+
+def tokenize(text):
+    return re.findall(r"\w+", (text or "").lower())
+
+
+class FakeIndices:
+
+    def __init__(self, client):
+        self.client = client
+
+    def exists(self, index):
+        self.client.requests.append(("indices.exists", index))
+        return index in self.client.indexes
+
+    def create(self, index, body=None):
+        self.client.requests.append(("indices.create", index))
+        with self.client.lock:
+            if index in self.client.indexes:
+                raise RequestError(400, "resource_already_exists_exception", {"error": {"type": "resource_already_exists_exception"}})
+            self.client.indexes[index] = {"body": copy.deepcopy(body or {}), "docs": OrderedDict()}
+        return {"acknowledged": True, "index": index}
+
+    def delete(self, index):
+        self.client.requests.append(("indices.delete", index))
+        with self.client.lock:
+            if index not in self.client.indexes:
+                raise NotFoundError(404, "index_not_found_exception", {})
+            del self.client.indexes[index]
+        return {"acknowledged": True}
+
+    def get_mapping(self, index):
+        self.client.requests.append(("indices.get_mapping", index))
+        if index not in self.client.indexes:
+            raise NotFoundError(404, "index_not_found_exception", {})
+        return {index: {"mappings": self.client.indexes[index]["body"].get("mappings", {})}}
+
+
+class FakeOpenSearch:
+    """
+    OpenSearch en memoria con el subconjunto de la API que usa el proyecto:
+    indices.exists/create/delete/get_mapping, bulk (index/create/delete), search (term, terms,
+    exists, bool, knn, match, multi_match; sort y search_after) y msearch. Los campos
+    que no están en el mapping se mapean como el mapping dinámico de
+    OpenSearch y, como en OpenSearch, no se puede ordenar por campos text
+    ni sin mapear.
+
+    Args:
+        fail_item: Callable(action, document) -> status HTTP o None para
+            simular rechazos por ítem (p. ej. 429) en bulk
+    """
+
+    def __init__(self, fail_item=None):
+        self.indexes = {}
+        self.indices = FakeIndices(self)
+        self.fail_item = fail_item
+        self.requests = []
+        self.bulk_calls = []
+        self.lock = threading.RLock()
+        self._stats_cache = {}
+
+    # ---------------------------------------------------------------- bulk
+
+    def bulk(self, body, index=None, **kwargs):
+        lines = self._parse_bulk_body(body)
+        self.bulk_calls.append({"operations": len([line for line in lines if self._is_action(line)]), "bytes": self._body_size(body)})
+        self.requests.append(("bulk", None))
+
+        items = []
+        errors = False
+        position = 0
+
+        while position < len(lines):
+            action_line = lines[position]
+            operation, meta = next(iter(action_line.items()))
+            position += 1
+
+            document = None
+            if operation in ("index", "create", "update"):
+                document = lines[position]
+                position += 1
+
+            index_name = meta.get("_index", index)
+            status = self.fail_item(operation, document) if self.fail_item else None
+
+            if status:
+                errors = True
+                items.append({operation: {
+                    "_index": index_name,
+                    "_id": meta.get("_id"),
+                    "status": status,
+                    "error": {"type": "es_rejected_execution_exception" if status == 429 else "mapper_parsing_exception", "reason": "simulado"}
+                }})
+                continue
+
+            with self.lock:
+                if index_name not in self.indexes:
+                    self.indexes[index_name] = {"body": {}, "docs": OrderedDict()}
+                docs = self.indexes[index_name]["docs"]
+
+                if operation == "delete":
+                    found = meta.get("_id") in docs
+                    docs.pop(meta.get("_id"), None)
+                    result_status = 200 if found else 404
+                    items.append({"delete": {"_index": index_name, "_id": meta.get("_id"), "status": result_status, "result": "deleted" if found else "not_found"}})
+                    continue
+
+                document_id = meta.get("_id") or uuid.uuid4().hex
+                created = document_id not in docs
+                docs[document_id] = copy.deepcopy(document)
+                self._map_dynamic_fields(index_name, document)
+                items.append({operation: {"_index": index_name, "_id": document_id, "status": 201 if created else 200, "result": "created" if created else "updated"}})
+
+        return {"took": 1, "errors": errors, "items": items}
+
+    @staticmethod
+    def _is_action(line):
+        return isinstance(line, dict) and len(line) == 1 and next(iter(line)) in ("index", "create", "update", "delete")
+
+    @staticmethod
+    def _parse_bulk_body(body):
+        if isinstance(body, (bytes, bytearray)):
+            body = body.decode("utf-8")
+        if isinstance(body, str):
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        return list(body)
+
+    @staticmethod
+    def _body_size(body):
+        if isinstance(body, (bytes, bytearray)):
+            return len(body)
+        if isinstance(body, str):
+            return len(body.encode("utf-8"))
+        return sum(len(json.dumps(line).encode("utf-8")) + 1 for line in body)
+
+    # ------------------------------------------------------------- mapping
+
+    def _map_dynamic_fields(self, index_name, document):
+        # Mapping dinámico de OpenSearch: strings -> text con subcampo .keyword (o date si parecen fecha)
+        properties = self.indexes[index_name]["body"].setdefault("mappings", {}).setdefault("properties", {})
+        for field, value in document.items():
+            if field in properties or value is None:
+                continue
+            if isinstance(value, bool):
+                properties[field] = {"type": "boolean"}
+            elif isinstance(value, int):
+                properties[field] = {"type": "long"}
+            elif isinstance(value, float):
+                properties[field] = {"type": "float"}
+            elif isinstance(value, str) and DATE_PATTERN.match(value):
+                properties[field] = {"type": "date"}
+            elif isinstance(value, str):
+                properties[field] = {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}}
+
+    def _sort_field_type(self, index_name, field):
+        properties = self.indexes[index_name]["body"].get("mappings", {}).get("properties", {})
+        base, _, subfield = field.partition(".")
+        mapping = properties.get(base)
+        if mapping and subfield:
+            mapping = mapping.get("fields", {}).get(subfield)
+        return mapping.get("type") if mapping else None
+
+    def _check_sort_fields(self, index_names, sort_fields):
+        # Como OpenSearch: sin fielddata no se puede ordenar por campos text ni por campos sin mapear
+        for index_name in index_names:
+            for field in sort_fields:
+                field_type = self._sort_field_type(index_name, field)
+                if field_type is None or field_type == "text":
+                    raise RequestError(400, "search_phase_execution_exception", {
+                        "error": {"type": "illegal_argument_exception", "reason": f"No se puede ordenar por [{field}] ({field_type or 'sin mapear'}) en {index_name}"}
+                    })
+
+    # -------------------------------------------------------------- search
+
+    def _resolve_indexes(self, index):
+        names = []
+        for pattern in (index or "*").split(","):
+            if "*" in pattern:
+                names.extend(name for name in self.indexes if fnmatch.fnmatch(name, pattern))
+            elif pattern in self.indexes:
+                names.append(pattern)
+            else:
+                raise NotFoundError(404, "index_not_found_exception", {"index": pattern})
+        return names
+
+    def count(self, index=None, body=None):
+        result = self.search(index=index, body=dict(body or {}, size=0))
+        return {"count": result["hits"]["total"]["value"]}
+
+    def search(self, index=None, body=None, **kwargs):
+        self.requests.append(("search", index))
+        body = body or {}
+
+        sort_fields = [next(iter(sort_spec)) for sort_spec in body.get("sort", [])]
+
+        candidates = []
+        with self.lock:
+            index_names = self._resolve_indexes(index)
+            self._check_sort_fields(index_names, sort_fields)
+            for index_name in index_names:
+                for document_id, source in self.indexes[index_name]["docs"].items():
+                    candidates.append((index_name, document_id, source))
+
+        query = body.get("query", {"match_all": {}})
+        scored = []
+        for index_name, document_id, source in candidates:
+            score = self._score(query, source, candidates)
+            if score is not None:
+                scored.append((score, index_name, document_id, source))
+
+        if sort_fields:
+            for sort_spec in reversed(body["sort"]):
+                field, options = next(iter(sort_spec.items()))
+                reverse = (options.get("order", "asc") if isinstance(options, dict) else options) == "desc"
+                scored.sort(key=lambda item: (self._sort_value(item[3], field) is None, self._sort_value(item[3], field)), reverse=reverse)
+        else:
+            scored.sort(key=lambda item: item[0], reverse=True)
+
+        total = len(scored)
+        if "search_after" in body:
+            # Solo orden ascendente, suficiente para la paginación del proyecto
+            after = list(body["search_after"])
+            scored = [item for item in scored if [self._sort_value(item[3], field) for field in sort_fields] > after]
+
+        start = body.get("from", 0)
+        size = body.get("size", 10)
+        hits = []
+        for score, index_name, document_id, source in scored[start:start + size]:
+            hit = {
+                "_index": index_name,
+                "_id": document_id,
+                "_score": score,
+                "_source": self._filter_source(source, body.get("_source"))
+            }
+            if sort_fields:
+                hit["sort"] = [self._sort_value(source, field) for field in sort_fields]
+            hits.append(hit)
+
+        return {
+            "took": 1,
+            "hits": {
+                "total": {"value": total, "relation": "eq"},
+                "max_score": hits[0]["_score"] if hits else None,
+                "hits": hits
+            }
+        }
+
+    @staticmethod
+    def _sort_value(source, field):
+        # document_hash.keyword ordena por el valor de document_hash
+        return source.get(field.partition(".")[0])
+
+    def msearch(self, body, index=None, **kwargs):
+        self.requests.append(("msearch", index))
+        lines = self._parse_bulk_body(body)
+        responses = []
+        for header, search_body in zip(lines[0::2], lines[1::2]):
+            try:
+                responses.append(dict(self.search(index=header.get("index", index), body=search_body), status=200))
+            except NotFoundError as e:
+                responses.append({"error": {"type": "index_not_found_exception", "reason": str(e)}, "status": 404})
+        return {"took": 1, "responses": responses}
+
+    @staticmethod
+    def _filter_source(source, source_filter):
+        if source_filter is None or source_filter is True:
+            return copy.deepcopy(source)
+        if source_filter is False:
+            return {}
+        if isinstance(source_filter, dict):
+            includes = source_filter.get("includes")
+            excludes = set(source_filter.get("excludes", []))
+            fields = includes if includes else list(source)
+            return {field: copy.deepcopy(source[field]) for field in fields if field in source and field not in excludes}
+        return {field: copy.deepcopy(source[field]) for field in source_filter if field in source}
+
+    # ------------------------------------------------------------- scoring
+
+    def _score(self, query, source, candidates):
+        query_type, params = next(iter(query.items()))
+
+        if query_type == "match_all":
+            return 1.0
+
+        if query_type == "term":
+            field, value = next(iter(params.items()))
+            value = value.get("value") if isinstance(value, dict) else value
+            return 1.0 if source.get(field) == value else None
+
+        if query_type == "exists":
+            return 1.0 if source.get(params["field"]) is not None else None
+
+        if query_type == "terms":
+            field, values = next((key, value) for key, value in params.items() if key != "boost")
+            return 1.0 if source.get(field) in values else None
+
+        if query_type == "bool":
+            for clause in self._as_list(params.get("filter")):
+                if self._score(clause, source, candidates) is None:
+                    return None
+            for clause in self._as_list(params.get("must_not")):
+                if self._score(clause, source, candidates) is not None:
+                    return None
+            score = 0.0
+            must = self._as_list(params.get("must"))
+            for clause in must:
+                clause_score = self._score(clause, source, candidates)
+                if clause_score is None:
+                    return None
+                score += clause_score
+            should = self._as_list(params.get("should"))
+            matched_should = 0
+            for clause in should:
+                clause_score = self._score(clause, source, candidates)
+                if clause_score is not None:
+                    score += clause_score
+                    matched_should += 1
+            if should and not must and matched_should == 0 and not params.get("filter"):
+                return None
+            return score if (must or should) else 1.0
+
+        if query_type == "knn":
+            field, options = next(iter(params.items()))
+            vector = source.get(field)
+            if not vector:
+                return None
+            knn_filter = options.get("filter")
+            if knn_filter and self._score(knn_filter, source, candidates) is None:
+                return None
+            return self._cosine_score(options["vector"], vector)
+
+        if query_type == "match":
+            field, value = next(iter(params.items()))
+            text = value.get("query") if isinstance(value, dict) else value
+            return self._bm25(text, [field], source, candidates)
+
+        if query_type == "multi_match":
+            fields = [field.split("^")[0] for field in params.get("fields", ["content"])]
+            return self._bm25(params.get("query", ""), fields, source, candidates)
+
+        raise RequestError(400, "parsing_exception", {"error": f"query no soportada por FakeOpenSearch: {query_type}"})
+
+    @staticmethod
+    def _as_list(value):
+        if value is None:
+            return []
+        return value if isinstance(value, list) else [value]
+
+    @staticmethod
+    def _cosine_score(query_vector, vector):
+        dot = sum(a * b for a, b in zip(query_vector, vector))
+        norm = math.sqrt(sum(a * a for a in query_vector)) * math.sqrt(sum(b * b for b in vector))
+        cosine = dot / norm if norm else 0.0
+        # Escala de OpenSearch para cosinesimil: (1 + coseno) / 2
+        return (1 + cosine) / 2
+
+    def _bm25(self, text, fields, source, candidates, k1=1.2, b=0.75):
+        query_terms = tokenize(text)
+        document_terms = [token for field in fields for token in tokenize(str(source.get(field, "")))]
+        if not query_terms or not document_terms:
+            return None
+
+        frequencies = Counter(document_terms)
+        if not any(term in frequencies for term in query_terms):
+            return None
+
+        document_frequencies, document_count, average_length = self._corpus_stats(fields, candidates)
+
+        score = 0.0
+        for term in set(query_terms):
+            if term not in frequencies:
+                continue
+            document_frequency = document_frequencies[term]
+            idf = math.log(1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            frequency = frequencies[term]
+            score += idf * frequency * (k1 + 1) / (frequency + k1 * (1 - b + b * len(document_terms) / average_length))
+        return score
+
+    def _corpus_stats(self, fields, candidates):
+        # Estadísticas del corpus una sola vez por búsqueda (candidates es la lista de esa búsqueda)
+        key = (id(candidates), tuple(fields))
+        cached = self._stats_cache.get(key)
+        if cached is not None and cached[0] is candidates:
+            return cached[1]
+
+        document_frequencies = Counter()
+        total_length = 0
+        for _, _, other in candidates:
+            terms = [token for field in fields for token in tokenize(str(other.get(field, "")))]
+            total_length += len(terms)
+            document_frequencies.update(set(terms))
+
+        stats = (document_frequencies, len(candidates), total_length / max(1, len(candidates)))
+        self._stats_cache = {key: (candidates, stats)}
+        return stats
+
+    # ---------------------------------------------------------- utilidades
+
+    def documents(self, index):
+        return list(self.indexes.get(index, {}).get("docs", {}).values())
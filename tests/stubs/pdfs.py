@@ -0,0 +1,83 @@
+import random
+
+
+WORDS = (
+    "factura contrato cliente proveedor pago monto fecha reporte trimestre ventas "
+    "inventario producto servicio garantía soporte manual instalación seguridad "
+    "política empresa documento análisis resultado proyecto equipo gestión riesgo "
+    "calidad proceso entrega pedido envío almacén auditoría presupuesto"
+).split()
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def synthetic_page_lines(page_number, lines_per_page=40, words_per_line=12, seed=None):
+    rng = random.Random(seed if seed is not None else page_number)
+    lines = []
+    for line_number in range(lines_per_page):
+        words = [rng.choice(WORDS) for _ in range(words_per_line)]
+        if line_number % 8 == 0:
+            words.append(f"SKU-{page_number:04d}-{line_number:02d}.")
+        else:
+            words[-1] += "."
+        lines.append(" ".join(words))
+    return lines
+
+
+def build_pdf(pages):
+    """
+    Genera un PDF mínimo (Helvetica, una columna) sin dependencias externas
+
+    Args:
+        pages: Lista de páginas; cada página es una lista de líneas de texto ASCII/Latin-1
+
+    Returns:
+        Bytes del PDF
+    """
+    objects = []
+
+    def add(content):
+        objects.append(content)
+        return len(objects)
+
+    catalog_id = add(None)
+    pages_id = add(None)
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    page_ids = []
+    for lines in pages:
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 790 Td"]
+        for line in lines:
+            commands.append(f"({_escape(line)}) '")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1", errors="replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            (f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 842] "
+             f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>").encode("ascii")
+        ))
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("ascii")
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("ascii")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, content in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode("ascii") + content + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n".encode("ascii")
+    output += b"0000000000 65535 f \n"
+    for offset in offsets:
+        output += f"{offset:010d} 00000 n \n".encode("ascii")
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode("ascii")
+
+    return bytes(output)
+
+
+def synthetic_pdf(page_count, lines_per_page=40, words_per_line=12):
+    return build_pdf([synthetic_page_lines(page, lines_per_page, words_per_line) for page in range(1, page_count + 1)])
@@ -0,0 +1,44 @@
+import io
+import threading
+
+from botocore.exceptions import ClientError
+
+
+class StubS3:
+    """
+    S3 en memoria con get_object/put_object/head_object (estilo moto)
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body if isinstance(Body, (bytes, bytearray)) else Body.encode("utf-8")
+        with self.lock:
+            self.objects[(Bucket, Key)] = bytes(data)
+        return {"ETag": f'"{hash(bytes(data)) & 0xffffffff:08x}"'}
+
+    def _get(self, Bucket, Key, operation):
+        with self.lock:
+            data = self.objects.get((Bucket, Key))
+        if data is None:
+            raise ClientError({"Error": {"Code": "NoSuchKey", "Message": Key}, "ResponseMetadata": {"HTTPStatusCode": 404}}, operation)
+        return data
+
+    def get_object(self, Bucket, Key, **kwargs):
+        data = self._get(Bucket, Key, "GetObject")
+        return {"Body": io.BytesIO(data), "ContentLength": len(data)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return {"ContentLength": len(self._get(Bucket, Key, "HeadObject"))}
+
+    def s3_event(self, Bucket, Key, event_name="ObjectCreated:Put"):
+        data = self.objects.get((Bucket, Key), b"")
+        return {
+            "eventName": event_name,
+            "s3": {
+                "bucket": {"name": Bucket},
+                "object": {"key": Key, "size": len(data), "eTag": f"{hash(data) & 0xffffffff:08x}"}
+            }
+        }
@@ -0,0 +1,93 @@
+import json
+import uuid
+from collections import deque
+
+
+class LocalQueue:
+    """
+    Cola SQS en memoria con la semántica que usa el event source mapping de
+    Lambda: lotes de hasta batch_size mensajes, batchItemFailures, reintentos
+    y DLQ tras max_receive_count recepciones
+
+    Args:
+        max_receive_count: Recepciones antes de mover el mensaje a la DLQ
+    """
+
+    def __init__(self, max_receive_count=3):
+        self.max_receive_count = max_receive_count
+        self.messages = deque()
+        self.dead_letters = []
+        self.deleted = []
+        self.invocations = []
+
+    def send_message(self, body):
+        message = {
+            "messageId": str(uuid.uuid4()),
+            "body": body if isinstance(body, str) else json.dumps(body),
+            "receive_count": 0
+        }
+        self.messages.append(message)
+        return message["messageId"]
+
+    def send_s3_notification(self, *records):
+        return self.send_message({"Records": list(records)})
+
+    def _receive(self, batch_size):
+        batch = []
+        while self.messages and len(batch) < batch_size:
+            message = self.messages.popleft()
+            message["receive_count"] += 1
+            batch.append(message)
+        return batch
+
+    @staticmethod
+    def _as_event(batch):
+        return {
+            "Records": [
+                {
+                    "messageId": message["messageId"],
+                    "receiptHandle": f"handle-{message['messageId']}",
+                    "body": message["body"],
+                    "attributes": {"ApproximateReceiveCount": str(message["receive_count"])},
+                    "eventSource": "aws:sqs",
+                    "eventSourceARN": "arn:aws:sqs:us-east-1:000000000000:ingestion"
+                }
+                for message in batch
+            ]
+        }
+
+    def dispatch(self, handler, batch_size=10, context=None):
+        """
+        Entrega un lote al handler y aplica su respuesta: los mensajes en
+        batchItemFailures vuelven a la cola (o a la DLQ), el resto se borra.
+        Si el handler lanza una excepción, todo el lote se reintenta.
+        """
+        batch = self._receive(batch_size)
+        if not batch:
+            return None
+
+        try:
+            response = handler(self._as_event(batch), context) or {}
+            failed_ids = {failure["itemIdentifier"] for failure in response.get("batchItemFailures", [])}
+        except Exception:
+            response = None
+            failed_ids = {message["messageId"] for message in batch}
+
+        self.invocations.append({"batch": [message["messageId"] for message in batch], "failed": sorted(failed_ids)})
+
+        for message in batch:
+            if message["messageId"] not in failed_ids:
+                self.deleted.append(message)
+            elif message["receive_count"] >= self.max_receive_count:
+                self.dead_letters.append(message)
+            else:
+                self.messages.append(message)
+
+        return response
+
+    def drain(self, handler, batch_size=10, context=None, max_invocations=100):
+        for _ in range(max_invocations):
+            if not self.messages:
+                return
+            self.dispatch(handler, batch_size, context)
+        raise RuntimeError("La cola no se vació")
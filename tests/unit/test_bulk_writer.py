@@ -0,0 +1,86 @@
+import pytest
+
+from helpers import bulk_writer
+from helpers.bulk_writer import bulk_write
+
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+INDEX = "rag-documents-cliente_demo"
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(bulk_writer.time, "sleep", lambda seconds: None)
+
+
+def operations(count, vector_size=1024):
+    for i in range(count):
+        yield {"index": {"_index": INDEX, "_id": f"doc-{i}"}}, {"content": f"chunk {i}", "embedding": [0.123456789] * vector_size}
+
+
+def test_batches_respect_byte_and_document_limits():
+    client = FakeOpenSearch()
+
+    report = bulk_write(client, operations(40), max_bytes=60_000, max_docs=10, max_workers=3)
+
+    assert report["success"] and report["succeeded"] == 40
+    assert len(client.documents(INDEX)) == 40
+    assert all(call["bytes"] <= 60_000 and call["operations"] <= 10 for call in client.bulk_calls)
+    assert report["batches"] == len(client.bulk_calls) > 4
+
+
+def test_only_rejected_items_are_retried():
+    rejected = {"doc-3": 2, "doc-7": 1}
+
+    def fail_item(operation, document):
+        key = f"doc-{document['content'].split()[-1]}"
+        if rejected.get(key):
+            rejected[key] -= 1
+            return 429
+        return None
+
+    client = FakeOpenSearch(fail_item=fail_item)
+
+    report = bulk_write(client, operations(10, vector_size=4), max_docs=10, max_workers=1)
+
+    assert report["success"] and report["retried"] == 2
+    assert [call["operations"] for call in client.bulk_calls] == [10, 2, 1]
+    attempts = {item["_id"]: item["attempts"] for item in report["items"]}
+    assert attempts["doc-3"] == 3 and attempts["doc-7"] == 2 and attempts["doc-0"] == 1
+
+
+def test_permanent_errors_are_reported_per_item():
+    client = FakeOpenSearch(fail_item=lambda operation, document: 400 if document["content"] == "chunk 5" else None)
+
+    report = bulk_write(client, operations(8, vector_size=4), max_workers=2)
+
+    assert not report["success"]
+    assert report["failed"] == 1 and report["succeeded"] == 7
+    failed = [item for item in report["items"] if item["error"]]
+    assert failed[0]["_id"] == "doc-5" and failed[0]["status"] == 400 and failed[0]["attempts"] == 1
+
+
+def test_truncated_response_is_retried_not_misreported():
+    client = FakeOpenSearch()
+    bulk = client.bulk
+    calls = []
+
+    def truncated_once(body, **kwargs):
+        response = bulk(body=body, **kwargs)
+        calls.append(len(response["items"]))
+        if len(calls) == 1:
+            response["items"] = response["items"][:2]
+        return response
+
+    client.bulk = truncated_once
+    report = bulk_write(client, operations(5, vector_size=4), max_workers=1)
+
+    assert report["success"] and report["succeeded"] == 5 and report["retried"] == 5
+    assert calls == [5, 5]
+
+    client.bulk = lambda body, **kwargs: {"errors": False, "items": []}
+    report = bulk_write(client, operations(3, vector_size=4), max_workers=1, max_retries=1)
+
+    assert not report["success"] and report["failed"] == 3
+    assert all(item["status"] == 502 and item["attempts"] == 2 for item in report["items"])
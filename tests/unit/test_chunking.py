@@ -0,0 +1,58 @@
+import random
+
+from helpers.chunking import count_tokens, iter_chunks, split_text
+from helpers.pdf_text import clean_extracted_text
+
+from tests.stubs.pdfs import WORDS
+
+
+def synthetic_document(paragraphs, seed=7):
+    rng = random.Random(seed)
+    text = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(1, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(4, 40))]
+            sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", "?", ":"]))
+        text.append(" ".join(sentences))
+    return "\n\n".join(text)
+
+
+def test_count_tokens_approximates_subword_tokenizer():
+    assert count_tokens("") == 0
+    assert count_tokens("el pago") == 2
+    # Palabras largas y números cuestan varios tokens
+    assert count_tokens("internacionalización") == 4
+    assert count_tokens("1234567") == 3
+    assert count_tokens("SKU-0042-16.") == 7
+
+
+def test_clean_text_keeps_paragraphs_and_lines():
+    raw = "Título  del\tmanual\n\n\n\nPrimer   párrafo\ncontinúa aquí.\x00\n   \nSegundo."
+
+    assert clean_extracted_text(raw) == "Título del manual\n\nPrimer párrafo\ncontinúa aquí.\n\nSegundo."
+
+
+def test_chunks_respect_token_budget_and_sentence_boundaries():
+    text = synthetic_document(300)
+
+    chunks = split_text(text, chunk_size=200, chunk_overlap=40)
+
+    assert len(chunks) > 20
+    assert all(count_tokens(chunk) <= 200 for chunk in chunks)
+    # Ninguna oración cortada: todos los chunks terminan en fin de oración
+    assert all(chunk[-1] in ".?:" for chunk in chunks)
+    # Tamaños parejos: salvo el último, todos llenan al menos la mitad del presupuesto
+    assert min(count_tokens(chunk) for chunk in chunks[:-1]) > 100
+    # Cada chunk arranca con la cola del anterior (overlap por oraciones)
+    assert all(" ".join(chunk.split()[:4]) in previous for previous, chunk in zip(chunks, chunks[1:]))
+
+
+def test_streaming_pages_match_whole_text_and_split_long_sentences():
+    pages = [synthetic_document(5, seed=page) for page in range(20)]
+    pages.append(" ".join(["presupuesto"] * 500) + ".")
+
+    streamed = list(iter_chunks(iter(pages), chunk_size=120, chunk_overlap=20))
+
+    assert streamed == split_text("\n\n".join(pages), 120, 20)
+    assert all(count_tokens(chunk) <= 120 for chunk in streamed)
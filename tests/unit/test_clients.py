@@ -0,0 +1,34 @@
+import pytest
+
+from helpers import clients
+
+
+@pytest.fixture(autouse=True)
+def aws_environment(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIAPRIMERA")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "secret")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("OPENSEARCH_ENDPOINT", "https://coleccion.us-east-1.aoss.amazonaws.com")
+    clients.reset_clients()
+    yield
+    clients.reset_clients()
+
+
+def test_clients_are_reused_between_invocations():
+    assert clients.get_bedrock_runtime_client() is clients.get_bedrock_runtime_client()
+    assert clients.get_opensearch_client() is clients.get_opensearch_client()
+    assert clients.get_bedrock_runtime_client() is not clients.get_bedrock_runtime_client('generation')
+
+
+def test_clients_are_rebuilt_when_credentials_rotate(monkeypatch):
+    bedrock = clients.get_bedrock_runtime_client()
+    opensearch = clients.get_opensearch_client()
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "AKIASEGUNDA")
+
+    assert clients.get_bedrock_runtime_client() is not bedrock
+    assert clients.get_opensearch_client() is not opensearch
+
+
+def test_embedding_client_leaves_retries_to_backoff():
+    assert clients.get_bedrock_config('default').retries == {'max_attempts': 1}
@@ -0,0 +1,57 @@
+from helpers.chunking import count_tokens, split_text
+from helpers.context_packer import pack_context
+
+from tests.stubs.pdfs import synthetic_page_lines
+
+
+SOURCE = "uploads/cliente_demo/general/manual.pdf"
+
+
+def manual_chunks():
+    text = "\n\n".join(" ".join(synthetic_page_lines(page, lines_per_page=8)) for page in range(1, 13))
+    return split_text(text, 300, 60)
+
+
+def documents(chunks, indexes, source_file=SOURCE):
+    return [
+        {"content": chunks[i], "source_file": source_file, "chunk_index": i, "score": 1.0 - position / 10}
+        for position, i in enumerate(indexes)
+    ]
+
+
+def test_adjacent_chunks_are_merged_without_overlap():
+    chunks = manual_chunks()
+    context, sources = pack_context(documents(chunks, [3, 4, 5, 8]), {"token_budget": 10000, "duplicate_threshold": 0.8})
+
+    assert [source["chunk_indexes"] for source in sources] == [[3, 4, 5], [8]]
+    assert sources[0]["relevance_score"] == 1.0
+
+    # Cada oración de los chunks 3-5 aparece una sola vez
+    merged = context.split("\n\n[Documento 2]")[0]
+    for sentence in chunks[4].split(". "):
+        assert merged.count(sentence) == 1
+    assert count_tokens(context) < sum(count_tokens(chunks[i]) for i in (3, 4, 5, 8))
+
+
+def test_budget_is_filled_by_relevance_and_duplicates_dropped():
+    chunks = manual_chunks()
+    ranked = documents(chunks, [6, 1, 8])
+    # Mismo contenido indexado bajo otra ruta (archivo re-subido)
+    ranked.insert(1, dict(ranked[0], source_file="uploads/cliente_demo/general/copia.pdf"))
+
+    # El chunk 1 no entra junto al 6; el 8, más corto, sí
+    budget = count_tokens(chunks[6]) + count_tokens(chunks[8]) + 5
+    assert count_tokens(chunks[1]) > count_tokens(chunks[8]) + 5
+    context, sources = pack_context(ranked, {"token_budget": budget, "duplicate_threshold": 0.8})
+
+    assert [source["chunk_indexes"] for source in sources] == [[6], [8]]
+    assert all(source["source_file"] == SOURCE for source in sources)
+    assert count_tokens(context) <= budget + 10 * len(sources)
+
+
+def test_oversized_top_chunk_is_truncated():
+    chunks = manual_chunks()
+    context, sources = pack_context(documents(chunks, [2]), {"token_budget": 150, "duplicate_threshold": 0.8})
+
+    assert len(sources) == 1
+    assert 100 <= count_tokens(context) <= 150 + 15  # + etiqueta del documento
@@ -0,0 +1,51 @@
+import pytest
+
+from helpers.embedding_cache import (
+    EmbeddingCache,
+    MemoryLRUBackend,
+    SQLiteBackend,
+    embedding_cache_key,
+    set_embedding_cache
+)
+from helpers.rag_helpers import get_multimodal_embeddings
+
+from tests.stubs.bedrock import StubBedrockRuntime
+
+
+def test_key_ignores_whitespace_but_not_model_or_dimensions():
+    key = embedding_cache_key("amazon.titan-embed-image-v1", 1024, "Factura  número\n42 ")
+
+    assert key == embedding_cache_key("amazon.titan-embed-image-v1", 1024, "Factura número 42")
+    assert key != embedding_cache_key("amazon.titan-embed-image-v1", 384, "Factura número 42")
+    assert key != embedding_cache_key("amazon.titan-embed-text-v2:0", 1024, "Factura número 42")
+
+
+def test_memory_lru_evicts_least_recently_used():
+    backend = MemoryLRUBackend(max_entries=2)
+    backend.set("a", [1.0])
+    backend.set("b", [2.0])
+    backend.get("a")
+    backend.set("c", [3.0])
+
+    assert backend.get("b") is None
+    assert backend.get("a") == [1.0]
+
+
+def test_reingest_only_embeds_changed_chunks(tmp_path):
+    database = str(tmp_path / "cache.sqlite3")
+    bedrock = StubBedrockRuntime()
+    chunks = ["capítulo uno", "capítulo dos", "capítulo tres"]
+
+    set_embedding_cache(EmbeddingCache([MemoryLRUBackend(), SQLiteBackend(database)]))
+    first = [get_multimodal_embeddings(input_text=chunk, bedrock_runtime=bedrock)[0] for chunk in chunks]
+
+    # Nuevo proceso (cold start): solo sobrevive el backend persistente
+    cache = EmbeddingCache([MemoryLRUBackend(), SQLiteBackend(database)])
+    set_embedding_cache(cache)
+    edited = ["capítulo uno", "capítulo dos editado", "capítulo tres"]
+    second = [get_multimodal_embeddings(input_text=chunk, bedrock_runtime=bedrock)[0] for chunk in edited]
+
+    assert len(bedrock.calls) == 4
+    assert cache.stats()["hits"] == 2 and cache.stats()["misses"] == 1
+    assert cache.stats()["hits_by_backend"]["sqlite"] == 2
+    assert second[0] == pytest.approx(first[0], abs=1e-6)
@@ -0,0 +1,50 @@
+import numpy as np
+
+from helpers import embedding_engine
+from helpers.embedding_engine import embed_concurrently
+from helpers.rag_helpers import get_multimodal_embeddings
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+
+
+def test_results_keep_chunk_order():
+    bedrock = StubBedrockRuntime(latency=0.01)
+    chunks = [f"chunk numero {i}" for i in range(20)]
+
+    embeddings = embed_concurrently(
+        chunks,
+        lambda chunk: get_multimodal_embeddings(input_text=chunk, bedrock_runtime=bedrock)[0],
+        max_workers=6
+    )
+
+    # Embeddings en float32 desde el parseo de la respuesta de Bedrock
+    np.testing.assert_allclose(embeddings, [fake_embedding(chunk) for chunk in chunks], atol=1e-6)
+    assert 1 < bedrock.peak_concurrency <= 6
+
+
+def test_throttled_chunks_are_retried(monkeypatch):
+    monkeypatch.setattr(embedding_engine.time, "sleep", lambda seconds: None)
+    bedrock = StubBedrockRuntime(throttle_every=3)
+    chunks = [f"texto {i}" for i in range(10)]
+
+    embeddings = embed_concurrently(
+        chunks,
+        lambda chunk: get_multimodal_embeddings(input_text=chunk, bedrock_runtime=bedrock)[0],
+        max_workers=4
+    )
+
+    assert bedrock.throttled > 0
+    np.testing.assert_allclose(embeddings, [fake_embedding(chunk) for chunk in chunks], atol=1e-6)
+
+
+def test_return_exceptions_keeps_failed_positions():
+
+    def embed(value):
+        if value == 2:
+            raise ValueError("fallo")
+        return value * 10
+
+    results = embed_concurrently([1, 2, 3], embed, max_workers=3, return_exceptions=True)
+
+    assert results[0] == 10 and results[2] == 30
+    assert isinstance(results[1], ValueError)
@@ -0,0 +1,136 @@
+import io
+import json
+
+import pytest
+
+import process
+from helpers import clients, fanout, pdf_pipeline, vector_store
+from helpers.fanout import get_fanout_settings, plan_page_ranges, run_fanout_tasks
+from helpers.pdf_pipeline import iter_clean_pages
+from helpers.pdf_text import iter_pdf_pages
+
+from tests.stubs.bedrock import StubBedrockRuntime
+from tests.stubs.opensearch import FakeOpenSearch
+from tests.stubs.pdfs import synthetic_pdf
+from tests.stubs.s3 import StubS3
+
+
+BUCKET = "bucket"
+
+
+class InProcessLambda:
+    """
+    Cliente Lambda que ejecuta process.lambda_handler en el mismo proceso,
+    pasando el evento y la respuesta por JSON como una invocación real
+    """
+
+    def __init__(self):
+        self.invocations = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        event = json.loads(Payload)
+        self.invocations.append(event["fanout_task"])
+        result = process.lambda_handler(event, None)
+        return {"StatusCode": 200, "Payload": io.BytesIO(json.dumps(result).encode("utf-8"))}
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    bedrock = StubBedrockRuntime()
+    opensearch = FakeOpenSearch()
+    s3 = StubS3()
+    monkeypatch.setattr(pdf_pipeline, "get_bedrock_runtime_client", lambda: bedrock)
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(clients, "get_bedrock_runtime_client", lambda profile='default': bedrock)
+    monkeypatch.setattr(fanout, "get_aws_client", lambda service_name: s3)
+    monkeypatch.setenv("FANOUT_MIN_PAGES", "20")
+    monkeypatch.setenv("FANOUT_PAGES_PER_WORKER", "5")
+    monkeypatch.setenv("FANOUT_MAX_WORKERS", "4")
+    return bedrock, opensearch, s3
+
+
+def indexed_chunks(opensearch, tenant_id):
+    return sorted(
+        (doc["chunk_index"], doc["content"])
+        for doc in opensearch.documents(f"rag-documents-{tenant_id}")
+    )
+
+
+def test_page_ranges_cover_document_in_one_wave():
+    assert plan_page_ranges(0, 50, 8) == []
+    assert plan_page_ranges(120, 50, 8) == [(0, 50), (50, 100), (100, 120)]
+
+    ranges = plan_page_ranges(1000, 50, 8)
+    assert len(ranges) == 8
+    assert ranges[0][0] == 0 and ranges[-1][1] == 1000
+    assert all(previous[1] == current[0] for previous, current in zip(ranges, ranges[1:]))
+
+
+@pytest.mark.parametrize("backend", ["thread", "lambda"])
+def test_fanout_matches_single_pass_ingestion(stubs, monkeypatch, backend):
+    bedrock, opensearch, s3 = stubs
+    lambda_client = InProcessLambda()
+    monkeypatch.setattr(fanout, "get_lambda_client", lambda: lambda_client)
+    monkeypatch.setenv("FANOUT_BACKEND", backend)
+    monkeypatch.setenv("FANOUT_FUNCTION_NAME", "process")
+
+    content = synthetic_pdf(30)
+    for tenant_id in ["cliente_a", "cliente_b"]:
+        s3.put_object(Bucket=BUCKET, Key=f"uploads/{tenant_id}/general/manual.pdf", Body=content)
+
+    monkeypatch.setenv("FANOUT_MIN_PAGES", "1000")
+    single = process.process_file(s3, BUCKET, "uploads/cliente_a/general/manual.pdf", "cliente_a", "general", "manual.pdf", ".pdf")
+    monkeypatch.setenv("FANOUT_MIN_PAGES", "20")
+    calls = len(bedrock.calls)
+    fanned = process.process_file(s3, BUCKET, "uploads/cliente_b/general/manual.pdf", "cliente_b", "general", "manual.pdf", ".pdf")
+
+    assert single["success"] is True and fanned["success"] is True
+    assert fanned["details"]["page_ranges"] == 4
+    assert fanned["details"]["chunk_ranges"] > 1
+    # Índices y overlap en los bordes de rango idénticos al procesamiento en una pasada
+    assert indexed_chunks(opensearch, "cliente_b") == indexed_chunks(opensearch, "cliente_a")
+    assert len(bedrock.calls) - calls == single["details"]["chunks_count"]
+    if backend == "lambda":
+        assert lambda_client.invocations.count("extract_pages") == 4
+
+    # Reprocesar el mismo archivo no embebe nada
+    calls = len(bedrock.calls)
+    again = process.process_file(s3, BUCKET, "uploads/cliente_b/general/manual.pdf", "cliente_b", "general", "manual.pdf", ".pdf")
+    assert again["details"]["written_count"] == 0
+    assert len(bedrock.calls) == calls
+
+
+def test_process_pool_extracts_same_pages(stubs, monkeypatch):
+    _, _, s3 = stubs
+    monkeypatch.setenv("FANOUT_BACKEND", "process")
+    content = synthetic_pdf(12)
+    s3.put_object(Bucket=BUCKET, Key="uploads/cliente_a/general/manual.pdf", Body=content)
+
+    results = run_fanout_tasks("extract_pages", [
+        {"bucket": BUCKET, "object_key": "uploads/cliente_a/general/manual.pdf", "first_page": first, "last_page": last}
+        for first, last in plan_page_ranges(12, 5, 4)
+    ], get_fanout_settings())
+
+    assert [page for result in results for page in result["pages"]] == list(iter_clean_pages(iter_pdf_pages(content)))
+
+
+def test_process_backend_with_local_store_persists_every_chunk(stubs, monkeypatch, tmp_path):
+    bedrock, _, s3 = stubs
+    monkeypatch.setenv("FANOUT_BACKEND", "process")
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_VECTOR_STORE_DIR", str(tmp_path))
+    key = "uploads/cliente_a/general/manual.pdf"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=synthetic_pdf(30))
+
+    result = process.process_file(s3, BUCKET, key, "cliente_a", "general", "manual.pdf", ".pdf")
+
+    assert result["success"] is True and result["details"]["chunk_ranges"] > 1
+    # Escribe solo el coordinador: en disco están todos los chunks, no los del último proceso
+    vector_store.reset_vector_stores()
+    persisted = vector_store.get_vector_store().get_document_hashes("cliente_a", key)
+    assert len(persisted) == result["details"]["written_count"] == result["details"]["chunks_count"]
+
+    calls = len(bedrock.calls)
+    again = process.process_file(s3, BUCKET, key, "cliente_a", "general", "manual.pdf", ".pdf")
+    assert again["details"]["written_count"] == 0 and again["details"]["unchanged_count"] == len(persisted)
+    assert len(bedrock.calls) == calls
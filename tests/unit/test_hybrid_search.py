@@ -0,0 +1,70 @@
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers.hybrid_search import reciprocal_rank_fusion, weighted_score_fusion
+
+from tests.stubs.bedrock import fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+from tests.stubs.pdfs import synthetic_page_lines
+
+
+TENANT = "cliente_demo"
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    client = FakeOpenSearch()
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: client)
+
+    chunks = [" ".join(synthetic_page_lines(page, lines_per_page=3)) for page in range(40)]
+    indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in chunks], chunks, TENANT, "general",
+        "uploads/cliente_demo/general/catalogo.pdf", "catalogo.pdf"
+    )
+    return client
+
+
+def test_rrf_rewards_documents_ranked_by_both_branches():
+    vector = [{"_id": "a"}, {"_id": "b"}, {"_id": "c"}]
+    lexical = [{"_id": "c"}, {"_id": "d"}]
+
+    fused = reciprocal_rank_fusion([vector, lexical], rrf_k=60, size=3)
+
+    assert [hit["_id"] for hit in fused] == ["c", "a", "b"]
+    assert fused[0]["_ranks"] == [3, 1]
+    assert 0 < fused[-1]["_score"] < fused[0]["_score"] <= 1.0
+
+
+def target_rank(result, target):
+    return next(i for i, document in enumerate(result["documents"]) if target in document["content"])
+
+
+def test_hybrid_mode_promotes_exact_identifier_in_one_request(opensearch):
+    question = "precio y garantía del SKU-0027-00"
+    target = "SKU-0027-00"
+    embedding = fake_embedding(question)
+
+    vector = indexing.opensearch_query(embedding, TENANT, question=question, search_mode="vector")
+    hybrid = indexing.opensearch_query(embedding, TENANT, question=question, search_mode="hybrid")
+
+    assert hybrid["success"] and hybrid["search_mode"] == "hybrid"
+    assert target_rank(hybrid, target) < target_rank(vector, target)
+    assert [request[0] for request in opensearch.requests].count("msearch") == 1
+
+
+def test_invalid_search_mode_is_reported(opensearch):
+    result = indexing.opensearch_query(fake_embedding("hola"), TENANT, question="hola", search_mode="fuzzy")
+
+    assert not result["success"]
+    assert "search_mode" in result["message"]
+
+
+def test_score_fusion_keeps_strong_lexical_match_on_top():
+    vector = [{"_id": "a", "_score": 0.80}, {"_id": "c", "_score": 0.79}, {"_id": "b", "_score": 0.70}]
+    lexical = [{"_id": "c", "_score": 14.0}, {"_id": "a", "_score": 2.1}, {"_id": "b", "_score": 2.0}]
+
+    fused = weighted_score_fusion([vector, lexical], size=3)
+
+    assert [hit["_id"] for hit in fused] == ["c", "a", "b"]
+    assert fused[0]["_score"] <= 1.0
@@ -0,0 +1,86 @@
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import opensearch_helpers
+from helpers.rag_helpers import chunk_document_hash
+
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_demo"
+SOURCE = "uploads/cliente_demo/general/manual.pdf"
+INDEX = f"rag-documents-{TENANT}"
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    client = FakeOpenSearch()
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: client)
+    return client
+
+
+def ingest(chunks, embedded):
+    indexed_hashes = indexing.get_existing_chunk_hashes(TENANT, SOURCE)
+
+    embeddings = []
+    for i, chunk in enumerate(chunks):
+        if chunk_document_hash(TENANT, SOURCE, i, chunk) in indexed_hashes:
+            embeddings.append(None)
+        else:
+            embedded.append(chunk)
+            embeddings.append([float(i + 1), 0.0, 1.0])
+
+    return indexing.opensearch_indexing(
+        embeddings, chunks, TENANT, "general", SOURCE, "manual.pdf",
+        indexed_hashes=indexed_hashes
+    )
+
+
+def test_reprocessing_unchanged_file_costs_nothing(opensearch):
+    chunks = ["introducción", "capítulo uno", "capítulo dos"]
+    embedded = []
+
+    ingest(chunks, embedded)
+    bulk_calls = len(opensearch.bulk_calls)
+    embedded.clear()
+
+    result = ingest(chunks, embedded)
+
+    assert embedded == []
+    assert len(opensearch.bulk_calls) == bulk_calls
+    assert result["details"]["unchanged_count"] == 3
+    assert len(opensearch.documents(INDEX)) == 3
+
+
+def test_edited_file_writes_changes_and_deletes_stale_chunks(opensearch):
+    embedded = []
+    ingest(["introducción", "capítulo uno", "capítulo dos", "anexo"], embedded)
+    embedded.clear()
+
+    result = ingest(["introducción", "capítulo uno revisado", "capítulo dos"], embedded)
+
+    assert embedded == ["capítulo uno revisado"]
+    assert result["details"]["written_count"] == 1
+    assert result["details"]["deleted_count"] == 2
+    contents = sorted(doc["content"] for doc in opensearch.documents(INDEX))
+    assert contents == ["capítulo dos", "capítulo uno revisado", "introducción"]
+    assert sorted(doc["chunk_index"] for doc in opensearch.documents(INDEX)) == [0, 1, 2]
+
+
+def test_files_larger_than_one_search_page_are_fully_incremental(opensearch, monkeypatch):
+    # Páginas de 4: los 10 chunks del archivo necesitan 3 búsquedas
+    monkeypatch.setattr(opensearch_helpers, "INDEXED_HASHES_PAGE_SIZE", 4)
+    chunks = [f"sección {number}" for number in range(10)]
+    embedded = []
+
+    ingest(chunks, embedded)
+    assert len(indexing.get_existing_chunk_hashes(TENANT, SOURCE)) == 10
+    embedded.clear()
+
+    result = ingest(chunks[:9], embedded)
+
+    assert embedded == []
+    assert result["details"]["unchanged_count"] == 9
+    assert result["details"]["deleted_count"] == 1
+    assert len(opensearch.documents(INDEX)) == 9
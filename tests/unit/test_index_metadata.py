@@ -0,0 +1,86 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import rag_helpers, strategies
+from helpers.index_metadata import get_index_metadata_cache
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_demo"
+INDEX = f"rag-documents-{TENANT}"
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    client = FakeOpenSearch()
+    stub = StubBedrockRuntime(answer="De 9 a 18 horas.")
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: client)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    return client
+
+
+def ingest(filename, chunks):
+    return indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in chunks], chunks, TENANT, "general",
+        f"uploads/cliente_demo/general/{filename}", filename
+    )
+
+
+def index_operations(client):
+    return [operation for operation, _ in client.requests if operation.startswith("indices.")]
+
+
+def test_index_metadata_is_read_once_per_warm_lambda(opensearch):
+    assert ingest("faq.pdf", ["El horario de atención es de 9 a 18 horas"])["success"]
+    assert index_operations(opensearch) == ["indices.get_mapping", "indices.exists", "indices.create", "indices.get_mapping"]
+
+    opensearch.requests.clear()
+    assert ingest("envios.pdf", ["Los envíos tardan tres días hábiles"])["success"]
+    for _ in range(3):
+        assert strategies.query_strategy("¿Cuál es el horario de atención?", TENANT, use_cache=False)["success"]
+
+    # Ni la segunda ingesta ni las consultas preguntan por el índice
+    assert index_operations(opensearch) == []
+    assert get_index_metadata_cache().get(opensearch, INDEX)["mapping_version"] == 2
+
+
+def test_deleted_index_is_invalidated_on_404(opensearch):
+    assert ingest("faq.pdf", ["El horario de atención es de 9 a 18 horas"])["success"]
+
+    # Otra Lambda borra el índice (p. ej. una migración) con la metadata ya cacheada
+    opensearch.indices.delete(index=INDEX)
+    opensearch.requests.clear()
+
+    result = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT, use_cache=False, search_mode="vector")
+    assert result["success"] and result["sources"] == []
+
+    # La siguiente consulta vuelve a leer la metadata en vez de fallar otra vez
+    strategies.query_strategy("¿Cuál es el horario de atención?", TENANT, use_cache=False, search_mode="vector")
+    assert index_operations(opensearch) == ["indices.get_mapping"]
+
+
+def test_concurrent_first_ingest_creates_index_once(opensearch, monkeypatch):
+    # Dos Lambdas del mismo tenant nuevo ven el índice inexistente a la vez
+    barrier = threading.Barrier(2)
+    exists = opensearch.indices.exists
+
+    def racing_exists(index):
+        result = exists(index=index)
+        barrier.wait(timeout=5)
+        return result
+
+    monkeypatch.setattr(opensearch.indices, "exists", racing_exists)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda name: ingest(name, [f"Contenido del archivo {name}"]), ["a.pdf", "b.pdf"]))
+
+    assert all(result["success"] for result in results)
+    assert [operation for operation, _ in opensearch.requests].count("indices.create") == 2
+    assert len(opensearch.documents(INDEX)) == 2
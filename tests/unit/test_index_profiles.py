@@ -0,0 +1,87 @@
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import rag_helpers, strategies
+from helpers.index_profiles import get_index_profile, encode_vector, estimate_vector_memory
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_grande"
+INDEX = f"rag-documents-{TENANT}"
+CHUNKS = ["El horario de atención es de 9 a 18 horas", "Los envíos tardan tres días hábiles"]
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    client = FakeOpenSearch()
+    stub = StubBedrockRuntime(answer="De 9 a 18 horas.")
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: client)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setenv("TENANT_INDEX_PROFILES", '{"cliente_grande": "tiny"}')
+    return client
+
+
+def ingest(dimensions, chunks=CHUNKS):
+    return indexing.opensearch_indexing(
+        [fake_embedding(chunk, dimensions) for chunk in chunks], chunks, TENANT, "general",
+        "uploads/cliente_grande/general/faq.pdf", "faq.pdf"
+    )
+
+
+def test_tenant_profile_drives_mapping_ingest_and_query(opensearch):
+    assert indexing.get_embedding_dimensions(TENANT) == 256
+    assert ingest(256)["success"]
+
+    mappings = opensearch.indices.get_mapping(index=INDEX)[INDEX]["mappings"]
+    assert mappings["_meta"] == {"index_profile": "tiny", "mapping_version": 2}
+    assert mappings["properties"]["embedding"]["dimension"] == 256
+    assert mappings["properties"]["embedding"]["data_type"] == "byte"
+    assert mappings["properties"]["embedding"]["method"]["engine"] == "faiss"
+
+    # Los vectores se guardan cuantizados a enteros de un byte
+    stored = opensearch.documents(INDEX)[0]["embedding"]
+    assert len(stored) == 256 and all(isinstance(value, int) and -128 <= value <= 127 for value in stored)
+
+    # La pregunta se embebe con 256 dimensiones y se cuantiza igual
+    result = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT, use_cache=False)
+    assert result["success"]
+    assert result["sources"][0]["content_snippet"].startswith("El horario")
+
+
+def test_existing_index_keeps_its_profile(opensearch, monkeypatch):
+    assert ingest(256)["success"]
+
+    # Cambiar la configuración no afecta a un índice ya creado
+    monkeypatch.setenv("TENANT_INDEX_PROFILES", '{"cliente_grande": "compact"}')
+    vector_store.reset_vector_stores()
+    assert indexing.get_embedding_dimensions(TENANT) == 256
+
+    # Un embedding con otra dimensión falla antes de llegar a OpenSearch
+    result = ingest(384, CHUNKS + ["Las devoluciones se aceptan por 30 días"])
+    assert not result["success"] and "Dimensión 384" in result["message"]
+
+    # Tenants sin excepción usan INDEX_PROFILE (standard por defecto)
+    assert indexing.get_embedding_dimensions("cliente_nuevo") == 1024
+
+
+def test_legacy_index_without_meta_is_standard(opensearch):
+    # Índice creado antes de los perfiles: sin _meta en el mapping
+    opensearch.indices.create(index=INDEX, body={"mappings": {"properties": {}}})
+
+    assert vector_store.get_vector_store().get_index_profile(TENANT)["name"] == "standard"
+
+
+def test_profile_encoding_and_memory_estimate():
+    tiny = get_index_profile("tiny")
+    vector = [3.0, 4.0] + [0.0] * 254
+
+    assert encode_vector(vector, tiny)[:2] == [76, 102]
+    assert encode_vector(vector[:2] + [0.0] * 1022, get_index_profile("fp16"))[:2] == pytest.approx([0.6, 0.8])
+    assert estimate_vector_memory(get_index_profile("standard"), 1_000_000) > 8 * estimate_vector_memory(tiny, 1_000_000)
+
+    with pytest.raises(ValueError):
+        get_index_profile("huge")
@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+import process
+from helpers import clients, pdf_pipeline, vector_store
+
+from tests.stubs.bedrock import StubBedrockRuntime
+from tests.stubs.opensearch import FakeOpenSearch
+from tests.stubs.pdfs import synthetic_pdf
+from tests.stubs.s3 import StubS3
+from tests.stubs.sqs import LocalQueue
+
+
+BUCKET = "bucket"
+INDEX = "rag-documents-cliente_demo"
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    bedrock = StubBedrockRuntime()
+    opensearch = FakeOpenSearch()
+    s3 = StubS3()
+    monkeypatch.setattr(pdf_pipeline, "get_bedrock_runtime_client", lambda: bedrock)
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(clients, "get_bedrock_runtime_client", lambda profile='default': bedrock)
+    monkeypatch.setattr(process, "get_aws_client", lambda service_name: s3)
+    return bedrock, opensearch, s3
+
+
+def upload(s3, queue, name, body):
+    key = f"uploads/cliente_demo/general/{name}"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    queue.send_s3_notification(s3.s3_event(BUCKET, key))
+    return key
+
+
+def test_failed_file_is_retried_alone_and_lands_in_dlq(stubs):
+    bedrock, opensearch, s3 = stubs
+    queue = LocalQueue(max_receive_count=3)
+
+    upload(s3, queue, "manual.pdf", synthetic_pdf(3))
+    broken = upload(s3, queue, "roto.pdf", b"esto no es un pdf")
+    upload(s3, queue, "anexo.pdf", synthetic_pdf(2))
+
+    response = queue.dispatch(process.lambda_handler, batch_size=10)
+
+    assert len(response["batchItemFailures"]) == 1
+    assert len(queue.deleted) == 2
+    calls_after_first_batch = len(bedrock.calls)
+
+    queue.drain(process.lambda_handler)
+
+    assert [message["receive_count"] for message in queue.dead_letters] == [3]
+    assert broken in queue.dead_letters[0]["body"]
+    # Los reintentos solo tocan el archivo roto
+    assert len(bedrock.calls) == calls_after_first_batch
+    sources = {doc["source_file"] for doc in opensearch.documents(INDEX)}
+    assert sources == {"uploads/cliente_demo/general/manual.pdf", "uploads/cliente_demo/general/anexo.pdf"}
+
+
+def test_duplicate_delivery_is_skipped(stubs):
+    bedrock, opensearch, s3 = stubs
+    queue = LocalQueue()
+
+    key = upload(s3, queue, "manual.pdf", synthetic_pdf(3))
+    queue.drain(process.lambda_handler)
+    calls = len(bedrock.calls)
+    bulk_calls = len(opensearch.bulk_calls)
+
+    # SQS entrega al menos una vez: la misma notificación llega de nuevo
+    queue.send_s3_notification(s3.s3_event(BUCKET, key))
+    response = queue.dispatch(process.lambda_handler)
+
+    assert response == {"batchItemFailures": []}
+    assert len(bedrock.calls) == calls
+    assert len(opensearch.bulk_calls) == bulk_calls
+
+    # Una nueva versión del archivo sí se procesa
+    upload(s3, queue, "manual.pdf", synthetic_pdf(4))
+    queue.drain(process.lambda_handler)
+    assert len(bedrock.calls) > calls
+
+
+def test_batch_files_are_processed_concurrently(stubs, monkeypatch):
+    _, _, s3 = stubs
+    queue = LocalQueue()
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_process_file(s3_client, bucket_name, object_key, *args):
+        with lock:
+            active.append(object_key)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.remove(object_key)
+        return {"success": True, "message": "ok"}
+
+    monkeypatch.setattr(process, "process_file", slow_process_file)
+    monkeypatch.setenv("PROCESS_MAX_CONCURRENCY", "3")
+
+    for i in range(6):
+        upload(s3, queue, f"doc_{i}.pdf", f"contenido {i}".encode())
+
+    response = queue.dispatch(process.lambda_handler, batch_size=6)
+
+    assert response == {"batchItemFailures": []}
+    assert max(peak) == 3
+    assert len(queue.deleted) == 6
@@ -0,0 +1,116 @@
+import json
+import time
+
+import pytest
+
+import process
+import query
+from helpers import clients, opensearch_indexing as indexing, pdf_pipeline, rag_helpers, strategies, vector_store
+from helpers.embedding_cache import EmbeddingCache, MemoryLRUBackend, set_embedding_cache
+from helpers.metrics import metrics_scope, span
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+from tests.stubs.pdfs import synthetic_pdf
+from tests.stubs.s3 import StubS3
+
+
+TENANT = "cliente_demo"
+
+
+def emf_records(output):
+    return [json.loads(line) for line in output.splitlines() if line.startswith('{"Operation"')]
+
+
+def test_nested_spans_are_exclusive_and_emitted_as_emf(capsys):
+    with metrics_scope("prueba", tenant_id=TENANT) as metrics:
+        with span("externo"):
+            time.sleep(0.02)
+            with span("interno"):
+                time.sleep(0.05)
+        metrics.count("bytes", 2048, "Bytes")
+
+    [record] = emf_records(capsys.readouterr().out)
+
+    assert 15 <= record["externo_ms"] < 45
+    assert record["interno_ms"] >= 45
+    assert record["bytes"] == 2048 and record["tenant_id"] == TENANT
+    directive = record["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Dimensions"] == [["Operation"]]
+    units = {metric["Name"]: metric["Unit"] for metric in directive["Metrics"]}
+    assert units["interno_ms"] == "Milliseconds" and units["bytes"] == "Bytes"
+
+
+def test_ingestion_emits_stage_timings_and_counters(monkeypatch, capsys):
+    bedrock = StubBedrockRuntime()
+    s3 = StubS3()
+    monkeypatch.setattr(pdf_pipeline, "get_bedrock_runtime_client", lambda: bedrock)
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: FakeOpenSearch())
+    monkeypatch.setattr(clients, "get_bedrock_runtime_client", lambda profile='default': bedrock)
+    monkeypatch.setattr(process, "get_aws_client", lambda service_name: s3)
+
+    key = f"uploads/{TENANT}/general/manual.pdf"
+    s3.put_object(Bucket="bucket", Key=key, Body=synthetic_pdf(4))
+    process.lambda_handler({"Records": [s3.s3_event("bucket", key)]}, None)
+
+    [record] = [record for record in emf_records(capsys.readouterr().out) if record["Operation"] == "ingest"]
+
+    for stage in ("download", "extract", "chunk", "embed", "index"):
+        assert record[f"{stage}_ms"] >= 0
+    assert record["pages"] == 4
+    assert record["chunks"] == record["embedding_requests"] == record["documents_indexed"]
+    assert record["bedrock_input_tokens"] > 0
+    assert record["bytes_downloaded"] == len(s3.objects[("bucket", key)])
+    assert record["object_key"] == key and record["files_processed"] == 1
+
+
+def test_embedding_cache_stats_are_reported_per_file(monkeypatch):
+    bedrock = StubBedrockRuntime()
+    s3 = StubS3()
+    monkeypatch.setattr(pdf_pipeline, "get_bedrock_runtime_client", lambda: bedrock)
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: FakeOpenSearch())
+    monkeypatch.setattr(clients, "get_bedrock_runtime_client", lambda profile='default': bedrock)
+    monkeypatch.setenv("METRICS_ENABLED", "false")
+    set_embedding_cache(EmbeddingCache([MemoryLRUBackend()]))
+
+    results = []
+    for filename in ("manual.pdf", "copia.pdf"):
+        key = f"uploads/{TENANT}/general/{filename}"
+        s3.put_object(Bucket="bucket", Key=key, Body=synthetic_pdf(4))
+        with metrics_scope("ingest"):
+            results.append(process.process_file(s3, "bucket", key, TENANT, "general", filename, ".pdf"))
+
+    first, second = (result["embedding_cache"] for result in results)
+
+    assert first["hits"] == 0 and first["misses"] == len(bedrock.calls)
+    # El contenedor sigue caliente: la copia sale entera de la cache y no arrastra los fallos del primero
+    assert second == {"hits": first["misses"], "misses": 0, "hit_rate": 1.0}
+
+
+def test_query_returns_timings_when_requested(monkeypatch, capsys):
+    stub = StubBedrockRuntime(answer="Abrimos de nueve a dieciocho.")
+    opensearch = FakeOpenSearch()
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+
+    chunks = ["El horario de atención es de 9 a 18 horas"]
+    indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in chunks], chunks, TENANT, "general",
+        f"uploads/{TENANT}/general/faq.pdf", "faq.pdf"
+    )
+
+    body = {"tenant_id": TENANT, "question": "¿Cuál es el horario?", "use_cache": False, "include_timings": True}
+    response = json.loads(query.lambda_handler({"body": json.dumps(body)}, None)["body"])
+
+    timings = response["timings"]
+    assert set(timings["stages_ms"]) >= {"embed", "search", "rerank", "pack", "generate"}
+    assert timings["counters"]["llm_output_tokens"] == 5
+    assert timings["counters"]["documents_retrieved"] == 1
+    assert sum(timings["stages_ms"].values()) <= timings["total_ms"] + 1
+
+    [record] = [record for record in emf_records(capsys.readouterr().out) if record["Operation"] == "query"]
+    assert record["generate_ms"] == pytest.approx(timings["stages_ms"]["generate"], abs=0.2)
+
+    body.pop("include_timings")
+    assert "timings" not in json.loads(query.lambda_handler({"body": json.dumps(body)}, None)["body"])
@@ -0,0 +1,65 @@
+import pytest
+
+import process
+from helpers import clients, pdf_pipeline, vector_store
+from helpers.pdf_pipeline import iter_text_chunks
+from helpers.rag_helpers import get_chunks
+
+from tests.stubs.bedrock import StubBedrockRuntime
+from tests.stubs.opensearch import FakeOpenSearch
+from tests.stubs.pdfs import synthetic_page_lines, synthetic_pdf
+from tests.stubs.s3 import StubS3
+
+
+def test_streaming_chunker_matches_whole_document_chunking():
+    pages = [" ".join(synthetic_page_lines(page)) for page in range(1, 30)]
+
+    chunks = list(iter_text_chunks(iter(pages), chunk_size=200, chunk_overlap=60))
+
+    assert [index for index, _ in chunks] == list(range(len(chunks)))
+    assert [chunk for _, chunk in chunks] == get_chunks("\n\n".join(pages), 200, 60)
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    bedrock = StubBedrockRuntime()
+    opensearch = FakeOpenSearch()
+    s3 = StubS3()
+    monkeypatch.setattr(pdf_pipeline, "get_bedrock_runtime_client", lambda: bedrock)
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(clients, "get_bedrock_runtime_client", lambda profile='default': bedrock)
+    return bedrock, opensearch, s3
+
+
+def test_indexing_starts_before_all_pages_are_parsed(stubs, monkeypatch):
+    bedrock, opensearch, s3 = stubs
+    events = []
+
+    original_pages = pdf_pipeline.iter_pdf_pages
+
+    def tracked_pages(file_content):
+        for page_text in original_pages(file_content):
+            events.append("page")
+            yield page_text
+
+    original_bulk = opensearch.bulk
+
+    def tracked_bulk(body, **kwargs):
+        events.append("bulk")
+        return original_bulk(body, **kwargs)
+
+    monkeypatch.setattr(pdf_pipeline, "iter_pdf_pages", tracked_pages)
+    monkeypatch.setattr(opensearch, "bulk", tracked_bulk)
+    monkeypatch.setenv("BULK_BATCH_SIZE", "5")
+    monkeypatch.setenv("EMBEDDING_MAX_WORKERS", "2")
+
+    key = "uploads/cliente_demo/general/manual.pdf"
+    s3.put_object(Bucket="bucket", Key=key, Body=synthetic_pdf(40))
+
+    result = process.process_file(s3, "bucket", key, "cliente_demo", "general", "manual.pdf", ".pdf")
+
+    assert result["success"] is True
+    assert events.index("bulk") < len(events) - 1 - events[::-1].index("page")
+    details = result["details"]
+    assert details["written_count"] == details["chunks_count"] == len(bedrock.calls)
+    assert len(opensearch.documents("rag-documents-cliente_demo")) == details["chunks_count"]
@@ -0,0 +1,103 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from helpers import pdf_text
+from helpers.pdf_pipeline import iter_clean_pages
+from helpers.pdf_text import get_pdf_backend, get_pdf_page_count, iter_pdf_pages
+
+from tests.stubs.pdfs import synthetic_pdf
+
+
+def test_parallel_extraction_matches_serial(monkeypatch):
+    monkeypatch.setenv("PDF_PARALLEL_MIN_PAGES", "1")
+    file_content = synthetic_pdf(23, lines_per_page=10)
+
+    serial = list(iter_pdf_pages(file_content, backend="pypdf2", workers=1))
+    parallel = list(iter_pdf_pages(file_content, backend="pypdf2", workers=3))
+
+    assert len(serial) == 23
+    assert parallel == serial
+    # Rangos de páginas (fan-out) con varios procesos
+    assert list(iter_pdf_pages(file_content, 5, 17, backend="pypdf2", workers=4)) == serial[5:17]
+
+    monkeypatch.setenv("PDF_EXTRACT_WORKERS", "2")
+    assert pdf_text.get_extract_workers(23) == 2
+    assert list(iter_pdf_pages(file_content, backend="pypdf2")) == serial
+
+
+def test_parallel_extraction_closes_document_once(monkeypatch):
+    file_content = synthetic_pdf(6, lines_per_page=10)
+    open_pdf = pdf_text.open_pdf
+    closes = []
+
+    def recording_open_pdf(*args):
+        document = open_pdf(*args)
+        close = document.close
+        document.close = lambda: (closes.append(1), close())
+        return document
+
+    monkeypatch.setattr(pdf_text, "open_pdf", recording_open_pdf)
+
+    assert len(list(iter_pdf_pages(file_content, backend="pypdf2", workers=2))) == 6
+    assert closes == [1]
+
+
+def test_pdfium_backend_matches_pypdf2():
+    pytest.importorskip("pypdfium2")
+    file_content = synthetic_pdf(6, lines_per_page=12)
+
+    assert get_pdf_backend("auto") == "pdfium"
+    assert get_pdf_page_count(file_content) == 6
+
+    pdfium_pages = list(iter_clean_pages(iter_pdf_pages(file_content, backend="pdfium", workers=2)))
+    pypdf2_pages = list(iter_clean_pages(iter_pdf_pages(file_content, backend="pypdf2", workers=1)))
+
+    assert pdfium_pages == pypdf2_pages
+
+
+def test_pdfium_calls_are_serialized_across_threads(monkeypatch):
+    pytest.importorskip("pypdfium2")
+    file_content = synthetic_pdf(8, lines_per_page=10)
+    serial = list(iter_pdf_pages(file_content, backend="pdfium", workers=1))
+
+    # Cuenta las llamadas que pasan por el lock de PDFium
+    class RecordingLock:
+        def __init__(self):
+            self.lock = threading.RLock()
+            self.calls = 0
+
+        def __enter__(self):
+            self.lock.acquire()
+            self.calls += 1
+
+        def __exit__(self, *exc_info):
+            self.lock.release()
+
+    lock = RecordingLock()
+    monkeypatch.setattr(pdf_text, "_pdfium_lock", lock)
+
+    def extract(_):
+        assert get_pdf_page_count(file_content) == 8
+        return list(iter_pdf_pages(file_content, backend="pdfium", workers=1))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(extract, range(8)))
+
+    assert all(result == serial for result in results)
+    # abrir + cerrar dos veces y una extracción por página, en cada uno de los 8 hilos
+    assert lock.calls == 8 * (4 + 8)
+
+
+def test_backend_selection_and_invalid_pdf(monkeypatch):
+    monkeypatch.setattr(pdf_text, "BACKEND_MODULES", [("pdfium", "modulo_inexistente")])
+    assert get_pdf_backend() == "pypdf2"
+
+    monkeypatch.setenv("PDF_EXTRACTOR", "pdfminer")
+    with pytest.raises(ValueError):
+        get_pdf_backend()
+
+    monkeypatch.setenv("PDF_EXTRACTOR", "auto")
+    with pytest.raises(ValueError, match="No se pudo extraer texto del PDF"):
+        list(iter_pdf_pages(b"esto no es un PDF"))
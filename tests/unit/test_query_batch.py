@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+import query_batch
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import rag_helpers, strategies
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_demo"
+ANSWER = "El horario de atención es de nueve a dieciocho horas."
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    opensearch = FakeOpenSearch()
+    stub = StubBedrockRuntime(answer=ANSWER)
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+
+    chunks = ["El horario de atención es de 9 a 18 horas", "Los envíos tardan tres días"]
+    indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in chunks], chunks, TENANT, "general",
+        "uploads/cliente_demo/general/faq.pdf", "faq.pdf"
+    )
+    opensearch.requests.clear()
+    return opensearch
+
+
+def post_batch(body):
+    response = query_batch.lambda_handler({"body": json.dumps(body)}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_batch_answers_in_order_with_one_msearch(opensearch):
+    questions = ["¿Cuál es el horario?", "ok", "¿Cuánto tardan los envíos?"]
+
+    status, body = post_batch({"tenant_id": TENANT, "questions": questions, "include_timings": True})
+
+    assert status == 200
+    assert [result["question"] for result in body["results"]] == questions
+    assert body["answered"] == 2
+
+    first, invalid, last = body["results"]
+    assert first["success"] and first["answer"] == ANSWER
+    assert last["success"] and last["sources"][0]["source_file"] == "uploads/cliente_demo/general/faq.pdf"
+    # La pregunta inválida recibe su error sin frenar al resto del lote
+    assert not invalid["success"] and "al menos 3 caracteres" in invalid["error"]
+
+    # Las dos búsquedas viajan en un solo _msearch; la existencia del índice sale del cache
+    operations = [operation for operation, _ in opensearch.requests]
+    assert operations[0] == "msearch" and operations.count("msearch") == 1
+    assert not [operation for operation in operations if operation.startswith("indices.")]
+    assert body["timings"]["counters"]["documents_retrieved"] > 0
+
+
+def test_batch_reuses_query_cache_and_validates_size(opensearch, monkeypatch):
+    post_batch({"tenant_id": TENANT, "questions": ["¿Cuál es el horario?"]})
+    opensearch.requests.clear()
+
+    status, body = post_batch({"tenant_id": TENANT, "questions": ["cuál es el horario"]})
+
+    assert status == 200
+    assert body["results"][0]["cache"]["hit"] == "exact"
+    assert not any(operation == "msearch" for operation, _ in opensearch.requests)
+
+    monkeypatch.setenv("MAX_BATCH_QUESTIONS", "2")
+    status, body = post_batch({"tenant_id": TENANT, "questions": ["uno", "dos", "tres"]})
+    assert status == 400 and "máximo 2" in body["error"]
+
+    status, body = post_batch({"tenant_id": TENANT, "questions": []})
+    assert status == 400
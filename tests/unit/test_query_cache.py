@@ -0,0 +1,166 @@
+import threading
+
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import rag_helpers, strategies
+from helpers.query_cache import InMemoryIndexVersionStore, QueryCache, bump_index_version, get_query_cache
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_demo"
+SOURCE = "uploads/cliente_demo/general/faq.pdf"
+
+
+@pytest.fixture
+def services(monkeypatch):
+    opensearch = FakeOpenSearch()
+    bedrock = StubBedrockRuntime(answer="Atendemos de 9 a 18.")
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: bedrock)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: bedrock)
+    return opensearch, bedrock
+
+
+def index_chunks(chunks):
+    embeddings = [fake_embedding(chunk) for chunk in chunks]
+    return indexing.opensearch_indexing(embeddings, chunks, TENANT, "general", SOURCE, "faq.pdf")
+
+
+def test_repeated_question_skips_bedrock_and_reindex_invalidates(services):
+    _, bedrock = services
+    index_chunks(["El horario de atención es de 9 a 18 horas", "Los envíos tardan tres días"])
+
+    first = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT)
+    calls = len(bedrock.calls)
+    second = strategies.query_strategy("cual es el horario de atencion", TENANT)
+
+    assert first["cache"]["hit"] is None
+    assert second["cache"]["hit"] == "exact"
+    assert second["answer"] == first["answer"]
+    assert len(bedrock.calls) == calls
+    assert second["cache"]["latency_saved_ms"] > 0
+
+    index_chunks(["El horario de atención es de 8 a 20 horas"])
+    third = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT)
+
+    assert third["cache"]["hit"] is None
+    assert len(bedrock.calls) > calls
+
+
+def test_semantic_level_and_lru_eviction():
+    versions = InMemoryIndexVersionStore()
+    cache = QueryCache(versions, max_entries=2, semantic_threshold=0.9)
+    result = {"success": True, "answer": "9 a 18"}
+
+    cache.put(TENANT, None, "horario de atención", fake_embedding("horario de atención"), result, 800.0, 50.0)
+
+    hit = cache.get_semantic(TENANT, None, fake_embedding("horario de atención?"))
+    assert hit["level"] == "semantic"
+    assert cache.get_semantic(TENANT, None, fake_embedding("costo de envío")) is None
+    assert cache.get_semantic("cliente_otro", None, fake_embedding("horario de atención")) is None
+    assert cache.stats()["latency_saved_ms"] == 750.0
+
+    cache.put(TENANT, None, "costo de envío", fake_embedding("costo de envío"), result, 800.0)
+    cache.put(TENANT, None, "medios de pago", fake_embedding("medios de pago"), result, 800.0)
+    assert cache.get_exact(TENANT, None, "horario de atención") is None
+    assert cache.get_exact(TENANT, None, "medios de pago")["level"] == "exact"
+
+    versions.bump_version(TENANT)
+    assert cache.get_exact(TENANT, None, "medios de pago") is None
+
+
+class BlockingVersionStore(InMemoryIndexVersionStore):
+    # get_version de "cliente_lento" queda bloqueado como una llamada a DynamoDB colgada
+
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def get_version(self, tenant_id):
+        if tenant_id == "cliente_lento":
+            self.entered.set()
+            self.release.wait(5)
+        return super().get_version(tenant_id)
+
+
+def test_slow_version_lookup_does_not_block_other_tenants():
+    versions = BlockingVersionStore()
+    cache = QueryCache(versions)
+    result = {"success": True, "answer": "9 a 18"}
+    cache.put(TENANT, None, "horario de atención", None, result, 800.0)
+
+    slow = threading.Thread(target=cache.get_exact, args=("cliente_lento", None, "horario de atención"))
+    slow.start()
+    assert versions.entered.wait(5)
+
+    try:
+        finished = threading.Event()
+        fast = threading.Thread(target=lambda: cache.get_exact(TENANT, None, "horario de atención") and finished.set())
+        fast.start()
+        assert finished.wait(2)
+    finally:
+        versions.release.set()
+        slow.join()
+
+
+def test_reindex_during_generation_does_not_cache_stale_answer(services, monkeypatch):
+    index_chunks(["El horario de atención es de 9 a 18 horas"])
+    generate = strategies.generate_llm_response
+
+    def generate_while_reindexing(question, context):
+        # Un re-index termina entre la búsqueda y el put
+        bump_index_version(TENANT)
+        return generate(question, context)
+
+    monkeypatch.setattr(strategies, "generate_llm_response", generate_while_reindexing)
+    first = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT)
+    monkeypatch.setattr(strategies, "generate_llm_response", generate)
+    second = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT)
+
+    assert first["success"] and second["success"]
+    assert second["cache"]["hit"] is None
+
+
+class FailingVersionStore(InMemoryIndexVersionStore):
+
+    def get_version(self, tenant_id):
+        raise RuntimeError("ProvisionedThroughputExceededException")
+
+
+def test_version_store_errors_fail_open(services):
+    index_chunks(["El horario de atención es de 9 a 18 horas"])
+    cache = get_query_cache()
+    cache.version_store = FailingVersionStore()
+
+    first = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT)
+    second = strategies.query_strategy("¿Cuál es el horario de atención?", TENANT)
+
+    # Responde sin cache: ni lee ni guarda entradas sin versión
+    assert first["success"] and second["success"]
+    assert second["cache"]["hit"] is None
+    assert cache.stats()["entries"] == 0
+
+    batch = strategies.batch_query_strategy(["¿Cuál es el horario de atención?"], TENANT)
+    assert batch["success"] and batch["results"][0]["success"]
+
+
+def test_stream_failing_mid_file_still_invalidates_cache(services):
+    opensearch, _ = services
+    versions = get_query_cache().version_store
+    version = versions.get_version(TENANT)
+
+    def embedded_chunks():
+        for i in range(3):
+            yield i, f"chunk {i}", fake_embedding(f"chunk {i}")
+        raise RuntimeError("worker de extracción terminó inesperadamente")
+
+    result = indexing.opensearch_indexing_stream(embedded_chunks(), TENANT, "general", SOURCE, "faq.pdf", batch_size=2)
+
+    assert not result["success"]
+    assert len(opensearch.documents(f"rag-documents-{TENANT}")) == 2
+    assert versions.get_version(TENANT) > version
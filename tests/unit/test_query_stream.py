@@ -0,0 +1,125 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import query_stream
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import rag_helpers, strategies
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_demo"
+ANSWER = "El horario de atención es de nueve a dieciocho horas."
+
+
+@pytest.fixture
+def bedrock(monkeypatch):
+    opensearch = FakeOpenSearch()
+    stub = StubBedrockRuntime(answer=ANSWER)
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+
+    chunks = ["El horario de atención es de 9 a 18 horas", "Los envíos tardan tres días"]
+    indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in chunks], chunks, TENANT, "general",
+        "uploads/cliente_demo/general/faq.pdf", "faq.pdf"
+    )
+    return stub
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), query_stream.QueryStreamHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+
+
+def post_stream(port, body):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request("POST", "/", body=json.dumps(body), headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    events = [json.loads(line) for line in response.read().decode("utf-8").splitlines()]
+    return response, events
+
+
+def test_stream_sends_sources_then_tokens_then_done(bedrock, server):
+    response, events = post_stream(server, {"tenant_id": TENANT, "question": "¿Cuál es el horario?"})
+
+    assert response.status == 200
+    assert response.getheader("Content-Type") == "application/x-ndjson"
+    types = [event["type"] for event in events]
+    assert types[0] == "sources" and types[-1] == "done"
+    assert set(types[1:-1]) == {"token"} and len(types[1:-1]) > 1
+    assert "".join(event["text"] for event in events if event["type"] == "token").strip() == ANSWER
+    assert events[-1]["answer"] == ANSWER
+    assert events[0]["sources"][0]["source_file"] == "uploads/cliente_demo/general/faq.pdf"
+
+    # La misma pregunta sale del cache con el mismo formato de eventos
+    _, cached_events = post_stream(server, {"tenant_id": TENANT, "question": "cuál es el horario"})
+    assert [event["type"] for event in cached_events] == ["sources", "token", "done"]
+    assert cached_events[-1]["cache"]["hit"] == "exact"
+
+
+def test_error_mid_stream_ends_with_error_event_and_is_not_cached(bedrock):
+    bedrock.stream_error_after = 3
+    question = "¿Cuál es el horario?"
+
+    events = list(strategies.stream_query_strategy(question, TENANT))
+
+    assert [event["type"] for event in events] == ["sources", "token", "token", "token", "error"]
+    assert "modelStreamErrorException" in events[-1]["message"]
+
+    bedrock.stream_error_after = None
+    retried = list(strategies.stream_query_strategy(question, TENANT))
+    assert retried[-1]["type"] == "done"
+    assert retried[-1]["cache"]["hit"] is None
+
+
+def test_buffered_fallback_validates_request():
+    response = query_stream.lambda_handler({"body": json.dumps({"tenant_id": "otro", "question": "hola"})}, None)
+
+    assert response["statusCode"] == 400
+    assert "tenant_id" in json.loads(response["body"])["error"]
+
+
+@pytest.mark.parametrize("body", [[], None, {"tenant_id": 5, "question": "hola"}, {"tenant_id": TENANT, "question": ["hola"]}])
+def test_malformed_bodies_get_400(server, body):
+    response, events = post_stream(server, body)
+
+    assert response.status == 400
+    assert events[0]["success"] is False
+
+    fallback = query_stream.lambda_handler({"body": json.dumps(body)}, None)
+    assert fallback["statusCode"] == 400
+
+
+def test_unexpected_errors_still_answer_the_client(server, monkeypatch):
+    def failing_parse(raw_body):
+        raise RuntimeError("fallo antes de los headers")
+
+    monkeypatch.setattr(query_stream, "parse_stream_request", failing_parse)
+    response, events = post_stream(server, {"tenant_id": TENANT, "question": "hola"})
+    assert response.status == 500 and events[0]["success"] is False
+
+    def failing_events(params):
+        yield b'{"type": "sources", "sources": []}\n'
+        raise RuntimeError("fallo con el stream abierto")
+
+    monkeypatch.undo()
+    monkeypatch.setattr(query_stream, "iter_query_events", failing_events)
+    response, events = post_stream(server, {"tenant_id": TENANT, "question": "hola"})
+    assert response.status == 200
+    assert [event["type"] for event in events] == ["sources", "error"]
+    assert "fallo con el stream abierto" in events[-1]["message"]
+
+    fallback = query_stream.lambda_handler({"body": json.dumps({"tenant_id": TENANT, "question": "hola"})}, None)
+    assert fallback["statusCode"] == 500
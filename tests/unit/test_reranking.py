@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import rag_helpers, reranking, strategies, vector_store
+from helpers.reranking import get_rerank_settings, rerank_documents
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_demo"
+
+CANDIDATES = [
+    {"content": "Horario de atención de la tienda principal", "score": 0.91},
+    {"content": "La tienda abre los sábados", "score": 0.88},
+    {"content": "Política de devoluciones: treinta días con ticket", "score": 0.80},
+    {"content": "Envíos a todo el país", "score": 0.75}
+]
+
+
+def test_local_rerank_promotes_lexical_match_and_trims(monkeypatch):
+    monkeypatch.setenv("RERANK_MODE", "local")
+    monkeypatch.setenv("RERANK_TOP_N", "2")
+
+    documents, info = rerank_documents("¿Cuántos días tengo para devoluciones?", CANDIDATES, get_rerank_settings())
+
+    assert documents[0]["content"].startswith("Política de devoluciones")
+    assert len(documents) == 2 and "rerank_score" in documents[0]
+    assert info["mode"] == "local" and info["candidates"] == 4 and info["fallback"] is None
+
+
+def test_rerank_falls_back_to_vector_order_on_timeout(monkeypatch):
+    monkeypatch.setenv("RERANK_MODE", "local")
+    monkeypatch.setenv("RERANK_TOP_N", "3")
+    monkeypatch.setenv("RERANK_TIMEOUT_MS", "50")
+
+    def slow_scorer(question, documents, settings):
+        time.sleep(0.5)
+        return [1.0] * len(documents)
+
+    monkeypatch.setitem(reranking.RERANK_SCORERS, "local", slow_scorer)
+
+    start = time.perf_counter()
+    documents, info = rerank_documents("devoluciones", CANDIDATES, get_rerank_settings())
+
+    assert time.perf_counter() - start < 0.4
+    assert documents == CANDIDATES[:3]
+    assert info["fallback"] == "timeout"
+
+
+def test_query_strategy_overfetches_and_reranks_with_bedrock(monkeypatch):
+    opensearch = FakeOpenSearch()
+    stub = StubBedrockRuntime(answer="Treinta días.")
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(reranking, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setenv("RERANK_MODE", "bedrock")
+    monkeypatch.setenv("RERANK_CANDIDATES", "20")
+    monkeypatch.setenv("RERANK_TOP_N", "3")
+
+    chunks = [f"Sección {i} del manual de productos" for i in range(12)] + ["Plazo de devoluciones: treinta días"]
+    indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in chunks], chunks, TENANT, "general",
+        "uploads/cliente_demo/general/manual.pdf", "manual.pdf"
+    )
+
+    result = strategies.query_strategy("plazo de devoluciones", TENANT, use_cache=False)
+
+    assert result["success"]
+    assert result["total_documents_searched"] == 13
+    assert sum(len(source["chunk_indexes"]) for source in result["sources"]) == 3
+    assert result["sources"][0]["content_snippet"].startswith("Plazo de devoluciones")
+    rerank_call = next(call for call in stub.calls if ".rerank" in call["modelId"])
+    assert len(rerank_call["payload"]["documents"]) == 13
+
+
+def test_invalid_rerank_mode(monkeypatch):
+    monkeypatch.setenv("RERANK_MODE", "crossencoder")
+
+    with pytest.raises(ValueError):
+        get_rerank_settings()
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import query
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import rag_helpers, strategies
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_legal"
+INDEX = f"rag-documents-{TENANT}"
+CHUNKS = [f"Cláusula {number}: el arrendatario paga la renta del mes {number}" for number in range(12)]
+
+
+class RecordingOpenSearch(FakeOpenSearch):
+
+    def __init__(self):
+        super().__init__()
+        self.search_bodies = []
+
+    def search(self, index=None, body=None, **kwargs):
+        self.search_bodies.append(body)
+        return super().search(index=index, body=body, **kwargs)
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    client = RecordingOpenSearch()
+    stub = StubBedrockRuntime(answer="La renta se paga mensualmente.")
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: client)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    return client
+
+
+def ingest(profile, monkeypatch):
+    monkeypatch.setenv("TENANT_INDEX_PROFILES", json.dumps({TENANT: profile}))
+    assert indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in CHUNKS], CHUNKS, TENANT, "contratos",
+        "uploads/cliente_legal/contratos/arriendo.pdf", "arriendo.pdf"
+    )["success"]
+
+
+def knn_of(body):
+    return body["query"]["bool"]["must"]["knn"]["embedding"]
+
+
+def test_profile_hnsw_parameters_and_per_request_overrides(opensearch, monkeypatch):
+    ingest("precise", monkeypatch)
+
+    index = opensearch.indexes[INDEX]["body"]
+    method = index["mappings"]["properties"]["embedding"]["method"]
+    assert method["parameters"]["m"] == 32 and method["parameters"]["ef_construction"] == 256
+    assert index["settings"]["index"]["knn.algo_param.ef_search"] == 256
+
+    result = strategies.query_strategy(
+        "¿Cuándo se paga la renta?", TENANT, use_cache=False,
+        search_options={"size": 3, "k": 40, "ef_search": 400}
+    )
+
+    assert result["success"] and result["total_documents_searched"] == 3
+    body = opensearch.search_bodies[-1]
+    assert body["size"] == 3
+    assert knn_of(body)["k"] == 40
+    assert knn_of(body)["method_parameters"] == {"ef_search": 400}
+
+
+def test_nmslib_profile_ignores_query_ef_search(opensearch, monkeypatch):
+    ingest("standard", monkeypatch)
+
+    strategies.query_strategy("¿Cuándo se paga la renta?", TENANT, use_cache=False, search_options={"ef_search": 300})
+
+    knn = knn_of(opensearch.search_bodies[-1])
+    assert knn["k"] == 10 and "method_parameters" not in knn
+
+
+@pytest.mark.parametrize("options, error", [
+    ({"size": 0}, "size debe ser un entero entre 1 y 100"),
+    ({"k": "50"}, "k debe ser un entero"),
+    ({"ef_search": True}, "ef_search debe ser un entero"),
+    ({"size": 20, "k": 10}, "k debe ser mayor o igual que size"),
+    ({"k": 200, "ef_search": 100}, "ef_search debe ser mayor o igual que k"),
+    ({"size": 5, "k": 50, "ef_search": 512}, None)
+])
+def test_validate_search_options(options, error):
+    body = dict(options, tenant_id=TENANT, question="¿Cuándo se paga la renta?")
+    validation_error = query.validate_query_request(TENANT, body["question"], None, query.get_search_options(body))
+
+    if error is None:
+        assert validation_error is None
+    else:
+        assert validation_error.startswith(error)
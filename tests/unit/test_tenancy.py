@@ -0,0 +1,159 @@
+import json
+
+import pytest
+from opensearchpy.exceptions import RequestError
+
+import process
+import verify
+from helpers import opensearch_indexing as indexing
+from helpers import tenancy, vector_store
+from helpers.bulk_writer import bulk_write
+from helpers.opensearch_helpers import create_index_if_not_exists, delete_documents_bulk
+from helpers.index_profiles import get_index_profile
+from helpers import rag_helpers, strategies
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+POOL = "rag-documents-pool-00"
+
+
+class RecordingOpenSearch(FakeOpenSearch):
+
+    def __init__(self):
+        super().__init__()
+        self.search_bodies = []
+
+    def search(self, index=None, body=None, **kwargs):
+        self.search_bodies.append(body)
+        return super().search(index=index, body=body, **kwargs)
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    client = RecordingOpenSearch()
+    stub = StubBedrockRuntime(answer="Respuesta.")
+    for module in (vector_store, tenancy, verify):
+        monkeypatch.setattr(module, "get_opensearch_client", lambda: client)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.delenv("AWS_LAMBDA_FUNCTION_NAME", raising=False)
+    monkeypatch.setenv("TENANCY_MODE", "pooled")
+    monkeypatch.setenv("POOLED_INDEX_COUNT", "1")
+    monkeypatch.setenv("TENANCY_CACHE_TTL", "0")
+    return client
+
+
+def ingest(tenant_id, chunks, filename="faq.pdf"):
+    return indexing.opensearch_indexing(
+        [fake_embedding(chunk) for chunk in chunks], chunks, tenant_id, "general",
+        f"uploads/{tenant_id}/general/{filename}", filename
+    )
+
+
+def test_pooled_tenants_share_index_and_stay_isolated(opensearch):
+    assert ingest("cliente_a", ["El horario de atención es de 9 a 18 horas"])["success"]
+    assert ingest("cliente_b", ["El horario de atención es de 10 a 14 horas"])["success"]
+
+    assert list(opensearch.indexes) == [POOL]
+    mappings = opensearch.indices.get_mapping(index=POOL)[POOL]["mappings"]
+    assert mappings["_meta"] == {"index_profile": "fp16", "mapping_version": 2}
+
+    result = strategies.query_strategy("¿Cuál es el horario de atención?", "cliente_a", use_cache=False, search_mode="vector")
+    assert result["success"] and result["total_documents_searched"] == 1
+    assert "9 a 18" in result["sources"][0]["content_snippet"]
+
+    # El filtro por tenant va dentro del kNN: HNSW no devuelve vecinos de otro tenant
+    knn = opensearch.search_bodies[-1]["query"]["bool"]["must"]["knn"]["embedding"]
+    assert knn["filter"] == {"bool": {"filter": [{"term": {"tenant_id": "cliente_a"}}]}}
+
+    # /verify busca solo en el índice del tenant
+    verification = verify.verify_tenant_documents("cliente_b", opensearch)
+    assert verification["total_documents"] == 1
+    assert verification["placement"] == "pooled"
+    assert verification["statistics"]["search_pattern"] == POOL
+
+
+def test_existing_and_custom_profile_tenants_stay_dedicated(opensearch, monkeypatch):
+    # Índice propio anterior al modo pooled
+    opensearch.indices.create(index="rag-documents-cliente_viejo", body={"mappings": {"properties": {}}})
+    monkeypatch.setenv("TENANT_INDEX_PROFILES", json.dumps({"cliente_grande": "tiny"}))
+
+    assert vector_store.get_index_name("cliente_viejo") == "rag-documents-cliente_viejo"
+    assert vector_store.get_index_name("cliente_grande") == "rag-documents-cliente_grande"
+    assert vector_store.get_index_name("cliente_nuevo") == POOL
+
+    # Una vez registrado, cambiar la cantidad de pools no mueve al tenant
+    assert ingest("cliente_nuevo", ["Los envíos tardan tres días hábiles"])["success"]
+    monkeypatch.setenv("POOLED_INDEX_COUNT", "8")
+    assert vector_store.get_index_name("cliente_nuevo") == POOL
+
+
+def test_large_tenant_is_promoted_and_can_move_back(opensearch, monkeypatch):
+    monkeypatch.setenv("TENANT_PROMOTION_CHUNKS", "5")
+    monkeypatch.setattr(tenancy, "MIGRATION_PAGE_SIZE", 2)
+
+    assert ingest("cliente_chico", ["El horario de atención es de 9 a 18 horas"])["success"]
+    chunks = [f"Cláusula {number}: el arrendatario paga la renta del mes {number}" for number in range(6)]
+    assert ingest("cliente_grande", chunks, "contrato.pdf")["success"]
+
+    # Pasó a índice propio con todos sus chunks (copiados en páginas de 2) y salió del pool
+    assert tenancy.get_tenancy_registry().get("cliente_grande") == {"placement": "dedicated", "index_name": "rag-documents-cliente_grande"}
+    assert len(opensearch.documents("rag-documents-cliente_grande")) == 6
+    assert [document["tenant_id"] for document in opensearch.documents(POOL)] == ["cliente_chico"]
+
+    result = strategies.query_strategy("¿Cuándo se paga la renta?", "cliente_grande", use_cache=False)
+    assert result["success"] and result["total_documents_searched"] == 6
+
+    # Herramienta de migración: vuelta al pool vía la Lambda de procesamiento
+    monkeypatch.setenv("TENANT_PROMOTION_CHUNKS", "0")
+    migration = process.lambda_handler({"tenancy_migration": {"tenant_id": "cliente_grande", "target": "pooled"}}, None)
+
+    assert migration["success"] and migration["results"][0]["details"]["documents"] == 6
+    assert "rag-documents-cliente_grande" not in opensearch.indexes
+    assert len(opensearch.documents(POOL)) == 7
+
+    assert not process.lambda_handler({"tenancy_migration": {"tenant_id": "cliente_grande", "target": "shared"}}, None)["success"]
+
+
+def test_promotion_from_pool_created_before_document_hash_mapping(opensearch, monkeypatch):
+    # Pool creado con mapping_version 1: document_hash quedó text + .keyword por mapping dinámico
+    create_index_if_not_exists(opensearch, POOL, profile=get_index_profile("fp16"))
+    mappings = opensearch.indexes[POOL]["body"]["mappings"]
+    del mappings["properties"]["document_hash"]
+    mappings["_meta"]["mapping_version"] = 1
+
+    monkeypatch.setenv("TENANT_PROMOTION_CHUNKS", "3")
+    monkeypatch.setattr(tenancy, "MIGRATION_PAGE_SIZE", 2)
+    chunks = [f"Cláusula {number}: el arrendatario paga la renta del mes {number}" for number in range(4)]
+    assert ingest("cliente_grande", chunks, "contrato.pdf")["success"]
+
+    with pytest.raises(RequestError):
+        opensearch.search(index=POOL, body={"sort": [{"document_hash": "asc"}]})
+
+    # La copia paginó por document_hash.keyword
+    assert len(opensearch.documents("rag-documents-cliente_grande")) == 4
+    assert opensearch.documents(POOL) == []
+
+
+def test_migration_recopies_only_late_writes(opensearch, monkeypatch):
+    monkeypatch.setenv("TENANT_PROMOTION_CHUNKS", "0")
+    chunks = [f"Cláusula {number}: el arrendatario paga la renta del mes {number}" for number in range(3)]
+    assert ingest("cliente_grande", chunks, "contrato.pdf")["success"]
+    target = "rag-documents-cliente_grande"
+    ids = sorted(document["document_hash"] for document in opensearch.documents(POOL))
+
+    def during_placement_ttl(seconds):
+        # Una Lambda con la ubicación nueva re-indexa y borra un chunk obsoleto del destino...
+        assert delete_documents_bulk(opensearch, target, [ids[0]])
+        # ...y otra con la ubicación vieja en cache todavía escribe al pool
+        late = dict(opensearch.documents(POOL)[0], document_hash="tardio", chunk_index=9)
+        assert bulk_write(opensearch, [({"index": {"_index": POOL, "_id": "tardio"}}, late)])["success"]
+
+    monkeypatch.setattr(tenancy.time, "sleep", during_placement_ttl)
+    result = tenancy.migrate_tenant("cliente_grande", "dedicated")
+
+    assert result["success"]
+    assert sorted(document["document_hash"] for document in opensearch.documents(target)) == sorted(ids[1:] + ["tardio"])
+    assert opensearch.documents(POOL) == []
@@ -0,0 +1,78 @@
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+
+from tests.stubs.bedrock import fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+from tests.stubs.pdfs import synthetic_page_lines
+
+
+TENANT = "cliente_demo"
+MANUAL = "uploads/cliente_demo/manuales/manual.pdf"
+INVOICE = "uploads/cliente_demo/facturas/factura.pdf"
+
+
+@pytest.fixture
+def local_store(monkeypatch, tmp_path):
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "local")
+    monkeypatch.setenv("LOCAL_VECTOR_STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def index_file(chunks, document_type, source_file, dimensions=64):
+    return indexing.opensearch_indexing(
+        [fake_embedding(chunk, dimensions) for chunk in chunks], chunks, TENANT, document_type,
+        source_file, source_file.rsplit("/", 1)[-1]
+    )
+
+
+def search(question, document_type=None, search_mode="vector", dimensions=64):
+    return indexing.opensearch_query(
+        fake_embedding(question, dimensions), TENANT, document_type, question=question, search_mode=search_mode
+    )
+
+
+def test_local_backend_runs_incremental_flow_with_filters_and_persists(local_store):
+    index_file(["instalación del equipo", "garantía de dos años", "soporte técnico"], "manuales", MANUAL)
+    index_file(["factura 0042 por garantía extendida"], "facturas", INVOICE)
+
+    result = search("garantía", document_type="manuales")
+    assert {document["document_type"] for document in result["documents"]} == {"manuales"}
+    assert result["documents"][0]["content"] == "garantía de dos años"
+
+    edited = index_file(["instalación del equipo", "garantía de tres años"], "manuales", MANUAL)
+    assert edited["details"]["written_count"] == 1
+    assert edited["details"]["deleted_count"] == 2
+
+    # Un proceso nuevo lee el mismo índice memory-mapped desde disco
+    vector_store.reset_vector_stores()
+    contents = sorted(document["content"] for document in search("garantía", search_mode="hybrid")["documents"])
+    assert contents == ["factura 0042 por garantía extendida", "garantía de tres años", "instalación del equipo"]
+    assert indexing.get_existing_chunk_hashes(TENANT, INVOICE)
+
+
+def test_local_backend_matches_opensearch_ranking(local_store, monkeypatch):
+    chunks = [" ".join(synthetic_page_lines(page, lines_per_page=2)) for page in range(30)]
+    questions = ["reporte de ventas del trimestre", "garantía y soporte del SKU-0012-00"]
+
+    index_file(chunks, "general", MANUAL)
+    local = {(question, mode): search(question, search_mode=mode) for question in questions for mode in ("vector", "lexical")}
+
+    opensearch = FakeOpenSearch()
+    monkeypatch.setenv("VECTOR_STORE_BACKEND", "opensearch")
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: opensearch)
+    index_file(chunks, "general", MANUAL)
+
+    def ranking(result):
+        # Los empates de score no tienen orden garantizado en ningún backend
+        return sorted(((-round(d["score"], 4), d["chunk_index"]) for d in result["documents"]))
+
+    for (question, mode), local_result in local.items():
+        assert ranking(local_result) == ranking(search(question, search_mode=mode))
+
+
+def test_unknown_tenant_returns_no_documents(local_store):
+    result = search("garantía")
+
+    assert result["success"] and result["documents"] == []
@@ -0,0 +1,178 @@
+import json
+
+import numpy as np
+import pytest
+
+from helpers import opensearch_indexing as indexing
+from helpers import vector_store
+from helpers import rag_helpers, strategies
+from helpers.bulk_writer import serialize_operation
+from helpers.rag_helpers import chunk_document_hash
+from helpers.index_profiles import decode_vector, encode_vector, get_index_profile
+from helpers.vectors import mmr
+
+from tests.stubs.bedrock import StubBedrockRuntime, fake_embedding
+from tests.stubs.opensearch import FakeOpenSearch
+
+
+TENANT = "cliente_demo"
+INDEX = f"rag-documents-{TENANT}"
+SOURCE = "uploads/cliente_demo/general/faq.pdf"
+
+
+class RecordingOpenSearch(FakeOpenSearch):
+
+    def __init__(self):
+        super().__init__()
+        self.search_bodies = []
+
+    def search(self, index=None, body=None, **kwargs):
+        self.search_bodies.append(body)
+        return super().search(index=index, body=body, **kwargs)
+
+
+@pytest.fixture
+def opensearch(monkeypatch):
+    client = RecordingOpenSearch()
+    stub = StubBedrockRuntime(answer="Respuesta.")
+    monkeypatch.setattr(vector_store, "get_opensearch_client", lambda: client)
+    monkeypatch.setattr(rag_helpers, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    monkeypatch.setattr(strategies, "get_bedrock_runtime_client", lambda *args, **kwargs: stub)
+    return client
+
+
+def ingest(chunks, embeddings=None):
+    embeddings = embeddings if embeddings is not None else [fake_embedding(chunk) for chunk in chunks]
+    return indexing.opensearch_indexing(embeddings, chunks, TENANT, "general", SOURCE, "faq.pdf")
+
+
+def test_bulk_body_round_trips_float32_and_byte_vectors():
+    vector = np.random.default_rng(7).standard_normal(1024).astype(np.float32)
+    action = {"index": {"_index": INDEX, "_id": "a"}}
+
+    _, line = serialize_operation(action, {"content": "Cláusula 1", "embedding": vector}).decode("utf-8").splitlines()
+    document = json.loads(line)
+
+    # %.9g reproduce cada float32 exacto, sin el ruido de imprimirlos como float64
+    assert document["content"] == "Cláusula 1"
+    assert np.array_equal(np.array(document["embedding"], dtype=np.float32), vector)
+    assert len(line) < len(json.dumps({"content": "Cláusula 1", "embedding": vector.astype(np.float64).tolist()}))
+
+    encoded = encode_vector(vector[:256], get_index_profile("tiny"))
+    _, line = serialize_operation(action, {"embedding": encoded}).decode("utf-8").splitlines()
+    assert encoded.dtype == np.int8 and json.loads(line)["embedding"] == encoded.tolist()
+
+    with pytest.raises(ValueError):
+        serialize_operation(action, {"embedding": np.array([np.nan, 1.0], dtype=np.float32)})
+
+
+def searchable_chunks(opensearch):
+    return sorted(document["chunk_index"] for document in opensearch.documents(INDEX) if "embedding" in document)
+
+
+def test_near_duplicate_and_invalid_chunks_are_not_indexed(opensearch, monkeypatch):
+    monkeypatch.setenv("CHUNK_DEDUP_THRESHOLD", "0.98")
+    footer = "Documento confidencial, prohibida su reproducción total o parcial"
+    chunks = [
+        "El horario de atención es de 9 a 18 horas",
+        footer,
+        "Los envíos tardan tres días hábiles",
+        footer,
+        "Chunk con embedding roto"
+    ]
+    embeddings = [fake_embedding(chunk) for chunk in chunks[:4]] + [[0.0] * 1024]
+
+    result = ingest(chunks, embeddings)
+
+    assert result["success"]
+    assert result["details"]["written_count"] == 3
+    assert result["details"]["deduplicated_count"] == 1
+    assert result["details"]["invalid_count"] == 1
+    assert result["details"]["unchanged_count"] == 0
+    assert searchable_chunks(opensearch) == [0, 1, 2]
+    # El duplicado queda como tombstone sin contenido que apunta al chunk conservado
+    tombstone = next(document for document in opensearch.documents(INDEX) if document["chunk_index"] == 3)
+    assert "content" not in tombstone and tombstone["duplicate_of"] == chunk_document_hash(TENANT, SOURCE, 1, footer)
+    documents = indexing.opensearch_query(None, TENANT, question="confidencial reproducción", search_mode="lexical")["documents"]
+    assert [document["chunk_index"] for document in documents] == [1]
+
+    # Re-subir el archivo: solo el chunk inválido (nunca indexado) se vuelve a embeber
+    indexed_hashes = indexing.get_existing_chunk_hashes(TENANT, SOURCE)
+    duplicate_hashes = indexing.get_existing_duplicate_hashes(TENANT, SOURCE)
+    needs_embedding = indexing.make_needs_embedding(TENANT, SOURCE, indexed_hashes, duplicate_hashes)
+    assert [needs_embedding(i, chunk) for i, chunk in enumerate(chunks)] == [False, False, False, False, True]
+
+    bulk_calls = len(opensearch.bulk_calls)
+    result = ingest(chunks, [None] * 4 + embeddings[4:])
+
+    assert result["success"]
+    assert result["details"]["written_count"] == 0
+    assert result["details"]["embeddings_count"] == 1
+    assert result["details"]["unchanged_count"] == 4
+    assert result["details"]["deleted_count"] == 0
+    assert len(opensearch.bulk_calls) == bulk_calls
+    assert len(opensearch.documents(INDEX)) == 4
+
+    # Si cambia el chunk conservado, el tombstone deja de valer y el duplicado se indexa
+    edited = ["Nuevo pie de página del documento"] + chunks[1:]
+    indexed_hashes = indexing.get_existing_chunk_hashes(TENANT, SOURCE)
+    needs_embedding = indexing.make_needs_embedding(TENANT, SOURCE, indexed_hashes, indexing.get_existing_duplicate_hashes(TENANT, SOURCE))
+    assert [needs_embedding(i, chunk) for i, chunk in enumerate(edited)] == [True, False, False, False, True]
+
+    edited = [chunks[0], "Pie de página reescrito por completo"] + chunks[2:]
+    indexed_hashes = indexing.get_existing_chunk_hashes(TENANT, SOURCE)
+    needs_embedding = indexing.make_needs_embedding(TENANT, SOURCE, indexed_hashes, indexing.get_existing_duplicate_hashes(TENANT, SOURCE))
+    assert [needs_embedding(i, chunk) for i, chunk in enumerate(edited)] == [False, True, False, True, True]
+
+    result = ingest(edited, [fake_embedding(chunk) if needed else None for chunk, needed in zip(edited, [False, True, False, True, False])])
+    assert result["details"]["written_count"] == 2 and result["details"]["deleted_count"] == 1
+    assert searchable_chunks(opensearch) == [0, 1, 2, 3]
+
+    # Un chunk nuevo idéntico a uno ya indexado queda como tombstone (su vector indexado siembra el filtro)
+    result = ingest(edited[:4] + [chunks[0]], [None] * 4 + [fake_embedding(chunks[0])])
+
+    assert result["details"]["written_count"] == 0 and result["details"]["deduplicated_count"] == 1
+    assert searchable_chunks(opensearch) == [0, 1, 2, 3]
+
+
+def test_indexed_vectors_are_decoded_with_the_index_profile():
+    profile = get_index_profile("tiny")
+    vector = np.random.default_rng(7).standard_normal(256).astype(np.float32)
+
+    decoded = decode_vector(encode_vector(vector, profile).tolist(), profile)
+
+    # int8 de vuelta a [-1, 1]: misma escala que un embedding normalizado
+    assert decoded.dtype == np.float32
+    assert np.allclose(decoded, vector / np.linalg.norm(vector), atol=1 / 127)
+
+
+def test_mmr_prefers_diverse_candidates():
+    query = np.array([1.0, 0.0, 0.0])
+    candidates = [[0.9, 0.1, 0.0], [0.9, 0.12, 0.0], [0.7, 0.0, 0.7]]
+
+    assert mmr(query, candidates, 1.0, 2) == [0, 1]
+    assert mmr(query, candidates, 0.5, 2) == [0, 2]
+
+
+def test_query_with_mmr_diversifies_and_drops_embeddings(opensearch, monkeypatch):
+    assert ingest([
+        "El horario de atención es de 9 a 18 horas de lunes a viernes",
+        "El horario de atención es de 9 a 18 horas de lunes a viernes.",
+        "Los sábados la atención es de 10 a 14 horas"
+    ])["success"]
+    question = "¿Cuál es el horario de atención?"
+
+    prepared = strategies.prepare_rag_query(question, TENANT, None, "vector", None, 0.0, {"size": 2})
+    assert [document["chunk_index"] for document in prepared["relevant_docs"]] == [0, 1]
+
+    monkeypatch.setenv("MMR_LAMBDA", "0.5")
+    monkeypatch.setenv("MMR_CANDIDATES", "10")
+    opensearch.search_bodies.clear()
+
+    prepared = strategies.prepare_rag_query(question, TENANT, None, "vector", None, 0.0, {"size": 2})
+
+    # Se piden más candidatos con embedding y el chunk repetido cede su lugar
+    assert opensearch.search_bodies[0]["size"] == 10
+    assert "embedding" in opensearch.search_bodies[0]["_source"]
+    assert [document["chunk_index"] for document in prepared["relevant_docs"]] == [0, 2]
+    assert all("embedding" not in document for document in prepared["relevant_docs"])